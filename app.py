@@ -1,15 +1,38 @@
 import os
+from collections.abc import Callable, Coroutine
+from typing import Any
 
-from flask import Flask
+from flask import Flask, Response, request
 from gcp_microservice_utils import GcpAuthToken, setup_apigateway, setup_cloud_logging, setup_cloud_trace
 
-from blueprints import BlueprintBackup, BlueprintHealth, BlueprintIncident, BlueprintReset
+from blueprints import (
+    BlueprintArchive,
+    BlueprintBackup,
+    BlueprintBulk,
+    BlueprintChanges,
+    BlueprintHealth,
+    BlueprintIncident,
+    BlueprintIncidentAsync,
+    BlueprintMetrics,
+    BlueprintReset,
+    BlueprintSideEffects,
+)
+from blueprints.idempotency import finish_request, start_request
 from containers import Container
 
 
 class FlaskMicroservice(Flask):
     container: Container
 
+    def async_to_sync(self, func: Callable[..., Coroutine[Any, Any, Any]]) -> Callable[..., Any]:
+        # Async views run on the container's shared event loop instead of a new loop per request
+        event_loop = self.container.event_loop()
+
+        def run(*args: Any, **kwargs: Any) -> Any:  # noqa: ANN401
+            return event_loop.run(func(*args, **kwargs))
+
+        return run
+
 
 def create_app() -> FlaskMicroservice:
     if os.getenv('ENABLE_CLOUD_LOGGING') == '1':
@@ -19,6 +42,49 @@ def create_app() -> FlaskMicroservice:
     app.container = Container()
 
     app.container.config.firestore.database.from_env('FIRESTORE_DATABASE', '(default)')
+    # Maximum history entries kept on the incident document, 0 stores all of them in the history subcollection
+    app.container.config.firestore.embedded_history.from_env('FIRESTORE_EMBEDDED_HISTORY', '0', as_=int)
+    # Entries per compacted history chunk, and subcollection entries that trigger a compaction (0 disables it)
+    app.container.config.firestore.history_chunk.from_env('FIRESTORE_HISTORY_CHUNK', '100', as_=int)
+    app.container.config.firestore.compact_threshold.from_env('FIRESTORE_COMPACT_THRESHOLD', '0', as_=int)
+    # Closed incidents not modified for that many days are moved to the archive, at most limit per call
+    app.container.config.incident_archive.days.from_env('INCIDENT_ARCHIVE_DAYS', '90', as_=int)
+    app.container.config.incident_archive.limit.from_env('INCIDENT_ARCHIVE_LIMIT', '1000', as_=int)
+
+    app.container.config.incident_repo.backend.from_env('INCIDENT_REPO_BACKEND', 'firestore')
+    app.container.config.sqlite.path.from_env('SQLITE_PATH', 'incidents.db')
+
+    app.container.config.incident_cache.mode.from_env('INCIDENT_CACHE', 'disabled')
+    app.container.config.incident_cache.max_size.from_env('INCIDENT_CACHE_SIZE', '1024', as_=int)
+    app.container.config.incident_cache.ttl.from_env('INCIDENT_CACHE_TTL', '60', as_=float)
+
+    # Snapshot listeners of the firestore backend, answering update checks of recently modified incidents from memory
+    app.container.config.incident_listener.mode.from_env('INCIDENT_LISTENER', 'disabled')
+    app.container.config.incident_listener.max_clients.from_env('INCIDENT_LISTENER_MAX_CLIENTS', '100', as_=int)
+    app.container.config.incident_listener.idle_ttl.from_env('INCIDENT_LISTENER_IDLE_TTL', '300', as_=float)
+    app.container.config.incident_listener.active_window.from_env('INCIDENT_LISTENER_WINDOW', '3600', as_=float)
+
+    # Per-endpoint repository call statistics, logged after every request and served by the metrics endpoint
+    app.container.config.instrumentation.mode.from_env('REPO_INSTRUMENTATION', 'disabled')
+
+    # Reads repeated within a request (the view, then every notification it sends) are answered from a per-request memo
+    app.container.config.request_memo.mode.from_env('REQUEST_MEMO', 'enabled')
+
+    # Responses to write requests sent with an Idempotency-Key are replayed to their retries for ttl seconds.
+    # local_size records are kept in memory, in front of Firestore or as the only store of the other backends.
+    app.container.config.idempotency.mode.from_env('IDEMPOTENCY', 'enabled')
+    app.container.config.idempotency.ttl.from_env('IDEMPOTENCY_TTL', '86400', as_=float)
+    app.container.config.idempotency.local_size.from_env('IDEMPOTENCY_LOCAL_SIZE', '10000', as_=int)
+
+    # Writes sent with Prefer: respond-async get a 202 once committed, their notifications are sent by worker threads.
+    # The outcome is kept ttl seconds, local_size tasks in memory when the backend is not Firestore.
+    app.container.config.respond_async.workers.from_env('RESPOND_ASYNC_WORKERS', '8', as_=int)
+    app.container.config.respond_async.ttl.from_env('RESPOND_ASYNC_TTL', '86400', as_=float)
+    app.container.config.respond_async.local_size.from_env('RESPOND_ASYNC_LOCAL_SIZE', '10000', as_=int)
+
+    # Changes stamped in the last lag seconds are held back from the change feed, until writes stamped before them
+    # (slower requests, other instances) have committed
+    app.container.config.change_feed.lag.from_env('CHANGE_FEED_LAG', '30', as_=float)
 
     if 'K_SERVICE' in os.environ:  # pragma: no cover
         import google.auth
@@ -51,9 +117,65 @@ def create_app() -> FlaskMicroservice:
         elif 'USE_CLOUD_TOKEN_PROVIDER' in os.environ:
             app.container.config.svc.client.token_provider.from_value(GcpAuthToken(os.environ['CLIENT_SVC_URL']))
 
+    register_blueprints(app)
+
+    setup_instrumentation(app)
+
+    setup_idempotency(app)
+
+    return app
+
+
+def register_blueprints(app: FlaskMicroservice) -> None:
     app.register_blueprint(BlueprintBackup)
     app.register_blueprint(BlueprintHealth)
+    app.register_blueprint(BlueprintMetrics)
     app.register_blueprint(BlueprintReset)
-    app.register_blueprint(BlueprintIncident)
+    app.register_blueprint(BlueprintSideEffects)
+    # The bulk views run on the sync repository, which every backend provides
+    app.register_blueprint(BlueprintBulk)
+    app.register_blueprint(BlueprintChanges)
 
-    return app
+    if app.container.config.incident_repo.backend() in ['firestore', 'firestore_async']:
+        app.register_blueprint(BlueprintArchive)
+
+    if app.container.config.incident_repo.backend() == 'firestore_async':
+        app.register_blueprint(BlueprintIncidentAsync)
+    else:
+        app.register_blueprint(BlueprintIncident)
+
+
+def setup_instrumentation(app: FlaskMicroservice) -> None:
+    if app.container.config.instrumentation.mode() != 'enabled':
+        return
+
+    instrumentation = app.container.instrumentation()
+
+    @app.before_request
+    def start_request() -> None:
+        instrumentation.start_request(request.endpoint)
+
+    @app.teardown_request
+    def end_request(_exc: BaseException | None) -> None:
+        instrumentation.end_request()
+
+
+def setup_idempotency(app: FlaskMicroservice) -> None:
+    if app.container.config.idempotency.mode() != 'enabled':
+        return
+
+    ttl = app.container.config.idempotency.ttl()
+
+    @app.before_request
+    def start_idempotent_request() -> Response | None:
+        return start_request(app.container.idempotency_repo)
+
+    @app.after_request
+    def finish_idempotent_request(response: Response) -> Response:
+        finish_request(app.container.idempotency_repo, response, ttl)
+        return response
+
+    @app.teardown_request
+    def release_idempotent_request(_exc: BaseException | None) -> None:
+        # Only holds a key when no response was made
+        finish_request(app.container.idempotency_repo, None, ttl)
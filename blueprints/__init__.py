@@ -1,8 +1,25 @@
 # ruff: noqa: N812
 
+from .archive import blp as BlueprintArchive
 from .backup import blp as BlueprintBackup
+from .bulk import blp as BlueprintBulk
+from .changes import blp as BlueprintChanges
 from .health import blp as BlueprintHealth
 from .incident import blp as BlueprintIncident
+from .incident_async import blp as BlueprintIncidentAsync
+from .metrics import blp as BlueprintMetrics
 from .reset import blp as BlueprintReset
+from .side_effects import blp as BlueprintSideEffects
 
-__all__ = ['BlueprintBackup', 'BlueprintHealth', 'BlueprintReset', 'BlueprintIncident']
+__all__ = [
+    'BlueprintArchive',
+    'BlueprintBackup',
+    'BlueprintBulk',
+    'BlueprintChanges',
+    'BlueprintHealth',
+    'BlueprintMetrics',
+    'BlueprintReset',
+    'BlueprintSideEffects',
+    'BlueprintIncident',
+    'BlueprintIncidentAsync',
+]
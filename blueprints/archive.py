@@ -0,0 +1,29 @@
+from datetime import UTC, datetime, timedelta
+
+from dependency_injector.wiring import Provide
+from flask import Blueprint, Response
+from flask.views import MethodView
+
+from containers import Container
+from repositories.firestore import FirestoreIncidentRepository
+
+from .util import class_route, json_response
+
+blp = Blueprint('Archive', __name__)
+
+
+# Called by Cloud Scheduler, every call archives at most `limit` incidents
+@class_route(blp, '/api/v1/archive/incident')
+class Archive(MethodView):
+    init_every_request = False
+
+    def post(
+        self,
+        incident_repo: FirestoreIncidentRepository = Provide[Container.firestore_incident_repo],
+        days: int = Provide[Container.config.incident_archive.days],
+        limit: int = Provide[Container.config.incident_archive.limit],
+    ) -> Response:
+        closed_before = datetime.now(UTC) - timedelta(days=days)
+        archived = incident_repo.archive_closed(closed_before, limit)
+
+        return json_response({'status': 'Ok', 'archived': archived}, 200)
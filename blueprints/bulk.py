@@ -0,0 +1,217 @@
+from dataclasses import dataclass, field
+from typing import Any
+
+import marshmallow.validate
+from dependency_injector.wiring import Provide
+from flask import Blueprint, Response, current_app
+from flask.views import MethodView
+
+from containers import Container
+from models import Action, HistoryEntry, Incident
+from services import IncidentService, RiskChange, UpdateItem, UpdateRejectedError
+from utils import INVALID_UUID_ERROR
+
+from .incident import (
+    IncidentRiskUpdateBody,
+    IncidentUpdateBody,
+    RegistryIncidentBody,
+    history_to_dict,
+    incident_to_dict,
+    new_incident,
+)
+from .notification import send_notifications
+from .util import class_route, is_valid_uuid4, json_response
+from .validation import MAX_BODY_SIZE, RequestValidator, load_body
+
+blp = Blueprint('Bulk', __name__)
+
+# Items per bulk request, the body limit grows with it
+BULK_MAX_ITEMS = 100
+
+
+def item_error(incident_id: str, message: str, code: int) -> dict[str, Any]:
+    return {'incident_id': incident_id, 'code': code, 'message': message}
+
+
+def notify(
+    client_id: str,
+    incident_ids: list[str],
+    topic: str,
+    loaded: dict[str, tuple[Incident, list[HistoryEntry]]] | None = None,
+) -> None:
+    # The writes are done, a failed notification is logged instead of failing the whole request
+    try:
+        errors = send_notifications(client_id, incident_ids, topic, loaded=loaded)
+    except Exception as e:  # noqa: BLE001
+        errors = dict.fromkeys(incident_ids, e)
+
+    for incident_id, error in errors.items():
+        current_app.logger.error('Failed to send %s notification of incident %s: %s', topic, incident_id, error)
+
+
+@dataclass
+class BulkUpdateItemBody(IncidentUpdateBody):
+    incident_id: str = field(metadata={'validate': marshmallow.validate.Length(min=1, max=50)})
+    assigned_to: str = field(metadata={'validate': marshmallow.validate.Length(min=1, max=50)})
+
+
+@dataclass
+class BulkUpdateBody:
+    updates: list[BulkUpdateItemBody] = field(metadata={'validate': marshmallow.validate.Length(min=1, max=BULK_MAX_ITEMS)})
+
+
+BULK_UPDATE_VALIDATOR = RequestValidator(BulkUpdateBody)
+
+
+# Internal only, many updates of the incidents of one client
+@class_route(blp, '/api/v1/clients/<client_id>/incidents/update')
+class BulkIncidentUpdate(MethodView):
+    init_every_request = False
+
+    def post(
+        self,
+        client_id: str,
+        incident_service: IncidentService = Provide[Container.incident_service],
+    ) -> Response:
+        data = load_body(BULK_UPDATE_VALIDATOR, MAX_BODY_SIZE * BULK_MAX_ITEMS)
+        if isinstance(data, Response):
+            return data
+
+        # Items with an invalid ID are rejected on their own, the others are applied in a single batch
+        valid = [item for item in data.updates if is_valid_uuid4(item.incident_id)]
+        applied = iter(
+            incident_service.append_updates(
+                client_id,
+                [UpdateItem(item.incident_id, item.assigned_to, Action(item.action), item.description) for item in valid],
+            )
+        )
+
+        results: list[dict[str, Any]] = []
+        updated: list[str] = []
+
+        for item in data.updates:
+            if not is_valid_uuid4(item.incident_id):
+                results.append(item_error(item.incident_id, INVALID_UUID_ERROR.format(field='incident_id'), 400))
+                continue
+
+            result: HistoryEntry | UpdateRejectedError = next(applied)
+            if isinstance(result, UpdateRejectedError):
+                results.append(item_error(item.incident_id, result.message, result.status))
+            else:
+                results.append({'incident_id': item.incident_id, 'code': 201, 'entry': history_to_dict(result)})
+                updated.append(item.incident_id)
+
+        if updated:
+            notify(client_id, updated, 'incident-update')
+
+        return json_response({'results': results}, 200)
+
+
+@dataclass
+class BulkRiskUpdateItemBody(IncidentRiskUpdateBody):
+    incident_id: str = field(metadata={'validate': marshmallow.validate.Length(min=1, max=50)})
+
+
+@dataclass
+class BulkRiskUpdateBody:
+    incidents: list[BulkRiskUpdateItemBody] = field(
+        metadata={'validate': marshmallow.validate.Length(min=1, max=BULK_MAX_ITEMS)}
+    )
+
+
+BULK_RISK_UPDATE_VALIDATOR = RequestValidator(BulkRiskUpdateBody)
+
+
+# Internal only, risks of many incidents of one client, as re-scored by the predictive AI
+@class_route(blp, '/api/v1/clients/<client_id>/incidents/update-risk')
+class BulkIncidentUpdateRisk(MethodView):
+    init_every_request = False
+
+    def put(
+        self,
+        client_id: str,
+        incident_service: IncidentService = Provide[Container.incident_service],
+    ) -> Response:
+        data = load_body(BULK_RISK_UPDATE_VALIDATOR, MAX_BODY_SIZE * BULK_MAX_ITEMS)
+        if isinstance(data, Response):
+            return data
+
+        valid = [item for item in data.incidents if is_valid_uuid4(item.incident_id)]
+        applied = iter(incident_service.update_risks(client_id, [(item.incident_id, item.risk) for item in valid]))
+
+        results: list[dict[str, Any]] = []
+        # Incidents whose risk actually changed, notified once each
+        changed: dict[str, None] = {}
+
+        for item in data.incidents:
+            if not is_valid_uuid4(item.incident_id):
+                results.append(item_error(item.incident_id, INVALID_UUID_ERROR.format(field='incident_id'), 400))
+                continue
+
+            result: RiskChange | UpdateRejectedError = next(applied)
+            if isinstance(result, UpdateRejectedError):
+                results.append(item_error(item.incident_id, result.message, result.status))
+                continue
+
+            prev_risk, risk = result
+            results.append({'incident_id': item.incident_id, 'code': 200, 'updated': prev_risk != risk, 'risk': risk})
+            if prev_risk != risk and prev_risk is not None:
+                changed[item.incident_id] = None
+
+        if changed:
+            notify(client_id, list(changed), 'incident-risk-updated')
+
+        return json_response({'results': results}, 200)
+
+
+@dataclass
+class BulkRegistryBody:
+    incidents: list[RegistryIncidentBody] = field(
+        metadata={'validate': marshmallow.validate.Length(min=1, max=BULK_MAX_ITEMS)}
+    )
+
+
+BULK_REGISTRY_VALIDATOR = RequestValidator(BulkRegistryBody)
+
+
+# Many registrations at once, for the intake services of the high-volume channels
+@class_route(blp, '/api/v1/register/incidents')
+class BulkRegistryIncident(MethodView):
+    init_every_request = False
+
+    def post(
+        self,
+        incident_service: IncidentService = Provide[Container.incident_service],
+    ) -> Response:
+        data = load_body(BULK_REGISTRY_VALIDATOR, MAX_BODY_SIZE * BULK_MAX_ITEMS)
+        if isinstance(data, Response):
+            return data
+
+        incidents = [new_incident(item) for item in data.incidents]
+        registered = incident_service.register_incidents(
+            [(incident, item.description) for incident, item in zip(incidents, data.incidents, strict=True)]
+        )
+
+        results: list[dict[str, Any]] = []
+        # Registered incidents and their history by client, the notifications are built from them without reads
+        loaded: dict[str, dict[str, tuple[Incident, list[HistoryEntry]]]] = {}
+        alerts: dict[str, list[str]] = {}
+
+        for incident, item, result in zip(incidents, data.incidents, registered, strict=True):
+            if isinstance(result, UpdateRejectedError):
+                results.append(item_error(incident.id, result.message, result.status))
+                continue
+
+            results.append({'code': 201, 'incident': incident_to_dict(incident)})
+            loaded.setdefault(incident.client_id, {})[incident.id] = (incident, [result])
+
+            if 'urgente' in item.description.lower():
+                alerts.setdefault(incident.client_id, []).append(incident.id)
+
+        for client_id, client_loaded in loaded.items():
+            notify(client_id, list(client_loaded), 'incident-update', client_loaded)
+
+            if client_id in alerts:
+                notify(client_id, alerts[client_id], 'incident-alert', client_loaded)
+
+        return json_response({'results': results}, 200)
@@ -0,0 +1,105 @@
+import base64
+import binascii
+import json
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+from dependency_injector.wiring import Provide
+from flask import Blueprint, Response, request
+from flask.views import MethodView
+
+from containers import Container
+from models import IncidentChange
+from repositories import IncidentRepository
+from utils import INVALID_PARAMETER_ERROR
+
+from .incident import incident_to_dict
+from .util import class_route, error_response, json_response
+
+blp = Blueprint('Change Feed', __name__)
+
+CHANGE_FEED_DEFAULT_LIMIT = 100
+CHANGE_FEED_MAX_LIMIT = 500
+
+# Position of a change in the feed, the empty incident ID is the start of its last_modified
+Position = tuple[datetime, str]
+FEED_START: Position = (datetime.min.replace(tzinfo=UTC), '')
+
+
+def change_to_dict(change: IncidentChange) -> dict[str, Any]:
+    return {
+        **incident_to_dict(change.incident),
+        'last_modified': change.last_modified.isoformat().replace('+00:00', 'Z'),
+    }
+
+
+def encode_cursor(position: Position) -> str:
+    last_modified, incident_id = position
+    return base64.urlsafe_b64encode(json.dumps([last_modified.isoformat(), incident_id]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Position | None:
+    try:
+        last_modified, incident_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return parse_time(last_modified), str(incident_id)
+    except (binascii.Error, ValueError, TypeError):
+        return None
+
+
+def parse_time(value: str) -> datetime:
+    # Times without an offset are taken as UTC
+    parsed = datetime.fromisoformat(value)
+    return parsed.replace(tzinfo=UTC) if parsed.tzinfo is None else parsed.astimezone(UTC)
+
+
+def feed_position() -> Position | Response:
+    # The cursor of the previous page, or since when starting, or the start of the feed
+    cursor = request.args.get('cursor')
+    if cursor is not None:
+        position = decode_cursor(cursor)
+        return error_response(INVALID_PARAMETER_ERROR.format(param='cursor'), 400) if position is None else position
+
+    since = request.args.get('since')
+    if since is None:
+        return FEED_START
+
+    try:
+        return parse_time(since), ''
+    except ValueError:
+        return error_response(INVALID_PARAMETER_ERROR.format(param='since'), 400)
+
+
+@class_route(blp, '/api/v1/clients/<client_id>/incidents/changes')
+class IncidentChangeFeed(MethodView):
+    init_every_request = False
+
+    def get(
+        self,
+        client_id: str,
+        incident_repo: IncidentRepository = Provide[Container.incident_repo],
+        lag: float = Provide[Container.config.change_feed.lag],
+    ) -> Response:
+        position = feed_position()
+        if isinstance(position, Response):
+            return position
+
+        limit = request.args.get('limit', str(CHANGE_FEED_DEFAULT_LIMIT))
+        if not limit.isdigit() or not 1 <= int(limit) <= CHANGE_FEED_MAX_LIMIT:
+            return error_response(INVALID_PARAMETER_ERROR.format(param='limit'), 400)
+
+        # last_modified is stamped before the write commits, recent changes are held back until any write
+        # stamped before them has committed, so a consumer never moves its cursor past a change it has not seen
+        until = datetime.now(UTC) - timedelta(seconds=lag)
+        changes = incident_repo.get_changes(client_id, position, until, int(limit)) if position[0] <= until else []
+
+        if changes:
+            position = changes[-1].last_modified, changes[-1].incident.id
+
+        return json_response(
+            {
+                'changes': [change_to_dict(change) for change in changes],
+                'cursor': encode_cursor(position),
+                'has_more': len(changes) == int(limit),
+            },
+            200,
+        )
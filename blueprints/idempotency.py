@@ -0,0 +1,97 @@
+import hashlib
+from collections.abc import Callable
+from datetime import UTC, datetime, timedelta
+
+from flask import Response, current_app, g, request
+
+from models import IdempotencyRecord
+from repositories import IdempotencyRepository
+from utils import IDEMPOTENCY_IN_PROGRESS_ERROR, IDEMPOTENCY_KEY_ERROR, IDEMPOTENCY_MISMATCH_ERROR
+
+from .bulk import BULK_MAX_ITEMS
+from .util import error_response
+from .validation import MAX_BODY_SIZE
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+WRITE_METHODS = {'POST', 'PUT', 'PATCH', 'DELETE'}
+# Response headers stored with the body, the ones a retry needs to act on the response as on the first one
+STORED_HEADERS = ('Content-Type', 'Location', 'ETag', 'Preference-Applied')
+# How long a request holds its key, a retry after that (the instance died mid-request) runs it again
+IN_PROGRESS_TTL = timedelta(minutes=5)
+
+
+def scoped_key(key: str) -> str:
+    # Keys are chosen by the callers, scoping them to the caller and the endpoint keeps them from colliding
+    token = getattr(request, 'user_token', None) or {}
+    scope = '\n'.join([str(token.get('sub', '')), request.method, request.path, key])
+    return hashlib.sha256(scope.encode('utf-8')).hexdigest()
+
+
+def request_fingerprint() -> str:
+    # The body is cached, the view reads it again. Larger bodies are rejected by every endpoint.
+    request.max_content_length = MAX_BODY_SIZE * BULK_MAX_ITEMS
+    return hashlib.sha256(request.get_data()).hexdigest()
+
+
+def replay(record: IdempotencyRecord, existing: IdempotencyRecord) -> Response:
+    if existing.fingerprint != record.fingerprint:
+        return error_response(IDEMPOTENCY_MISMATCH_ERROR, 422)
+
+    if existing.status is None:
+        return error_response(IDEMPOTENCY_IN_PROGRESS_ERROR, 409)
+
+    response = Response(
+        existing.body, status=existing.status, headers={'Content-Type': 'application/json', **existing.headers}
+    )
+    response.headers[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def start_request(repo: Callable[[], IdempotencyRepository]) -> Response | None:
+    # Returns the response to a retry, or None when the request runs, holding its key until finish_request.
+    # repo is only called for writes carrying a key, other requests never build the store.
+    key = request.headers.get(IDEMPOTENCY_HEADER)
+    if key is None or request.method not in WRITE_METHODS:
+        return None
+
+    if not 0 < len(key) <= IDEMPOTENCY_KEY_MAX_LENGTH:
+        return error_response(IDEMPOTENCY_KEY_ERROR, 400)
+
+    record = IdempotencyRecord(
+        key=scoped_key(key), fingerprint=request_fingerprint(), expires_at=datetime.now(UTC) + IN_PROGRESS_TTL
+    )
+
+    try:
+        existing = repo().create(record)
+    except Exception:
+        # The store being down must not take the writes with it, they run as without a key
+        current_app.logger.exception('Failed to store idempotency key')
+        return None
+
+    if existing is not None:
+        return replay(record, existing)
+
+    g.idempotency_record = record
+    return None
+
+
+def finish_request(repo: Callable[[], IdempotencyRepository], response: Response | None, ttl: float) -> None:
+    # Stores the response for the retries. Server errors release the key instead, so a retry runs the request again.
+    record: IdempotencyRecord | None = g.pop('idempotency_record', None)
+    if record is None:
+        return
+
+    try:
+        if response is None or response.status_code >= 500 or response.is_streamed:  # noqa: PLR2004
+            repo().delete(record.key)
+            return
+
+        record.status = response.status_code
+        record.body = response.get_data(as_text=True)
+        record.headers = {name: response.headers[name] for name in STORED_HEADERS if name in response.headers}
+        record.expires_at = datetime.now(UTC) + timedelta(seconds=ttl)
+        repo().complete(record)
+    except Exception:
+        current_app.logger.exception('Failed to store idempotent response')
@@ -1,28 +1,23 @@
 from dataclasses import dataclass, field
 from datetime import UTC, datetime
+from functools import partial
 from typing import Any
 from uuid import uuid4
 
 import marshmallow.validate
-import marshmallow_dataclass
 from dependency_injector.wiring import Provide
-from flask import Blueprint, Response, request
+from flask import Blueprint, Response
 from flask.views import MethodView
-from marshmallow import ValidationError
 
 from containers import Container
 from models import Action, Channel, HistoryEntry, Incident, Risk
 from repositories import IncidentRepository
-from utils import (
-    CLOSED_INCIDENT_ERROR,
-    INCIDENT_NOT_FOUND,
-    INVALID_UUID_ERROR,
-    JSON_VALIDATION_ERROR,
-    UNAUTHORIZED_INCIDENT_ERROR,
-)
+from services import IncidentService, IncidentUnitOfWork, UpdateRejectedError
 
 from .notification import send_notification
-from .util import class_route, error_response, is_valid_uuid4, json_response, requires_token, validation_error_response
+from .side_effects import SideEffects, finish_side_effects
+from .util import class_route, error_response, if_match_version, json_response, requires_token
+from .validation import RequestValidator, invalid_path_response, load_body
 
 blp = Blueprint('Incident', __name__)
 
@@ -63,6 +58,22 @@ class RegistryIncidentBody:
     assigned_to: str = field(metadata={'validate': marshmallow.validate.Length(min=1, max=50)})
 
 
+REGISTRY_VALIDATOR = RequestValidator(RegistryIncidentBody, fast=True)
+
+
+def new_incident(data: RegistryIncidentBody) -> Incident:
+    return Incident(
+        id=str(uuid4()),
+        client_id=data.client_id,
+        name=data.name,
+        channel=Channel(data.channel),
+        reported_by=data.reported_by,
+        created_by=data.created_by,
+        assigned_to=data.assigned_to,
+        risk=None,
+    )
+
+
 @class_route(blp, '/api/v1/register/incident')
 class RegistryIncident(MethodView):
     init_every_request = False
@@ -72,28 +83,12 @@ class RegistryIncident(MethodView):
         incident_repo: IncidentRepository = Provide[Container.incident_repo],
     ) -> Response:
         # Validate request body
-        schema = marshmallow_dataclass.class_schema(RegistryIncidentBody)()
-        req_json = request.get_json(silent=True)
-
-        if req_json is None:
-            return error_response(JSON_VALIDATION_ERROR, 400)
-
-        try:
-            data: RegistryIncidentBody = schema.load(req_json)
-        except ValidationError as e:
-            return validation_error_response(e)
+        data = load_body(REGISTRY_VALIDATOR)
+        if isinstance(data, Response):
+            return data
 
         # Create incident
-        incident = Incident(
-            id=str(uuid4()),
-            client_id=data.client_id,
-            name=data.name,
-            channel=Channel(data.channel),
-            reported_by=data.reported_by,
-            created_by=data.created_by,
-            assigned_to=data.assigned_to,
-            risk=None,
-        )
+        incident = new_incident(data)
 
         # Append history entry
         history_entry = HistoryEntry(
@@ -108,12 +103,14 @@ class RegistryIncident(MethodView):
         incident_repo.create(incident)
         incident_repo.append_history_entry(history_entry)
 
-        send_notification(incident.client_id, incident.id, 'incident-update')
+        effects: SideEffects = {
+            'incident-update': partial(send_notification, incident.client_id, incident.id, 'incident-update'),
+        }
 
         if 'urgente' in data.description.lower():
-            send_notification(incident.client_id, incident.id, 'incident-alert')
+            effects['incident-alert'] = partial(send_notification, incident.client_id, incident.id, 'incident-alert')
 
-        return json_response(incident_to_dict(incident), 201)
+        return finish_side_effects(json_response(incident_to_dict(incident), 201), effects)
 
 
 @dataclass
@@ -124,54 +121,52 @@ class IncidentUpdateBody:
     description: str = field(metadata={'validate': marshmallow.validate.Length(min=1, max=1000)})
 
 
+UPDATE_VALIDATOR = RequestValidator(IncidentUpdateBody, fast=True)
+
+
+def update_response(uow: IncidentUnitOfWork, data: dict[str, Any], status: int) -> Response:
+    # Repository calls the request made through its unit of work
+    response = json_response(data, status)
+    response.headers['X-Repository-Calls'] = str(uow.calls)
+    return response
+
+
+def append_update(
+    incident_service: IncidentService, client_id: str, incident_id: str, assigned_to: str, data: IncidentUpdateBody
+) -> Response:
+    try:
+        uow, history_entry = incident_service.append_update(
+            client_id, incident_id, assigned_to, Action(data.action), data.description
+        )
+    except UpdateRejectedError as err:
+        return error_response(err.message, err.status)
+
+    effects: SideEffects = {
+        'incident-update': partial(send_notification, client_id, incident_id, 'incident-update'),
+    }
+
+    return finish_side_effects(update_response(uow, history_to_dict(history_entry), 201), effects)
+
+
 @class_route(blp, '/api/v1/incidents/<incident_id>/update')
 class IncidentDetail(MethodView):
     init_every_request = False
 
     @requires_token
-    def post(  # noqa: PLR0911
+    def post(
         self,
         incident_id: str,
         token: dict[str, Any],
-        incident_repo: IncidentRepository = Provide[Container.incident_repo],
+        incident_service: IncidentService = Provide[Container.incident_service],
     ) -> Response:
-        auth_schema = marshmallow_dataclass.class_schema(IncidentUpdateBody)()
-        req_json = request.get_json(silent=True)
-        if req_json is None:
-            return error_response(JSON_VALIDATION_ERROR, 400)
-
-        try:
-            data: IncidentUpdateBody = auth_schema.load(req_json)
-        except ValidationError as err:
-            return validation_error_response(err)
-
-        if not is_valid_uuid4(incident_id):
-            return error_response(INVALID_UUID_ERROR.format(field='incident_id'), 400)
-
-        incident = incident_repo.get(client_id=token['cid'], incident_id=incident_id)
-        if incident is None:
-            return error_response(INCIDENT_NOT_FOUND, 404)
-
-        if incident.assigned_to != token['sub']:
-            return error_response(UNAUTHORIZED_INCIDENT_ERROR, 403)
-
-        history = list(incident_repo.get_history(client_id=token['cid'], incident_id=incident.id))
-
-        if history[-1].action == Action.CLOSED:
-            return error_response(CLOSED_INCIDENT_ERROR, 409)
-
-        history_entry = HistoryEntry(
-            incident_id=incident.id,
-            client_id=incident.client_id,
-            date=datetime.now(UTC).replace(microsecond=0),
-            action=Action(data.action),
-            description=data.description,
-        )
-        incident_repo.append_history_entry(history_entry)
+        if (error := invalid_path_response(incident_id=incident_id)) is not None:
+            return error
 
-        send_notification(incident.client_id, incident.id, 'incident-update')
+        data = load_body(UPDATE_VALIDATOR)
+        if isinstance(data, Response):
+            return data
 
-        return json_response(history_to_dict(history_entry), 201)
+        return append_update(incident_service, token['cid'], incident_id, token['sub'], data)
 
 
 # Internal only
@@ -179,50 +174,21 @@ class IncidentDetail(MethodView):
 class IncidentUpdate(MethodView):
     init_every_request = False
 
-    def post(  # noqa: PLR0911
+    def post(
         self,
         client_id: str,
         incident_id: str,
         assigned_to: str,
-        incident_repo: IncidentRepository = Provide[Container.incident_repo],
+        incident_service: IncidentService = Provide[Container.incident_service],
     ) -> Response:
-        auth_schema = marshmallow_dataclass.class_schema(IncidentUpdateBody)()
-        req_json = request.get_json(silent=True)
-        if req_json is None:
-            return error_response(JSON_VALIDATION_ERROR, 400)
-
-        try:
-            data: IncidentUpdateBody = auth_schema.load(req_json)
-        except ValidationError as err:
-            return validation_error_response(err)
-
-        if not is_valid_uuid4(incident_id):
-            return error_response(INVALID_UUID_ERROR.format(field='incident_id'), 400)
+        if (error := invalid_path_response(incident_id=incident_id)) is not None:
+            return error
 
-        incident = incident_repo.get(client_id=client_id, incident_id=incident_id)
-        if incident is None:
-            return error_response(INCIDENT_NOT_FOUND, 404)
+        data = load_body(UPDATE_VALIDATOR)
+        if isinstance(data, Response):
+            return data
 
-        if incident.assigned_to != assigned_to:
-            return error_response(UNAUTHORIZED_INCIDENT_ERROR, 403)
-
-        history = list(incident_repo.get_history(client_id=client_id, incident_id=incident.id))
-
-        if history[-1].action == Action.CLOSED:
-            return error_response(CLOSED_INCIDENT_ERROR, 409)
-
-        history_entry = HistoryEntry(
-            incident_id=incident.id,
-            client_id=incident.client_id,
-            date=datetime.now(UTC).replace(microsecond=0),
-            action=Action(data.action),
-            description=data.description,
-        )
-        incident_repo.append_history_entry(history_entry)
-
-        send_notification(incident.client_id, incident.id, 'incident-update')
-
-        return json_response(history_to_dict(history_entry), 201)
+        return append_update(incident_service, client_id, incident_id, assigned_to, data)
 
 
 @dataclass
@@ -230,6 +196,9 @@ class IncidentRiskUpdateBody:
     risk: Risk = field(metadata={'validate': marshmallow.validate.OneOf([Risk.HIGH, Risk.LOW, Risk.MEDIUM])})
 
 
+RISK_UPDATE_VALIDATOR = RequestValidator(IncidentRiskUpdateBody, fast=True)
+
+
 # Internal only
 @class_route(blp, '/api/v1/clients/<client_id>/incidents/<incident_id>/update-risk')
 class IncidentUpdateRisk(MethodView):
@@ -239,35 +208,32 @@ class IncidentUpdateRisk(MethodView):
         self,
         client_id: str,
         incident_id: str,
-        incident_repo: IncidentRepository = Provide[Container.incident_repo],
+        incident_service: IncidentService = Provide[Container.incident_service],
     ) -> Response:
-        auth_schema = marshmallow_dataclass.class_schema(IncidentRiskUpdateBody)()
-        req_json = request.get_json(silent=True)
-        if req_json is None:
-            return error_response(JSON_VALIDATION_ERROR, 400)
-
-        try:
-            data: IncidentRiskUpdateBody = auth_schema.load(req_json)
-        except ValidationError as err:
-            return validation_error_response(err)
-
-        if not is_valid_uuid4(incident_id):
-            return error_response(INVALID_UUID_ERROR.format(field='incident_id'), 400)
+        if (error := invalid_path_response(incident_id=incident_id)) is not None:
+            return error
 
-        incident = incident_repo.get(client_id=client_id, incident_id=incident_id)
-        if incident is None:
-            return error_response(INCIDENT_NOT_FOUND, 404)
+        if_match = if_match_version()
+        if isinstance(if_match, Response):
+            return if_match
 
-        history = list(incident_repo.get_history(client_id=client_id, incident_id=incident.id))
+        data = load_body(RISK_UPDATE_VALIDATOR)
+        if isinstance(data, Response):
+            return data
 
-        if history[-1].action == Action.CLOSED:
-            return error_response(CLOSED_INCIDENT_ERROR, 409)
-
-        prev_risk = incident.risk
-        incident.risk = data.risk
-        incident_repo.update(incident)
+        try:
+            uow, prev_risk = incident_service.update_risk(client_id, incident_id, data.risk, if_match)
+        except UpdateRejectedError as err:
+            return error_response(err.message, err.status)
 
+        incident, _ = uow.loaded
+        effects: SideEffects = {}
         if prev_risk != data.risk and prev_risk is not None:
-            send_notification(incident.client_id, incident.id, 'incident-risk-updated')
+            effects['incident-risk-updated'] = partial(send_notification, client_id, incident_id, 'incident-risk-updated')
+
+        response = update_response(uow, incident_to_dict(incident), 200)
+        # The version the risk was written with, the If-Match of the next update
+        if incident.version is not None:
+            response.set_etag(incident.version)
 
-        return json_response(incident_to_dict(incident), 200)
+        return finish_side_effects(response, effects)
@@ -0,0 +1,238 @@
+from collections.abc import Collection
+from datetime import UTC, datetime
+from functools import partial
+from typing import Any
+
+from dependency_injector.wiring import Provide
+from flask import Blueprint, Response
+from flask.views import MethodView
+from google.api_core.exceptions import FailedPrecondition
+
+from containers import Container
+from models import Action, HistoryEntry, Incident, IncidentView, Risk
+from repositories import AsyncIncidentRepository
+from services.incident import UPDATE_CHECK_FIELDS, UpdateRejectedError
+from utils import CLOSED_INCIDENT_ERROR, INCIDENT_NOT_FOUND, INCIDENT_VERSION_ERROR, UNAUTHORIZED_INCIDENT_ERROR
+
+from .incident import (
+    REGISTRY_VALIDATOR,
+    RISK_UPDATE_VALIDATOR,
+    UPDATE_VALIDATOR,
+    history_to_dict,
+    incident_to_dict,
+    new_incident,
+)
+from .notification import send_notification_async
+from .side_effects import AsyncSideEffects, finish_side_effects_async
+from .util import class_route, error_response, if_match_version, json_response, requires_token_async
+from .validation import invalid_path_response, load_body
+
+# Async variants of the views in blueprints.incident, registered instead of them when
+# INCIDENT_REPO_BACKEND=firestore_async. They answer the same, respond-async, ETag/If-Match and
+# X-Repository-Calls included, but do not go through IncidentService: its unit of work is blocking.
+blp = Blueprint('Incident (async)', __name__)
+
+
+class RepositoryCalls:
+    # The repository calls of an update, counted for X-Repository-Calls as IncidentUnitOfWork counts them
+    def __init__(self, incident_repo: AsyncIncidentRepository) -> None:
+        self.incident_repo = incident_repo
+        self.calls = 0
+
+    async def get_view(self, client_id: str, incident_id: str, fields: Collection[str]) -> IncidentView | None:
+        self.calls += 1
+        return await self.incident_repo.get_view(client_id=client_id, incident_id=incident_id, fields=fields)
+
+    async def get_with_history(
+        self, client_id: str, incident_id: str, history_limit: int | None = None
+    ) -> tuple[Incident | None, list[HistoryEntry]]:
+        self.calls += 1
+        return await self.incident_repo.get_with_history(
+            client_id=client_id, incident_id=incident_id, history_limit=history_limit
+        )
+
+    async def append_history_entry(self, entry: HistoryEntry) -> None:
+        self.calls += 1
+        await self.incident_repo.append_history_entry(entry)
+
+    async def update(self, incident: Incident, expected_version: str | None = None) -> None:
+        self.calls += 1
+        await self.incident_repo.update(incident, expected_version=expected_version)
+
+
+def update_response(data: dict[str, Any], status: int, repo: RepositoryCalls) -> Response:
+    response = json_response(data, status)
+    response.headers['X-Repository-Calls'] = str(repo.calls)
+    return response
+
+
+@class_route(blp, '/api/v1/register/incident')
+class RegistryIncidentAsync(MethodView):
+    init_every_request = False
+
+    async def post(
+        self,
+        incident_repo: AsyncIncidentRepository = Provide[Container.async_incident_repo],
+    ) -> Response:
+        # Validate request body
+        data = load_body(REGISTRY_VALIDATOR)
+        if isinstance(data, Response):
+            return data
+
+        # Create incident
+        incident = new_incident(data)
+
+        # Append history entry
+        history_entry = HistoryEntry(
+            incident_id=incident.id,
+            client_id=incident.client_id,
+            date=datetime.now(UTC).replace(microsecond=0),
+            action=Action.CREATED,
+            description=data.description,
+        )
+
+        # Save incident and history entry
+        await incident_repo.create(incident)
+        await incident_repo.append_history_entry(history_entry)
+
+        effects: AsyncSideEffects = {
+            'incident-update': partial(send_notification_async, incident.client_id, incident.id, 'incident-update'),
+        }
+
+        if 'urgente' in data.description.lower():
+            effects['incident-alert'] = partial(send_notification_async, incident.client_id, incident.id, 'incident-alert')
+
+        return await finish_side_effects_async(json_response(incident_to_dict(incident), 201), effects)
+
+
+async def append_update(
+    incident_repo: AsyncIncidentRepository,
+    client_id: str,
+    incident_id: str,
+    assigned_to: str,
+) -> Response:
+    if (error := invalid_path_response(incident_id=incident_id)) is not None:
+        return error
+
+    data = load_body(UPDATE_VALIDATOR)
+    if isinstance(data, Response):
+        return data
+
+    repo = RepositoryCalls(incident_repo)
+    incident = await repo.get_view(client_id, incident_id, UPDATE_CHECK_FIELDS)
+    if incident is None:
+        return error_response(INCIDENT_NOT_FOUND, 404)
+
+    if incident.assigned_to != assigned_to:
+        return error_response(UNAUTHORIZED_INCIDENT_ERROR, 403)
+
+    if incident.last_action == Action.CLOSED:
+        return error_response(CLOSED_INCIDENT_ERROR, 409)
+
+    history_entry = HistoryEntry(
+        incident_id=incident.id,
+        client_id=incident.client_id,
+        date=datetime.now(UTC).replace(microsecond=0),
+        action=Action(data.action),
+        description=data.description,
+    )
+    await repo.append_history_entry(history_entry)
+
+    effects: AsyncSideEffects = {
+        'incident-update': partial(send_notification_async, client_id, incident_id, 'incident-update'),
+    }
+
+    return await finish_side_effects_async(update_response(history_to_dict(history_entry), 201, repo), effects)
+
+
+@class_route(blp, '/api/v1/incidents/<incident_id>/update')
+class IncidentDetailAsync(MethodView):
+    init_every_request = False
+
+    @requires_token_async
+    async def post(
+        self,
+        incident_id: str,
+        token: dict[str, Any],
+        incident_repo: AsyncIncidentRepository = Provide[Container.async_incident_repo],
+    ) -> Response:
+        return await append_update(incident_repo, token['cid'], incident_id, token['sub'])
+
+
+# Internal only
+@class_route(blp, '/api/v1/clients/<client_id>/employees/<assigned_to>/incidents/<incident_id>/update')
+class IncidentUpdateAsync(MethodView):
+    init_every_request = False
+
+    async def post(
+        self,
+        client_id: str,
+        incident_id: str,
+        assigned_to: str,
+        incident_repo: AsyncIncidentRepository = Provide[Container.async_incident_repo],
+    ) -> Response:
+        return await append_update(incident_repo, client_id, incident_id, assigned_to)
+
+
+async def update_risk(
+    repo: RepositoryCalls, client_id: str, incident_id: str, risk: Risk, if_match: str | None
+) -> tuple[Incident, Risk | None]:
+    # Same checks as IncidentService.update_risk, returns the updated incident and its previous risk
+    incident, history = await repo.get_with_history(client_id, incident_id, history_limit=1)
+    if incident is None:
+        raise UpdateRejectedError(INCIDENT_NOT_FOUND, 404)
+
+    if history and history[-1].action == Action.CLOSED:
+        raise UpdateRejectedError(CLOSED_INCIDENT_ERROR, 409)
+
+    prev_risk = incident.risk
+    incident.risk = risk
+
+    try:
+        await repo.update(incident, expected_version=if_match)
+    except FailedPrecondition as e:
+        raise UpdateRejectedError(INCIDENT_VERSION_ERROR, 412) from e
+
+    return incident, prev_risk
+
+
+# Internal only
+@class_route(blp, '/api/v1/clients/<client_id>/incidents/<incident_id>/update-risk')
+class IncidentUpdateRiskAsync(MethodView):
+    init_every_request = False
+
+    async def put(
+        self,
+        client_id: str,
+        incident_id: str,
+        incident_repo: AsyncIncidentRepository = Provide[Container.async_incident_repo],
+    ) -> Response:
+        if (error := invalid_path_response(incident_id=incident_id)) is not None:
+            return error
+
+        if_match = if_match_version()
+        if isinstance(if_match, Response):
+            return if_match
+
+        data = load_body(RISK_UPDATE_VALIDATOR)
+        if isinstance(data, Response):
+            return data
+
+        repo = RepositoryCalls(incident_repo)
+        try:
+            incident, prev_risk = await update_risk(repo, client_id, incident_id, data.risk, if_match)
+        except UpdateRejectedError as err:
+            return error_response(err.message, err.status)
+
+        effects: AsyncSideEffects = {}
+        if prev_risk != data.risk and prev_risk is not None:
+            effects['incident-risk-updated'] = partial(
+                send_notification_async, client_id, incident_id, 'incident-risk-updated'
+            )
+
+        response = update_response(incident_to_dict(incident), 200, repo)
+        # The version the risk was written with, the If-Match of the next update
+        if incident.version is not None:
+            response.set_etag(incident.version)
+
+        return await finish_side_effects_async(response, effects)
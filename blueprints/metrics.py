@@ -0,0 +1,31 @@
+from typing import Any
+
+from dependency_injector.wiring import Provide
+from flask import Blueprint, Response
+from flask.views import MethodView
+
+from containers import Container
+from repositories import IncidentRepository
+from repositories.instrumented import Instrumentation
+
+from .util import class_route, json_response
+
+blp = Blueprint('Metrics', __name__)
+
+
+@class_route(blp, '/api/v1/metrics/incidentmodify')
+class Metrics(MethodView):
+    init_every_request = False
+
+    def get(
+        self,
+        incident_repo: IncidentRepository = Provide[Container.incident_repo],
+        instrumentation: Instrumentation = Provide[Container.instrumentation],
+        instrumentation_mode: str = Provide[Container.config.instrumentation.mode],
+    ) -> Response:
+        metrics: dict[str, Any] = {'incident_repo': incident_repo.metrics()}
+
+        if instrumentation_mode == 'enabled':
+            metrics['repositories'] = instrumentation.snapshot()
+
+        return json_response(metrics, 200)
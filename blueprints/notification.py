@@ -1,3 +1,4 @@
+import asyncio
 import json
 from typing import Any, cast
 
@@ -7,8 +8,8 @@ from google.cloud.pubsub_v1.publisher.futures import Future  # type: ignore[impo
 from lingua import Language, LanguageDetectorBuilder
 
 from containers import Container
-from models import Client, HistoryEntry, Incident, User
-from repositories import ClientRepository, EmployeeRepository, IncidentRepository, UserRepository
+from models import Client, Employee, HistoryEntry, Incident, User
+from repositories import AsyncIncidentRepository, ClientRepository, EmployeeRepository, IncidentRepository, UserRepository
 
 
 def client_to_dict(client: Client) -> dict[str, Any]:
@@ -32,23 +33,16 @@ def history_to_dict(entry: HistoryEntry) -> dict[str, Any]:
 def incident_to_dict(
     incident: Incident,
     history: list[HistoryEntry],
-    user_repo: UserRepository,
-    employee_repo: EmployeeRepository,
+    user_reported_by: User | None,
+    user_created_by: User | Employee | None,
+    employee_assigned_to: Employee | None,
 ) -> dict[str, Any]:
-    user_reported_by = user_repo.get(incident.reported_by, incident.client_id)
-
     if user_reported_by is None:
         raise ValueError(f'User {incident.reported_by} not found')
 
-    user_created_by = user_repo.get(incident.created_by, incident.client_id) or employee_repo.get(
-        incident.created_by, incident.client_id
-    )
-
     if user_created_by is None:
         raise ValueError(f'User/Employee {incident.created_by} not found')
 
-    employee_assigned_to = employee_repo.get(incident.assigned_to, incident.client_id)
-
     if employee_assigned_to is None:
         raise ValueError(f'Employee {incident.assigned_to} not found')
 
@@ -79,10 +73,55 @@ def incident_to_dict(
     }
 
 
+def notification_to_dict(  # noqa: PLR0913
+    client: Client,
+    incident: Incident,
+    history: list[HistoryEntry],
+    user_reported_by: User | None,
+    user_created_by: User | Employee | None,
+    employee_assigned_to: Employee | None,
+) -> dict[str, Any]:
+    data = incident_to_dict(incident, history, user_reported_by, user_created_by, employee_assigned_to)
+
+    data['client'] = client_to_dict(client)
+
+    detector = LanguageDetectorBuilder.from_languages(Language.SPANISH, Language.PORTUGUESE).build()
+    language = detector.detect_language_of(incident.name + '\n' + data['history'][0]['description'])
+
+    data['language'] = 'pt' if language == Language.PORTUGUESE else 'es'
+
+    return data
+
+
+def publish(project_id: str, topic: str, data: dict[str, Any]) -> None:
+    publish_many(project_id, topic, [data])
+
+
+def publish_many(project_id: str, topic: str, messages: list[dict[str, Any]]) -> None:
+    # All messages are handed to one publisher before waiting, so its batching sends them in as few requests as it can
+    publisher = PublisherClient()
+    futures = [
+        cast(
+            Future,
+            publisher.publish(
+                f'projects/{project_id}/topics/{topic}',
+                json.dumps(data).encode('utf-8'),
+                **{'Content-Type': 'application/json'},
+            ),
+        )
+        for data in messages
+    ]
+
+    for future in futures:
+        future.result()
+
+
 def send_notification(  # noqa: PLR0913
     client_id: str,
     incident_id: str,
     topic: str,
+    *,
+    loaded: tuple[Incident, list[HistoryEntry]] | None = None,
     client_repo: ClientRepository = Provide[Container.client_repo],
     incident_repo: IncidentRepository = Provide[Container.incident_repo],
     user_repo: UserRepository = Provide[Container.user_repo],
@@ -93,28 +132,104 @@ def send_notification(  # noqa: PLR0913
     if client is None:
         raise ValueError('Client not found.')
 
-    incident = incident_repo.get(client_id=client_id, incident_id=incident_id)
+    # The incident and full history the caller already read are not read again
+    incident, history = loaded or incident_repo.get_with_history(client_id=client_id, incident_id=incident_id)
     if incident is None:
         raise ValueError('Incident not found.')
 
-    history = incident_repo.get_history(client_id=client_id, incident_id=incident_id)
+    data = build_notification(client, incident, history, user_repo, employee_repo)
 
-    data = incident_to_dict(incident, list(history), user_repo, employee_repo)
+    publish(project_id, topic, data)
 
-    data['client'] = client_to_dict(client)
 
-    detector = LanguageDetectorBuilder.from_languages(Language.SPANISH, Language.PORTUGUESE).build()
-    language = detector.detect_language_of(incident.name + '\n' + data['history'][0]['description'])
+def build_notification(
+    client: Client,
+    incident: Incident,
+    history: list[HistoryEntry],
+    user_repo: UserRepository,
+    employee_repo: EmployeeRepository,
+) -> dict[str, Any]:
+    user_reported_by = user_repo.get(incident.reported_by, incident.client_id)
+    user_created_by = user_repo.get(incident.created_by, incident.client_id) or employee_repo.get(
+        incident.created_by, incident.client_id
+    )
+    employee_assigned_to = employee_repo.get(incident.assigned_to, incident.client_id)
 
-    data['language'] = 'pt' if language == Language.PORTUGUESE else 'es'
+    return notification_to_dict(client, incident, history, user_reported_by, user_created_by, employee_assigned_to)
 
-    publisher = PublisherClient()
-    future = cast(
-        Future,
-        publisher.publish(
-            f'projects/{project_id}/topics/{topic}',
-            json.dumps(data).encode('utf-8'),
-            **{'Content-Type': 'application/json'},
-        ),
+
+def send_notifications(  # noqa: PLR0913
+    client_id: str,
+    incident_ids: list[str],
+    topic: str,
+    *,
+    loaded: dict[str, tuple[Incident, list[HistoryEntry]]] | None = None,
+    client_repo: ClientRepository = Provide[Container.client_repo],
+    incident_repo: IncidentRepository = Provide[Container.incident_repo],
+    user_repo: UserRepository = Provide[Container.user_repo],
+    employee_repo: EmployeeRepository = Provide[Container.employee_repo],
+    project_id: str = Provide[Container.config.project_id],
+) -> dict[str, Exception]:
+    # Notifications of many incidents of one client, published together. Returns the errors by incident ID, the
+    # notifications of the other incidents are still sent.
+    client = client_repo.get(client_id=client_id)
+    if client is None:
+        raise ValueError('Client not found.')
+
+    messages: list[dict[str, Any]] = []
+    errors: dict[str, Exception] = {}
+
+    for incident_id in dict.fromkeys(incident_ids):
+        try:
+            # The incidents the caller already holds, with their full history, are not read again
+            incident, history = (loaded or {}).get(incident_id) or incident_repo.get_with_history(
+                client_id=client_id, incident_id=incident_id
+            )
+            if incident is None:
+                raise ValueError('Incident not found.')  # noqa: TRY301
+
+            messages.append(build_notification(client, incident, history, user_repo, employee_repo))
+        except Exception as e:  # noqa: BLE001
+            errors[incident_id] = e
+
+    if messages:
+        publish_many(project_id, topic, messages)
+
+    return errors
+
+
+async def send_notification_async(  # noqa: PLR0913
+    client_id: str,
+    incident_id: str,
+    topic: str,
+    client_repo: ClientRepository = Provide[Container.client_repo],
+    incident_repo: AsyncIncidentRepository = Provide[Container.async_incident_repo],
+    user_repo: UserRepository = Provide[Container.user_repo],
+    employee_repo: EmployeeRepository = Provide[Container.employee_repo],
+    project_id: str = Provide[Container.config.project_id],
+) -> None:
+    # The directory repositories are blocking, they run in worker threads so all lookups overlap
+    client, (incident, history) = await asyncio.gather(
+        asyncio.to_thread(client_repo.get, client_id=client_id),
+        incident_repo.get_with_history(client_id=client_id, incident_id=incident_id),
+    )
+
+    if client is None:
+        raise ValueError('Client not found.')
+
+    if incident is None:
+        raise ValueError('Incident not found.')
+
+    # created_by may be a user or an employee, both are looked up at once
+    user_reported_by, user_created_by, employee_created_by, employee_assigned_to = await asyncio.gather(
+        asyncio.to_thread(user_repo.get, incident.reported_by, incident.client_id),
+        asyncio.to_thread(user_repo.get, incident.created_by, incident.client_id),
+        asyncio.to_thread(employee_repo.get, incident.created_by, incident.client_id),
+        asyncio.to_thread(employee_repo.get, incident.assigned_to, incident.client_id),
     )
-    future.result()
+
+    data = notification_to_dict(
+        client, incident, history, user_reported_by, user_created_by or employee_created_by, employee_assigned_to
+    )
+
+    await asyncio.to_thread(publish, project_id, topic, data)
@@ -1,7 +1,8 @@
 import copy
+import time
 
 from dependency_injector.wiring import Provide, inject
-from flask import Blueprint, Response, request
+from flask import Blueprint, Response, current_app, request
 from flask.views import MethodView
 
 import demo
@@ -22,13 +23,25 @@ class ResetDB(MethodView):
         self,
         incident_repo: IncidentRepository = Provide[Container.incident_repo],
     ) -> Response:
-        incident_repo.delete_all()
+        client_id = request.args.get('client_id')
+
+        start = time.perf_counter()
+        deleted = incident_repo.delete_all(client_id=client_id)
+        timing = {'delete': round(time.perf_counter() - start, 3)}
 
         if request.args.get('demo', 'false') == 'true':
-            for incident in demo.incidents:
-                incident_repo.create(incident)
+            start = time.perf_counter()
+            incidents = [incident for incident in demo.incidents if client_id is None or incident.client_id == client_id]
+            errors = incident_repo.create_many(incidents)
+
+            if not any(errors):
+                entries = [copy.copy(entry) for incident in incidents for entry in demo.history[incident.id]]
+                errors = incident_repo.append_history_many(entries)
+
+            if any(errors):
+                current_app.logger.error('Failed to seed demo data: %s', [str(e) for e in errors if e is not None])
+                return json_response({'status': 'Error'}, 500)
 
-                for entry in demo.history[incident.id]:
-                    incident_repo.append_history_entry(copy.copy(entry))
+            timing['demo'] = round(time.perf_counter() - start, 3)
 
-        return json_response({'status': 'Ok'}, 200)
+        return json_response({'status': 'Ok', 'deleted': deleted, 'timing': timing}, 200)
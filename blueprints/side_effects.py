@@ -0,0 +1,146 @@
+import asyncio
+from collections.abc import Callable, Coroutine
+from concurrent.futures import Executor
+from datetime import UTC, datetime, timedelta
+from typing import Any
+from uuid import uuid4
+
+from dependency_injector.wiring import Provide
+from flask import Blueprint, Flask, Response, current_app, request
+from flask.views import MethodView
+
+from containers import Container
+from models import SideEffectTask, TaskStatus
+from repositories import SideEffectTaskRepository
+from repositories.instrumented import request_context
+from utils import TASK_NOT_FOUND, EventLoopThread
+
+from .util import class_route, error_response, json_response
+from .validation import invalid_path_response
+
+blp = Blueprint('Side Effects', __name__)
+
+RESPOND_ASYNC = 'respond-async'
+
+# Side effects of a request by name, such as the topics of its notifications
+SideEffects = dict[str, Callable[[], None]]
+# Side effects of an async view, each returns the coroutine running it
+AsyncSideEffects = dict[str, Callable[[], Coroutine[Any, Any, None]]]
+
+
+def task_to_dict(task: SideEffectTask) -> dict[str, Any]:
+    return {
+        'id': task.id,
+        'status': task.status,
+        'errors': task.errors,
+    }
+
+
+def prefers_async() -> bool:
+    # Prefer (RFC 7240) holds comma separated preferences, each may have a value and parameters
+    preferences = {
+        preference.split(';')[0].split('=')[0].strip().lower()
+        for header in request.headers.getlist('Prefer')
+        for preference in header.split(',')
+    }
+    return RESPOND_ASYNC in preferences
+
+
+def run_side_effects(app: Flask, repo: SideEffectTaskRepository, task: SideEffectTask, effects: SideEffects) -> None:
+    # Its own app context, the reads of the side effects share a request memo like they do in the request
+    with app.app_context():
+        for name, effect in effects.items():
+            try:
+                effect()
+            except Exception as e:
+                app.logger.exception('Side effect %s of task %s failed', name, task.id)
+                task.errors.append(f'{name}: {e}')
+
+        task.status = TaskStatus.FAILED if task.errors else TaskStatus.SUCCEEDED
+
+        try:
+            repo.update(task)
+        except Exception:
+            app.logger.exception('Failed to store the status of task %s', task.id)
+
+
+def defer_side_effects(
+    effects: SideEffects,
+    repo: SideEffectTaskRepository = Provide[Container.side_effect_task_repo],
+    executor: Executor = Provide[Container.side_effect_executor],
+    ttl: float = Provide[Container.config.respond_async.ttl],
+) -> str | None:
+    # The id of the task running effects in the background, None when its status could not be stored.
+    # Without effects there is nothing to run, the task is stored already succeeded.
+    status = TaskStatus.PENDING if effects else TaskStatus.SUCCEEDED
+    task = SideEffectTask(id=str(uuid4()), expires_at=datetime.now(UTC) + timedelta(seconds=ttl), status=status)
+
+    try:
+        repo.create(task)
+    except Exception:
+        current_app.logger.exception('Failed to store task %s, running its side effects in the request', task.id)
+        return None
+
+    if effects:
+        app = current_app._get_current_object()  # type: ignore[attr-defined]  # noqa: SLF001
+        executor.submit(request_context().run, run_side_effects, app, repo, task, effects)
+
+    return task.id
+
+
+def accepted(response: Response, task_id: str) -> Response:
+    response.status_code = 202
+    response.headers['Preference-Applied'] = RESPOND_ASYNC
+    response.headers['Location'] = f'/api/v1/side-effects/{task_id}'
+    return response
+
+
+def finish_side_effects(response: Response, effects: SideEffects) -> Response:
+    # Runs effects, then returns response. With Prefer: respond-async, response is returned first with status 202
+    # and effects run in the background, their outcome is served at its Location, even when there are none
+    if prefers_async() and (task_id := defer_side_effects(effects)) is not None:
+        return accepted(response, task_id)
+
+    for effect in effects.values():
+        effect()
+
+    return response
+
+
+def run_on(event_loop: EventLoopThread, effect: Callable[[], Coroutine[Any, Any, None]]) -> Callable[[], None]:
+    return lambda: event_loop.run(effect())
+
+
+async def finish_side_effects_async(
+    response: Response,
+    effects: AsyncSideEffects,
+    event_loop: EventLoopThread = Provide[Container.event_loop],
+) -> Response:
+    # As finish_side_effects, deferred effects are run on the event loop by the worker threads
+    if prefers_async():
+        deferred = {name: run_on(event_loop, effect) for name, effect in effects.items()}
+        if (task_id := defer_side_effects(deferred)) is not None:
+            return accepted(response, task_id)
+
+    await asyncio.gather(*(effect() for effect in effects.values()))
+
+    return response
+
+
+@class_route(blp, '/api/v1/side-effects/<task_id>')
+class SideEffectTaskStatus(MethodView):
+    init_every_request = False
+
+    def get(
+        self,
+        task_id: str,
+        repo: SideEffectTaskRepository = Provide[Container.side_effect_task_repo],
+    ) -> Response:
+        if (error := invalid_path_response(task_id=task_id)) is not None:
+            return error
+
+        task = repo.get(task_id)
+        if task is None:
+            return error_response(TASK_NOT_FOUND, 404)
+
+        return json_response(task_to_dict(task), 200)
@@ -1,5 +1,5 @@
 import json
-from collections.abc import Callable
+from collections.abc import Awaitable, Callable
 from typing import Any, cast
 from uuid import UUID
 
@@ -8,6 +8,8 @@ from flask.views import MethodView
 from marshmallow import ValidationError
 from tightwrap import wraps
 
+from utils import IF_MATCH_ERROR
+
 
 class APIGatewayRequest(Request):
     user_token: dict[str, Any]
@@ -38,28 +40,74 @@ def error_response(msg: str, code: int) -> Response:
     return json_response({'message': msg, 'code': code}, code)
 
 
+def if_match_version() -> str | Response | None:
+    # The version a write is conditional on, None when there is no If-Match or it is *
+    if_match = request.if_match
+    if not if_match or if_match.star_tag:
+        return None
+
+    versions = if_match.as_set(include_weak=True)
+    if len(versions) != 1 or if_match.is_weak(next(iter(versions))):
+        return error_response(IF_MATCH_ERROR, 400)
+
+    return next(iter(versions))
+
+
+def flatten_messages(messages: dict[Any, Any], prefix: str = '') -> list[tuple[str, list[str]]]:
+    # Errors of nested schemas are keyed by their path, such as updates.0.action
+    flat: list[tuple[str, list[str]]] = []
+
+    for key, value in messages.items():
+        if isinstance(value, dict):
+            flat.extend(flatten_messages(value, f'{prefix}{key}.'))
+        else:
+            flat.append((f'{prefix}{key}', value))
+
+    return flat
+
+
 def validation_error_response(err: ValidationError) -> Response:
     if isinstance(err.messages, dict):
-        msg = ' '.join([f'Invalid value for {k}: {" ".join(v)}' for k, v in err.messages.items()])
+        msg = ' '.join([f'Invalid value for {k}: {" ".join(v)}' for k, v in flatten_messages(err.messages)])
         return error_response(msg, 400)
 
     raise NotImplementedError('Validation error response for non-dict messages not implemented.')  # pragma: no cover
 
 
+def get_token() -> dict[str, Any] | Response:
+    if hasattr(request, 'user_token') and cast(APIGatewayRequest, request).user_token is not None:
+        req = cast(APIGatewayRequest, request)
+        token: dict[str, Any] = req.user_token
+
+        required_fields = ['sub', 'cid', 'role', 'aud']
+        for field in required_fields:
+            if field not in token:
+                return error_response(f'{field} is missing in token', 401)
+
+        return token
+
+    return error_response('Token is missing', 401)
+
+
 def requires_token(f: Callable[..., Response]) -> Callable[..., Response]:
     @wraps(f)
     def decorated_function(*args, **kwargs) -> Response:  # type: ignore[no-untyped-def] # noqa: ANN002, ANN003
-        if hasattr(request, 'user_token') and cast(APIGatewayRequest, request).user_token is not None:
-            req = cast(APIGatewayRequest, request)
-            token: dict[str, Any] = req.user_token
+        token = get_token()
+        if isinstance(token, Response):
+            return token
 
-            required_fields = ['sub', 'cid', 'role', 'aud']
-            for field in required_fields:
-                if field not in token:
-                    return error_response(f'{field} is missing in token', 401)
+        return f(*args, token=token, **kwargs)
 
-            return f(*args, token=token, **kwargs)
+    return decorated_function
+
+
+def requires_token_async(f: Callable[..., Awaitable[Response]]) -> Callable[..., Awaitable[Response]]:
+    @wraps(f)
+    async def decorated_function(*args, **kwargs) -> Response:  # type: ignore[no-untyped-def] # noqa: ANN002, ANN003
+        token = get_token()
+        if isinstance(token, Response):
+            return token
 
-        return error_response('Token is missing', 401)
+        return await f(*args, token=token, **kwargs)
 
     return decorated_function
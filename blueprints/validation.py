@@ -0,0 +1,117 @@
+from collections.abc import Callable
+from typing import Any, Generic, TypeVar
+
+import marshmallow.validate
+import marshmallow_dataclass
+from flask import Response, request
+from marshmallow import ValidationError, fields
+from werkzeug.exceptions import RequestEntityTooLarge
+
+from utils import BODY_TOO_LARGE_ERROR, INVALID_UUID_ERROR, JSON_VALIDATION_ERROR
+
+from .util import error_response, is_valid_uuid4, validation_error_response
+
+T = TypeVar('T')
+
+# Largest request body of the incident views, a 1000 character description fits with room to spare
+MAX_BODY_SIZE = 16 * 1024
+
+# Checks a raw value and converts it to the loaded one
+FieldLoader = tuple[Callable[[Any], bool], Callable[[Any], Any]]
+
+
+def _length_check(validator: marshmallow.validate.Length) -> Callable[[Any], bool]:
+    low, high = validator.min, validator.max
+    return lambda value: (low is None or len(value) >= low) and (high is None or len(value) <= high)
+
+
+def _one_of_check(validator: marshmallow.validate.OneOf) -> Callable[[Any], bool]:
+    choices = frozenset(validator.choices)
+    return lambda value: value in choices
+
+
+def _validators_check(name: str, field: fields.Field) -> Callable[[Any], bool]:
+    checks: list[Callable[[Any], bool]] = []
+
+    for validator in field.validators:
+        if isinstance(validator, marshmallow.validate.Length) and validator.equal is None:
+            checks.append(_length_check(validator))
+        elif isinstance(validator, marshmallow.validate.OneOf):
+            checks.append(_one_of_check(validator))
+        else:
+            raise TypeError(f'Validator {validator!r} of {name} has no fast check')
+
+    return lambda value: all(check(value) for check in checks)
+
+
+def _field_loader(name: str, field: fields.Field) -> FieldLoader:
+    # Only required fields without a data key, whose type and validators have a plain check
+    if not field.required or field.allow_none or field.data_key is not None:
+        raise TypeError(f'Field {name} has no fast check')
+
+    check = _validators_check(name, field)
+
+    if type(field) is fields.String:
+        return (lambda value: isinstance(value, str) and check(value)), lambda value: value
+
+    if isinstance(field, fields.Enum) and not field.by_value:
+        members = field.enum.__members__
+        return (lambda value: isinstance(value, str) and value in members and check(members[value])), members.__getitem__
+
+    raise TypeError(f'Field {name} has no fast check')
+
+
+class RequestValidator(Generic[T]):
+    # Loads request bodies into T with its schema. With fast=True, bodies holding exactly the fields of a flat schema
+    # of strings and enums skip marshmallow, any other body is loaded by the schema so the errors are its own
+    def __init__(self, cls: type[T], *, fast: bool = False) -> None:
+        self.cls = cls
+        self.schema = marshmallow_dataclass.class_schema(cls)()
+        self.loaders = {name: _field_loader(name, field) for name, field in self.schema.fields.items()} if fast else None
+
+    def load(self, data: Any) -> T:  # noqa: ANN401
+        loaders = self.loaders
+
+        if (
+            loaders is not None
+            and isinstance(data, dict)
+            and data.keys() == loaders.keys()
+            and all(check(data[name]) for name, (check, _) in loaders.items())
+        ):
+            return self.cls(**{name: load(data[name]) for name, (_, load) in loaders.items()})
+
+        return self.schema.load(data)  # type: ignore[no-any-return]
+
+
+def invalid_path_response(**params: str) -> Response | None:
+    # Path parameters are checked before the body is read
+    for name, value in params.items():
+        if not is_valid_uuid4(value):
+            return error_response(INVALID_UUID_ERROR.format(field=name), 400)
+
+    return None
+
+
+def load_body(validator: RequestValidator[T], max_size: int = MAX_BODY_SIZE) -> T | Response:
+    # Oversized bodies are rejected from their Content-Length, and streamed ones once more than max_size bytes were read
+    if request.content_length is not None and request.content_length > max_size:
+        return error_response(BODY_TOO_LARGE_ERROR, 413)
+
+    # Streamed bodies are read one byte past max_size, Werkzeug cuts them at the limit instead of failing
+    request.max_content_length = max_size + 1
+    try:
+        body = request.get_data(cache=True)
+    except RequestEntityTooLarge:
+        return error_response(BODY_TOO_LARGE_ERROR, 413)
+
+    if len(body) > max_size:
+        return error_response(BODY_TOO_LARGE_ERROR, 413)
+
+    req_json = request.get_json(silent=True)
+    if req_json is None:
+        return error_response(JSON_VALIDATION_ERROR, 400)
+
+    try:
+        return validator.load(req_json)
+    except ValidationError as err:
+        return validation_error_response(err)
@@ -1,9 +1,24 @@
+from concurrent.futures import ThreadPoolExecutor
+
 from dependency_injector import providers
 from dependency_injector.containers import DeclarativeContainer, WiringConfiguration
 from gcp_microservice_utils import access_token_provider
 
-from repositories.firestore import FirestoreIncidentRepository
+from repositories.cached import CachedIdempotencyRepository, CachedIncidentRepository
+from repositories.firestore import (
+    AsyncFirestoreIncidentRepository,
+    FirestoreIdempotencyRepository,
+    FirestoreIncidentRepository,
+    FirestoreSideEffectTaskRepository,
+    ListenerIncidentRepository,
+)
+from repositories.instrumented import Instrumentation, instrumented
+from repositories.memoized import memoized
+from repositories.memory import MemoryIdempotencyRepository, MemoryIncidentRepository, MemorySideEffectTaskRepository
 from repositories.rest import RestClientRepository, RestEmployeeRepository, RestUserRepository
+from repositories.sqlite import SqliteIncidentRepository
+from services import IncidentService
+from utils import EventLoopThread
 
 
 class Container(DeclarativeContainer):
@@ -12,22 +27,177 @@ class Container(DeclarativeContainer):
 
     access_token = providers.Callable(access_token_provider)
 
-    incident_repo = providers.ThreadSafeSingleton(FirestoreIncidentRepository, database=config.firestore.database)
+    event_loop = providers.ThreadSafeSingleton(EventLoopThread)
+
+    instrumentation = providers.ThreadSafeSingleton(Instrumentation)
+
+    firestore_incident_repo = providers.ThreadSafeSingleton(
+        FirestoreIncidentRepository,
+        database=config.firestore.database,
+        embedded_history=config.firestore.embedded_history,
+        history_chunk=config.firestore.history_chunk,
+        compact_threshold=config.firestore.compact_threshold,
+    )
+
+    listener_incident_repo = providers.Selector(
+        config.incident_listener.mode,
+        disabled=firestore_incident_repo,
+        enabled=providers.ThreadSafeSingleton(
+            ListenerIncidentRepository,
+            repo=firestore_incident_repo,
+            max_clients=config.incident_listener.max_clients,
+            idle_ttl=config.incident_listener.idle_ttl,
+            active_window=config.incident_listener.active_window,
+        ),
+    )
+
+    memory_incident_repo = providers.ThreadSafeSingleton(MemoryIncidentRepository)
+
+    sqlite_incident_repo = providers.ThreadSafeSingleton(SqliteIncidentRepository, path=config.sqlite.path)
+
+    # The sync views of the firestore_async backend (reset, metrics) keep using the sync repository
+    storage_incident_repo = providers.Selector(
+        config.incident_repo.backend,
+        firestore=listener_incident_repo,
+        firestore_async=firestore_incident_repo,
+        memory=memory_incident_repo,
+        sqlite=sqlite_incident_repo,
+    )
+
+    # Under the cache, so only the calls that reach the storage backend are counted
+    instrumented_incident_repo = providers.Selector(
+        config.instrumentation.mode,
+        disabled=storage_incident_repo,
+        enabled=providers.ThreadSafeSingleton(instrumented, storage_incident_repo, 'incident_repo', instrumentation),
+    )
+
+    cached_incident_repo = providers.Selector(
+        config.incident_cache.mode,
+        disabled=instrumented_incident_repo,
+        enabled=providers.ThreadSafeSingleton(
+            CachedIncidentRepository,
+            repo=instrumented_incident_repo,
+            max_size=config.incident_cache.max_size,
+            ttl=config.incident_cache.ttl,
+        ),
+    )
+
+    incident_repo = providers.Selector(
+        config.request_memo.mode,
+        disabled=cached_incident_repo,
+        enabled=providers.ThreadSafeSingleton(memoized, cached_incident_repo, 'incident_repo'),
+    )
+
+    # Built per request, so it follows overrides of incident_repo
+    incident_service = providers.Factory(IncidentService, incident_repo=incident_repo)
+
+    # Only usable from coroutines running on event_loop
+    firestore_async_incident_repo = providers.ThreadSafeSingleton(
+        AsyncFirestoreIncidentRepository,
+        database=config.firestore.database,
+        embedded_history=config.firestore.embedded_history,
+        history_chunk=config.firestore.history_chunk,
+        compact_threshold=config.firestore.compact_threshold,
+    )
+
+    async_incident_repo = providers.Selector(
+        config.instrumentation.mode,
+        disabled=firestore_async_incident_repo,
+        enabled=providers.ThreadSafeSingleton(
+            instrumented, firestore_async_incident_repo, 'async_incident_repo', instrumentation
+        ),
+    )
 
-    user_repo = providers.ThreadSafeSingleton(
+    # Local LRU in front of Firestore, the other backends keep the records in memory only
+    firestore_idempotency_repo = providers.ThreadSafeSingleton(
+        CachedIdempotencyRepository,
+        repo=providers.ThreadSafeSingleton(FirestoreIdempotencyRepository, database=config.firestore.database),
+        max_size=config.idempotency.local_size,
+    )
+
+    memory_idempotency_repo = providers.ThreadSafeSingleton(
+        MemoryIdempotencyRepository, max_size=config.idempotency.local_size
+    )
+
+    idempotency_repo = providers.Selector(
+        config.incident_repo.backend,
+        firestore=firestore_idempotency_repo,
+        firestore_async=firestore_idempotency_repo,
+        memory=memory_idempotency_repo,
+        sqlite=memory_idempotency_repo,
+    )
+
+    # Status of the side effects of respond-async requests, the memory one is only readable from the same instance
+    firestore_side_effect_task_repo = providers.ThreadSafeSingleton(
+        FirestoreSideEffectTaskRepository, database=config.firestore.database
+    )
+
+    memory_side_effect_task_repo = providers.ThreadSafeSingleton(
+        MemorySideEffectTaskRepository, max_size=config.respond_async.local_size
+    )
+
+    side_effect_task_repo = providers.Selector(
+        config.incident_repo.backend,
+        firestore=firestore_side_effect_task_repo,
+        firestore_async=firestore_side_effect_task_repo,
+        memory=memory_side_effect_task_repo,
+        sqlite=memory_side_effect_task_repo,
+    )
+
+    side_effect_executor = providers.ThreadSafeSingleton(
+        ThreadPoolExecutor, max_workers=config.respond_async.workers, thread_name_prefix='side-effects'
+    )
+
+    rest_user_repo = providers.ThreadSafeSingleton(
         RestUserRepository,
         base_url=config.svc.user.url,
         token_provider=config.svc.user.token_provider,
     )
 
-    employee_repo = providers.ThreadSafeSingleton(
+    rest_employee_repo = providers.ThreadSafeSingleton(
         RestEmployeeRepository,
         base_url=config.svc.client.url,
         token_provider=config.svc.client.token_provider,
     )
 
-    client_repo = providers.ThreadSafeSingleton(
+    rest_client_repo = providers.ThreadSafeSingleton(
         RestClientRepository,
         base_url=config.svc.client.url,
         token_provider=config.svc.client.token_provider,
     )
+
+    instrumented_user_repo = providers.Selector(
+        config.instrumentation.mode,
+        disabled=rest_user_repo,
+        enabled=providers.ThreadSafeSingleton(instrumented, rest_user_repo, 'user_repo', instrumentation),
+    )
+
+    user_repo = providers.Selector(
+        config.request_memo.mode,
+        disabled=instrumented_user_repo,
+        enabled=providers.ThreadSafeSingleton(memoized, instrumented_user_repo, 'user_repo'),
+    )
+
+    instrumented_employee_repo = providers.Selector(
+        config.instrumentation.mode,
+        disabled=rest_employee_repo,
+        enabled=providers.ThreadSafeSingleton(instrumented, rest_employee_repo, 'employee_repo', instrumentation),
+    )
+
+    employee_repo = providers.Selector(
+        config.request_memo.mode,
+        disabled=instrumented_employee_repo,
+        enabled=providers.ThreadSafeSingleton(memoized, instrumented_employee_repo, 'employee_repo'),
+    )
+
+    instrumented_client_repo = providers.Selector(
+        config.instrumentation.mode,
+        disabled=rest_client_repo,
+        enabled=providers.ThreadSafeSingleton(instrumented, rest_client_repo, 'client_repo', instrumentation),
+    )
+
+    client_repo = providers.Selector(
+        config.request_memo.mode,
+        disabled=instrumented_client_repo,
+        enabled=providers.ThreadSafeSingleton(memoized, instrumented_client_repo, 'client_repo'),
+    )
@@ -3,11 +3,16 @@ from .channel import Channel
 from .client import Client
 from .employee import Employee
 from .history_entry import HistoryEntry
+from .idempotency_record import IdempotencyRecord
 from .incident import Incident
+from .incident_change import IncidentChange
+from .incident_view import INCIDENT_VIEW_FIELDS, IncidentView
 from .invitation_status import InvitationStatus
 from .plan import Plan
 from .risk import Risk
 from .role import Role
+from .side_effect_task import SideEffectTask
+from .task_status import TaskStatus
 from .user import User
 
 __all__ = [
@@ -16,10 +21,16 @@ __all__ = [
     'Client',
     'Employee',
     'HistoryEntry',
+    'IdempotencyRecord',
     'Incident',
+    'IncidentChange',
+    'IncidentView',
+    'INCIDENT_VIEW_FIELDS',
     'InvitationStatus',
     'Plan',
     'Role',
+    'SideEffectTask',
+    'TaskStatus',
     'User',
     'Risk',
 ]
@@ -0,0 +1,13 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+
+
+@dataclass
+class IdempotencyRecord:
+    key: str
+    fingerprint: str
+    expires_at: datetime
+    # Set once the first request completed, the response every retry gets
+    status: int | None = None
+    body: str | None = None
+    headers: dict[str, str] = field(default_factory=dict)
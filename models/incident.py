@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 from .channel import Channel
 from .risk import Risk
@@ -14,3 +14,5 @@ class Incident:
     created_by: str
     assigned_to: str
     risk: Risk | None
+    # Changes on every write, only set when reading from DB. Not part of the incident's value.
+    version: str | None = field(default=None, compare=False)
@@ -0,0 +1,12 @@
+from dataclasses import dataclass
+from datetime import datetime
+
+from .incident import Incident
+
+
+# An incident in the change feed of its client, ordered by (last_modified, incident.id)
+@dataclass
+class IncidentChange:
+    incident: Incident
+    # Time of the incident's last write
+    last_modified: datetime
@@ -0,0 +1,23 @@
+from dataclasses import dataclass, fields
+
+from .action import Action
+from .channel import Channel
+from .risk import Risk
+
+
+# Partial read of an incident, only the requested fields are set.
+# last_action is the action of the incident's last history entry.
+@dataclass
+class IncidentView:
+    id: str
+    client_id: str
+    name: str | None = None
+    channel: Channel | None = None
+    reported_by: str | None = None
+    created_by: str | None = None
+    assigned_to: str | None = None
+    risk: Risk | None = None
+    last_action: Action | None = None
+
+
+INCIDENT_VIEW_FIELDS = frozenset(f.name for f in fields(IncidentView)) - {'id', 'client_id'}
@@ -0,0 +1,13 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from .task_status import TaskStatus
+
+
+@dataclass
+class SideEffectTask:
+    id: str
+    expires_at: datetime
+    status: TaskStatus = TaskStatus.PENDING
+    # The side effects that failed, each with its error
+    errors: list[str] = field(default_factory=list)
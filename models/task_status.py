@@ -0,0 +1,7 @@
+from enum import StrEnum
+
+
+class TaskStatus(StrEnum):
+    PENDING = 'pending'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
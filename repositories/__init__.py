@@ -1,6 +1,16 @@
 from .client import ClientRepository
 from .employee import EmployeeRepository
-from .incident import IncidentRepository
+from .idempotency import IdempotencyRepository
+from .incident import AsyncIncidentRepository, IncidentRepository
+from .side_effect import SideEffectTaskRepository
 from .user import UserRepository
 
-__all__ = ['ClientRepository', 'EmployeeRepository', 'IncidentRepository', 'UserRepository']
+__all__ = [
+    'AsyncIncidentRepository',
+    'ClientRepository',
+    'EmployeeRepository',
+    'IdempotencyRepository',
+    'IncidentRepository',
+    'SideEffectTaskRepository',
+    'UserRepository',
+]
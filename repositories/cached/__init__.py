@@ -0,0 +1,4 @@
+from .idempotency import CachedIdempotencyRepository
+from .incident import CachedIncidentRepository
+
+__all__ = ['CachedIdempotencyRepository', 'CachedIncidentRepository']
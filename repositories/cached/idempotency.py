@@ -0,0 +1,53 @@
+import copy
+import threading
+from collections import OrderedDict
+from datetime import UTC, datetime
+
+from models import IdempotencyRecord
+from repositories import IdempotencyRepository
+
+
+class CachedIdempotencyRepository(IdempotencyRepository):
+    # LRU of the completed records of repo, they never change until they expire. Retries reaching this instance are
+    # answered without a round trip, records in progress are always read from repo
+    def __init__(self, repo: IdempotencyRepository, max_size: int) -> None:
+        self.repo = repo
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._records: OrderedDict[str, IdempotencyRecord] = OrderedDict()
+
+    def _store(self, record: IdempotencyRecord) -> None:
+        with self._lock:
+            self._records[record.key] = copy.copy(record)
+            self._records.move_to_end(record.key)
+
+            while len(self._records) > self.max_size:
+                self._records.popitem(last=False)
+
+    def create(self, record: IdempotencyRecord) -> IdempotencyRecord | None:
+        with self._lock:
+            cached = self._records.get(record.key)
+
+            if cached is not None and cached.expires_at <= datetime.now(UTC):
+                del self._records[record.key]
+                cached = None
+
+            if cached is not None:
+                self._records.move_to_end(record.key)
+                return copy.copy(cached)
+
+        existing = self.repo.create(record)
+        if existing is not None and existing.status is not None:
+            self._store(existing)
+
+        return existing
+
+    def complete(self, record: IdempotencyRecord) -> None:
+        self.repo.complete(record)
+        self._store(record)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._records.pop(key, None)
+
+        self.repo.delete(key)
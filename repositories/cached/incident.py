@@ -0,0 +1,239 @@
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Collection, Generator
+from datetime import datetime
+from typing import Any
+
+from models import HistoryEntry, Incident, IncidentChange, IncidentView
+from repositories import IncidentRepository
+from repositories.incident import check_view_fields, incident_view
+
+
+class CachedIncidentRepository(IncidentRepository):
+    # Read-through LRU cache of incidents, writes made through it go through to the cache. The TTL bounds how long
+    # an incident modified by someone else (another instance, a script) can be served stale
+    def __init__(self, repo: IncidentRepository, max_size: int, ttl: float | None = None) -> None:
+        self.repo = repo
+        self.max_size = max_size
+        self.ttl = ttl
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple[str, str], tuple[float, Incident]] = OrderedDict()
+        # Bumped on every invalidation, so a read that raced with a write never populates the cache
+        self._version = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _store(self, incident: Incident, version: int | None = None) -> None:
+        key = (incident.client_id, incident.id)
+
+        with self._lock:
+            if version is not None and version != self._version:
+                return
+
+            self._entries[key] = (time.monotonic(), copy.copy(incident))
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _invalidate(self, client_id: str, incident_id: str) -> None:
+        with self._lock:
+            self._version += 1
+            self._entries.pop((client_id, incident_id), None)
+
+    def clear(self, client_id: str | None = None) -> None:
+        with self._lock:
+            self._version += 1
+
+            if client_id is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if key[0] == client_id]:
+                    del self._entries[key]
+
+    def create(self, incident: Incident) -> None:
+        self._invalidate(incident.client_id, incident.id)
+        self.repo.create(incident)
+        self._store(incident)
+
+    def _lookup(self, client_id: str, incident_id: str) -> tuple[Incident | None, int]:
+        # Returns a copy of the cached incident, or None with the version a read-through must store with
+        key = (client_id, incident_id)
+
+        with self._lock:
+            cached = self._entries.get(key)
+
+            if cached is not None and self.ttl is not None and time.monotonic() - cached[0] > self.ttl:
+                del self._entries[key]
+                cached = None
+
+            if cached is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return copy.copy(cached[1]), self._version
+
+            self.misses += 1
+            return None, self._version
+
+    def get(self, client_id: str, incident_id: str) -> Incident | None:
+        incident, version = self._lookup(client_id, incident_id)
+        if incident is not None:
+            return incident
+
+        incident = self.repo.get(client_id=client_id, incident_id=incident_id)
+
+        if incident is not None:
+            self._store(incident, version)
+
+        return incident
+
+    def get_view(self, client_id: str, incident_id: str, fields: Collection[str]) -> IncidentView | None:
+        check_view_fields(fields)
+
+        # last_action is not on the cached incident, views that need it always go to the inner repository
+        if 'last_action' not in fields:
+            incident, _ = self._lookup(client_id, incident_id)
+            if incident is not None:
+                return incident_view(incident, fields)
+
+        return self.repo.get_view(client_id, incident_id, fields)
+
+    def get_views(self, client_id: str, incident_ids: list[str], fields: Collection[str]) -> list[IncidentView | None]:
+        check_view_fields(fields)
+        views: list[IncidentView | None] = [None] * len(incident_ids)
+        missing: list[int] = []
+
+        for idx, incident_id in enumerate(incident_ids):
+            incident = None if 'last_action' in fields else self._lookup(client_id, incident_id)[0]
+
+            if incident is None:
+                missing.append(idx)
+            else:
+                views[idx] = incident_view(incident, fields)
+
+        # The incidents not cached are read in one call of the inner repository
+        if missing:
+            read = self.repo.get_views(client_id, [incident_ids[idx] for idx in missing], fields)
+            for idx, view in zip(missing, read, strict=True):
+                views[idx] = view
+
+        return views
+
+    def get_with_history(
+        self, client_id: str, incident_id: str, history_limit: int | None = None
+    ) -> tuple[Incident | None, list[HistoryEntry]]:
+        incident, version = self._lookup(client_id, incident_id)
+
+        if incident is None:
+            incident, history = self.repo.get_with_history(client_id, incident_id, history_limit)
+
+            if incident is not None:
+                self._store(incident, version)
+
+            return incident, history
+
+        # History is never cached, on a hit it is the only read
+        entries = self.repo.get_history(
+            client_id=client_id, incident_id=incident_id, limit=history_limit, descending=history_limit is not None
+        )
+        history = list(entries)
+        return incident, history if history_limit is None else history[::-1]
+
+    def append_history_entry(self, entry: HistoryEntry) -> None:
+        try:
+            self.repo.append_history_entry(entry)
+        finally:
+            self._invalidate(entry.client_id, entry.incident_id)
+
+    def get_history(
+        self,
+        client_id: str,
+        incident_id: str,
+        after_seq: int | None = None,
+        limit: int | None = None,
+        *,
+        descending: bool = False,
+    ) -> Generator[HistoryEntry, None, None]:
+        return self.repo.get_history(
+            client_id=client_id,
+            incident_id=incident_id,
+            after_seq=after_seq,
+            limit=limit,
+            descending=descending,
+        )
+
+    def get_last_history_entry(self, client_id: str, incident_id: str) -> HistoryEntry | None:
+        return self.repo.get_last_history_entry(client_id=client_id, incident_id=incident_id)
+
+    def get_changes(self, client_id: str, after: tuple[datetime, str], until: datetime, limit: int) -> list[IncidentChange]:
+        return self.repo.get_changes(client_id, after, until, limit)
+
+    def create_many(self, incidents: list[Incident]) -> list[Exception | None]:
+        for incident in incidents:
+            self._invalidate(incident.client_id, incident.id)
+
+        results = self.repo.create_many(incidents)
+
+        for incident, error in zip(incidents, results, strict=True):
+            if error is None:
+                self._store(incident)
+
+        return results
+
+    def append_history_many(self, entries: list[HistoryEntry]) -> list[Exception | None]:
+        try:
+            return self.repo.append_history_many(entries)
+        finally:
+            for entry in entries:
+                self._invalidate(entry.client_id, entry.incident_id)
+
+    def update_many(self, views: list[IncidentView], fields: Collection[str]) -> list[Exception | None]:
+        try:
+            return self.repo.update_many(views, fields)
+        finally:
+            for view in views:
+                self._invalidate(view.client_id, view.id)
+
+    def delete_all(self, client_id: str | None = None) -> dict[str, int]:
+        try:
+            return self.repo.delete_all(client_id=client_id)
+        finally:
+            self.clear(client_id)
+
+    def update(self, incident: Incident) -> None:
+        self._invalidate(incident.client_id, incident.id)
+        self.repo.update(incident)
+        self._store(incident)
+
+    def update_with_history(
+        self, incident: Incident, fields: Collection[str], entry: HistoryEntry | None, expected_version: str | None = None
+    ) -> None:
+        self._invalidate(incident.client_id, incident.id)
+        self.repo.update_with_history(incident, fields, entry, expected_version)
+
+        # Like update(), an incident whose fields were written is cached as written
+        if fields:
+            self._store(incident)
+
+    def metrics(self) -> dict[str, Any]:
+        with self._lock:
+            size = len(self._entries)
+
+        return {
+            **self.repo.metrics(),
+            'incident_cache': {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': size,
+                'max_size': self.max_size,
+            },
+        }
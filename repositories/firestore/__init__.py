@@ -1,3 +1,13 @@
+from .async_incident import AsyncFirestoreIncidentRepository
+from .idempotency import FirestoreIdempotencyRepository
 from .incident import FirestoreIncidentRepository
+from .listener import ListenerIncidentRepository
+from .side_effect import FirestoreSideEffectTaskRepository
 
-__all__ = ['FirestoreIncidentRepository']
+__all__ = [
+    'AsyncFirestoreIncidentRepository',
+    'FirestoreIdempotencyRepository',
+    'FirestoreIncidentRepository',
+    'FirestoreSideEffectTaskRepository',
+    'ListenerIncidentRepository',
+]
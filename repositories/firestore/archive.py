@@ -0,0 +1,38 @@
+from datetime import datetime
+from typing import Any
+
+from models import HistoryEntry
+
+from .compaction import HISTORY_FIELDS, chunk_doc
+from .converters import history_entry_to_doc
+
+# Cold storage of closed incidents, outside of the clients tree that requests, listeners and resets go through.
+#
+# An archived incident is a document of archive/{client_id}/archived_incidents holding the fields of the incident
+# document, and its history is stored in chunk documents of its history_chunks subcollection (see .compaction),
+# so archiving an incident of any layout writes one document per history_chunk entries.
+
+ARCHIVE_COLLECTION = 'archive'
+ARCHIVED_INCIDENTS = 'archived_incidents'
+
+
+def archived_incident_doc(
+    data: dict[str, Any], history: list[HistoryEntry], archived_at: datetime, chunk: int
+) -> dict[str, Any]:
+    # data is the incident document, its history fields are replaced by the bounds of the archived chunks
+    doc = {key: value for key, value in data.items() if key not in HISTORY_FIELDS}
+    doc.update(
+        {
+            'archived_at': archived_at,
+            'history_count': len(history),
+            'history_chunks': [
+                {'first': first, 'last': min(first + chunk, len(history)) - 1} for first in range(0, len(history), chunk)
+            ],
+        }
+    )
+    return doc
+
+
+def archived_chunk_docs(history: list[HistoryEntry], chunk: int) -> list[dict[str, Any]]:
+    entries = [history_entry_to_doc(entry) for entry in history]
+    return [chunk_doc(entries[first : first + chunk]) for first in range(0, len(entries), chunk)]
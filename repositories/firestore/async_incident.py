@@ -0,0 +1,388 @@
+import asyncio
+import contextlib
+import functools
+import logging
+from collections.abc import AsyncGenerator, Collection
+from datetime import UTC, datetime
+from typing import Any, cast
+
+from google.api_core.exceptions import AlreadyExists, NotFound
+from google.cloud.firestore import AsyncClient as AsyncFirestoreClient  # type: ignore[import-untyped]
+from google.cloud.firestore_v1 import (
+    AsyncCollectionReference,
+    AsyncDocumentReference,
+    AsyncTransaction,
+    DocumentSnapshot,
+    async_transactional,
+)
+
+from models import HistoryEntry, Incident, IncidentView
+from repositories import AsyncIncidentRepository
+from repositories.incident import check_view_fields
+
+from .compaction import HISTORY_FIELDS, Chunk, chunked_until, chunks_to_read, history_chunks
+from .converters import (
+    doc_to_history_entry,
+    doc_to_incident,
+    doc_to_incident_view,
+    history_entry_to_doc,
+    incident_to_doc,
+    update_time_to_version,
+)
+from .embedded import history_count
+from .incident import APPEND_MAX_ATTEMPTS, FirestoreIncidentRepository
+from .shared import (
+    aggregation_count,
+    append_fields,
+    archived_path,
+    chunk_entries,
+    embedded_append,
+    expected_update_time,
+    incident_path,
+    lacks_last_action,
+    merge,
+    new_incident_doc,
+    not_found_error,
+    originals_reachable,
+    plan_merge,
+    remaining,
+    seqs_exhausted,
+    tail_cursor,
+)
+
+
+class AsyncFirestoreIncidentRepository(AsyncIncidentRepository):
+    # The AsyncClient binds its gRPC channel to the event loop of its first call,
+    # so an instance must only ever be used from a single loop (see utils.EventLoopThread).
+    def __init__(self, database: str, embedded_history: int = 0, history_chunk: int = 100, compact_threshold: int = 0) -> None:
+        self.db = AsyncFirestoreClient(database=database)
+        self.embedded_history = embedded_history
+        self.compact_threshold = compact_threshold
+        # BulkWriter has no async counterpart, bulk operations and compactions run on the sync repository
+        self.sync_repo = FirestoreIncidentRepository(database, embedded_history, history_chunk, compact_threshold)
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    def _incident_ref(self, client_id: str, incident_id: str) -> AsyncDocumentReference:
+        return cast(AsyncDocumentReference, self.db.document(*incident_path(client_id, incident_id)))
+
+    def _archived_ref(self, client_id: str, incident_id: str) -> AsyncDocumentReference:
+        return cast(AsyncDocumentReference, self.db.document(*archived_path(client_id, incident_id)))
+
+    async def _get_incident_doc(
+        self, client_id: str, incident_id: str, field_paths: list[str] | None = None
+    ) -> DocumentSnapshot | None:
+        # Same as the sync repository's
+        doc = await self._incident_ref(client_id, incident_id).get(field_paths=field_paths)  # type: ignore[arg-type]
+        if not doc.exists:
+            doc = await self._archived_ref(client_id, incident_id).get(field_paths=field_paths)  # type: ignore[arg-type]
+
+        return doc if doc.exists else None
+
+    async def _history_count(self, incident_ref: AsyncDocumentReference, transaction: AsyncTransaction | None = None) -> int:
+        history_ref = cast(AsyncCollectionReference, incident_ref.collection('history'))
+        return aggregation_count(await history_ref.count().get(transaction=transaction))  # type: ignore[no-untyped-call]
+
+    async def create(self, incident: Incident) -> None:
+        client_ref = self.db.collection('clients').document(incident.client_id)
+        with contextlib.suppress(AlreadyExists):
+            await client_ref.create({})
+
+        incident_dict = new_incident_doc(incident, self.embedded_history)
+        result = await self._incident_ref(incident.client_id, incident.id).create(incident_dict)
+        incident.version = update_time_to_version(result.update_time)
+
+    async def get(self, client_id: str, incident_id: str) -> Incident | None:
+        doc = await self._get_incident_doc(client_id, incident_id)
+
+        if doc is None:
+            return None
+
+        return doc_to_incident(doc, client_id)
+
+    async def get_view(self, client_id: str, incident_id: str, fields: Collection[str]) -> IncidentView | None:
+        check_view_fields(fields)
+
+        doc = await self._get_incident_doc(client_id, incident_id, list(fields))
+        if doc is None:
+            return None
+
+        view = doc_to_incident_view(doc, client_id, fields)
+
+        if lacks_last_action(doc, fields):
+            last_entry = await self.get_last_history_entry(client_id, incident_id)
+            view.last_action = None if last_entry is None else last_entry.action
+
+        return view
+
+    async def append_history_entry(self, entry: HistoryEntry) -> None:
+        if entry.seq is not None:
+            raise ValueError('seq must be None when appending history entry')
+
+        incident_ref = self._incident_ref(entry.client_id, entry.incident_id)
+
+        if self.embedded_history:
+            append = functools.partial(self._append_embedded, incident_ref=incident_ref, entry=entry)
+            entry.seq, uncompacted = await async_transactional(append)(self.db.transaction())
+
+            if self.compact_threshold and uncompacted >= self.compact_threshold:
+                self.sync_repo.schedule_compaction(entry.client_id, entry.incident_id)
+            return
+
+        history_ref = cast(AsyncCollectionReference, incident_ref.collection('history'))
+        next_seq = await self._history_count(incident_ref)
+
+        # Same as the sync repository's
+        for seq in range(next_seq, next_seq + APPEND_MAX_ATTEMPTS):
+            entry.seq = seq
+            batch = self.db.batch()
+            batch.create(history_ref.document(str(seq)), history_entry_to_doc(entry))
+            batch.update(incident_ref, append_fields(entry, {}))
+
+            try:
+                await batch.commit()
+            except AlreadyExists:
+                continue
+            return
+
+        raise seqs_exhausted(entry)
+
+    async def _append_embedded(
+        self, transaction: AsyncTransaction, incident_ref: AsyncDocumentReference, entry: HistoryEntry
+    ) -> tuple[int, int]:
+        doc = await incident_ref.get(transaction=transaction)
+        if not doc.exists:
+            raise NotFound(f'Incident {entry.incident_id} not found')  # type: ignore[no-untyped-call]
+
+        data = cast(dict[str, Any], doc.to_dict())
+        seq = history_count(data)
+        if seq is None:
+            seq = await self._history_count(incident_ref, transaction)
+
+        append = embedded_append(data, entry, seq, self.embedded_history, {})
+        if append.spilled:
+            history_ref = cast(AsyncCollectionReference, incident_ref.collection('history'))
+            transaction.create(history_ref.document(str(seq)), append.entry_doc)
+
+        transaction.update(incident_ref, append.incident_update)
+        return seq, append.uncompacted
+
+    async def get_history(
+        self,
+        client_id: str,
+        incident_id: str,
+        after_seq: int | None = None,
+        limit: int | None = None,
+        *,
+        descending: bool = False,
+    ) -> AsyncGenerator[HistoryEntry, None]:
+        if not self.embedded_history:
+            found = False
+            async for entry in self._query_history(client_id, incident_id, after_seq, limit, descending=descending):
+                found = True
+                yield entry
+
+            # As in the sync repository, the archive is only read when the incident document is missing
+            if not found and not (await self._incident_ref(client_id, incident_id).get(field_paths=HISTORY_FIELDS)).exists:
+                for entry in await self._archived_history(client_id, incident_id, after_seq, limit, descending=descending):
+                    yield entry
+            return
+
+        doc = await self._incident_ref(client_id, incident_id).get(field_paths=HISTORY_FIELDS)
+        if not doc.exists:
+            for entry in await self._archived_history(client_id, incident_id, after_seq, limit, descending=descending):
+                yield entry
+            return
+
+        data = cast(dict[str, Any], doc.to_dict())
+        async for entry in self._merge_history(data, client_id, incident_id, after_seq, limit, descending=descending):
+            yield entry
+
+    async def _archived_history(  # noqa: PLR0913
+        self,
+        client_id: str,
+        incident_id: str,
+        after_seq: int | None,
+        limit: int | None,
+        *,
+        descending: bool,
+        data: dict[str, Any] | None = None,
+    ) -> list[HistoryEntry]:
+        # Same as the sync repository's
+        archived_ref = self._archived_ref(client_id, incident_id)
+
+        if data is None:
+            doc = await archived_ref.get(field_paths=['history_chunks'])
+            if not doc.exists:
+                return []
+            data = cast(dict[str, Any], doc.to_dict())
+
+        to_read = chunks_to_read(history_chunks(data), after_seq, limit, descending=descending)
+        entries = await self._read_chunks(archived_ref, client_id, incident_id, to_read, after_seq, descending=descending)
+        return entries[:limit]
+
+    async def _merge_history(  # noqa: PLR0913
+        self,
+        data: dict[str, Any],
+        client_id: str,
+        incident_id: str,
+        after_seq: int | None,
+        limit: int | None,
+        *,
+        descending: bool,
+    ) -> AsyncGenerator[HistoryEntry, None]:
+        plan = plan_merge(data, client_id, incident_id, after_seq, limit, descending=descending)
+        spilled: list[HistoryEntry] = []
+        if plan.spill is not None:
+            spilled = await collect(self._query_spilled(data, client_id, incident_id, *plan.spill, descending=descending))
+
+        for entry in merge(plan, spilled, limit, descending=descending):
+            yield entry
+
+    async def _query_spilled(  # noqa: PLR0913
+        self,
+        data: dict[str, Any],
+        client_id: str,
+        incident_id: str,
+        after_seq: int | None,
+        limit: int | None,
+        *,
+        descending: bool,
+    ) -> AsyncGenerator[HistoryEntry, None]:
+        # Same as the sync repository's
+        chunks = history_chunks(data)
+        if not chunks:
+            async for entry in self._query_history(client_id, incident_id, after_seq, limit, descending=descending):
+                yield entry
+            return
+
+        until = chunked_until(data)
+        count = 0
+
+        if originals_reachable(after_seq, until, descending=descending):
+            async for entry in self._query_history(client_id, incident_id, after_seq, limit, descending=True):
+                if cast(int, entry.seq) < until:
+                    break
+
+                count += 1
+                yield entry
+
+        if limit is None or count < limit:
+            to_read = chunks_to_read(chunks, after_seq, remaining(limit, count), descending=descending)
+
+            incident_ref = self._incident_ref(client_id, incident_id)
+            chunked = await self._read_chunks(incident_ref, client_id, incident_id, to_read, after_seq, descending=descending)
+
+            for entry in chunked[: remaining(limit, count)]:
+                count += 1
+                yield entry
+
+        if not descending and (limit is None or count < limit):
+            cursor = tail_cursor(after_seq, until)
+            async for entry in self._query_history(client_id, incident_id, cursor, remaining(limit, count), descending=False):
+                yield entry
+
+    async def _read_chunks(  # noqa: PLR0913
+        self,
+        incident_ref: AsyncDocumentReference,
+        client_id: str,
+        incident_id: str,
+        chunks: list[Chunk],
+        after_seq: int | None,
+        *,
+        descending: bool,
+    ) -> list[HistoryEntry]:
+        if not chunks:
+            return []
+
+        chunks_ref = cast(AsyncCollectionReference, incident_ref.collection('history_chunks'))
+        refs = [chunks_ref.document(str(first)) for first, _ in chunks]
+        docs = {doc.id: cast(dict[str, Any], doc.to_dict()) async for doc in self.db.get_all(refs)}
+        return chunk_entries(chunks, docs, client_id, incident_id, after_seq, descending=descending)
+
+    async def get_with_history(
+        self, client_id: str, incident_id: str, history_limit: int | None = None
+    ) -> tuple[Incident | None, list[HistoryEntry]]:
+        descending = history_limit is not None
+        history: list[HistoryEntry] = []
+
+        if self.embedded_history:
+            doc = await self._incident_ref(client_id, incident_id).get()
+
+            if doc.exists:
+                data = cast(dict[str, Any], doc.to_dict())
+                history = await collect(
+                    self._merge_history(data, client_id, incident_id, None, history_limit, descending=descending)
+                )
+        else:
+            query = self._query_history(client_id, incident_id, None, history_limit, descending=descending)
+            doc, history = await asyncio.gather(self._incident_ref(client_id, incident_id).get(), collect(query))
+
+        if not doc.exists:
+            doc = await self._archived_ref(client_id, incident_id).get()
+            if not doc.exists:
+                return None, []
+
+            data = cast(dict[str, Any], doc.to_dict())
+            history = await self._archived_history(
+                client_id, incident_id, None, history_limit, descending=descending, data=data
+            )
+
+        incident = doc_to_incident(doc, client_id)
+        return incident, history[::-1] if descending else history
+
+    async def _query_history(
+        self,
+        client_id: str,
+        incident_id: str,
+        after_seq: int | None,
+        limit: int | None,
+        *,
+        descending: bool,
+    ) -> AsyncGenerator[HistoryEntry, None]:
+        history_ref = cast(AsyncCollectionReference, self._incident_ref(client_id, incident_id).collection('history'))
+        query = history_ref.order_by('seq', direction='DESCENDING' if descending else 'ASCENDING')
+
+        if after_seq is not None:
+            query = query.start_after({'seq': after_seq})
+
+        if limit is not None:
+            query = query.limit(limit)
+
+        async for doc in query.stream():
+            yield doc_to_history_entry(doc, client_id, incident_id)
+
+    async def create_many(self, incidents: list[Incident]) -> list[Exception | None]:
+        return await asyncio.to_thread(self.sync_repo.create_many, incidents)
+
+    async def append_history_many(self, entries: list[HistoryEntry]) -> list[Exception | None]:
+        return await asyncio.to_thread(self.sync_repo.append_history_many, entries)
+
+    async def delete_all(self, client_id: str | None = None) -> dict[str, int]:
+        return await asyncio.to_thread(self.sync_repo.delete_all, client_id)
+
+    async def update(self, incident: Incident, expected_version: str | None = None) -> None:
+        incident_ref = self._incident_ref(incident.client_id, incident.id)
+        incident_dict = {**incident_to_doc(incident), 'last_modified': datetime.now(UTC)}
+
+        if expected_version is None:
+            doc = await incident_ref.get()
+            if not doc.exists:
+                raise not_found_error(incident)
+
+            result = await incident_ref.update(incident_dict)
+            incident.version = update_time_to_version(result.update_time)
+            return
+
+        # As in the sync repository's update_with_history, the precondition is checked by the write
+        option = self.db.write_option(last_update_time=expected_update_time(incident, expected_version))
+
+        try:
+            result = await incident_ref.update(incident_dict, option=option)
+        except NotFound as e:
+            raise not_found_error(incident) from e
+
+        incident.version = update_time_to_version(result.update_time)
+
+
+async def collect(entries: AsyncGenerator[HistoryEntry, None]) -> list[HistoryEntry]:
+    return [entry async for entry in entries]
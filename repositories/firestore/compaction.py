@@ -0,0 +1,69 @@
+from typing import Any
+
+from models import HistoryEntry
+
+from .converters import dict_to_history_entry
+from .embedded import embedded_count
+
+# History compaction, only in the embedded-history layout where the incident document holds the seq counter.
+#
+# Full chunks of the oldest spilled entries are copied from the history subcollection to documents of the
+# history_chunks subcollection (keyed by their first seq), and the incident document lists their bounds in
+# `history_chunks`. Chunks are contiguous and follow the embedded entries, the history subcollection holds the
+# entries after the last chunk. A full history read then costs one document per chunk instead of one per entry.
+#
+# The original entries of a chunk are only deleted by the next compaction of the incident, so readers that read
+# the incident document before the chunk was listed still find them.
+
+# Fields of the incident document every history read needs
+HISTORY_FIELDS = ['history', 'history_count', 'history_chunks']
+
+Chunk = tuple[int, int]  # First and last seq
+
+
+def history_chunks(data: dict[str, Any]) -> list[Chunk]:
+    return [(chunk['first'], chunk['last']) for chunk in data.get('history_chunks', [])]
+
+
+def chunked_until(data: dict[str, Any]) -> int:
+    # First seq that is not embedded nor in a chunk
+    chunks = history_chunks(data)
+    return chunks[-1][1] + 1 if chunks else embedded_count(data)
+
+
+def chunk_doc(entries: list[dict[str, Any]]) -> dict[str, Any]:
+    return {'first': entries[0]['seq'], 'last': entries[-1]['seq'], 'entries': entries}
+
+
+def chunks_to_read(chunks: list[Chunk], after_seq: int | None, limit: int | None, *, descending: bool) -> list[Chunk]:
+    # The chunks holding the requested entries, in the requested order
+    selected: list[Chunk] = []
+    count = 0
+
+    for first, last in reversed(chunks) if descending else chunks:
+        if descending:
+            requested = (last if after_seq is None else min(last, after_seq - 1)) - first + 1
+        else:
+            requested = last - (first if after_seq is None else max(first, after_seq + 1)) + 1
+
+        if requested <= 0:
+            continue
+
+        if limit is not None and count >= limit:
+            break
+
+        selected.append((first, last))
+        count += requested
+
+    return selected
+
+
+def read_chunk(
+    data: dict[str, Any], client_id: str, incident_id: str, after_seq: int | None, *, descending: bool
+) -> list[HistoryEntry]:
+    if descending:
+        entries = [x for x in reversed(data['entries']) if after_seq is None or x['seq'] < after_seq]
+    else:
+        entries = [x for x in data['entries'] if after_seq is None or x['seq'] > after_seq]
+
+    return [dict_to_history_entry(x, client_id, incident_id) for x in entries]
@@ -0,0 +1,95 @@
+from collections.abc import Callable, Collection
+from datetime import datetime
+from typing import Any, cast
+
+from google.api_core.datetime_helpers import DatetimeWithNanoseconds
+from google.cloud.firestore_v1 import DocumentSnapshot
+
+from models import Action, Channel, HistoryEntry, Incident, IncidentView, Risk
+
+# Hand-written converters: the caller already knows the IDs from the path it queried,
+# so there is no need to walk the document reference or go through dacite's reflection.
+
+
+def doc_to_incident(doc: DocumentSnapshot, client_id: str) -> Incident:
+    data = cast(dict[str, Any], doc.to_dict())
+    risk = data.get('risk')
+
+    return Incident(
+        id=doc.id,
+        client_id=client_id,
+        name=data['name'],
+        channel=Channel(data['channel']),
+        reported_by=data['reported_by'],
+        created_by=data['created_by'],
+        assigned_to=data['assigned_to'],
+        risk=None if risk is None else Risk(risk),
+        version=update_time_to_version(doc.update_time),
+    )
+
+
+# The version of an incident is the update time of its document, to the nanosecond
+
+
+def update_time_to_version(update_time: datetime | None) -> str | None:
+    return None if update_time is None else cast(str, cast(DatetimeWithNanoseconds, update_time).rfc3339())  # type: ignore[no-untyped-call]
+
+
+def version_to_update_time(version: str) -> DatetimeWithNanoseconds | None:
+    # None for versions that are not update times, no document has them
+    try:
+        return cast(DatetimeWithNanoseconds, DatetimeWithNanoseconds.from_rfc3339(version))  # type: ignore[no-untyped-call]
+    except ValueError:
+        return None
+
+
+# Enum fields of a view, the others are stored as is
+VIEW_ENUMS: dict[str, Callable[[Any], Any]] = {'channel': Channel, 'risk': Risk, 'last_action': Action}
+
+
+def doc_to_incident_view(doc: DocumentSnapshot, client_id: str, fields: Collection[str]) -> IncidentView:
+    # doc is read with a field mask, fields missing from it are left unset
+    data = cast(dict[str, Any], doc.to_dict())
+    view = IncidentView(id=doc.id, client_id=client_id)
+
+    for name in fields:
+        value = data.get(name)
+        if value is not None:
+            setattr(view, name, VIEW_ENUMS[name](value) if name in VIEW_ENUMS else value)
+
+    return view
+
+
+def doc_to_history_entry(doc: DocumentSnapshot, client_id: str, incident_id: str) -> HistoryEntry:
+    return dict_to_history_entry(cast(dict[str, Any], doc.to_dict()), client_id, incident_id)
+
+
+def dict_to_history_entry(data: dict[str, Any], client_id: str, incident_id: str) -> HistoryEntry:
+    return HistoryEntry(
+        incident_id=incident_id,
+        client_id=client_id,
+        date=data['date'],
+        action=Action(data['action']),
+        description=data['description'],
+        seq=data['seq'],
+    )
+
+
+def incident_to_doc(incident: Incident) -> dict[str, Any]:
+    return {
+        'name': incident.name,
+        'channel': incident.channel,
+        'reported_by': incident.reported_by,
+        'created_by': incident.created_by,
+        'assigned_to': incident.assigned_to,
+        'risk': incident.risk,
+    }
+
+
+def history_entry_to_doc(entry: HistoryEntry) -> dict[str, Any]:
+    return {
+        'date': entry.date,
+        'action': entry.action,
+        'description': entry.description,
+        'seq': entry.seq,
+    }
@@ -0,0 +1,61 @@
+from typing import Any
+
+from models import HistoryEntry
+
+from .converters import dict_to_history_entry
+
+# Embedded-history layout: the first entries of an incident are kept in the `history` array of its document
+# and `history_count` holds the next seq. Entries past the threshold, and every entry of an incident written
+# before the layout was enabled (no `history_count`), live in the history subcollection.
+#
+# Readers merge both sources, so the threshold can be raised or lowered at any time. Disabling the layout
+# once incidents embed entries is not supported: the subcollection-only readers would not see them.
+
+
+def empty_history() -> dict[str, Any]:
+    # Fields of a new incident document
+    return {'history': [], 'history_count': 0}
+
+
+def history_count(data: dict[str, Any]) -> int | None:
+    count = data.get('history_count')
+    return None if count is None else int(count)
+
+
+def read_embedded(data: dict[str, Any], client_id: str, incident_id: str) -> tuple[list[HistoryEntry], bool]:
+    # Returns the embedded entries and whether some entries were spilled to the subcollection
+    embedded = [dict_to_history_entry(x, client_id, incident_id) for x in data.get('history', [])]
+    return embedded, history_count(data) != len(embedded)
+
+
+def embedded_count(data: dict[str, Any]) -> int:
+    return len(data.get('history', []))
+
+
+def embeds(embedded: int, seq: int, max_embedded: int) -> bool:
+    # Only contiguous entries are embedded, seq is then the index in the array
+    return seq < max_embedded and embedded == seq
+
+
+def slice_embedded(
+    embedded: list[HistoryEntry], after_seq: int | None, limit: int | None, *, descending: bool
+) -> list[HistoryEntry]:
+    if descending:
+        end = len(embedded) if after_seq is None else min(after_seq, len(embedded))
+        return embedded[:end][::-1][:limit]
+
+    return embedded[0 if after_seq is None else after_seq + 1 :][:limit]
+
+
+def spill_cursor(embedded: list[HistoryEntry], after_seq: int | None, *, descending: bool) -> int | None:
+    # Cursor of the subcollection query, whose entries all come after the embedded ones
+    if descending:
+        return after_seq
+
+    cursor = max(-1 if after_seq is None else after_seq, len(embedded) - 1)
+    return None if cursor < 0 else cursor
+
+
+def spill_reachable(embedded: list[HistoryEntry], after_seq: int | None, *, descending: bool) -> bool:
+    # Descending from a cursor inside the embedded entries never reaches the subcollection
+    return not descending or after_seq is None or after_seq > len(embedded)
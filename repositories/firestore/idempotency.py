@@ -0,0 +1,71 @@
+from datetime import UTC, datetime
+from typing import Any, cast
+
+from google.api_core.exceptions import AlreadyExists
+from google.cloud.firestore import Client as FirestoreClient  # type: ignore[import-untyped]
+from google.cloud.firestore_v1 import DocumentReference, Transaction, transactional
+
+from models import IdempotencyRecord
+from repositories import IdempotencyRepository
+
+# Top-level, outside of the clients tree. The TTL policy on expires_at (see terraform) deletes expired records.
+IDEMPOTENCY_COLLECTION = 'idempotency_keys'
+
+
+def record_to_doc(record: IdempotencyRecord) -> dict[str, Any]:
+    return {
+        'fingerprint': record.fingerprint,
+        'expires_at': record.expires_at,
+        'status': record.status,
+        'body': record.body,
+        'headers': record.headers,
+    }
+
+
+def doc_to_record(key: str, doc: dict[str, Any]) -> IdempotencyRecord:
+    # Records stored before the headers were kept have none
+    return IdempotencyRecord(
+        key=key,
+        fingerprint=doc['fingerprint'],
+        expires_at=doc['expires_at'],
+        status=doc['status'],
+        body=doc['body'],
+        headers=doc.get('headers') or {},
+    )
+
+
+class FirestoreIdempotencyRepository(IdempotencyRepository):
+    def __init__(self, database: str) -> None:
+        self.db = FirestoreClient(database=database)
+
+    def _ref(self, key: str) -> DocumentReference:
+        return cast(DocumentReference, self.db.collection(IDEMPOTENCY_COLLECTION).document(key))
+
+    def create(self, record: IdempotencyRecord) -> IdempotencyRecord | None:
+        # New keys take a single write, only a retry reads the stored record
+        try:
+            self._ref(record.key).create(record_to_doc(record))
+        except AlreadyExists:
+            return cast(IdempotencyRecord | None, transactional(self._replace_expired)(self.db.transaction(), record))
+
+        return None
+
+    def _replace_expired(self, transaction: Transaction, record: IdempotencyRecord) -> IdempotencyRecord | None:
+        # The TTL policy deletes expired documents up to a day late, until then they are replaced
+        doc = self._ref(record.key).get(transaction=transaction)
+
+        if doc.exists:
+            existing = doc_to_record(record.key, cast(dict[str, Any], doc.to_dict()))
+            if existing.expires_at > datetime.now(UTC):
+                return existing
+
+        transaction.set(self._ref(record.key), record_to_doc(record))
+        return None
+
+    def complete(self, record: IdempotencyRecord) -> None:
+        self._ref(record.key).update(
+            {'status': record.status, 'body': record.body, 'headers': record.headers, 'expires_at': record.expires_at}
+        )
+
+    def delete(self, key: str) -> None:
+        self._ref(key).delete()
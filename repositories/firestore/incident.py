@@ -1,116 +1,895 @@
 import contextlib
+import copy
 import logging
-from collections.abc import Generator
-from dataclasses import asdict
-from enum import Enum
+import threading
+import time
+from collections.abc import Collection, Generator, Iterable
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import UTC, datetime
 from typing import Any, cast
 
-import dacite
-from google.api_core.exceptions import AlreadyExists
+from google.api_core.exceptions import AlreadyExists, FailedPrecondition, NotFound, from_grpc_status
 from google.cloud.firestore import Client as FirestoreClient  # type: ignore[import-untyped]
-from google.cloud.firestore_v1 import CollectionReference, DocumentReference, DocumentSnapshot
-from google.cloud.firestore_v1.base_aggregation import AggregationResult
+from google.cloud.firestore_v1 import (
+    ArrayUnion,
+    CollectionReference,
+    DocumentReference,
+    DocumentSnapshot,
+    FieldFilter,
+    Transaction,
+    transactional,
+)
+from google.cloud.firestore_v1.bulk_writer import BulkWriteFailure, BulkWriter, BulkWriterOptions, SendMode
+from google.cloud.firestore_v1.field_path import FieldPath
 
-from models import HistoryEntry, Incident
+from models import Action, HistoryEntry, Incident, IncidentChange, IncidentView
 from repositories import IncidentRepository
+from repositories.incident import check_update_fields, check_view_fields
+
+from .archive import ARCHIVE_COLLECTION, ARCHIVED_INCIDENTS, archived_chunk_docs, archived_incident_doc
+from .compaction import HISTORY_FIELDS, Chunk, chunk_doc, chunked_until, chunks_to_read, history_chunks
+from .converters import (
+    doc_to_history_entry,
+    doc_to_incident,
+    doc_to_incident_view,
+    history_entry_to_doc,
+    incident_to_doc,
+    update_time_to_version,
+)
+from .embedded import embedded_count, embeds, history_count
+from .shared import (
+    aggregation_count,
+    append_fields,
+    archived_path,
+    chunk_entries,
+    embedded_append,
+    expected_update_time,
+    incident_path,
+    lacks_last_action,
+    merge,
+    new_incident_doc,
+    not_found_error,
+    originals_reachable,
+    plan_merge,
+    remaining,
+    seqs_exhausted,
+    tail_cursor,
+)
+
+# gRPC codes worth retrying in bulk writes: DEADLINE_EXCEEDED, RESOURCE_EXHAUSTED, ABORTED, INTERNAL, UNAVAILABLE
+BULK_RETRYABLE_CODES = {4, 8, 10, 13, 14}
+BULK_MAX_ATTEMPTS = 10
+BULK_READ_WORKERS = 8
+# Reads of a single request issued in parallel, shared by all request threads
+READ_WORKERS = 16
+DELETE_WORKERS = 8
+COMPACT_WORKERS = 2
+# Seqs tried by an append to the history subcollection before giving up
+APPEND_MAX_ATTEMPTS = 50
+# Times the entries of an incident appended to concurrently are read and written again by bulk appends
+BULK_CONFLICT_ATTEMPTS = 3
+# Incidents moved to the archive per round of bulk writes
+ARCHIVE_BATCH = 100
+# Seconds the counts of metrics are reused for, each refresh runs a collection group count per collection
+METRICS_TTL = 60.0
+# Read by the change feed, the field mask leaves the embedded history on the server
+CHANGE_FIELDS = ['name', 'channel', 'reported_by', 'created_by', 'assigned_to', 'risk', 'last_modified']
+DOCUMENT_ID = FieldPath.document_id()  # type: ignore[no-untyped-call]
+
+# Next seq of an incident, its number of embedded entries, the first seq not embedded nor in a chunk, and the update
+# time they were read at, if any
+NextSeq = tuple[int, int, int, datetime | None]
+# History entry documents to create, with their references
+EntryCreates = list[tuple[DocumentReference, dict[str, Any]]]
 
 
 class FirestoreIncidentRepository(IncidentRepository):
-    def __init__(self, database: str) -> None:
+    # embedded_history > 0 keeps up to that many entries on the incident document (see .embedded).
+    # In that layout, history_chunk entries are compacted at a time (see .compaction), and appends schedule the
+    # compaction of incidents with compact_threshold entries or more in the history subcollection (0 disables it).
+    def __init__(self, database: str, embedded_history: int = 0, history_chunk: int = 100, compact_threshold: int = 0) -> None:
         self.db = FirestoreClient(database=database)
+        self.embedded_history = embedded_history
+        self.history_chunk = history_chunk
+        self.compact_threshold = compact_threshold
+        self.read_executor = ThreadPoolExecutor(max_workers=READ_WORKERS, thread_name_prefix='firestore-read')
+        self.compact_executor = ThreadPoolExecutor(max_workers=COMPACT_WORKERS, thread_name_prefix='firestore-compact')
         self.logger = logging.getLogger(self.__class__.__name__)
 
-    def doc_to_incident(self, doc: DocumentSnapshot) -> Incident:
-        client_id = cast(DocumentReference, cast(CollectionReference, cast(DocumentReference, doc.reference).parent).parent).id
-        return dacite.from_dict(
-            data_class=Incident,
-            data={
-                **cast(dict[str, Any], doc.to_dict()),
-                'id': doc.id,
-                'client_id': client_id,
-            },
-            config=dacite.Config(cast=[Enum]),
-        )
+        # Paths of the incidents with a scheduled compaction
+        self._compacting: set[str] = set()
+        self._compacting_lock = threading.Lock()
 
-    def doc_to_history_entry(self, doc: DocumentSnapshot) -> HistoryEntry:
-        incident_ref = cast(DocumentReference, cast(CollectionReference, cast(DocumentReference, doc.reference).parent).parent)
-        client_ref = cast(DocumentReference, cast(CollectionReference, incident_ref.parent).parent)
-        return dacite.from_dict(
-            data_class=HistoryEntry,
-            data={
-                **cast(dict[str, Any], doc.to_dict()),
-                'incident_id': incident_ref.id,
-                'client_id': client_ref.id,
-            },
-            config=dacite.Config(cast=[Enum]),
-        )
+        # Monotonic time the counts of metrics were read at, and the counts
+        self._metrics: tuple[float, dict[str, int]] | None = None
+        self._metrics_lock = threading.Lock()
+
+    def _incident_ref(self, client_id: str, incident_id: str) -> DocumentReference:
+        return cast(DocumentReference, self.db.document(*incident_path(client_id, incident_id)))
+
+    def _archived_ref(self, client_id: str, incident_id: str) -> DocumentReference:
+        return cast(DocumentReference, self.db.document(*archived_path(client_id, incident_id)))
+
+    def _get_incident_doc(
+        self, client_id: str, incident_id: str, field_paths: list[str] | None = None
+    ) -> DocumentSnapshot | None:
+        # Archived incidents are only read when the incident is not found, so they cost nothing to active ones.
+        # No field_paths reads every field.
+        doc = self._incident_ref(client_id, incident_id).get(field_paths=field_paths)  # type: ignore[arg-type]
+        if not doc.exists:
+            doc = self._archived_ref(client_id, incident_id).get(field_paths=field_paths)  # type: ignore[arg-type]
+
+        return doc if doc.exists else None
+
+    def _history_count(self, incident_ref: DocumentReference, transaction: Transaction | None = None) -> int:
+        history_ref = cast(CollectionReference, incident_ref.collection('history'))
+        return aggregation_count(history_ref.count().get(transaction=transaction))  # type: ignore[no-untyped-call]
+
+    def _bulk_writer(self) -> tuple[BulkWriter, dict[str, Exception]]:
+        # Failures are keyed by document path, the callback runs on the bulk writer's sender threads
+        failures: dict[str, Exception] = {}
+
+        def on_write_error(failure: BulkWriteFailure, _bulk_writer: BulkWriter) -> bool:
+            if failure.code in BULK_RETRYABLE_CODES and failure.attempts < BULK_MAX_ATTEMPTS:
+                return True
+
+            reference = cast(DocumentReference, failure.operation.reference)  # type: ignore[attr-defined]
+            failures[reference.path] = from_grpc_status(failure.code, failure.message)  # type: ignore[no-untyped-call]
+            return False
+
+        bulk_writer = self.db.bulk_writer(options=BulkWriterOptions(mode=SendMode.parallel))
+        bulk_writer.on_write_error(on_write_error)
+
+        return bulk_writer, failures
 
     def create(self, incident: Incident) -> None:
-        incident_dict = asdict(incident)
-        del incident_dict['id']
-        del incident_dict['client_id']
+        incident_dict = new_incident_doc(incident, self.embedded_history)
 
         client_ref = self.db.collection('clients').document(incident.client_id)
         with contextlib.suppress(AlreadyExists):
             client_ref.create({})
 
         incident_ref = cast(CollectionReference, client_ref.collection('incidents')).document(incident.id)
-        incident_ref.create(incident_dict)
+        incident.version = update_time_to_version(incident_ref.create(incident_dict).update_time)
 
     def get(self, client_id: str, incident_id: str) -> Incident | None:
-        client_ref = self.db.collection('clients').document(client_id)
-        incident_ref = cast(CollectionReference, client_ref.collection('incidents')).document(incident_id)
-        doc = incident_ref.get()
+        doc = self._get_incident_doc(client_id, incident_id)
 
-        if not doc.exists:
+        if doc is None:
+            return None
+
+        return doc_to_incident(doc, client_id)
+
+    def get_view(self, client_id: str, incident_id: str, fields: Collection[str]) -> IncidentView | None:
+        check_view_fields(fields)
+
+        # The field mask leaves the history array and the other fields on the server
+        doc = self._get_incident_doc(client_id, incident_id, list(fields))
+        if doc is None:
             return None
 
-        return self.doc_to_incident(doc)
+        return self._doc_to_view(doc, client_id, fields)
+
+    def _doc_to_view(self, doc: DocumentSnapshot, client_id: str, fields: Collection[str]) -> IncidentView:
+        view = doc_to_incident_view(doc, client_id, fields)
+
+        if lacks_last_action(doc, fields):
+            last_entry = self.get_last_history_entry(client_id, doc.id)
+            view.last_action = None if last_entry is None else last_entry.action
+
+        return view
+
+    def get_changes(self, client_id: str, after: tuple[datetime, str], until: datetime, limit: int) -> list[IncidentChange]:
+        incidents_ref = cast(CollectionReference, self.db.collection('clients').document(client_id).collection('incidents'))
+        last_modified, incident_id = after
+
+        # Served by the single-field index of last_modified, documents are ordered by their id within each value
+        query = (
+            incidents_ref.where(filter=FieldFilter('last_modified', '>=', last_modified))  # type: ignore[no-untyped-call]
+            .where(filter=FieldFilter('last_modified', '<=', until))  # type: ignore[no-untyped-call]
+            .order_by('last_modified')
+            .order_by(DOCUMENT_ID)
+            .select(CHANGE_FIELDS)
+            .limit(limit)
+        )
+
+        if incident_id:
+            query = query.start_after({'last_modified': last_modified, DOCUMENT_ID: incident_id})
+
+        return [
+            IncidentChange(incident=doc_to_incident(doc, client_id), last_modified=doc.get('last_modified'))
+            for doc in query.stream()
+        ]
+
+    def get_views(self, client_id: str, incident_ids: list[str], fields: Collection[str]) -> list[IncidentView | None]:
+        check_view_fields(fields)
+
+        # One batched read of the active incidents, then one of the archive for those not found
+        refs = [self._incident_ref(client_id, incident_id) for incident_id in dict.fromkeys(incident_ids)]
+        docs = {doc.id: doc for doc in self.db.get_all(refs, field_paths=list(fields)) if doc.exists}
+
+        missing = [incident_id for incident_id in dict.fromkeys(incident_ids) if incident_id not in docs]
+        if missing:
+            archived_refs = [self._archived_ref(client_id, incident_id) for incident_id in missing]
+            docs.update((doc.id, doc) for doc in self.db.get_all(archived_refs, field_paths=list(fields)) if doc.exists)
+
+        views = {incident_id: self._doc_to_view(doc, client_id, fields) for incident_id, doc in docs.items()}
+        return [copy.copy(views[incident_id]) if incident_id in views else None for incident_id in incident_ids]
 
     def append_history_entry(self, entry: HistoryEntry) -> None:
-        history_dict = asdict(entry)
-        del history_dict['client_id']
-        del history_dict['incident_id']
-        del history_dict['seq']
+        self._append(entry, {})
 
+    def _append(self, entry: HistoryEntry, incident_fields: dict[str, Any]) -> None:
+        # Appends entry and writes incident_fields on the incident document in the same commit
         if entry.seq is not None:
             raise ValueError('seq must be None when appending history entry')
 
-        client_ref = self.db.collection('clients').document(entry.client_id)
-        incident_ref = cast(CollectionReference, client_ref.collection('incidents')).document(entry.incident_id)
-        history_ref = cast(CollectionReference, incident_ref.collection('history'))
-        next_seq = int(cast(AggregationResult, history_ref.count().get()[0][0]).value)  # type: ignore[no-untyped-call]
-        entry_ref = history_ref.document(str(next_seq))
+        incident_ref = self._incident_ref(entry.client_id, entry.incident_id)
+
+        if self.embedded_history:
+            entry.seq, uncompacted = transactional(self._append_embedded)(
+                self.db.transaction(), incident_ref, entry, incident_fields
+            )
 
-        entry.seq = next_seq
-        history_dict['seq'] = next_seq
-        entry_ref.create(history_dict)
-        incident_ref.update({'last_modified': entry.date})
+            if self.compact_threshold and uncompacted >= self.compact_threshold:
+                self.schedule_compaction(entry.client_id, entry.incident_id)
+            return
 
-    def get_history(self, client_id: str, incident_id: str) -> Generator[HistoryEntry, None, None]:
-        client_ref = self.db.collection('clients').document(client_id)
-        incident_ref = cast(CollectionReference, client_ref.collection('incidents')).document(incident_id)
         history_ref = cast(CollectionReference, incident_ref.collection('history'))
-        query = history_ref.order_by('seq', direction='ASCENDING')
+        next_seq = self._history_count(incident_ref)
+
+        # Concurrent appends count the same entries, the create of a taken seq fails and the next one is tried
+        for seq in range(next_seq, next_seq + APPEND_MAX_ATTEMPTS):
+            entry.seq = seq
+            batch = self.db.batch()
+            batch.create(history_ref.document(str(seq)), history_entry_to_doc(entry))
+            batch.update(incident_ref, append_fields(entry, incident_fields))
+
+            try:
+                batch.commit()
+            except AlreadyExists:
+                continue
+            return
+
+        raise seqs_exhausted(entry)
+
+    def _append_embedded(
+        self, transaction: Transaction, incident_ref: DocumentReference, entry: HistoryEntry, incident_fields: dict[str, Any]
+    ) -> tuple[int, int]:
+        # One transaction reads the seq counter and writes the entry, instead of a count plus two writes.
+        # Returns the seq and the number of entries in the history subcollection that are not compacted.
+        doc = incident_ref.get(transaction=transaction)
+        if not doc.exists:
+            raise NotFound(f'Incident {entry.incident_id} not found')  # type: ignore[no-untyped-call]
+
+        data = cast(dict[str, Any], doc.to_dict())
+        seq = history_count(data)
+        if seq is None:
+            seq = self._history_count(incident_ref, transaction)
+
+        append = embedded_append(data, entry, seq, self.embedded_history, incident_fields)
+        if append.spilled:
+            history_ref = cast(CollectionReference, incident_ref.collection('history'))
+            transaction.create(history_ref.document(str(seq)), append.entry_doc)
+
+        transaction.update(incident_ref, append.incident_update)
+        return seq, append.uncompacted
+
+    def get_history(
+        self,
+        client_id: str,
+        incident_id: str,
+        after_seq: int | None = None,
+        limit: int | None = None,
+        *,
+        descending: bool = False,
+    ) -> Generator[HistoryEntry, None, None]:
+        if not self.embedded_history:
+            found = False
+            for entry in self._query_history(client_id, incident_id, after_seq, limit, descending=descending):
+                found = True
+                yield entry
+
+            # No history in the clients tree, the incident is only archived when its document is missing too
+            if not found and not self._incident_ref(client_id, incident_id).get(field_paths=HISTORY_FIELDS).exists:
+                yield from self._archived_history(client_id, incident_id, after_seq, limit, descending=descending)
+            return
+
+        doc = self._incident_ref(client_id, incident_id).get(field_paths=HISTORY_FIELDS)
+        if not doc.exists:
+            yield from self._archived_history(client_id, incident_id, after_seq, limit, descending=descending)
+            return
+
+        data = cast(dict[str, Any], doc.to_dict())
+        yield from self._merge_history(data, client_id, incident_id, after_seq, limit, descending=descending)
+
+    def _archived_history(  # noqa: PLR0913
+        self,
+        client_id: str,
+        incident_id: str,
+        after_seq: int | None,
+        limit: int | None,
+        *,
+        descending: bool,
+        data: dict[str, Any] | None = None,
+    ) -> list[HistoryEntry]:
+        # History of an archived incident, data is its document when already read
+        archived_ref = self._archived_ref(client_id, incident_id)
+
+        if data is None:
+            doc = archived_ref.get(field_paths=['history_chunks'])
+            if not doc.exists:
+                return []
+            data = cast(dict[str, Any], doc.to_dict())
+
+        to_read = chunks_to_read(history_chunks(data), after_seq, limit, descending=descending)
+        entries = self._read_chunks(archived_ref, client_id, incident_id, to_read, after_seq, descending=descending)
+        return entries[:limit]
+
+    def _merge_history(  # noqa: PLR0913
+        self,
+        data: dict[str, Any],
+        client_id: str,
+        incident_id: str,
+        after_seq: int | None,
+        limit: int | None,
+        *,
+        descending: bool,
+    ) -> Generator[HistoryEntry, None, None]:
+        plan = plan_merge(data, client_id, incident_id, after_seq, limit, descending=descending)
+        spilled: Iterable[HistoryEntry] = ()
+        if plan.spill is not None:
+            spilled = self._query_spilled(data, client_id, incident_id, *plan.spill, descending=descending)
+
+        # Lazy, in ascending order the spilled entries are only read once the embedded ones are consumed
+        yield from merge(plan, spilled, limit, descending=descending)
+
+    def _query_spilled(  # noqa: PLR0913
+        self,
+        data: dict[str, Any],
+        client_id: str,
+        incident_id: str,
+        after_seq: int | None,
+        limit: int | None,
+        *,
+        descending: bool,
+    ) -> Generator[HistoryEntry, None, None]:
+        # Spilled entries of an incident document: its compacted chunks, then the history subcollection
+        chunks = history_chunks(data)
+        if not chunks:
+            yield from self._query_history(client_id, incident_id, after_seq, limit, descending=descending)
+            return
+
+        until = chunked_until(data)
+        count = 0
+
+        if originals_reachable(after_seq, until, descending=descending):
+            for entry in self._query_history(client_id, incident_id, after_seq, limit, descending=True):
+                if cast(int, entry.seq) < until:
+                    break
+
+                count += 1
+                yield entry
+
+        if limit is None or count < limit:
+            to_read = chunks_to_read(chunks, after_seq, remaining(limit, count), descending=descending)
+
+            incident_ref = self._incident_ref(client_id, incident_id)
+            chunked = self._read_chunks(incident_ref, client_id, incident_id, to_read, after_seq, descending=descending)
+
+            for entry in chunked[: remaining(limit, count)]:
+                count += 1
+                yield entry
+
+        if not descending and (limit is None or count < limit):
+            cursor = tail_cursor(after_seq, until)
+            yield from self._query_history(client_id, incident_id, cursor, remaining(limit, count), descending=False)
+
+    def _read_chunks(  # noqa: PLR0913
+        self,
+        incident_ref: DocumentReference,
+        client_id: str,
+        incident_id: str,
+        chunks: list[Chunk],
+        after_seq: int | None,
+        *,
+        descending: bool,
+    ) -> list[HistoryEntry]:
+        # incident_ref is the active or the archived incident document
+        if not chunks:
+            return []
+
+        chunks_ref = cast(CollectionReference, incident_ref.collection('history_chunks'))
+        refs = [chunks_ref.document(str(first)) for first, _ in chunks]
+        # get_all returns the documents in any order
+        docs = {doc.id: cast(dict[str, Any], doc.to_dict()) for doc in self.db.get_all(refs)}
+        return chunk_entries(chunks, docs, client_id, incident_id, after_seq, descending=descending)
+
+    def get_with_history(
+        self, client_id: str, incident_id: str, history_limit: int | None = None
+    ) -> tuple[Incident | None, list[HistoryEntry]]:
+        descending = history_limit is not None
+        history: list[HistoryEntry] = []
+
+        if self.embedded_history:
+            # A single document read, unless part of the requested history was spilled
+            doc = self._incident_ref(client_id, incident_id).get()
+
+            if doc.exists:
+                data = cast(dict[str, Any], doc.to_dict())
+                history = list(self._merge_history(data, client_id, incident_id, None, history_limit, descending=descending))
+        else:
+            # Both reads are in flight at once, the request pays one round trip instead of two
+            doc_future = self.read_executor.submit(self._incident_ref(client_id, incident_id).get)
+            history = list(self._query_history(client_id, incident_id, None, history_limit, descending=descending))
+            doc = doc_future.result()
+
+        # The archive is only read when the incident document is missing, an active incident may have no history
+        if not doc.exists:
+            doc = self._archived_ref(client_id, incident_id).get()
+            if not doc.exists:
+                return None, []
+
+            data = cast(dict[str, Any], doc.to_dict())
+            history = self._archived_history(client_id, incident_id, None, history_limit, descending=descending, data=data)
+
+        incident = doc_to_incident(doc, client_id)
+        return incident, history[::-1] if descending else history
+
+    def _query_history(
+        self,
+        client_id: str,
+        incident_id: str,
+        after_seq: int | None,
+        limit: int | None,
+        *,
+        descending: bool,
+    ) -> Generator[HistoryEntry, None, None]:
+        history_ref = cast(CollectionReference, self._incident_ref(client_id, incident_id).collection('history'))
+        query = history_ref.order_by('seq', direction='DESCENDING' if descending else 'ASCENDING')
+
+        if after_seq is not None:
+            query = query.start_after({'seq': after_seq})
+
+        if limit is not None:
+            query = query.limit(limit)
 
         docs = query.stream()
 
         for doc in docs:
-            yield self.doc_to_history_entry(doc)
+            yield doc_to_history_entry(doc, client_id, incident_id)
 
-    def delete_all(self) -> None:
-        self.db.recursive_delete(self.db.collection('clients'))
+    def create_many(self, incidents: list[Incident]) -> list[Exception | None]:
+        bulk_writer, failures = self._bulk_writer()
 
-    def update(self, incident: Incident) -> None:
-        incident_dict = asdict(incident)
-        del incident_dict['id']
-        del incident_dict['client_id']
+        # Client documents may already exist, their failures are never reported
+        for client_id in {incident.client_id for incident in incidents}:
+            bulk_writer.create(self.db.collection('clients').document(client_id), {})
 
-        client_ref = self.db.collection('clients').document(incident.client_id)
-        incident_ref = cast(CollectionReference, client_ref.collection('incidents')).document(incident.id)
+        paths: list[str] = []
+        for incident in incidents:
+            incident_ref = self._incident_ref(incident.client_id, incident.id)
+            bulk_writer.create(incident_ref, new_incident_doc(incident, self.embedded_history))
+            paths.append(incident_ref.path)
+
+        bulk_writer.close()  # type: ignore[no-untyped-call]
+
+        return [failures.get(path) for path in paths]
+
+    def update_many(self, views: list[IncidentView], fields: Collection[str]) -> list[Exception | None]:
+        check_update_fields(fields)
+        bulk_writer, failures = self._bulk_writer()
+
+        # Updates fail on missing documents, so nothing is read first
+        now = datetime.now(UTC)
+        paths: list[str] = []
+        for view in views:
+            incident_ref = self._incident_ref(view.client_id, view.id)
+            bulk_writer.update(incident_ref, {**{name: getattr(view, name) for name in fields}, 'last_modified': now})
+            paths.append(incident_ref.path)
+
+        bulk_writer.close()  # type: ignore[no-untyped-call]
+
+        return [failures.get(path) for path in paths]
+
+    def _next_seqs(self, incident_refs: list[DocumentReference]) -> list[NextSeq | None]:
+        # NextSeq of every incident, None for missing incidents. A single batched read fetches all of them
+        snapshots = {doc.reference.path: doc for doc in self.db.get_all(incident_refs)}
+
+        def read(incident_ref: DocumentReference) -> NextSeq | None:
+            doc = snapshots[incident_ref.path]
+            if not doc.exists:
+                return None
+
+            if not self.embedded_history:
+                # One count per incident instead of one per entry, seqs are then assigned client-side
+                return self._history_count(incident_ref), 0, 0, None
+
+            # The incident documents hold the seq counters
+            data = cast(dict[str, Any], doc.to_dict())
+            seq = history_count(data)
+            next_seq = self._history_count(incident_ref) if seq is None else seq
+            return next_seq, embedded_count(data), chunked_until(data), doc.update_time
+
+        with ThreadPoolExecutor(max_workers=BULK_READ_WORKERS) as executor:
+            return list(executor.map(read, incident_refs))
+
+    def append_history_many(self, entries: list[HistoryEntry]) -> list[Exception | None]:
+        results: list[Exception | None] = [None] * len(entries)
+        groups: dict[tuple[str, str], list[int]] = {}
+
+        for idx, entry in enumerate(entries):
+            if entry.seq is not None:
+                results[idx] = ValueError('seq must be None when appending history entry')
+            else:
+                groups.setdefault((entry.client_id, entry.incident_id), []).append(idx)
+
+        # Incidents appended to since their seq counter was read are read and written again
+        for _ in range(BULK_CONFLICT_ATTEMPTS):
+            if not groups:
+                break
+            groups = self._append_groups(entries, groups, results)
+
+        for indices in groups.values():
+            for idx in indices:
+                results[idx] = FailedPrecondition(f'Incident {entries[idx].incident_id} was modified')  # type: ignore[no-untyped-call]
+
+        return results
+
+    def _append_groups(
+        self, entries: list[HistoryEntry], groups: dict[tuple[str, str], list[int]], results: list[Exception | None]
+    ) -> dict[tuple[str, str], list[int]]:
+        # Appends the entries of every incident and sets their results, returns the groups that conflicted
+        written, incident_failures, failures = self._write_groups(entries, groups, results)
+        conflicts: dict[tuple[str, str], list[int]] = {}
+
+        for key, indices in groups.items():
+            if key in written:
+                incident_ref, entry_paths, uncompacted = written[key]
+                for idx, entry_path in zip(indices, entry_paths, strict=True):
+                    entry_error = failures.get(entry_path) if entry_path != incident_ref.path else None
+                    if entry_error is not None:
+                        entries[idx].seq = None
+                    results[idx] = entry_error or incident_failures.get(incident_ref.path)
+
+                # Same threshold as single appends
+                if self.embedded_history and self.compact_threshold and uncompacted >= self.compact_threshold:
+                    self.schedule_compaction(*key)
+                continue
+
+            # Embedded layout incidents whose update failed, none of their entries were written
+            incident_error = incident_failures.get(self._incident_ref(*key).path)
+            if incident_error is None:
+                continue
+
+            for idx in indices:
+                entries[idx].seq = None
+                results[idx] = incident_error
+            if isinstance(incident_error, FailedPrecondition):
+                conflicts[key] = indices
+
+        return conflicts
+
+    def _write_groups(
+        self, entries: list[HistoryEntry], groups: dict[tuple[str, str], list[int]], results: list[Exception | None]
+    ) -> tuple[dict[tuple[str, str], tuple[DocumentReference, list[str], int]], dict[str, Exception], dict[str, Exception]]:
+        # Returns the incident, entry paths and entries left to compact of the groups written, and the failures of the
+        # incident updates and of the entries. In the embedded layout the seqs are taken by the update of the incident
+        # document, conditional on the snapshot they were read from, and the entries of the subcollection are only
+        # created once it succeeded.
+        incident_refs = [self._incident_ref(client_id, incident_id) for client_id, incident_id in groups]
+        next_seqs = self._next_seqs(incident_refs)
+
+        bulk_writer, failures = self._bulk_writer()
+        written: dict[tuple[str, str], tuple[DocumentReference, list[str], EntryCreates, int]] = {}
+
+        for (key, indices), incident_ref, next_seq in zip(groups.items(), incident_refs, next_seqs, strict=True):
+            if next_seq is None:
+                for idx in indices:
+                    results[idx] = NotFound(f'Incident {entries[idx].incident_id} not found')  # type: ignore[no-untyped-call]
+            else:
+                group = [entries[idx] for idx in indices]
+                written[key] = (incident_ref, *self._write_history(bulk_writer, incident_ref, group, next_seq))
+
+        incident_failures = failures
+        if self.embedded_history:
+            bulk_writer.close()  # type: ignore[no-untyped-call]
+            bulk_writer, failures = self._bulk_writer()
+            written = {key: group for key, group in written.items() if group[0].path not in incident_failures}
+
+        for _, _, creates, _ in written.values():
+            for entry_ref, doc in creates:
+                bulk_writer.create(entry_ref, doc)
+
+        bulk_writer.close()  # type: ignore[no-untyped-call]
+
+        paths = {key: (ref, entry_paths, uncompacted) for key, (ref, entry_paths, _, uncompacted) in written.items()}
+        return paths, incident_failures, failures
+
+    def _write_history(
+        self, bulk_writer: BulkWriter, incident_ref: DocumentReference, entries: list[HistoryEntry], next_seq: NextSeq
+    ) -> tuple[list[str], EntryCreates, int]:
+        # Queues the update of the incident document. Returns the path of the document each entry is written to,
+        # the documents to create in the history subcollection, and the number of entries left to compact after them.
+        start, embedded, chunked, update_time = next_seq
+        history_ref = cast(CollectionReference, incident_ref.collection('history'))
+        embedded_docs: list[dict[str, Any]] = []
+        creates: EntryCreates = []
+        paths: list[str] = []
+
+        for seq, entry in enumerate(entries, start=start):
+            entry.seq = seq
+
+            if self.embedded_history and embeds(embedded + len(embedded_docs), seq, self.embedded_history):
+                embedded_docs.append(history_entry_to_doc(entry))
+                paths.append(incident_ref.path)
+            else:
+                entry_ref = history_ref.document(str(seq))
+                creates.append((entry_ref, history_entry_to_doc(entry)))
+                paths.append(entry_ref.path)
+
+        incident_update = append_fields(entries[-1], {})
+
+        if self.embedded_history:
+            incident_update['history_count'] = start + len(entries)
+
+        if embedded_docs:
+            incident_update['history'] = ArrayUnion(embedded_docs)
+
+        if update_time is None:
+            bulk_writer.update(incident_ref, incident_update)
+        else:
+            bulk_writer.update(incident_ref, incident_update, option=self.db.write_option(last_update_time=update_time))
+
+        return paths, creates, start + len(entries) - chunked
+
+    def _delete_client(self, client_id: str) -> tuple[str, int]:
+        deleted = 0
+
+        for collection in ['clients', ARCHIVE_COLLECTION]:
+            # recursive_delete closes the bulk writer it is given, so every client gets its own
+            bulk_writer = self.db.bulk_writer(options=BulkWriterOptions(mode=SendMode.parallel))
+            deleted += int(
+                self.db.recursive_delete(self.db.collection(collection).document(client_id), bulk_writer=bulk_writer)
+            )
+
+        self.logger.info('Deleted %d documents of client %s', deleted, client_id)
+
+        return client_id, deleted
+
+    def delete_all(self, client_id: str | None = None) -> dict[str, int]:
+        if client_id is None:
+            # Clients whose incidents are all archived are only listed in the archive
+            collections = [self.db.collection(name) for name in ['clients', ARCHIVE_COLLECTION]]
+            client_ids = sorted({ref.id for collection in collections for ref in collection.list_documents()})
+        else:
+            client_ids = [client_id]
+
+        with ThreadPoolExecutor(max_workers=DELETE_WORKERS) as executor:
+            return dict(executor.map(self._delete_client, client_ids))
+
+    def update(self, incident: Incident) -> None:
+        incident_dict = incident_to_doc(incident)
+        incident_ref = self._incident_ref(incident.client_id, incident.id)
 
         doc = incident_ref.get()
         if not doc.exists:
-            raise ValueError(f'Incident with ID {incident.id} not found for client {incident.client_id}.')
+            raise not_found_error(incident)
+
+        incident_ref.update({**incident_dict, 'last_modified': datetime.now(UTC)})
+
+    def update_with_history(
+        self, incident: Incident, fields: Collection[str], entry: HistoryEntry | None, expected_version: str | None = None
+    ) -> None:
+        check_update_fields(fields)
+        incident_doc = incident_to_doc(incident)
+        incident_fields = {name: incident_doc[name] for name in fields}
+
+        if expected_version is not None and entry is not None:
+            raise ValueError('expected_version is only supported for updates without a history entry')
+
+        # A single write, which fails when the document is missing so there is no need to read it first.
+        # The expected version is a precondition of that write, a conflict costs no extra round trip.
+        try:
+            if entry is not None:
+                self._append(entry, incident_fields)
+                incident.version = None
+            elif incident_fields:
+                incident.version = self._update_fields(incident, incident_fields, expected_version)
+        except NotFound as e:
+            raise not_found_error(incident) from e
+
+    def _update_fields(self, incident: Incident, incident_fields: dict[str, Any], expected_version: str | None) -> str | None:
+        # Returns the new version of the incident
+        incident_ref = self._incident_ref(incident.client_id, incident.id)
+        incident_fields = {**incident_fields, 'last_modified': datetime.now(UTC)}
+
+        if expected_version is None:
+            return update_time_to_version(incident_ref.update(incident_fields).update_time)
+
+        option = self.db.write_option(last_update_time=expected_update_time(incident, expected_version))
+        return update_time_to_version(incident_ref.update(incident_fields, option=option).update_time)
+
+    def compact_history(self, client_id: str, incident_id: str) -> int:
+        # Moves the full chunks of the incident's history subcollection to chunk documents, returns how many entries
+        if not self.embedded_history:
+            raise ValueError('History compaction requires the embedded history layout')
+
+        incident_ref = self._incident_ref(client_id, incident_id)
+        self._delete_compacted(incident_ref)
+
+        compacted = 0
+        while moved := transactional(self._compact_chunk)(self.db.transaction(), incident_ref):
+            compacted += moved
+
+        if compacted:
+            self.logger.info('Compacted %d history entries of incident %s', compacted, incident_id)
+
+        return compacted
+
+    def _delete_compacted(self, incident_ref: DocumentReference) -> None:
+        # Originals of the chunks listed by previous compactions, no reader can reach them anymore
+        doc = incident_ref.get(field_paths=HISTORY_FIELDS)
+        if not doc.exists:
+            raise NotFound(f'Incident {incident_ref.id} not found')  # type: ignore[no-untyped-call]
+
+        data = cast(dict[str, Any], doc.to_dict())
+        if not history_chunks(data):
+            return
+
+        history_ref = cast(CollectionReference, incident_ref.collection('history'))
+        query = history_ref.order_by('seq').end_before({'seq': chunked_until(data)}).select(['seq'])
+
+        bulk_writer, failures = self._bulk_writer()
+        for entry_doc in query.stream():
+            bulk_writer.delete(entry_doc.reference)
+        bulk_writer.close()  # type: ignore[no-untyped-call]
+
+        # Left for the next compaction
+        for path, error in failures.items():
+            self.logger.warning('Failed to delete compacted history entry %s: %s', path, error)
+
+    def _compact_chunk(self, transaction: Transaction, incident_ref: DocumentReference) -> int:
+        doc = incident_ref.get(field_paths=HISTORY_FIELDS, transaction=transaction)
+        if not doc.exists:
+            raise NotFound(f'Incident {incident_ref.id} not found')  # type: ignore[no-untyped-call]
+
+        data = cast(dict[str, Any], doc.to_dict())
+        count = history_count(data)
+        start = chunked_until(data)
+
+        # Legacy incidents have no seq counter, and only full chunks are compacted
+        if count is None or count - start < self.history_chunk:
+            return 0
+
+        history_ref = cast(CollectionReference, incident_ref.collection('history'))
+        query = history_ref.order_by('seq').start_after({'seq': start - 1}).limit(self.history_chunk)
+        entries = [cast(dict[str, Any], entry_doc.to_dict()) for entry_doc in query.stream(transaction=transaction)]
+
+        # Entries of a bulk append may not all be written yet
+        if [entry['seq'] for entry in entries] != list(range(start, start + self.history_chunk)):
+            return 0
+
+        chunk = chunk_doc(entries)
+        chunks_ref = cast(CollectionReference, incident_ref.collection('history_chunks'))
+        transaction.create(chunks_ref.document(str(start)), chunk)
+        transaction.update(incident_ref, {'history_chunks': ArrayUnion([{'first': chunk['first'], 'last': chunk['last']}])})
+
+        return len(entries)
+
+    def schedule_compaction(self, client_id: str, incident_id: str) -> None:
+        # Compacts the incident on a worker thread, unless its compaction is already scheduled
+        path = self._incident_ref(client_id, incident_id).path
+
+        with self._compacting_lock:
+            if path in self._compacting:
+                return
+
+            self._compacting.add(path)
+
+        future = self.compact_executor.submit(self.compact_history, client_id, incident_id)
+        future.add_done_callback(lambda f: self._compaction_done(path, f))
+
+    def _compaction_done(self, path: str, future: 'Future[int]') -> None:
+        with self._compacting_lock:
+            self._compacting.discard(path)
+
+        if (error := future.exception()) is not None:
+            self.logger.error('Failed to compact history of %s', path, exc_info=error)
+
+    def archive_closed(self, closed_before: datetime, limit: int | None = None) -> int:
+        # Moves the incidents closed before closed_before to the archive, at most limit of them, returns how many
+        # Incidents last appended to before last_action was stored need scripts/backfill_last_action.py first
+        archived = 0
+
+        for client_ref in self.db.collection('clients').list_documents():
+            if limit is not None and archived >= limit:
+                break
+
+            incidents_ref = cast(CollectionReference, client_ref.collection('incidents'))
+            query = incidents_ref.where(filter=FieldFilter('last_action', '==', Action.CLOSED)).where(  # type: ignore[no-untyped-call]
+                filter=FieldFilter('last_modified', '<', closed_before)  # type: ignore[no-untyped-call]
+            )
+
+            while limit is None or archived < limit:
+                batch = ARCHIVE_BATCH if limit is None else min(ARCHIVE_BATCH, limit - archived)
+                docs = list(query.limit(batch).stream())
+                moved = self._archive_batch(client_ref.id, docs) if docs else 0
+                archived += moved
+
+                # Incidents that failed are left for the next run
+                if moved < batch:
+                    break
+
+        if archived:
+            self.logger.info('Archived %d incidents closed before %s', archived, closed_before.isoformat())
+            self._metrics = None
+
+        return archived
+
+    def _archive_batch(self, client_id: str, docs: list[DocumentSnapshot]) -> int:
+        archived_at = datetime.now(UTC)
+        histories = list(self.read_executor.map(lambda doc: list(self.get_history(client_id, doc.id)), docs))
+
+        with contextlib.suppress(AlreadyExists):
+            self.db.collection(ARCHIVE_COLLECTION).document(client_id).create({})
+
+        # Copies first, set so that a copy left by a failed run is overwritten
+        bulk_writer, failures = self._bulk_writer()
+        copies: dict[str, list[str]] = {}
+
+        for doc, history in zip(docs, histories, strict=True):
+            archived_ref = self._archived_ref(client_id, doc.id)
+            bulk_writer.set(
+                archived_ref,
+                archived_incident_doc(cast(dict[str, Any], doc.to_dict()), history, archived_at, self.history_chunk),
+            )
+            copies[doc.id] = [archived_ref.path]
+
+            chunks_ref = cast(CollectionReference, archived_ref.collection('history_chunks'))
+            for chunk in archived_chunk_docs(history, self.history_chunk):
+                chunk_ref = chunks_ref.document(str(chunk['first']))
+                bulk_writer.set(chunk_ref, chunk)
+                copies[doc.id].append(chunk_ref.path)
+
+        bulk_writer.close()  # type: ignore[no-untyped-call]
+        copied = [doc for doc in docs if not any(path in failures for path in copies[doc.id])]
+
+        # Then the incidents, unless they changed since they were read
+        bulk_writer, failures = self._bulk_writer()
+        for doc in copied:
+            bulk_writer.delete(doc.reference, option=self.db.write_option(last_update_time=doc.update_time))
+        bulk_writer.close()  # type: ignore[no-untyped-call]
+
+        moved = [doc for doc in copied if doc.reference.path not in failures]
+        kept = [doc for doc in copied if doc.reference.path in failures]
+
+        # Finally their history, and the copies of the incidents that changed
+        bulk_writer, failures = self._bulk_writer()
+        for doc in moved:
+            for collection in ['history', 'history_chunks']:
+                for ref in cast(CollectionReference, doc.reference.collection(collection)).list_documents():
+                    bulk_writer.delete(ref)
+        for doc in kept:
+            archived_ref = self._archived_ref(client_id, doc.id)
+            for ref in cast(CollectionReference, archived_ref.collection('history_chunks')).list_documents():
+                bulk_writer.delete(ref)
+            bulk_writer.delete(archived_ref)
+        bulk_writer.close()  # type: ignore[no-untyped-call]
+
+        for path, error in failures.items():
+            self.logger.warning('Failed to delete %s after archiving: %s', path, error)
+
+        return len(moved)
+
+    def metrics(self) -> dict[str, Any]:
+        # Scrapes within METRICS_TTL of the last refresh, or concurrent with it, share its counts
+        with self._metrics_lock:
+            if self._metrics is None or time.monotonic() - self._metrics[0] > METRICS_TTL:
+                counts = {}
+                for name, collection in [('active', 'incidents'), ('archived', ARCHIVED_INCIDENTS)]:
+                    counts[name] = aggregation_count(self.db.collection_group(collection).count().get())
+
+                self._metrics = (time.monotonic(), counts)
 
-        incident_ref.update(incident_dict)
+            return {'incident_archive': dict(self._metrics[1])}
@@ -0,0 +1,286 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Collection, Generator
+from dataclasses import dataclass, field
+from datetime import UTC, datetime, timedelta
+from typing import Any, cast
+
+from google.cloud.firestore_v1 import CollectionReference, DocumentSnapshot, FieldFilter
+from google.cloud.firestore_v1.watch import ChangeType, DocumentChange, Watch
+
+from models import INCIDENT_VIEW_FIELDS, HistoryEntry, Incident, IncidentChange, IncidentView
+from repositories import IncidentRepository
+from repositories.incident import check_view_fields
+
+from .converters import doc_to_incident_view
+from .incident import FirestoreIncidentRepository
+
+
+@dataclass
+class ClientListener:
+    watch: Watch | None
+    started: float
+    last_used: float
+    synced: bool = False
+    # Every field of the active incidents of the client, by incident ID
+    incidents: dict[str, IncidentView] = field(default_factory=dict)
+    # Incidents written through this instance whose change the listener has not delivered yet
+    dirty: set[str] = field(default_factory=set)
+
+
+class ListenerIncidentRepository(IncidentRepository):
+    # Serves views of the incidents modified in the last active_window seconds from per-client snapshot listeners,
+    # other reads go to repo. Listeners idle for idle_ttl or past max_clients are stopped, and restarted once older
+    # than active_window or once their stream has stopped
+    def __init__(self, repo: FirestoreIncidentRepository, max_clients: int, idle_ttl: float, active_window: float) -> None:
+        self.repo = repo
+        self.max_clients = max_clients
+        self.idle_ttl = idle_ttl
+        self.active_window = active_window
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+        self._lock = threading.Lock()
+        self._listeners: OrderedDict[str, ClientListener] = OrderedDict()
+
+        self.hits = 0
+        self.fallbacks = 0
+        self.evictions = 0
+
+    def _start(self, client_id: str, now: float) -> ClientListener:
+        listener = ClientListener(watch=None, started=now, last_used=now)
+        cutoff = datetime.now(UTC) - timedelta(seconds=self.active_window)
+        incidents_ref = cast(
+            CollectionReference, self.repo.db.collection('clients').document(client_id).collection('incidents')
+        )
+        query = incidents_ref.where(filter=FieldFilter('last_modified', '>=', cutoff))  # type: ignore[no-untyped-call]
+
+        def on_snapshot(_docs: list[DocumentSnapshot], changes: list[DocumentChange], _read_time: Any) -> None:  # noqa: ANN401
+            self._apply(listener, client_id, changes)
+
+        listener.watch = query.on_snapshot(on_snapshot)
+        self.logger.debug('Started incident listener of client %s', client_id)
+
+        return listener
+
+    def _apply(self, listener: ClientListener, client_id: str, changes: list[DocumentChange]) -> None:
+        # Runs on the listener's thread
+        with self._lock:
+            for change in changes:
+                incident_id = change.document.id
+                listener.dirty.discard(incident_id)
+
+                data = cast(dict[str, Any], change.document.to_dict() or {})
+
+                # Incidents without last_action can't answer closed checks, they are read directly
+                if change.type == ChangeType.REMOVED or 'last_action' not in data:
+                    listener.incidents.pop(incident_id, None)
+                else:
+                    listener.incidents[incident_id] = doc_to_incident_view(change.document, client_id, INCIDENT_VIEW_FIELDS)
+
+            listener.synced = True
+
+    def _listener(self, client_id: str) -> ClientListener:
+        now = time.monotonic()
+        stopped: list[ClientListener] = []
+
+        with self._lock:
+            listener = self._listeners.get(client_id)
+
+            # A listener whose stream died keeps its last snapshot, it is restarted like an expired one
+            if listener is not None and (now - listener.started > self.active_window or not self._active(listener)):
+                stopped.append(self._listeners.pop(client_id))
+                listener = None
+
+        if listener is None:
+            # Opening the stream is an RPC, another thread may have started a listener meanwhile
+            started = self._start(client_id, now)
+
+            with self._lock:
+                listener = self._listeners.setdefault(client_id, started)
+
+            if listener is not started:
+                stopped.append(started)
+
+        with self._lock:
+            listener.last_used = now
+            self._listeners.move_to_end(client_id)
+
+            # Least recently used first, the current client is last and never evicted
+            for cid, other in list(self._listeners.items())[:-1]:
+                if len(self._listeners) > self.max_clients or now - other.last_used > self.idle_ttl:
+                    stopped.append(self._listeners.pop(cid))
+                    self.evictions += 1
+
+        # Unsubscribing closes the stream and joins its thread, so it happens outside the lock
+        for other in stopped:
+            self._stop(other)
+
+        return listener
+
+    def _active(self, listener: ClientListener) -> bool:
+        # Still streaming, the watch stops for good after an unrecoverable error
+        return listener.watch is None or bool(listener.watch.is_active)
+
+    def _stop(self, listener: ClientListener) -> None:
+        if listener.watch is not None:
+            listener.watch.unsubscribe()  # type: ignore[no-untyped-call]
+
+    def _mark_dirty(self, client_id: str, incident_id: str) -> None:
+        # Marked once the write returned: if the listener delivered it already, the incident is only read
+        # directly until its next change, but a change delivered before the write can never clear the mark
+        with self._lock:
+            listener = self._listeners.get(client_id)
+            if listener is not None:
+                listener.dirty.add(incident_id)
+
+    def close(self) -> None:
+        with self._lock:
+            listeners = list(self._listeners.values())
+            self._listeners.clear()
+
+        for listener in listeners:
+            self._stop(listener)
+
+    def _held_view(self, listener: ClientListener, incident_id: str, fields: Collection[str]) -> IncidentView | None:
+        # Called with the lock held, counts the hit or the fallback
+        cached = None if incident_id in listener.dirty else listener.incidents.get(incident_id)
+
+        if listener.synced and cached is not None and self._active(listener):
+            self.hits += 1
+            view = IncidentView(id=cached.id, client_id=cached.client_id)
+            for name in fields:
+                setattr(view, name, getattr(cached, name))
+            return view
+
+        self.fallbacks += 1
+        return None
+
+    def get_view(self, client_id: str, incident_id: str, fields: Collection[str]) -> IncidentView | None:
+        check_view_fields(fields)
+        listener = self._listener(client_id)
+
+        with self._lock:
+            view = self._held_view(listener, incident_id, fields)
+
+        return view or self.repo.get_view(client_id, incident_id, fields)
+
+    def get_views(self, client_id: str, incident_ids: list[str], fields: Collection[str]) -> list[IncidentView | None]:
+        check_view_fields(fields)
+        listener = self._listener(client_id)
+
+        with self._lock:
+            views = [self._held_view(listener, incident_id, fields) for incident_id in incident_ids]
+
+        # The incidents the listener doesn't hold are read in one call of the wrapped repository
+        missing = [idx for idx, view in enumerate(views) if view is None]
+        if missing:
+            read = self.repo.get_views(client_id, [incident_ids[idx] for idx in missing], fields)
+            for idx, view in zip(missing, read, strict=True):
+                views[idx] = view
+
+        return views
+
+    def create(self, incident: Incident) -> None:
+        self.repo.create(incident)
+
+    def get(self, client_id: str, incident_id: str) -> Incident | None:
+        return self.repo.get(client_id=client_id, incident_id=incident_id)
+
+    def append_history_entry(self, entry: HistoryEntry) -> None:
+        try:
+            self.repo.append_history_entry(entry)
+        finally:
+            self._mark_dirty(entry.client_id, entry.incident_id)
+
+    def get_history(
+        self,
+        client_id: str,
+        incident_id: str,
+        after_seq: int | None = None,
+        limit: int | None = None,
+        *,
+        descending: bool = False,
+    ) -> Generator[HistoryEntry, None, None]:
+        return self.repo.get_history(
+            client_id=client_id,
+            incident_id=incident_id,
+            after_seq=after_seq,
+            limit=limit,
+            descending=descending,
+        )
+
+    def get_last_history_entry(self, client_id: str, incident_id: str) -> HistoryEntry | None:
+        return self.repo.get_last_history_entry(client_id=client_id, incident_id=incident_id)
+
+    def get_with_history(
+        self, client_id: str, incident_id: str, history_limit: int | None = None
+    ) -> tuple[Incident | None, list[HistoryEntry]]:
+        return self.repo.get_with_history(client_id, incident_id, history_limit)
+
+    def get_changes(self, client_id: str, after: tuple[datetime, str], until: datetime, limit: int) -> list[IncidentChange]:
+        return self.repo.get_changes(client_id, after, until, limit)
+
+    def create_many(self, incidents: list[Incident]) -> list[Exception | None]:
+        return self.repo.create_many(incidents)
+
+    def append_history_many(self, entries: list[HistoryEntry]) -> list[Exception | None]:
+        try:
+            return self.repo.append_history_many(entries)
+        finally:
+            for entry in entries:
+                self._mark_dirty(entry.client_id, entry.incident_id)
+
+    def update_many(self, views: list[IncidentView], fields: Collection[str]) -> list[Exception | None]:
+        try:
+            return self.repo.update_many(views, fields)
+        finally:
+            for view in views:
+                self._mark_dirty(view.client_id, view.id)
+
+    def delete_all(self, client_id: str | None = None) -> dict[str, int]:
+        # The listeners would deliver the deletions one by one, the affected ones are restarted instead
+        with self._lock:
+            if client_id is None:
+                stopped = list(self._listeners.values())
+                self._listeners.clear()
+            else:
+                listener = self._listeners.pop(client_id, None)
+                stopped = [] if listener is None else [listener]
+
+        for listener in stopped:
+            self._stop(listener)
+
+        return self.repo.delete_all(client_id=client_id)
+
+    def update(self, incident: Incident) -> None:
+        try:
+            self.repo.update(incident)
+        finally:
+            self._mark_dirty(incident.client_id, incident.id)
+
+    def update_with_history(
+        self, incident: Incident, fields: Collection[str], entry: HistoryEntry | None, expected_version: str | None = None
+    ) -> None:
+        try:
+            self.repo.update_with_history(incident, fields, entry, expected_version)
+        finally:
+            self._mark_dirty(incident.client_id, incident.id)
+
+    def metrics(self) -> dict[str, Any]:
+        with self._lock:
+            listeners = len(self._listeners)
+            incidents = sum(len(listener.incidents) for listener in self._listeners.values())
+
+        return {
+            **self.repo.metrics(),
+            'incident_listener': {
+                'listeners': listeners,
+                'max_listeners': self.max_clients,
+                'incidents': incidents,
+                'hits': self.hits,
+                'fallbacks': self.fallbacks,
+                'evictions': self.evictions,
+            },
+        }
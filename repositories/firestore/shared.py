@@ -0,0 +1,161 @@
+from collections.abc import Collection, Generator, Iterable
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, cast
+
+from google.api_core.exceptions import AlreadyExists, FailedPrecondition
+from google.cloud.firestore_v1 import ArrayUnion, DocumentSnapshot
+from google.cloud.firestore_v1.base_aggregation import AggregationResult
+
+from models import HistoryEntry, Incident
+
+from .archive import ARCHIVE_COLLECTION, ARCHIVED_INCIDENTS
+from .compaction import Chunk, chunked_until, read_chunk
+from .converters import history_entry_to_doc, incident_to_doc, version_to_update_time
+from .embedded import embedded_count, embeds, empty_history, read_embedded, slice_embedded, spill_cursor, spill_reachable
+
+# What FirestoreIncidentRepository and AsyncFirestoreIncidentRepository have in common, they only differ in how
+# they read and write, so everything here works on documents already read or returns the writes to make.
+
+
+def incident_path(client_id: str, incident_id: str) -> tuple[str, ...]:
+    return 'clients', client_id, 'incidents', incident_id
+
+
+def archived_path(client_id: str, incident_id: str) -> tuple[str, ...]:
+    return ARCHIVE_COLLECTION, client_id, ARCHIVED_INCIDENTS, incident_id
+
+
+def new_incident_doc(incident: Incident, embedded_history: int) -> dict[str, Any]:
+    incident_dict = incident_to_doc(incident)
+
+    if embedded_history:
+        incident_dict.update(empty_history())
+
+    return incident_dict
+
+
+def aggregation_count(result: Any) -> int:  # noqa: ANN401
+    return int(cast(AggregationResult, result[0][0]).value)
+
+
+def lacks_last_action(doc: DocumentSnapshot, fields: Collection[str]) -> bool:
+    # Incidents last appended to before last_action was stored fall back to their history
+    return 'last_action' in fields and 'last_action' not in cast(dict[str, Any], doc.to_dict())
+
+
+def not_found_error(incident: Incident) -> ValueError:
+    return ValueError(f'Incident with ID {incident.id} not found for client {incident.client_id}.')
+
+
+def expected_update_time(incident: Incident, expected_version: str) -> datetime:
+    # Precondition of a conditional write, a version that is not one of ours never matches
+    update_time = version_to_update_time(expected_version)
+    if update_time is None:
+        raise FailedPrecondition(f'Incident {incident.id} was modified')  # type: ignore[no-untyped-call]
+
+    return update_time
+
+
+def append_fields(entry: HistoryEntry, incident_fields: dict[str, Any]) -> dict[str, Any]:
+    # Written on the incident document with every entry appended to it
+    return {**incident_fields, 'last_modified': entry.date, 'last_action': entry.action}
+
+
+def seqs_exhausted(entry: HistoryEntry) -> AlreadyExists:
+    entry.seq = None
+    return AlreadyExists(f'No free seq found for a history entry of incident {entry.incident_id}')  # type: ignore[no-untyped-call]
+
+
+@dataclass
+class EmbeddedAppend:
+    entry_doc: dict[str, Any]
+    incident_update: dict[str, Any]
+    # Whether the entry goes to the history subcollection instead of the incident document
+    spilled: bool
+    # Entries in the history subcollection that are not compacted, once the entry is written
+    uncompacted: int
+
+
+def embedded_append(
+    data: dict[str, Any], entry: HistoryEntry, seq: int, max_embedded: int, incident_fields: dict[str, Any]
+) -> EmbeddedAppend:
+    # Writes of an append to the incident document data, read in the same transaction
+    entry_doc = {**history_entry_to_doc(entry), 'seq': seq}
+    incident_update = {**append_fields(entry, incident_fields), 'history_count': seq + 1}
+    spilled = not embeds(embedded_count(data), seq, max_embedded)
+
+    if not spilled:
+        incident_update['history'] = ArrayUnion([entry_doc])
+
+    return EmbeddedAppend(entry_doc, incident_update, spilled, seq + 1 - chunked_until(data))
+
+
+def remaining(limit: int | None, count: int) -> int | None:
+    return None if limit is None else limit - count
+
+
+@dataclass
+class MergePlan:
+    # Embedded entries to return, in the requested order
+    embedded: list[HistoryEntry]
+    # Cursor and limit of the read of the spilled entries, None when none are requested
+    spill: tuple[int | None, int | None] | None
+
+
+def plan_merge(  # noqa: PLR0913
+    data: dict[str, Any], client_id: str, incident_id: str, after_seq: int | None, limit: int | None, *, descending: bool
+) -> MergePlan:
+    # History of an incident document in the embedded layout, the subcollection is only queried when needed
+    all_embedded, spilled = read_embedded(data, client_id, incident_id)
+    embedded = slice_embedded(all_embedded, after_seq, limit, descending=descending)
+
+    spill_limit = limit if limit is None or descending else limit - len(embedded)
+    if not spilled or spill_limit == 0 or not spill_reachable(all_embedded, after_seq, descending=descending):
+        return MergePlan(embedded, None)
+
+    return MergePlan(embedded, (spill_cursor(all_embedded, after_seq, descending=descending), spill_limit))
+
+
+def merge(
+    plan: MergePlan, spilled: Iterable[HistoryEntry], limit: int | None, *, descending: bool
+) -> Generator[HistoryEntry, None, None]:
+    # Spilled entries come after the embedded ones, in ascending order they are read last
+    if not descending:
+        yield from plan.embedded
+
+    count = 0
+    for entry in spilled:
+        count += 1
+        yield entry
+
+    if descending:
+        yield from plan.embedded[: remaining(limit, count)]
+
+
+def originals_reachable(after_seq: int | None, until: int, *, descending: bool) -> bool:
+    # Originals of the last compacted chunk may still be in the subcollection, below until. A descending read
+    # goes through them first, stopping at until.
+    return descending and (after_seq is None or after_seq > until)
+
+
+def tail_cursor(after_seq: int | None, until: int) -> int:
+    # Cursor of the ascending read of the subcollection after the chunks
+    return max(-1 if after_seq is None else after_seq, until - 1)
+
+
+def chunk_entries(  # noqa: PLR0913
+    chunks: list[Chunk],
+    docs: dict[str, dict[str, Any]],
+    client_id: str,
+    incident_id: str,
+    after_seq: int | None,
+    *,
+    descending: bool,
+) -> list[HistoryEntry]:
+    # Entries of the chunk documents read, keyed by their id, in the order of chunks
+    entries: list[HistoryEntry] = []
+    for first, _ in chunks:
+        entries.extend(read_chunk(docs[str(first)], client_id, incident_id, after_seq, descending=descending))
+
+    return entries
@@ -0,0 +1,48 @@
+from datetime import UTC, datetime
+from typing import Any, cast
+
+from google.cloud.firestore import Client as FirestoreClient  # type: ignore[import-untyped]
+from google.cloud.firestore_v1 import DocumentReference
+
+from models import SideEffectTask, TaskStatus
+from repositories import SideEffectTaskRepository
+
+# Top-level, outside of the clients tree. The TTL policy on expires_at (see terraform) deletes expired tasks.
+SIDE_EFFECT_COLLECTION = 'side_effect_tasks'
+
+
+def task_to_doc(task: SideEffectTask) -> dict[str, Any]:
+    return {
+        'expires_at': task.expires_at,
+        'status': task.status.value,
+        'errors': task.errors,
+    }
+
+
+def doc_to_task(task_id: str, doc: dict[str, Any]) -> SideEffectTask:
+    return SideEffectTask(
+        id=task_id, expires_at=doc['expires_at'], status=TaskStatus(doc['status']), errors=list(doc['errors'])
+    )
+
+
+class FirestoreSideEffectTaskRepository(SideEffectTaskRepository):
+    def __init__(self, database: str) -> None:
+        self.db = FirestoreClient(database=database)
+
+    def _ref(self, task_id: str) -> DocumentReference:
+        return cast(DocumentReference, self.db.collection(SIDE_EFFECT_COLLECTION).document(task_id))
+
+    def create(self, task: SideEffectTask) -> None:
+        self._ref(task.id).create(task_to_doc(task))
+
+    def update(self, task: SideEffectTask) -> None:
+        self._ref(task.id).update({'status': task.status.value, 'errors': task.errors})
+
+    def get(self, task_id: str) -> SideEffectTask | None:
+        doc = self._ref(task_id).get()
+        if not doc.exists:
+            return None
+
+        # The TTL policy deletes expired documents up to a day late
+        task = doc_to_task(task_id, cast(dict[str, Any], doc.to_dict()))
+        return task if task.expires_at > datetime.now(UTC) else None
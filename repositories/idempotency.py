@@ -0,0 +1,14 @@
+from models import IdempotencyRecord
+
+
+class IdempotencyRepository:
+    # Stores record unless a record that has not expired exists under its key, which is returned instead
+    def create(self, record: IdempotencyRecord) -> IdempotencyRecord | None:
+        raise NotImplementedError  # pragma: no cover
+
+    # Stores the response of the request that created record, with its expiration
+    def complete(self, record: IdempotencyRecord) -> None:
+        raise NotImplementedError  # pragma: no cover
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError  # pragma: no cover
@@ -1,6 +1,36 @@
-from collections.abc import Generator
+from collections.abc import AsyncGenerator, Collection, Generator
+from datetime import datetime
+from typing import Any
 
-from models import HistoryEntry, Incident
+from google.api_core.exceptions import FailedPrecondition, NotFound
+
+from models import INCIDENT_VIEW_FIELDS, HistoryEntry, Incident, IncidentChange, IncidentView
+
+
+def check_view_fields(fields: Collection[str]) -> None:
+    unknown = set(fields) - INCIDENT_VIEW_FIELDS
+    if unknown:
+        raise ValueError(f'Unknown incident fields: {", ".join(sorted(unknown))}')
+
+
+def check_update_fields(fields: Collection[str]) -> None:
+    # Fields of the incident an update can write, last_action is only written by history appends
+    unknown = set(fields) - (INCIDENT_VIEW_FIELDS - {'last_action'})
+    if unknown:
+        raise ValueError(f'Unknown incident fields: {", ".join(sorted(unknown))}')
+
+
+def incident_view(incident: Incident, fields: Collection[str], last_entry: HistoryEntry | None = None) -> IncidentView:
+    view = IncidentView(id=incident.id, client_id=incident.client_id)
+
+    for name in fields:
+        if name != 'last_action':
+            setattr(view, name, getattr(incident, name))
+
+    if last_entry is not None:
+        view.last_action = last_entry.action
+
+    return view
 
 
 class IncidentRepository:
@@ -10,14 +40,220 @@ class IncidentRepository:
     def get(self, client_id: str, incident_id: str) -> Incident | None:
         raise NotImplementedError  # pragma: no cover
 
+    # Only the given fields of the incident (see IncidentView), for checks that don't need the whole document
+    def get_view(self, client_id: str, incident_id: str, fields: Collection[str]) -> IncidentView | None:
+        check_view_fields(fields)
+
+        incident = self.get(client_id=client_id, incident_id=incident_id)
+        if incident is None:
+            return None
+
+        last_entry = self.get_last_history_entry(client_id, incident_id) if 'last_action' in fields else None
+        return incident_view(incident, fields, last_entry)
+
+    # get_view of many incidents of one client, in input order with None for the missing ones
+    def get_views(self, client_id: str, incident_ids: list[str], fields: Collection[str]) -> list[IncidentView | None]:
+        return [self.get_view(client_id=client_id, incident_id=incident_id, fields=fields) for incident_id in incident_ids]
+
     def append_history_entry(self, entry: HistoryEntry) -> None:
         raise NotImplementedError  # pragma: no cover
 
-    def get_history(self, client_id: str, incident_id: str) -> Generator[HistoryEntry, None, None]:
+    def get_history(
+        self,
+        client_id: str,
+        incident_id: str,
+        after_seq: int | None = None,
+        limit: int | None = None,
+        *,
+        descending: bool = False,
+    ) -> Generator[HistoryEntry, None, None]:
+        # after_seq is a cursor in the requested order (greater seqs when ascending, lower seqs when descending)
+        raise NotImplementedError  # pragma: no cover
+
+    def get_last_history_entry(self, client_id: str, incident_id: str) -> HistoryEntry | None:
+        return next(self.get_history(client_id=client_id, incident_id=incident_id, limit=1, descending=True), None)
+
+    # The incident with its last history_limit entries (all of them when None) in ascending order, or (None, [])
+    def get_with_history(
+        self, client_id: str, incident_id: str, history_limit: int | None = None
+    ) -> tuple[Incident | None, list[HistoryEntry]]:
+        incident = self.get(client_id=client_id, incident_id=incident_id)
+        if incident is None:
+            return None, []
+
+        if history_limit is None:
+            return incident, list(self.get_history(client_id=client_id, incident_id=incident_id))
+
+        history = self.get_history(client_id=client_id, incident_id=incident_id, limit=history_limit, descending=True)
+        return incident, list(history)[::-1]
+
+    # Incidents of client_id last modified after the (last_modified, incident_id) position after and at or before until,
+    # at most limit of them in that order. An empty incident_id starts at last_modified, inclusive.
+    def get_changes(self, client_id: str, after: tuple[datetime, str], until: datetime, limit: int) -> list[IncidentChange]:
         raise NotImplementedError  # pragma: no cover
 
-    def delete_all(self) -> None:
+    # Bulk operations return one result per item, in input order: None on success or the exception that item failed with
+    def create_many(self, incidents: list[Incident]) -> list[Exception | None]:
+        results: list[Exception | None] = []
+
+        for incident in incidents:
+            try:
+                self.create(incident)
+            except Exception as e:  # noqa: BLE001
+                results.append(e)
+            else:
+                results.append(None)
+
+        return results
+
+    def append_history_many(self, entries: list[HistoryEntry]) -> list[Exception | None]:
+        results: list[Exception | None] = []
+
+        for entry in entries:
+            try:
+                self.append_history_entry(entry)
+            except Exception as e:  # noqa: BLE001
+                results.append(e)
+            else:
+                results.append(None)
+
+        return results
+
+    # Writes the given fields of every view on its incident
+    def update_many(self, views: list[IncidentView], fields: Collection[str]) -> list[Exception | None]:
+        check_update_fields(fields)
+        results: list[Exception | None] = []
+
+        for view in views:
+            try:
+                incident = self.get(client_id=view.client_id, incident_id=view.id)
+                if incident is None:
+                    raise NotFound(f'Incident {view.id} not found')  # type: ignore[no-untyped-call]  # noqa: TRY301
+
+                for name in fields:
+                    setattr(incident, name, getattr(view, name))
+
+                self.update_with_history(incident, fields, None)
+            except Exception as e:  # noqa: BLE001
+                results.append(e)
+            else:
+                results.append(None)
+
+        return results
+
+    # Deletes every incident, or only those of client_id, returning the number of deleted documents per client
+    def delete_all(self, client_id: str | None = None) -> dict[str, int]:
         raise NotImplementedError  # pragma: no cover
 
     def update(self, incident: Incident) -> None:
         raise NotImplementedError  # pragma: no cover
+
+    # Writes the given fields of incident and appends entry, in a single commit where the backend allows it.
+    # With expected_version nothing is written unless the stored incident has that version, FailedPrecondition is raised.
+    def update_with_history(
+        self, incident: Incident, fields: Collection[str], entry: HistoryEntry | None, expected_version: str | None = None
+    ) -> None:
+        check_update_fields(fields)
+
+        if expected_version is not None:
+            stored = self.get(client_id=incident.client_id, incident_id=incident.id)
+            if stored is not None and stored.version != expected_version:
+                raise FailedPrecondition(f'Incident {incident.id} was modified')  # type: ignore[no-untyped-call]
+
+        if fields:
+            self.update(incident)
+
+        if entry is not None:
+            self.append_history_entry(entry)
+
+    def metrics(self) -> dict[str, Any]:
+        return {}
+
+
+# Same operations as IncidentRepository for use from coroutines, so independent reads can overlap
+class AsyncIncidentRepository:
+    async def create(self, incident: Incident) -> None:
+        raise NotImplementedError  # pragma: no cover
+
+    async def get(self, client_id: str, incident_id: str) -> Incident | None:
+        raise NotImplementedError  # pragma: no cover
+
+    async def get_view(self, client_id: str, incident_id: str, fields: Collection[str]) -> IncidentView | None:
+        check_view_fields(fields)
+
+        incident = await self.get(client_id=client_id, incident_id=incident_id)
+        if incident is None:
+            return None
+
+        last_entry = await self.get_last_history_entry(client_id, incident_id) if 'last_action' in fields else None
+        return incident_view(incident, fields, last_entry)
+
+    async def append_history_entry(self, entry: HistoryEntry) -> None:
+        raise NotImplementedError  # pragma: no cover
+
+    def get_history(
+        self,
+        client_id: str,
+        incident_id: str,
+        after_seq: int | None = None,
+        limit: int | None = None,
+        *,
+        descending: bool = False,
+    ) -> AsyncGenerator[HistoryEntry, None]:
+        raise NotImplementedError  # pragma: no cover
+
+    async def get_last_history_entry(self, client_id: str, incident_id: str) -> HistoryEntry | None:
+        async for entry in self.get_history(client_id=client_id, incident_id=incident_id, limit=1, descending=True):
+            return entry
+
+        return None
+
+    async def get_with_history(
+        self, client_id: str, incident_id: str, history_limit: int | None = None
+    ) -> tuple[Incident | None, list[HistoryEntry]]:
+        incident = await self.get(client_id=client_id, incident_id=incident_id)
+        if incident is None:
+            return None, []
+
+        history = self.get_history(
+            client_id=client_id, incident_id=incident_id, limit=history_limit, descending=history_limit is not None
+        )
+        entries = [entry async for entry in history]
+        return incident, entries if history_limit is None else entries[::-1]
+
+    async def create_many(self, incidents: list[Incident]) -> list[Exception | None]:
+        results: list[Exception | None] = []
+
+        for incident in incidents:
+            try:
+                await self.create(incident)
+            except Exception as e:  # noqa: BLE001
+                results.append(e)
+            else:
+                results.append(None)
+
+        return results
+
+    async def append_history_many(self, entries: list[HistoryEntry]) -> list[Exception | None]:
+        results: list[Exception | None] = []
+
+        for entry in entries:
+            try:
+                await self.append_history_entry(entry)
+            except Exception as e:  # noqa: BLE001
+                results.append(e)
+            else:
+                results.append(None)
+
+        return results
+
+    async def delete_all(self, client_id: str | None = None) -> dict[str, int]:
+        raise NotImplementedError  # pragma: no cover
+
+    # With expected_version nothing is written unless the stored incident has that version, FailedPrecondition is raised.
+    # Sets the new version on incident.
+    async def update(self, incident: Incident, expected_version: str | None = None) -> None:
+        raise NotImplementedError  # pragma: no cover
+
+    def metrics(self) -> dict[str, Any]:
+        return {}
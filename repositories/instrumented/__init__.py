@@ -0,0 +1,3 @@
+from .instrumentation import Instrumentation, InstrumentedRepository, instrumented, request_context
+
+__all__ = ['Instrumentation', 'InstrumentedRepository', 'instrumented', 'request_context']
@@ -0,0 +1,243 @@
+import bisect
+import functools
+import inspect
+import logging
+import threading
+import time
+from collections import Counter
+from collections.abc import AsyncGenerator, Callable, Generator
+from contextvars import Context, ContextVar
+from dataclasses import dataclass, field
+from typing import Any, TypeVar, cast
+
+T = TypeVar('T')
+
+# Upper bounds of the latency histogram buckets in seconds, the last bucket counts the slower calls
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# Methods whose documents written are their number of items, the other writes count one document
+BULK_WRITES = {'create_many', 'append_history_many', 'update_many'}
+WRITES = {'create', 'update', 'append_history_entry', 'update_with_history', 'delete_all', *BULK_WRITES}
+UNINSTRUMENTED = {'metrics', 'close'}
+
+NO_ENDPOINT = '-'
+
+
+@dataclass
+class MethodStats:
+    calls: int = 0
+    errors: int = 0
+    reads: int = 0
+    writes: int = 0
+    seconds: float = 0.0
+    buckets: list[int] = field(default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'documents_read': self.reads,
+            'documents_written': self.writes,
+            'seconds': round(self.seconds, 6),
+            'latency_buckets': dict(zip([*map(str, LATENCY_BUCKETS), '+Inf'], self.buckets, strict=True)),
+        }
+
+
+@dataclass
+class RequestStats:
+    endpoint: str
+    calls: Counter[str] = field(default_factory=Counter)
+    seconds: float = 0.0
+
+
+current_request: ContextVar[RequestStats | None] = ContextVar('current_request', default=None)
+
+
+def request_context() -> Context:
+    # Holds only the statistics of the current request. ThreadPoolExecutor does not copy contextvars, work a request
+    # submits runs in this context so its calls are tagged with the request's endpoint
+    context = Context()
+    context.run(current_request.set, current_request.get())
+    return context
+
+
+def count_documents(result: Any) -> int:  # noqa: ANN401
+    # Every model returned is one document read, None is a miss
+    if result is None or isinstance(result, bool | int | float | str | dict):
+        return 0
+
+    if isinstance(result, list | tuple):
+        return sum(count_documents(item) for item in result)
+
+    return 1
+
+
+def count_writes(method: str, result: Any) -> int:  # noqa: ANN401
+    if method not in WRITES:
+        return 0
+
+    if method == 'delete_all':
+        return sum(cast(dict[str, int], result).values())
+
+    if method in BULK_WRITES:
+        return sum(1 for error in cast(list[Exception | None], result) if error is None)
+
+    return 1
+
+
+class Instrumentation:
+    # Statistics of the calls made to the repositories wrapped with instrumented(), per method and per endpoint
+    def __init__(self) -> None:
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._lock = threading.Lock()
+        self._stats: dict[tuple[str, str], MethodStats] = {}
+
+    def start_request(self, endpoint: str | None) -> None:
+        current_request.set(RequestStats(endpoint=endpoint or NO_ENDPOINT))
+
+    def end_request(self) -> None:
+        stats = current_request.get()
+        if stats is None:
+            return
+
+        current_request.set(None)
+
+        if stats.calls:
+            calls = ', '.join(f'{method}={count}' for method, count in sorted(stats.calls.items()))
+            self.logger.info(
+                'Endpoint %s made %d repository calls in %.1f ms: %s',
+                stats.endpoint,
+                stats.calls.total(),
+                stats.seconds * 1000,
+                calls,
+            )
+
+    def record(self, method: str, seconds: float, reads: int, writes: int, *, error: bool) -> None:
+        request = current_request.get()
+        endpoint = NO_ENDPOINT if request is None else request.endpoint
+
+        with self._lock:
+            stats = self._stats.get((endpoint, method))
+            if stats is None:
+                stats = self._stats[endpoint, method] = MethodStats()
+
+            stats.calls += 1
+            stats.errors += error
+            stats.reads += reads
+            stats.writes += writes
+            stats.seconds += seconds
+            stats.buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+            # Calls run in request_context() or by asyncio.to_thread still count towards the request that started them
+            if request is not None:
+                request.calls[method] += 1
+                request.seconds += seconds
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        with self._lock:
+            items = sorted((key, stats.to_dict()) for key, stats in self._stats.items())
+
+        endpoints: dict[str, dict[str, Any]] = {}
+        for (endpoint, method), stats in items:
+            endpoints.setdefault(endpoint, {})[method] = stats
+
+        return endpoints
+
+
+class InstrumentedRepository:
+    # Wraps every public method of repo, generators and async generators are timed until closed
+    def __init__(self, repo: object, name: str, instrumentation: Instrumentation) -> None:
+        self.repo = repo
+        self.name = name
+        self.instrumentation = instrumentation
+
+    def __getattr__(self, attr: str) -> Any:  # noqa: ANN401
+        value = getattr(self.repo, attr)
+
+        if attr.startswith('_') or attr in UNINSTRUMENTED or not callable(value):
+            return value
+
+        wrapper = self._wrap(attr, value)
+        # Cached on the instance, later lookups don't go through __getattr__
+        setattr(self, attr, wrapper)
+        return wrapper
+
+    def _record(self, method: str, start: float, reads: int, writes: int, *, error: bool) -> None:
+        seconds = time.perf_counter() - start
+        self.instrumentation.record(f'{self.name}.{method}', seconds, reads, writes, error=error)
+
+    def _wrap(self, method: str, func: Callable[..., Any]) -> Callable[..., Any]:
+        if inspect.iscoroutinefunction(func):
+            return self._wrap_async(method, func)
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:  # noqa: ANN401
+            start = time.perf_counter()
+
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                self._record(method, start, 0, 0, error=True)
+                raise
+
+            if inspect.isgenerator(result):
+                return self._generator(method, start, result)
+
+            if inspect.isasyncgen(result):
+                return self._async_generator(method, start, result)
+
+            self._record(method, start, count_documents(result), count_writes(method, result), error=False)
+            return result
+
+        return wrapper
+
+    def _wrap_async(self, method: str, func: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:  # noqa: ANN401
+            start = time.perf_counter()
+
+            try:
+                result = await func(*args, **kwargs)
+            except Exception:
+                self._record(method, start, 0, 0, error=True)
+                raise
+
+            self._record(method, start, count_documents(result), count_writes(method, result), error=False)
+            return result
+
+        return wrapper
+
+    def _generator(self, method: str, start: float, gen: Generator[Any, None, None]) -> Generator[Any, None, None]:
+        # Recorded once the caller is done with it, also when it stops early
+        reads = 0
+        error = False
+
+        try:
+            for item in gen:
+                reads += 1
+                yield item
+        except Exception:
+            error = True
+            raise
+        finally:
+            self._record(method, start, reads, 0, error=error)
+
+    async def _async_generator(self, method: str, start: float, gen: AsyncGenerator[Any, None]) -> AsyncGenerator[Any, None]:
+        # Recorded once the caller is done with it, also when it stops early
+        reads = 0
+        error = False
+
+        try:
+            async for item in gen:
+                reads += 1
+                yield item
+        except Exception:
+            error = True
+            raise
+        finally:
+            self._record(method, start, reads, 0, error=error)
+
+
+def instrumented(repo: T, name: str, instrumentation: Instrumentation) -> T:
+    # Typed as the wrapped repository, every call is forwarded to it
+    return cast(T, InstrumentedRepository(repo, name, instrumentation))
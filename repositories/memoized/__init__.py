@@ -0,0 +1,3 @@
+from .memo import MemoizedRepository, memoized
+
+__all__ = ['MemoizedRepository', 'memoized']
@@ -0,0 +1,140 @@
+import copy
+import functools
+import inspect
+from collections.abc import Callable, Hashable
+from typing import Any, TypeVar, cast
+
+from flask import g, has_app_context
+
+from models import HistoryEntry, Incident, IncidentView
+
+T = TypeVar('T')
+
+# Reads are the get* methods, every other public method is a write that invalidates what it touches.
+# The change feed spans all incidents of a client, writes to one of them would not drop it.
+READ_PREFIX = 'get'
+UNMEMOIZED = {'metrics', 'close', 'get_changes'}
+
+# Results by repository name and (client_id, incident_id), then by method and arguments
+Memo = dict[tuple[str, tuple[str | None, str | None]], dict[Hashable, Any]]
+
+
+def request_memo() -> Memo | None:
+    # Kept on Flask's g, so it lives as long as the request. Outside of one nothing is memoized.
+    if not has_app_context():
+        return None
+
+    return cast(Memo, g.setdefault('repository_memo', {}))
+
+
+def copy_result(result: Any) -> Any:  # noqa: ANN401
+    # Models only hold immutable values, copying them and their containers keeps the memo safe from callers
+    if isinstance(result, tuple):
+        return tuple(copy_result(item) for item in result)
+
+    if isinstance(result, list):
+        return [copy.copy(item) for item in result]
+
+    return copy.copy(result)
+
+
+def write_scopes(arguments: dict[str, Any]) -> set[tuple[str | None, str | None]] | None:
+    # The incidents a write touches, None when they are not known from its arguments
+    scopes: set[tuple[str | None, str | None]] = set()
+
+    for value in arguments.values():
+        for item in value if isinstance(value, list) else [value]:
+            if isinstance(item, Incident | IncidentView):
+                scopes.add((item.client_id, item.id))
+            elif isinstance(item, HistoryEntry):
+                scopes.add((item.client_id, item.incident_id))
+
+    return scopes or None
+
+
+class MemoizedRepository:
+    # Answers repeated reads of one request from a memo, writes drop what was remembered for the incidents they touch.
+    # Generators are not memoized, and only blocking repositories are supported
+    def __init__(self, repo: object, name: str) -> None:
+        self.repo = repo
+        self.name = name
+
+    def __getattr__(self, attr: str) -> Any:  # noqa: ANN401
+        value = getattr(self.repo, attr)
+
+        if attr.startswith('_') or attr in UNMEMOIZED or not callable(value):
+            return value
+
+        wrapper = self._read(attr, value) if attr.startswith(READ_PREFIX) else self._write(value)
+        # Cached on the instance, later lookups don't go through __getattr__
+        setattr(self, attr, wrapper)
+        return wrapper
+
+    def _read(self, method: str, func: Callable[..., Any]) -> Callable[..., Any]:
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:  # noqa: ANN401
+            memo = request_memo()
+            if memo is None:
+                return func(*args, **kwargs)
+
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = {name: tuple(value) if isinstance(value, list) else value for name, value in bound.arguments.items()}
+            key = (method, tuple(sorted(arguments.items())))
+
+            try:
+                hash(key)
+            except TypeError:
+                return func(*args, **kwargs)
+
+            scope = (bound.arguments.get('client_id'), bound.arguments.get('incident_id'))
+            entries = memo.setdefault((self.name, scope), {})
+            if key in entries:
+                return copy_result(entries[key])
+
+            result = func(*args, **kwargs)
+            if inspect.isgenerator(result):
+                return result
+
+            entries[key] = copy_result(result)
+            return result
+
+        return wrapper
+
+    def _write(self, func: Callable[..., Any]) -> Callable[..., Any]:
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:  # noqa: ANN401
+            # Also dropped when the write fails, it may have been applied anyway
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._invalidate(signature.bind(*args, **kwargs).arguments)
+
+        return wrapper
+
+    def _invalidate(self, arguments: dict[str, Any]) -> None:
+        memo = request_memo()
+        if memo is None:
+            return
+
+        scopes = write_scopes(arguments)
+        clients = {client_id for client_id, _ in scopes or []}
+
+        for key in list(memo):
+            name, (client_id, incident_id) = key
+
+            # Reads without an incident ID span the incidents of their client, or of every client
+            spanned = incident_id is None and (client_id is None or client_id in clients)
+            touched = scopes is None or (client_id, incident_id) in scopes or spanned
+
+            if name == self.name and touched:
+                memo.pop(key, None)
+
+
+def memoized(repo: T, name: str) -> T:
+    # Typed as the wrapped repository, every call is forwarded to it
+    return cast(T, MemoizedRepository(repo, name))
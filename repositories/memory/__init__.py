@@ -0,0 +1,5 @@
+from .idempotency import MemoryIdempotencyRepository
+from .incident import MemoryIncidentRepository
+from .side_effect import MemorySideEffectTaskRepository
+
+__all__ = ['MemoryIdempotencyRepository', 'MemoryIncidentRepository', 'MemorySideEffectTaskRepository']
@@ -0,0 +1,40 @@
+import copy
+import threading
+from collections import OrderedDict
+from datetime import UTC, datetime
+
+from models import IdempotencyRecord
+from repositories import IdempotencyRepository
+
+
+class MemoryIdempotencyRepository(IdempotencyRepository):
+    # Process-local, keeps the max_size most recently used records
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._records: OrderedDict[str, IdempotencyRecord] = OrderedDict()
+
+    def create(self, record: IdempotencyRecord) -> IdempotencyRecord | None:
+        with self._lock:
+            existing = self._records.get(record.key)
+
+            if existing is not None and existing.expires_at > datetime.now(UTC):
+                self._records.move_to_end(record.key)
+                return copy.copy(existing)
+
+            self._records[record.key] = copy.copy(record)
+            self._records.move_to_end(record.key)
+
+            while len(self._records) > self.max_size:
+                self._records.popitem(last=False)
+
+            return None
+
+    def complete(self, record: IdempotencyRecord) -> None:
+        with self._lock:
+            if record.key in self._records:
+                self._records[record.key] = copy.copy(record)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._records.pop(key, None)
@@ -0,0 +1,176 @@
+import copy
+import threading
+from collections.abc import Collection, Generator
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+
+from google.api_core.exceptions import AlreadyExists, FailedPrecondition, NotFound
+
+from models import HistoryEntry, Incident, IncidentChange
+from repositories import IncidentRepository
+from repositories.incident import check_update_fields
+
+
+@dataclass
+class IncidentRecord:
+    incident: Incident
+    history: list[HistoryEntry] = field(default_factory=list)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    # Bumped by every write under lock
+    version: int = 0
+    # Date of the last history entry, or time of the last write of fields after it
+    last_modified: datetime | None = None
+
+    def read(self) -> Incident:
+        incident = copy.copy(self.incident)
+        incident.version = str(self.version)
+        return incident
+
+
+class MemoryIncidentRepository(IncidentRepository):
+    # Process-local storage with the semantics of the Firestore repository, for load testing without a database.
+    # The repository lock only guards the incident index, each incident has its own lock
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._clients: dict[str, dict[str, IncidentRecord]] = {}
+
+    def _record(self, client_id: str, incident_id: str) -> IncidentRecord | None:
+        with self._lock:
+            return self._clients.get(client_id, {}).get(incident_id)
+
+    def create(self, incident: Incident) -> None:
+        with self._lock:
+            incidents = self._clients.setdefault(incident.client_id, {})
+
+            if incident.id in incidents:
+                raise AlreadyExists(f'Incident {incident.id} already exists')  # type: ignore[no-untyped-call]
+
+            incidents[incident.id] = IncidentRecord(incident=copy.copy(incident))
+            incident.version = '0'
+
+    def get(self, client_id: str, incident_id: str) -> Incident | None:
+        record = self._record(client_id, incident_id)
+        if record is None:
+            return None
+
+        with record.lock:
+            return record.read()
+
+    def append_history_entry(self, entry: HistoryEntry) -> None:
+        if entry.seq is not None:
+            raise ValueError('seq must be None when appending history entry')
+
+        record = self._record(entry.client_id, entry.incident_id)
+        if record is None:
+            raise NotFound(f'Incident {entry.incident_id} not found')  # type: ignore[no-untyped-call]
+
+        with record.lock:
+            entry.seq = len(record.history)
+            record.history.append(copy.copy(entry))
+            record.version += 1
+            record.last_modified = entry.date
+
+    def get_history(
+        self,
+        client_id: str,
+        incident_id: str,
+        after_seq: int | None = None,
+        limit: int | None = None,
+        *,
+        descending: bool = False,
+    ) -> Generator[HistoryEntry, None, None]:
+        record = self._record(client_id, incident_id)
+        if record is None:
+            return
+
+        # seq is the index in the history list, so cursors are plain slices
+        with record.lock:
+            if descending:
+                entries = record.history[: after_seq if after_seq is not None else len(record.history)][::-1]
+            else:
+                entries = record.history[after_seq + 1 if after_seq is not None else 0 :]
+
+        for entry in entries[:limit]:
+            yield copy.copy(entry)
+
+    def get_with_history(
+        self, client_id: str, incident_id: str, history_limit: int | None = None
+    ) -> tuple[Incident | None, list[HistoryEntry]]:
+        record = self._record(client_id, incident_id)
+        if record is None:
+            return None, []
+
+        # Read under one lock acquisition, so the incident and its history are consistent
+        with record.lock:
+            start = 0 if history_limit is None else max(len(record.history) - history_limit, 0)
+            return record.read(), [copy.copy(entry) for entry in record.history[start:]]
+
+    def get_changes(self, client_id: str, after: tuple[datetime, str], until: datetime, limit: int) -> list[IncidentChange]:
+        with self._lock:
+            records = list(self._clients.get(client_id, {}).values())
+
+        changes: list[IncidentChange] = []
+        for record in records:
+            with record.lock:
+                last_modified = record.last_modified
+
+                if last_modified is not None and after < (last_modified, record.incident.id) and last_modified <= until:
+                    changes.append(IncidentChange(incident=record.read(), last_modified=last_modified))
+
+        return sorted(changes, key=lambda change: (change.last_modified, change.incident.id))[:limit]
+
+    def delete_all(self, client_id: str | None = None) -> dict[str, int]:
+        with self._lock:
+            if client_id is None:
+                clients, self._clients = self._clients, {}
+            else:
+                clients = {client_id: self._clients.pop(client_id)} if client_id in self._clients else {}
+
+        # Counted like Firestore documents: the client, its incidents and their history entries
+        deleted = {
+            cid: 1 + sum(1 + len(record.history) for record in incidents.values()) for cid, incidents in clients.items()
+        }
+
+        if client_id is not None:
+            deleted.setdefault(client_id, 0)
+
+        return deleted
+
+    def update(self, incident: Incident) -> None:
+        record = self._record(incident.client_id, incident.id)
+        if record is None:
+            raise ValueError(f'Incident with ID {incident.id} not found for client {incident.client_id}.')
+
+        with record.lock:
+            record.incident = copy.copy(incident)
+            record.version += 1
+            record.last_modified = datetime.now(UTC)
+
+    def update_with_history(
+        self, incident: Incident, fields: Collection[str], entry: HistoryEntry | None, expected_version: str | None = None
+    ) -> None:
+        check_update_fields(fields)
+
+        if entry is not None and entry.seq is not None:
+            raise ValueError('seq must be None when appending history entry')
+
+        record = self._record(incident.client_id, incident.id)
+        if record is None:
+            raise ValueError(f'Incident with ID {incident.id} not found for client {incident.client_id}.')
+
+        # Both writes under one lock acquisition, like a single commit
+        with record.lock:
+            if expected_version is not None and expected_version != str(record.version):
+                raise FailedPrecondition(f'Incident {incident.id} was modified')  # type: ignore[no-untyped-call]
+
+            for name in fields:
+                setattr(record.incident, name, getattr(incident, name))
+
+            if entry is not None:
+                entry.seq = len(record.history)
+                record.history.append(copy.copy(entry))
+
+            if fields or entry is not None:
+                record.version += 1
+                record.last_modified = datetime.now(UTC) if entry is None else entry.date
+                incident.version = str(record.version)
@@ -0,0 +1,36 @@
+import copy
+import threading
+from collections import OrderedDict
+from datetime import UTC, datetime
+
+from models import SideEffectTask
+from repositories import SideEffectTaskRepository
+
+
+class MemorySideEffectTaskRepository(SideEffectTaskRepository):
+    # Process-local, keeps the max_size most recently created tasks
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._tasks: OrderedDict[str, SideEffectTask] = OrderedDict()
+
+    def create(self, task: SideEffectTask) -> None:
+        with self._lock:
+            self._tasks[task.id] = copy.deepcopy(task)
+
+            while len(self._tasks) > self.max_size:
+                self._tasks.popitem(last=False)
+
+    def update(self, task: SideEffectTask) -> None:
+        with self._lock:
+            if task.id in self._tasks:
+                self._tasks[task.id] = copy.deepcopy(task)
+
+    def get(self, task_id: str) -> SideEffectTask | None:
+        with self._lock:
+            task = self._tasks.get(task_id)
+
+            if task is None or task.expires_at <= datetime.now(UTC):
+                return None
+
+            return copy.deepcopy(task)
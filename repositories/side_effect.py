@@ -0,0 +1,14 @@
+from models import SideEffectTask
+
+
+class SideEffectTaskRepository:
+    def create(self, task: SideEffectTask) -> None:
+        raise NotImplementedError  # pragma: no cover
+
+    # Stores the status and errors of task once its side effects ran
+    def update(self, task: SideEffectTask) -> None:
+        raise NotImplementedError  # pragma: no cover
+
+    # None when there is no task with that id or it expired
+    def get(self, task_id: str) -> SideEffectTask | None:
+        raise NotImplementedError  # pragma: no cover
@@ -0,0 +1,4 @@
+from .incident import SqliteIncidentRepository
+from .migrate import migrate
+
+__all__ = ['SqliteIncidentRepository', 'migrate']
@@ -0,0 +1,317 @@
+import sqlite3
+import threading
+from collections.abc import Collection, Generator
+from datetime import UTC, datetime
+from enum import Enum
+from typing import Any, cast
+
+from google.api_core.exceptions import AlreadyExists, FailedPrecondition, NotFound
+
+from models import INCIDENT_VIEW_FIELDS, Action, Channel, HistoryEntry, Incident, IncidentChange, Risk
+from repositories import IncidentRepository
+from repositories.incident import check_update_fields
+
+from .migrate import migrate
+
+# Statements are kept as constants, sqlite3 caches the compiled statement per connection by its SQL text
+INSERT_INCIDENT = (
+    'INSERT INTO incidents (client_id, id, name, channel, reported_by, created_by, assigned_to, risk) '
+    'VALUES (?, ?, ?, ?, ?, ?, ?, ?)'
+)
+SELECT_INCIDENT = (
+    'SELECT id, client_id, name, channel, reported_by, created_by, assigned_to, risk, version '
+    'FROM incidents WHERE client_id = ? AND id = ?'
+)
+SELECT_VERSION = 'SELECT version FROM incidents WHERE client_id = ? AND id = ?'
+# Every write bumps version once, in the statement that writes the incident or in BUMP_VERSION
+UPDATE_INCIDENT = (
+    'UPDATE incidents SET name = ?, channel = ?, reported_by = ?, created_by = ?, assigned_to = ?, risk = ?, '
+    'last_modified = ?, version = version + 1 WHERE client_id = ? AND id = ?'
+)
+BUMP_VERSION = 'UPDATE incidents SET version = version + 1 WHERE client_id = ? AND id = ?'
+# One statement per column update_with_history can write, the column names are the incident field names
+UPDATE_FIELD = {
+    name: f'UPDATE incidents SET {name} = ?, last_modified = ? WHERE client_id = ? AND id = ?'  # noqa: S608
+    for name in INCIDENT_VIEW_FIELDS - {'last_action'}
+}
+# last_modified is stored in ISO format in UTC, so it sorts as text (see the incidents_changes index)
+SELECT_CHANGES = (
+    'SELECT id, client_id, name, channel, reported_by, created_by, assigned_to, risk, version, last_modified '
+    'FROM incidents WHERE client_id = ? AND (last_modified, id) > (?, ?) AND last_modified <= ? '
+    'ORDER BY last_modified, id LIMIT ?'
+)
+NEXT_SEQ = (
+    'UPDATE incidents SET history_count = history_count + 1, last_modified = ?, version = version + 1 '
+    'WHERE client_id = ? AND id = ? RETURNING history_count - 1'
+)
+INSERT_HISTORY = 'INSERT INTO history (client_id, incident_id, seq, date, action, description) VALUES (?, ?, ?, ?, ?, ?)'
+# A negative LIMIT means no limit
+SELECT_HISTORY_ASC = (
+    'SELECT seq, date, action, description FROM history '
+    'WHERE client_id = ? AND incident_id = ? AND seq > ? ORDER BY seq ASC LIMIT ?'
+)
+SELECT_HISTORY_DESC = (
+    'SELECT seq, date, action, description FROM history '
+    'WHERE client_id = ? AND incident_id = ? AND seq < ? ORDER BY seq DESC LIMIT ?'
+)
+COUNT_DOCUMENTS = (
+    'SELECT client_id, COUNT(*), SUM(history_count) FROM incidents WHERE ? IS NULL OR client_id = ? GROUP BY client_id'
+)
+DELETE_INCIDENTS = 'DELETE FROM incidents WHERE ? IS NULL OR client_id = ?'
+
+MAX_SEQ = 2**63 - 1
+
+
+def row_to_incident(row: tuple[Any, ...]) -> Incident:
+    return Incident(
+        id=row[0],
+        client_id=row[1],
+        name=row[2],
+        channel=Channel(row[3]),
+        reported_by=row[4],
+        created_by=row[5],
+        assigned_to=row[6],
+        risk=None if row[7] is None else Risk(row[7]),
+        version=str(row[8]),
+    )
+
+
+class SqliteIncidentRepository(IncidentRepository):
+    # Local SQLite database in WAL mode, for on-prem and offline deployments. Every thread gets its own connection,
+    # readers proceed while a single writer commits
+    def __init__(self, path: str, timeout: float = 5.0) -> None:
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: list[sqlite3.Connection] = []
+
+        migrate(self._conn())
+
+    def _conn(self) -> sqlite3.Connection:
+        conn: sqlite3.Connection | None = getattr(self._local, 'conn', None)
+
+        if conn is None:
+            # Autocommit mode, write transactions are opened explicitly with BEGIN IMMEDIATE
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = NORMAL')
+            conn.execute('PRAGMA foreign_keys = ON')
+            self._local.conn = conn
+
+            with self._lock:
+                self._connections.append(conn)
+
+        return conn
+
+    def close(self) -> None:
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+
+        self._local = threading.local()
+
+    def create(self, incident: Incident) -> None:
+        try:
+            self._conn().execute(
+                INSERT_INCIDENT,
+                (
+                    incident.client_id,
+                    incident.id,
+                    incident.name,
+                    incident.channel.value,
+                    incident.reported_by,
+                    incident.created_by,
+                    incident.assigned_to,
+                    None if incident.risk is None else incident.risk.value,
+                ),
+            )
+        except sqlite3.IntegrityError as e:
+            raise AlreadyExists(f'Incident {incident.id} already exists') from e  # type: ignore[no-untyped-call]
+
+        incident.version = '0'
+
+    def get(self, client_id: str, incident_id: str) -> Incident | None:
+        row = self._conn().execute(SELECT_INCIDENT, (client_id, incident_id)).fetchone()
+
+        if row is None:
+            return None
+
+        return row_to_incident(row)
+
+    def get_changes(self, client_id: str, after: tuple[datetime, str], until: datetime, limit: int) -> list[IncidentChange]:
+        rows = (
+            self._conn()
+            .execute(SELECT_CHANGES, (client_id, after[0].isoformat(), after[1], until.isoformat(), limit))
+            .fetchall()
+        )
+
+        return [IncidentChange(incident=row_to_incident(row), last_modified=datetime.fromisoformat(row[9])) for row in rows]
+
+    def append_history_entry(self, entry: HistoryEntry) -> None:
+        if entry.seq is not None:
+            raise ValueError('seq must be None when appending history entry')
+
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+
+        try:
+            seq = self._insert_entry(conn, entry)
+        except BaseException:
+            conn.rollback()
+            raise
+
+        if seq is None:
+            conn.rollback()
+            raise NotFound(f'Incident {entry.incident_id} not found')  # type: ignore[no-untyped-call]
+
+        conn.commit()
+        entry.seq = seq
+
+    def _insert_entry(self, conn: sqlite3.Connection, entry: HistoryEntry) -> int | None:
+        # Inside a write transaction, returns the seq of the entry or None when the incident does not exist
+        row = conn.execute(NEXT_SEQ, (entry.date.isoformat(), entry.client_id, entry.incident_id)).fetchone()
+        if row is None:
+            return None
+
+        conn.execute(
+            INSERT_HISTORY,
+            (entry.client_id, entry.incident_id, row[0], entry.date.isoformat(), entry.action.value, entry.description),
+        )
+        return cast(int, row[0])
+
+    def get_history(
+        self,
+        client_id: str,
+        incident_id: str,
+        after_seq: int | None = None,
+        limit: int | None = None,
+        *,
+        descending: bool = False,
+    ) -> Generator[HistoryEntry, None, None]:
+        if descending:
+            params = (client_id, incident_id, MAX_SEQ if after_seq is None else after_seq, -1 if limit is None else limit)
+            rows = self._conn().execute(SELECT_HISTORY_DESC, params).fetchall()
+        else:
+            params = (client_id, incident_id, -1 if after_seq is None else after_seq, -1 if limit is None else limit)
+            rows = self._conn().execute(SELECT_HISTORY_ASC, params).fetchall()
+
+        for seq, date, action, description in rows:
+            yield HistoryEntry(
+                incident_id=incident_id,
+                client_id=client_id,
+                date=datetime.fromisoformat(date),
+                action=Action(action),
+                description=description,
+                seq=seq,
+            )
+
+    def get_with_history(
+        self, client_id: str, incident_id: str, history_limit: int | None = None
+    ) -> tuple[Incident | None, list[HistoryEntry]]:
+        # Both reads see the same WAL snapshot
+        conn = self._conn()
+        conn.execute('BEGIN')
+
+        try:
+            incident = self.get(client_id, incident_id)
+            history = self.get_history(client_id, incident_id, limit=history_limit, descending=history_limit is not None)
+            entries = [] if incident is None else list(history)
+        finally:
+            conn.commit()
+
+        return incident, entries if history_limit is None else entries[::-1]
+
+    def delete_all(self, client_id: str | None = None) -> dict[str, int]:
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+
+        try:
+            rows = conn.execute(COUNT_DOCUMENTS, (client_id, client_id)).fetchall()
+            # History rows go with their incident through ON DELETE CASCADE
+            conn.execute(DELETE_INCIDENTS, (client_id, client_id))
+        except BaseException:
+            conn.rollback()
+            raise
+
+        conn.commit()
+
+        # Counted like Firestore documents: the client, its incidents and their history entries
+        deleted = {cid: 1 + incidents + history for cid, incidents, history in rows}
+
+        if client_id is not None:
+            deleted.setdefault(client_id, 0)
+
+        return deleted
+
+    def update(self, incident: Incident) -> None:
+        cursor = self._conn().execute(
+            UPDATE_INCIDENT,
+            (
+                incident.name,
+                incident.channel.value,
+                incident.reported_by,
+                incident.created_by,
+                incident.assigned_to,
+                None if incident.risk is None else incident.risk.value,
+                datetime.now(UTC).isoformat(),
+                incident.client_id,
+                incident.id,
+            ),
+        )
+
+        if cursor.rowcount == 0:
+            raise ValueError(f'Incident with ID {incident.id} not found for client {incident.client_id}.')
+
+    def update_with_history(
+        self, incident: Incident, fields: Collection[str], entry: HistoryEntry | None, expected_version: str | None = None
+    ) -> None:
+        check_update_fields(fields)
+
+        if entry is not None and entry.seq is not None:
+            raise ValueError('seq must be None when appending history entry')
+
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+
+        try:
+            version = self._check_version(conn, incident, expected_version)
+            self._update_fields(conn, incident, fields)
+
+            # The entry's insert bumps the version, writes of fields alone bump it here
+            seq = None if entry is None else self._insert_entry(conn, entry)
+            if fields and entry is None:
+                conn.execute(BUMP_VERSION, (incident.client_id, incident.id))
+        except BaseException:
+            conn.rollback()
+            raise
+
+        conn.commit()
+
+        if fields or entry is not None:
+            incident.version = str(version + 1)
+
+        if entry is not None:
+            entry.seq = seq
+
+    def _check_version(self, conn: sqlite3.Connection, incident: Incident, expected_version: str | None) -> int:
+        # Inside the write transaction, no other write can happen until it commits. Returns the current version.
+        row = conn.execute(SELECT_VERSION, (incident.client_id, incident.id)).fetchone()
+        if row is None:
+            raise ValueError(f'Incident with ID {incident.id} not found for client {incident.client_id}.')
+
+        if expected_version is not None and expected_version != str(row[0]):
+            raise FailedPrecondition(f'Incident {incident.id} was modified')  # type: ignore[no-untyped-call]
+
+        return cast(int, row[0])
+
+    def _update_fields(self, conn: sqlite3.Connection, incident: Incident, fields: Collection[str]) -> None:
+        # Inside the write transaction of update_with_history, once the incident is known to exist.
+        # An entry inserted after them stamps last_modified with its date instead.
+        now = datetime.now(UTC).isoformat()
+
+        for name in fields:
+            value: Any = getattr(incident, name)
+            value = value.value if isinstance(value, Enum) else value
+            conn.execute(UPDATE_FIELD[name], (value, now, incident.client_id, incident.id))
@@ -0,0 +1,32 @@
+import logging
+import sqlite3
+from pathlib import Path
+
+MIGRATIONS_DIR = Path(__file__).parent / 'migrations'
+
+logger = logging.getLogger(__name__)
+
+
+# Applies the migrations newer than the database's user_version, each one in its own transaction.
+# Two processes racing on a database both succeed: migrations are idempotent, and the one that cannot be repeated
+# (ALTER TABLE) is skipped when it fails because the other process applied it first.
+def migrate(conn: sqlite3.Connection) -> int:
+    version = int(conn.execute('PRAGMA user_version').fetchone()[0])
+
+    for path in sorted(MIGRATIONS_DIR.glob('*.sql')):
+        migration_version = int(path.name.split('_', 1)[0])
+        if migration_version <= version:
+            continue
+
+        logger.info('Applying migration %s', path.name)
+        try:
+            conn.executescript(f'BEGIN IMMEDIATE;\n{path.read_text()}\nPRAGMA user_version = {migration_version};\nCOMMIT;')
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.rollback()
+            if int(conn.execute('PRAGMA user_version').fetchone()[0]) < migration_version:
+                raise
+
+        version = migration_version
+
+    return version
@@ -0,0 +1,27 @@
+-- Incidents and their history, keyed like the Firestore paths clients/{client_id}/incidents/{id}/history/{seq}
+
+CREATE TABLE IF NOT EXISTS incidents (
+    client_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    reported_by TEXT NOT NULL,
+    created_by TEXT NOT NULL,
+    assigned_to TEXT NOT NULL,
+    risk TEXT,
+    -- Next history seq, bumped in the same transaction that inserts the entry
+    history_count INTEGER NOT NULL DEFAULT 0,
+    last_modified TEXT,
+    PRIMARY KEY (client_id, id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS history (
+    client_id TEXT NOT NULL,
+    incident_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    action TEXT NOT NULL,
+    description TEXT NOT NULL,
+    PRIMARY KEY (client_id, incident_id, seq),
+    FOREIGN KEY (client_id, incident_id) REFERENCES incidents (client_id, id) ON DELETE CASCADE
+) WITHOUT ROWID;
@@ -0,0 +1,3 @@
+-- Serves the change feed of a client, ordered by (last_modified, id)
+
+CREATE INDEX IF NOT EXISTS incidents_changes ON incidents (client_id, last_modified, id);
@@ -0,0 +1,3 @@
+-- Version of an incident, bumped by every write to it and checked by update_with_history's expected_version
+
+ALTER TABLE incidents ADD COLUMN version INTEGER NOT NULL DEFAULT 0;
@@ -0,0 +1,39 @@
+# ruff: noqa: INP001, T201
+# Usage: FIRESTORE_EMBEDDED_HISTORY=10 PYTHONPATH=. python scripts/backfill_last_action.py
+# Sets last_action on the incidents last appended to before it was stored on the incident document,
+# archive_closed only finds closed incidents through it. Safe to run again, incidents that have it are skipped.
+import logging
+import os
+from typing import Any, cast
+
+from google.api_core.exceptions import FailedPrecondition, NotFound
+
+from repositories.firestore import FirestoreIncidentRepository
+
+DATABASE = os.getenv('FIRESTORE_DATABASE') or '(default)'
+EMBEDDED_HISTORY = int(os.getenv('FIRESTORE_EMBEDDED_HISTORY') or '0')
+
+logging.basicConfig(level=logging.INFO)
+
+repo = FirestoreIncidentRepository(DATABASE, EMBEDDED_HISTORY)
+incidents = updated = 0
+
+for client_doc in repo.db.collection('clients').list_documents():
+    for incident_doc in client_doc.collection('incidents').select(['last_action']).stream():
+        incidents += 1
+        if 'last_action' in cast(dict[str, Any], incident_doc.to_dict()):
+            continue
+
+        last_entry = next(repo.get_history(client_doc.id, incident_doc.id, limit=1, descending=True), None)
+        if last_entry is None:
+            continue
+
+        # An append since the read sets last_action itself, the update is then skipped
+        option = repo.db.write_option(last_update_time=incident_doc.update_time)
+        try:
+            incident_doc.reference.update({'last_action': last_entry.action}, option=option)
+            updated += 1
+        except (FailedPrecondition, NotFound):
+            pass
+
+print(f'Set last_action on {updated} of {incidents} incidents')
@@ -0,0 +1,89 @@
+# ruff: noqa: INP001, T201
+# Usage: FIRESTORE_EMULATOR_HOST=localhost:8080 PYTHONPATH=. python scripts/bench_async.py
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import UTC, datetime
+from unittest.mock import AsyncMock, patch
+from uuid import uuid4
+
+from app import create_app
+from models import Action, Channel, HistoryEntry, Incident
+from repositories.firestore import FirestoreIncidentRepository
+
+THREADS = int(os.getenv('BENCH_THREADS') or '8')
+REQUESTS = int(os.getenv('BENCH_REQUESTS') or '400')
+INCIDENTS = 50
+
+CLIENT_ID = str(uuid4())
+AGENT_ID = str(uuid4())
+
+if 'FIRESTORE_EMULATOR_HOST' not in os.environ:
+    raise SystemExit('FIRESTORE_EMULATOR_HOST must point to a Firestore emulator')
+
+# Seed a handful of open incidents, every request appends to one of them
+repo = FirestoreIncidentRepository('(default)')
+incidents = [
+    Incident(
+        id=str(uuid4()),
+        client_id=CLIENT_ID,
+        name=f'Incident {i}',
+        channel=Channel.WEB,
+        reported_by=str(uuid4()),
+        created_by=str(uuid4()),
+        assigned_to=AGENT_ID,
+        risk=None,
+    )
+    for i in range(INCIDENTS)
+]
+repo.create_many(incidents)
+repo.append_history_many(
+    [
+        HistoryEntry(
+            incident_id=incident.id,
+            client_id=CLIENT_ID,
+            date=datetime.now(UTC),
+            action=Action.CREATED,
+            description='Benchmark',
+        )
+        for incident in incidents
+    ]
+)
+
+body = json.dumps({'action': Action.AI_RESPONSE.value, 'description': 'Benchmark update'})
+
+
+def run(backend: str) -> float:
+    with patch.dict(os.environ, {'INCIDENT_REPO_BACKEND': backend}):
+        app = create_app()
+
+    def request(i: int) -> None:
+        incident = incidents[i % INCIDENTS]
+        resp = app.test_client().post(
+            f'/api/v1/clients/{CLIENT_ID}/employees/{AGENT_ID}/incidents/{incident.id}/update',
+            data=body,
+            content_type='application/json',
+        )
+        if resp.status_code != 201:  # noqa: PLR2004
+            raise RuntimeError(resp.get_data(as_text=True))
+
+    # Warm up clients and channels before timing
+    request(0)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        list(executor.map(request, range(REQUESTS)))
+    return REQUESTS / (time.perf_counter() - start)
+
+
+# Notifications go to Pub/Sub and the directory services, they are out of scope here
+with (
+    patch('blueprints.incident.send_notification'),
+    patch('blueprints.incident_async.send_notification_async', new_callable=AsyncMock),
+):
+    print(f'{THREADS} threads, {REQUESTS} update requests')
+    for backend in ['firestore', 'firestore_async']:
+        print(f'{backend:<18}{run(backend):>10.1f} req/s')
+
+repo.delete_all(client_id=CLIENT_ID)
@@ -0,0 +1,89 @@
+# ruff: noqa: INP001, T201
+# Usage: PYTHONPATH=. python scripts/bench_backends.py
+# Set FIRESTORE_EMULATOR_HOST to include the Firestore emulator in the comparison.
+import os
+import tempfile
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from datetime import UTC, datetime
+from pathlib import Path
+from uuid import uuid4
+
+from models import Action, Channel, HistoryEntry, Incident
+from repositories import IncidentRepository
+from repositories.memory import MemoryIncidentRepository
+from repositories.sqlite import SqliteIncidentRepository
+
+THREADS = int(os.getenv('BENCH_THREADS') or '8')
+INCIDENTS = int(os.getenv('BENCH_INCIDENTS') or '200')
+ENTRIES = 5
+
+
+def new_incident(client_id: str) -> Incident:
+    return Incident(
+        id=str(uuid4()),
+        client_id=client_id,
+        name='Cobro incorrecto',
+        channel=Channel.WEB,
+        reported_by=str(uuid4()),
+        created_by=str(uuid4()),
+        assigned_to=str(uuid4()),
+        risk=None,
+    )
+
+
+def new_entry(incident: Incident) -> HistoryEntry:
+    return HistoryEntry(
+        incident_id=incident.id,
+        client_id=incident.client_id,
+        date=datetime.now(UTC),
+        action=Action.ESCALATED,
+        description='He recibido mi factura de septiembre y aparece un cobro adicional.',
+    )
+
+
+# Per incident, the calls one registration plus a few update requests make
+def workload(repo: IncidentRepository, incident: Incident) -> int:
+    repo.create(incident)
+    ops = 1
+
+    for _ in range(ENTRIES):
+        repo.get(client_id=incident.client_id, incident_id=incident.id)
+        repo.get_last_history_entry(client_id=incident.client_id, incident_id=incident.id)
+        repo.append_history_entry(new_entry(incident))
+        ops += 3
+
+    list(repo.get_history(client_id=incident.client_id, incident_id=incident.id))
+    return ops + 1
+
+
+def run(name: str, factory: Callable[[], IncidentRepository]) -> None:
+    repo = factory()
+    client_id = str(uuid4())
+    incidents = [new_incident(client_id) for _ in range(INCIDENTS)]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        ops = sum(executor.map(lambda incident: workload(repo, incident), incidents))
+    elapsed = time.perf_counter() - start
+
+    repo.delete_all(client_id=client_id)
+    print(f'{name:<12}{ops / elapsed:>12.0f}{elapsed / ops * 1e6:>14.1f}')
+
+
+with tempfile.TemporaryDirectory() as tmp_dir:
+    backends: list[tuple[str, Callable[[], IncidentRepository]]] = [
+        ('memory', MemoryIncidentRepository),
+        ('sqlite', lambda: SqliteIncidentRepository(str(Path(tmp_dir) / 'bench.db'))),
+    ]
+
+    if 'FIRESTORE_EMULATOR_HOST' in os.environ:
+        from repositories.firestore import FirestoreIncidentRepository
+
+        backends.append(('firestore', lambda: FirestoreIncidentRepository('(default)')))
+
+    print(f'{THREADS} threads, {INCIDENTS} incidents, {ENTRIES} updates each')
+    print(f'{"backend":<12}{"ops/s":>12}{"us/op":>14}')
+    for name, factory in backends:
+        run(name, factory)
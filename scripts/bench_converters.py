@@ -0,0 +1,106 @@
+# ruff: noqa: INP001, T201
+# Usage: PYTHONPATH=. python scripts/bench_converters.py
+import os
+import timeit
+from datetime import UTC, datetime
+from enum import Enum
+from typing import Any, cast
+
+import dacite
+from google.auth.credentials import AnonymousCredentials
+from google.cloud.firestore import Client as FirestoreClient  # type: ignore[import-untyped]
+from google.cloud.firestore_v1 import CollectionReference, DocumentReference, DocumentSnapshot
+
+from models import HistoryEntry, Incident
+from repositories.firestore.converters import doc_to_history_entry, doc_to_incident
+
+N = int(os.getenv('BENCH_DOCS') or '20000')
+
+CLIENT_ID = '9a652818-342e-4771-84cf-39c20a29264d'
+INCIDENT_ID = '36e3344d-aa5b-4c5a-88ef-a7eb8abe27d8'
+
+# The converters never touch the network, an offline client is enough to build document references
+db = FirestoreClient(project='bench', credentials=AnonymousCredentials())  # type: ignore[no-untyped-call]
+incident_ref = cast(CollectionReference, db.collection('clients').document(CLIENT_ID).collection('incidents')).document(
+    INCIDENT_ID
+)
+history_ref = cast(CollectionReference, incident_ref.collection('history')).document('0')
+now = datetime.now(UTC)
+
+incident_doc = DocumentSnapshot(
+    incident_ref,
+    {
+        'name': 'Cobro incorrecto',
+        'channel': 'web',
+        'reported_by': 'b713f559-cae5-4db3-992a-d3553fb25000',
+        'created_by': '0abad006-921c-4e09-b2a6-10713b71571f',
+        'assigned_to': '0abad006-921c-4e09-b2a6-10713b71571f',
+        'risk': 'MEDIUM',
+        'last_modified': now,
+    },
+    exists=True,
+    read_time=now,
+    create_time=now,
+    update_time=now,
+)
+
+history_doc = DocumentSnapshot(
+    history_ref,
+    {
+        'seq': 0,
+        'date': now,
+        'action': 'created',
+        'description': 'He recibido mi factura de septiembre y aparece un cobro adicional por un servicio que no contraté.',
+    },
+    exists=True,
+    read_time=now,
+    create_time=now,
+    update_time=now,
+)
+
+
+# Previous implementation, kept here as the baseline
+def dacite_doc_to_incident(doc: DocumentSnapshot) -> Incident:
+    client_id = cast(DocumentReference, cast(CollectionReference, cast(DocumentReference, doc.reference).parent).parent).id
+    return dacite.from_dict(
+        data_class=Incident,
+        data={
+            **cast(dict[str, Any], doc.to_dict()),
+            'id': doc.id,
+            'client_id': client_id,
+        },
+        config=dacite.Config(cast=[Enum]),
+    )
+
+
+def dacite_doc_to_history_entry(doc: DocumentSnapshot) -> HistoryEntry:
+    incident_ref = cast(DocumentReference, cast(CollectionReference, cast(DocumentReference, doc.reference).parent).parent)
+    client_ref = cast(DocumentReference, cast(CollectionReference, incident_ref.parent).parent)
+    return dacite.from_dict(
+        data_class=HistoryEntry,
+        data={
+            **cast(dict[str, Any], doc.to_dict()),
+            'incident_id': incident_ref.id,
+            'client_id': client_ref.id,
+        },
+        config=dacite.Config(cast=[Enum]),
+    )
+
+
+assert dacite_doc_to_incident(incident_doc) == doc_to_incident(incident_doc, CLIENT_ID)  # noqa: S101
+assert dacite_doc_to_history_entry(history_doc) == doc_to_history_entry(history_doc, CLIENT_ID, INCIDENT_ID)  # noqa: S101
+
+cases = [
+    ('incident', lambda: dacite_doc_to_incident(incident_doc), lambda: doc_to_incident(incident_doc, CLIENT_ID)),
+    (
+        'history_entry',
+        lambda: dacite_doc_to_history_entry(history_doc),
+        lambda: doc_to_history_entry(history_doc, CLIENT_ID, INCIDENT_ID),
+    ),
+]
+
+print(f'{"model":<16}{"dacite (us/doc)":>18}{"converter (us/doc)":>22}{"speedup":>10}')
+for name, before, after in cases:
+    before_us = min(timeit.repeat(before, number=N, repeat=3)) / N * 1e6
+    after_us = min(timeit.repeat(after, number=N, repeat=3)) / N * 1e6
+    print(f'{name:<16}{before_us:>18.2f}{after_us:>22.2f}{before_us / after_us:>9.1f}x')
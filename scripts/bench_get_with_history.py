@@ -0,0 +1,81 @@
+# ruff: noqa: INP001, T201
+# Usage: FIRESTORE_EMULATOR_HOST=localhost:8080 PYTHONPATH=. python scripts/bench_get_with_history.py
+# Times both history layouts. The emulator answers locally, so the gap shrinks compared with a real database.
+import os
+import time
+from collections.abc import Callable
+from datetime import UTC, datetime
+from statistics import median
+from uuid import uuid4
+
+from models import Action, Channel, HistoryEntry, Incident
+from repositories.firestore import FirestoreIncidentRepository
+
+ROUNDS = int(os.getenv('BENCH_ROUNDS') or '200')
+DATABASE = os.getenv('FIRESTORE_DATABASE') or '(default)'
+# History entries kept on the incident document in the embedded layout
+EMBEDDED_HISTORY = int(os.getenv('FIRESTORE_EMBEDDED_HISTORY') or '10')
+
+if 'FIRESTORE_EMULATOR_HOST' not in os.environ:
+    raise SystemExit('FIRESTORE_EMULATOR_HOST must point to a Firestore emulator')
+
+
+def seed(repo: FirestoreIncidentRepository) -> Incident:
+    incident = Incident(
+        id=str(uuid4()),
+        client_id=str(uuid4()),
+        name='Benchmark incident',
+        channel=Channel.WEB,
+        reported_by=str(uuid4()),
+        created_by=str(uuid4()),
+        assigned_to=str(uuid4()),
+        risk=None,
+    )
+    repo.create(incident)
+    for action in [Action.CREATED, Action.AI_RESPONSE, Action.ESCALATED]:
+        repo.append_history_entry(
+            HistoryEntry(
+                incident_id=incident.id,
+                client_id=incident.client_id,
+                date=datetime.now(UTC),
+                action=action,
+                description='Benchmark',
+            )
+        )
+    return incident
+
+
+def timed(func: Callable[[], object]) -> str:
+    func()
+    timings = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return f'p50 {median(timings) * 1000:6.2f} ms  p95 {timings[int(ROUNDS * 0.95)] * 1000:6.2f} ms'
+
+
+def bench(repo: FirestoreIncidentRepository, incident: Incident) -> tuple[str, str]:
+    def sequential() -> None:
+        # What the views did before: two dependent round trips
+        repo.get(client_id=incident.client_id, incident_id=incident.id)
+        repo.get_last_history_entry(client_id=incident.client_id, incident_id=incident.id)
+
+    def combined() -> None:
+        repo.get_with_history(client_id=incident.client_id, incident_id=incident.id, history_limit=1)
+
+    return timed(sequential), timed(combined)
+
+
+for layout, embedded_history in [('subcollection', 0), ('embedded', EMBEDDED_HISTORY)]:
+    repo = FirestoreIncidentRepository(DATABASE, embedded_history)
+    incident = seed(repo)
+
+    try:
+        sequential, combined = bench(repo, incident)
+    finally:
+        repo.delete_all(client_id=incident.client_id)
+
+    print(f'{layout:<15}{"get + get_last_history_entry":<30}{sequential}')
+    print(f'{layout:<15}{"get_with_history":<30}{combined}')
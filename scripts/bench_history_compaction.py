@@ -0,0 +1,68 @@
+# ruff: noqa: INP001, T201
+# Usage: FIRESTORE_EMULATOR_HOST=localhost:8080 PYTHONPATH=. python scripts/bench_history_compaction.py
+import os
+import time
+from datetime import UTC, datetime
+from statistics import median
+from uuid import uuid4
+
+from models import Action, Channel, HistoryEntry, Incident
+from repositories.firestore import FirestoreIncidentRepository
+
+ROUNDS = int(os.getenv('BENCH_ROUNDS') or '50')
+LENGTHS = [100, 1000, 5000]
+
+if 'FIRESTORE_EMULATOR_HOST' not in os.environ:
+    raise SystemExit('FIRESTORE_EMULATOR_HOST must point to a Firestore emulator')
+
+repo = FirestoreIncidentRepository('(default)', embedded_history=10, history_chunk=100)
+client_id = str(uuid4())
+
+
+def create_incident(length: int) -> Incident:
+    incident = Incident(
+        id=str(uuid4()),
+        client_id=client_id,
+        name='Benchmark incident',
+        channel=Channel.WEB,
+        reported_by=str(uuid4()),
+        created_by=str(uuid4()),
+        assigned_to=str(uuid4()),
+        risk=None,
+    )
+    repo.create(incident)
+    repo.append_history_many(
+        [
+            HistoryEntry(
+                incident_id=incident.id,
+                client_id=client_id,
+                date=datetime.now(UTC),
+                action=Action.CREATED if i == 0 else Action.AI_RESPONSE,
+                description=f'Benchmark {i}',
+            )
+            for i in range(length)
+        ]
+    )
+    return incident
+
+
+def bench(incident: Incident) -> str:
+    timings = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        list(repo.get_history(client_id=client_id, incident_id=incident.id))
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return f'p50 {median(timings) * 1000:8.2f} ms  p95 {timings[int(ROUNDS * 0.95)] * 1000:8.2f} ms'
+
+
+for length in LENGTHS:
+    incident = create_incident(length)
+    print(f'{length:>5} entries  subcollection  {bench(incident)}')
+
+    repo.compact_history(client_id, incident.id)
+    # The second run deletes the originals of the chunks
+    repo.compact_history(client_id, incident.id)
+    print(f'{length:>5} entries  compacted      {bench(incident)}')
+
+repo.delete_all(client_id=client_id)
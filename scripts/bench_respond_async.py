@@ -0,0 +1,91 @@
+# ruff: noqa: INP001, T201
+# Usage: PYTHONPATH=. python scripts/bench_respond_async.py
+# Runs on the memory backend, set INCIDENT_REPO_BACKEND=firestore and FIRESTORE_EMULATOR_HOST to time Firestore writes.
+import json
+import os
+import statistics
+import time
+from collections.abc import Callable
+from unittest.mock import patch
+from uuid import uuid4
+
+from werkzeug.test import TestResponse
+
+from app import create_app
+from models import Action
+
+REQUESTS = int(os.getenv('BENCH_REQUESTS') or '200')
+# Time to build and publish a notification, the user and client services and Pub/Sub are not called
+NOTIFY_MS = float(os.getenv('BENCH_NOTIFY_MS') or '80')
+
+CLIENT_ID = str(uuid4())
+AGENT_ID = str(uuid4())
+
+os.environ.setdefault('INCIDENT_REPO_BACKEND', 'memory')
+app = create_app()
+client = app.test_client()
+
+register_body = json.dumps(
+    {
+        'client_id': CLIENT_ID,
+        'name': 'Cobro incorrecto',
+        'channel': 'web',
+        'reported_by': str(uuid4()),
+        'created_by': str(uuid4()),
+        'description': 'Benchmark',
+        'assigned_to': AGENT_ID,
+    }
+)
+update_body = json.dumps({'action': Action.AI_RESPONSE.value, 'description': 'Benchmark update'})
+
+
+def timed(call: Callable[[], TestResponse]) -> float:
+    start = time.perf_counter()
+    resp = call()
+    elapsed = time.perf_counter() - start
+
+    if resp.status_code not in {201, 202}:
+        raise RuntimeError(resp.get_data(as_text=True))
+
+    return elapsed
+
+
+def register(headers: dict[str, str]) -> TestResponse:
+    return client.post('/api/v1/register/incident', data=register_body, content_type='application/json', headers=headers)
+
+
+def register_latency(headers: dict[str, str]) -> float:
+    return timed(lambda: register(headers))
+
+
+def update_latency(headers: dict[str, str]) -> float:
+    # Every update goes to a new incident, its registration is not timed
+    incident_id = register({}).get_json()['id']
+    return timed(
+        lambda: client.post(
+            f'/api/v1/clients/{CLIENT_ID}/employees/{AGENT_ID}/incidents/{incident_id}/update',
+            data=update_body,
+            content_type='application/json',
+            headers=headers,
+        )
+    )
+
+
+def notify(*_args: object, **_kwargs: object) -> None:
+    time.sleep(NOTIFY_MS / 1000)
+
+
+with patch('blueprints.incident.send_notification', notify):
+    print(f'{REQUESTS} sequential requests, {NOTIFY_MS:.0f} ms per notification')
+    print(f'{"":<24}{"p50 ms":>10}{"p99 ms":>10}')
+
+    for endpoint, latency in [('register', register_latency), ('update', update_latency)]:
+        for mode, headers in [('sync', {}), ('respond-async', {'Prefer': 'respond-async'})]:
+            # Warm up before timing
+            latency(headers)
+
+            results = sorted(latency(headers) * 1000 for _ in range(REQUESTS))
+            percentiles = statistics.quantiles(results, n=100, method='inclusive')
+            print(f'{endpoint + " " + mode:<24}{percentiles[49]:>10.1f}{percentiles[98]:>10.1f}')
+
+    app.container.side_effect_executor().shutdown(wait=True)
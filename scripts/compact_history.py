@@ -0,0 +1,31 @@
+# ruff: noqa: INP001, T201
+# Usage: FIRESTORE_EMBEDDED_HISTORY=10 COMPACT_MIN_HISTORY=200 PYTHONPATH=. python scripts/compact_history.py
+import logging
+import os
+
+from google.cloud.firestore_v1 import FieldFilter
+
+from repositories.firestore import FirestoreIncidentRepository
+
+DATABASE = os.getenv('FIRESTORE_DATABASE') or '(default)'
+EMBEDDED_HISTORY = int(os.getenv('FIRESTORE_EMBEDDED_HISTORY') or '0')
+HISTORY_CHUNK = int(os.getenv('FIRESTORE_HISTORY_CHUNK') or '100')
+# Incidents with fewer history entries are skipped
+MIN_HISTORY = int(os.getenv('COMPACT_MIN_HISTORY') or HISTORY_CHUNK)
+
+logging.basicConfig(level=logging.INFO)
+
+if not EMBEDDED_HISTORY:
+    raise SystemExit('History compaction requires FIRESTORE_EMBEDDED_HISTORY > 0')
+
+repo = FirestoreIncidentRepository(DATABASE, EMBEDDED_HISTORY, HISTORY_CHUNK)
+incidents = compacted = 0
+
+for client_doc in repo.db.collection('clients').list_documents():
+    query = client_doc.collection('incidents').where(filter=FieldFilter('history_count', '>=', MIN_HISTORY))  # type: ignore[no-untyped-call]
+
+    for incident_doc in query.select(['history_count']).stream():
+        incidents += 1
+        compacted += repo.compact_history(client_doc.id, incident_doc.id)
+
+print(f'Compacted {compacted} history entries of {incidents} incidents')
@@ -7,6 +7,8 @@ from google.cloud.firestore import Client as FirestoreClient  # type: ignore[imp
 from google.cloud.firestore_v1 import CollectionReference, DocumentReference
 
 FIRESTORE_DB = os.getenv('FIRESTORE_DB') or '(default)'
+# Archived incidents are only printed on demand
+DUMP_ARCHIVE = os.getenv('DUMP_ARCHIVE') == '1'
 
 db = FirestoreClient(database=FIRESTORE_DB)
 
@@ -28,4 +30,5 @@ def print_collection(collection: CollectionReference, indent: int) -> None:
 
 gen_collections: Generator[CollectionReference, None, None] = db.collections()
 for collection in gen_collections:
-    print_collection(collection, 0)
+    if collection.id != 'archive' or DUMP_ARCHIVE:
+        print_collection(collection, 0)
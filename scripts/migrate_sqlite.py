@@ -0,0 +1,15 @@
+# ruff: noqa: INP001, T201
+# Usage: SQLITE_PATH=incidents.db PYTHONPATH=. python scripts/migrate_sqlite.py
+import logging
+import os
+import sqlite3
+
+from repositories.sqlite import migrate
+
+SQLITE_PATH = os.getenv('SQLITE_PATH') or 'incidents.db'
+
+logging.basicConfig(level=logging.INFO)
+
+conn = sqlite3.connect(SQLITE_PATH, isolation_level=None)
+print(f'{SQLITE_PATH} at schema version {migrate(conn)}')
+conn.close()
@@ -0,0 +1,3 @@
+from .incident import IncidentService, IncidentUnitOfWork, RiskChange, UpdateItem, UpdateRejectedError
+
+__all__ = ['IncidentService', 'IncidentUnitOfWork', 'RiskChange', 'UpdateItem', 'UpdateRejectedError']
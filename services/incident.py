@@ -0,0 +1,267 @@
+from collections.abc import Collection
+from dataclasses import dataclass
+from datetime import UTC, datetime
+
+from google.api_core.exceptions import FailedPrecondition, NotFound
+
+from models import Action, HistoryEntry, Incident, IncidentView, Risk
+from repositories import IncidentRepository
+from utils import (
+    CLOSED_INCIDENT_ERROR,
+    INCIDENT_NOT_FOUND,
+    INCIDENT_VERSION_ERROR,
+    REGISTER_FAILED_ERROR,
+    UNAUTHORIZED_INCIDENT_ERROR,
+    UPDATE_FAILED_ERROR,
+)
+
+# The update checks only need who the incident is assigned to and whether it is closed
+UPDATE_CHECK_FIELDS = ('assigned_to', 'last_action')
+
+
+class UpdateRejectedError(Exception):
+    def __init__(self, message: str, status: int) -> None:
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def check_update(incident: Incident | IncidentView | None, assigned_to: str, last_action: Action | None) -> None:
+    if incident is None:
+        raise UpdateRejectedError(INCIDENT_NOT_FOUND, 404)
+
+    if incident.assigned_to != assigned_to:
+        raise UpdateRejectedError(UNAUTHORIZED_INCIDENT_ERROR, 403)
+
+    if last_action == Action.CLOSED:
+        raise UpdateRejectedError(CLOSED_INCIDENT_ERROR, 409)
+
+
+def write_rejection(error: Exception) -> UpdateRejectedError:
+    # An item of a bulk write that failed, incidents deleted since they were read are not found
+    if isinstance(error, NotFound):
+        return UpdateRejectedError(INCIDENT_NOT_FOUND, 404)
+
+    return UpdateRejectedError(UPDATE_FAILED_ERROR, 500)
+
+
+def new_entry(client_id: str, incident_id: str, action: Action, description: str) -> HistoryEntry:
+    return HistoryEntry(
+        incident_id=incident_id,
+        client_id=client_id,
+        date=datetime.now(UTC).replace(microsecond=0),
+        action=action,
+        description=description,
+    )
+
+
+# Previous and new risk of an incident
+RiskChange = tuple[Risk | None, Risk]
+
+
+@dataclass
+class UpdateItem:
+    incident_id: str
+    assigned_to: str
+    action: Action
+    description: str
+
+
+class IncidentUnitOfWork:
+    # Reads an incident once and commits the changes made to it in a single repository call, the incident and
+    # history it read are kept for the notifications
+    def __init__(self, incident_repo: IncidentRepository, client_id: str, incident_id: str) -> None:
+        self.incident_repo = incident_repo
+        self.client_id = client_id
+        self.incident_id = incident_id
+        self.incident: Incident | None = None
+        self.view: IncidentView | None = None
+        self.history: list[HistoryEntry] = []
+        self.fields: set[str] = set()
+        self.entry: HistoryEntry | None = None
+        self.calls = 0
+
+    def load(self, history_limit: int | None = None) -> Incident | None:
+        # With history_limit the history is only the last entries, which the closed check needs
+        self.calls += 1
+        self.incident, self.history = self.incident_repo.get_with_history(
+            client_id=self.client_id, incident_id=self.incident_id, history_limit=history_limit
+        )
+        return self.incident
+
+    def load_view(self, fields: Collection[str]) -> IncidentView | None:
+        # Only the fields the checks need, changes made after it are limited to appending entries
+        self.calls += 1
+        self.view = self.incident_repo.get_view(client_id=self.client_id, incident_id=self.incident_id, fields=fields)
+        return self.view
+
+    @property
+    def loaded(self) -> tuple[Incident, list[HistoryEntry]]:
+        if self.incident is None:
+            raise ValueError('Incident not loaded.')
+
+        return self.incident, self.history
+
+    @property
+    def last_action(self) -> Action | None:
+        return self.history[-1].action if self.history else None
+
+    def append(self, action: Action, description: str) -> HistoryEntry:
+        self.entry = new_entry(self.client_id, self.incident_id, action, description)
+        return self.entry
+
+    def set_risk(self, risk: Risk) -> None:
+        incident, _ = self.loaded
+        incident.risk = risk
+        self.fields.add('risk')
+
+    def commit(self, expected_version: str | None = None) -> None:
+        # With expected_version nothing is written if the incident changed since, FailedPrecondition is raised
+        if self.incident is None and self.view is not None and not self.fields and self.entry is not None:
+            self.calls += 1
+            self.incident_repo.append_history_entry(self.entry)
+            self.entry = None
+            return
+
+        incident, _ = self.loaded
+        if not self.fields and self.entry is None:
+            return
+
+        self.calls += 1
+        self.incident_repo.update_with_history(incident, self.fields, self.entry, expected_version)
+
+        if self.entry is not None:
+            self.history.append(self.entry)
+
+        self.fields = set()
+        self.entry = None
+
+
+class IncidentService:
+    def __init__(self, incident_repo: IncidentRepository) -> None:
+        self.incident_repo = incident_repo
+
+    def unit_of_work(self, client_id: str, incident_id: str) -> IncidentUnitOfWork:
+        return IncidentUnitOfWork(self.incident_repo, client_id, incident_id)
+
+    def append_update(
+        self, client_id: str, incident_id: str, assigned_to: str, action: Action, description: str
+    ) -> tuple[IncidentUnitOfWork, HistoryEntry]:
+        # The checks read a masked view, the notification reads the incident and its history once the entry is written
+        uow = self.unit_of_work(client_id, incident_id)
+
+        view = uow.load_view(UPDATE_CHECK_FIELDS)
+        check_update(view, assigned_to, None if view is None else view.last_action)
+
+        entry = uow.append(action, description)
+        uow.commit()
+
+        return uow, entry
+
+    def update_risk(
+        self, client_id: str, incident_id: str, risk: Risk, if_match: str | None = None
+    ) -> tuple[IncidentUnitOfWork, Risk | None]:
+        # Returns the previous risk, only the last history entry is read. With if_match, the risk is only written if
+        # the incident still has that version. It is checked by the write itself, not against what was read.
+        uow = self.unit_of_work(client_id, incident_id)
+
+        incident = uow.load(history_limit=1)
+        if incident is None:
+            raise UpdateRejectedError(INCIDENT_NOT_FOUND, 404)
+
+        if uow.last_action == Action.CLOSED:
+            raise UpdateRejectedError(CLOSED_INCIDENT_ERROR, 409)
+
+        prev_risk = incident.risk
+        uow.set_risk(risk)
+
+        try:
+            uow.commit(expected_version=if_match)
+        except FailedPrecondition as e:
+            raise UpdateRejectedError(INCIDENT_VERSION_ERROR, 412) from e
+
+        return uow, prev_risk
+
+    def append_updates(self, client_id: str, items: list[UpdateItem]) -> list[HistoryEntry | UpdateRejectedError]:
+        # One batched read for the checks and one bulk write of the accepted entries, results are in input order
+        views = self.incident_repo.get_views(client_id, [item.incident_id for item in items], UPDATE_CHECK_FIELDS)
+        results: list[HistoryEntry | UpdateRejectedError] = []
+        last_actions: dict[str, Action | None] = {}
+
+        for item, view in zip(items, views, strict=True):
+            # Items are applied in order, an incident closed by an earlier item rejects the later ones
+            last_action = last_actions.get(item.incident_id, None if view is None else view.last_action)
+
+            try:
+                check_update(view, item.assigned_to, last_action)
+            except UpdateRejectedError as err:
+                results.append(err)
+                continue
+
+            results.append(new_entry(client_id, item.incident_id, item.action, item.description))
+            last_actions[item.incident_id] = item.action
+
+        entries = [result for result in results if isinstance(result, HistoryEntry)]
+        errors = iter(self.incident_repo.append_history_many(entries))
+
+        for idx, result in enumerate(results):
+            if isinstance(result, HistoryEntry) and (error := next(errors)) is not None:
+                results[idx] = write_rejection(error)
+
+        return results
+
+    def update_risks(self, client_id: str, items: list[tuple[str, Risk]]) -> list[RiskChange | UpdateRejectedError]:
+        # Returns the previous and new risk of every item. Closed incidents are rejected, and only incidents whose
+        # risk changes are written, with one batched read and one bulk write.
+        views = self.incident_repo.get_views(client_id, [incident_id for incident_id, _ in items], ('risk', 'last_action'))
+        results: list[RiskChange | UpdateRejectedError] = []
+        risks: dict[str, Risk | None] = {}
+        stored: dict[str, Risk | None] = {}
+
+        for (incident_id, risk), view in zip(items, views, strict=True):
+            if view is None:
+                results.append(UpdateRejectedError(INCIDENT_NOT_FOUND, 404))
+            elif view.last_action == Action.CLOSED:
+                results.append(UpdateRejectedError(CLOSED_INCIDENT_ERROR, 409))
+            else:
+                # Items are applied in order, a later item of the same incident sees the risk set by the earlier one
+                stored.setdefault(incident_id, view.risk)
+                results.append((risks.get(incident_id, view.risk), risk))
+                risks[incident_id] = risk
+
+        changed = [incident_id for incident_id, risk in risks.items() if risk != stored[incident_id]]
+        updates = [IncidentView(id=incident_id, client_id=client_id, risk=risks[incident_id]) for incident_id in changed]
+        failed = {
+            incident_id: error
+            for incident_id, error in zip(changed, self.incident_repo.update_many(updates, ['risk']), strict=True)
+            if error is not None
+        }
+
+        for idx, ((incident_id, _), result) in enumerate(zip(items, results, strict=True)):
+            if isinstance(result, tuple) and incident_id in failed:
+                results[idx] = write_rejection(failed[incident_id])
+
+        return results
+
+    def register_incidents(self, items: list[tuple[Incident, str]]) -> list[HistoryEntry | UpdateRejectedError]:
+        # Creates every incident with its created entry from the description, returning the entries in input order.
+        # Both go out as one bulk write each, an incident that could not be created gets no entry.
+        created = self.incident_repo.create_many([incident for incident, _ in items])
+        entries = [
+            new_entry(incident.client_id, incident.id, Action.CREATED, description)
+            for (incident, description), error in zip(items, created, strict=True)
+            if error is None
+        ]
+        written = iter(zip(entries, self.incident_repo.append_history_many(entries), strict=True))
+
+        results: list[HistoryEntry | UpdateRejectedError] = []
+        for error in created:
+            if error is not None:
+                results.append(UpdateRejectedError(REGISTER_FAILED_ERROR, 500))
+                continue
+
+            # As in the single registration, an incident whose entry failed is left without history
+            entry, entry_error = next(written)
+            results.append(entry if entry_error is None else UpdateRejectedError(REGISTER_FAILED_ERROR, 500))
+
+        return results
@@ -64,9 +64,9 @@ resource "google_cloud_run_v2_service" "default" {
         }
       }
 
-      # CPU is only allocated when processing requests
+      # CPU stays allocated between requests, the side effects of respond-async requests run after their response
       resources {
-        cpu_idle = true
+        cpu_idle = false
         startup_cpu_boost = true
       }
     }
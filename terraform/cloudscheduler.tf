@@ -50,3 +50,27 @@ resource "google_cloud_scheduler_job" "backup" {
 
   depends_on = [ google_project_service.cloudscheduler ]
 }
+
+# Creates a Cloud Scheduler job, that moves long closed incidents to the archive every hour.
+resource "google_cloud_scheduler_job" "archive" {
+  name             = "archive-${local.service_name}"
+  region           = local.region
+  schedule         = "15 * * * *"
+  time_zone        = "Etc/UTC"
+  attempt_deadline = "300s"
+
+  retry_config {
+    retry_count = 1
+  }
+
+  http_target {
+    http_method = "POST"
+    uri         = "https://${local.service_name}-${data.google_project.default.number}.${local.region}.run.app/api/v1/archive/incident"
+    oidc_token {
+      service_account_email = data.google_service_account.backup.email
+      audience = "https://${local.service_name}-${data.google_project.default.number}.${local.region}.run.app"
+    }
+  }
+
+  depends_on = [ google_project_service.cloudscheduler ]
+}
@@ -63,3 +63,64 @@ resource "google_firestore_index" "query-by-assignee-idx" {
     order      = "DESCENDING"
   }
 }
+
+# Used by the archival of closed incidents.
+resource "google_firestore_index" "query-closed-idx" {
+  database   = google_firestore_database.default.name
+  collection = "incidents"
+
+  fields {
+    field_path = "last_action"
+    order      = "ASCENDING"
+  }
+
+  fields {
+    field_path = "last_modified"
+    order      = "ASCENDING"
+  }
+}
+
+# Used by the change feed of a client, a range of last_modified ordered by it and then by document id.
+# The single-field indexes serve it, Firestore rejects a composite index of last_modified and __name__ as
+# unnecessary. They are declared so an index exemption of last_modified can't break the feed.
+resource "google_firestore_field" "incidents-last-modified" {
+  database   = google_firestore_database.default.name
+  collection = "incidents"
+  field      = "last_modified"
+
+  index_config {
+    indexes {
+      order       = "ASCENDING"
+      query_scope = "COLLECTION"
+    }
+
+    indexes {
+      order       = "DESCENDING"
+      query_scope = "COLLECTION"
+    }
+  }
+}
+
+# Expired idempotency records are deleted by the TTL policy.
+resource "google_firestore_field" "idempotency-ttl" {
+  database   = google_firestore_database.default.name
+  collection = "idempotency_keys"
+  field      = "expires_at"
+
+  ttl_config {}
+
+  # Never queried
+  index_config {}
+}
+
+# Expired side effect tasks of respond-async requests are deleted by the TTL policy.
+resource "google_firestore_field" "side-effect-tasks-ttl" {
+  database   = google_firestore_database.default.name
+  collection = "side_effect_tasks"
+  field      = "expires_at"
+
+  ttl_config {}
+
+  # Never queried
+  index_config {}
+}
@@ -0,0 +1,44 @@
+import json
+import os
+from datetime import UTC, datetime, timedelta
+from typing import cast
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from app import create_app
+from repositories.firestore import FirestoreIncidentRepository
+
+
+class TestArchive(TestCase):
+    API_ENDPOINT = '/api/v1/archive/incident'
+
+    def setUp(self) -> None:
+        with patch.dict(os.environ, {'INCIDENT_ARCHIVE_DAYS': '30', 'INCIDENT_ARCHIVE_LIMIT': '50'}):
+            self.app = create_app()
+        self.client = self.app.test_client()
+
+    def tearDown(self) -> None:
+        self.app.container.unwire()
+
+    def test_archive(self) -> None:
+        incident_repo_mock = Mock(FirestoreIncidentRepository)
+        cast(Mock, incident_repo_mock.archive_closed).return_value = 7
+
+        with self.app.container.firestore_incident_repo.override(incident_repo_mock):
+            resp = self.client.post(self.API_ENDPOINT)
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(json.loads(resp.get_data()), {'status': 'Ok', 'archived': 7})
+
+        closed_before, limit = cast(Mock, incident_repo_mock.archive_closed).call_args.args
+        self.assertAlmostEqual(closed_before, datetime.now(UTC) - timedelta(days=30), delta=timedelta(minutes=1))
+        self.assertEqual(limit, 50)
+
+    def test_archive_other_backend(self) -> None:
+        with patch.dict(os.environ, {'INCIDENT_REPO_BACKEND': 'memory'}):
+            app = create_app()
+
+        resp = app.test_client().post(self.API_ENDPOINT)
+
+        self.assertEqual(resp.status_code, 404)
+        app.container.unwire()
@@ -0,0 +1,277 @@
+import json
+from typing import Any, cast
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from faker import Faker
+from google.api_core.exceptions import InternalServerError
+from werkzeug.test import TestResponse
+
+from app import create_app
+from blueprints.bulk import item_error
+from models import Action, IncidentView, Risk
+from repositories import IncidentRepository
+from utils import (
+    CLOSED_INCIDENT_ERROR,
+    INCIDENT_NOT_FOUND,
+    INVALID_UUID_ERROR,
+    REGISTER_FAILED_ERROR,
+    UNAUTHORIZED_INCIDENT_ERROR,
+    UPDATE_FAILED_ERROR,
+)
+
+
+class TestBulkIncidentUpdate(TestCase):
+    API_ENDPOINT = '/api/v1/clients/{client_id}/incidents/update'
+
+    def setUp(self) -> None:
+        self.faker = Faker()
+        self.app = create_app()
+        self.client = self.app.test_client()
+        self.client_id = cast(str, self.faker.uuid4())
+        self.incident_repo = Mock(IncidentRepository)
+
+    def item(self, incident_id: str, assigned_to: str, action: Action = Action.AI_RESPONSE) -> dict[str, Any]:
+        return {'incident_id': incident_id, 'assigned_to': assigned_to, 'action': action, 'description': self.faker.sentence()}
+
+    def call_api(self, body: dict[str, Any]) -> TestResponse:
+        with self.app.container.incident_repo.override(self.incident_repo):
+            return self.client.post(
+                self.API_ENDPOINT.format(client_id=self.client_id), data=json.dumps(body), content_type='application/json'
+            )
+
+    @patch('blueprints.bulk.send_notifications')
+    def test_bulk_update(self, send_notifications: Mock) -> None:
+        agent = cast(str, self.faker.uuid4())
+        ids = [cast(str, self.faker.uuid4()) for _ in range(5)]
+        views: list[IncidentView | None] = [
+            IncidentView(id=ids[0], client_id=self.client_id, assigned_to=agent, last_action=Action.CREATED),
+            None,
+            IncidentView(id=ids[2], client_id=self.client_id, assigned_to=agent, last_action=Action.CLOSED),
+            IncidentView(id=ids[3], client_id=self.client_id, assigned_to=agent, last_action=Action.CREATED),
+            IncidentView(id=ids[4], client_id=self.client_id, assigned_to=agent, last_action=Action.CREATED),
+        ]
+        cast(Mock, self.incident_repo.get_views).return_value = views
+        cast(Mock, self.incident_repo.append_history_many).return_value = [None, InternalServerError('error')]  # type: ignore[no-untyped-call]
+        send_notifications.return_value = {}
+
+        items = [
+            self.item(ids[0], agent),
+            self.item('not-a-uuid', agent),
+            self.item(ids[1], agent),
+            self.item(ids[2], agent),
+            self.item(ids[3], cast(str, self.faker.uuid4())),
+            self.item(ids[4], agent),
+        ]
+        resp = self.call_api({'updates': items})
+
+        self.assertEqual(resp.status_code, 200)
+        results = json.loads(resp.get_data())['results']
+        self.assertEqual(
+            [(x['incident_id'], x['code'], x.get('message')) for x in results],
+            [
+                (ids[0], 201, None),
+                ('not-a-uuid', 400, INVALID_UUID_ERROR.format(field='incident_id')),
+                (ids[1], 404, INCIDENT_NOT_FOUND),
+                (ids[2], 409, CLOSED_INCIDENT_ERROR),
+                (ids[3], 403, UNAUTHORIZED_INCIDENT_ERROR),
+                (ids[4], 500, UPDATE_FAILED_ERROR),
+            ],
+        )
+        self.assertEqual(results[0]['entry']['description'], items[0]['description'])
+
+        # One batched read of the valid items and one bulk write of the accepted ones
+        cast(Mock, self.incident_repo.get_views).assert_called_once()
+        self.assertEqual(cast(Mock, self.incident_repo.get_views).call_args.args[1], ids)
+        self.assertEqual(len(cast(Mock, self.incident_repo.append_history_many).call_args.args[0]), 2)
+        send_notifications.assert_called_once_with(self.client_id, [ids[0]], 'incident-update', loaded=None)
+
+    @patch('blueprints.bulk.send_notifications')
+    def test_bulk_update_closed_by_earlier_item(self, send_notifications: Mock) -> None:
+        agent = cast(str, self.faker.uuid4())
+        incident_id = cast(str, self.faker.uuid4())
+        view = IncidentView(id=incident_id, client_id=self.client_id, assigned_to=agent, last_action=Action.CREATED)
+        cast(Mock, self.incident_repo.get_views).return_value = [view, view]
+        cast(Mock, self.incident_repo.append_history_many).return_value = [None]
+        send_notifications.return_value = {incident_id: ValueError('Employee not found')}
+
+        with self.assertLogs(self.app.logger, 'ERROR'):
+            resp = self.call_api(
+                {'updates': [self.item(incident_id, agent, Action.CLOSED), self.item(incident_id, agent, Action.ESCALATED)]}
+            )
+
+        self.assertEqual([x['code'] for x in json.loads(resp.get_data())['results']], [201, 409])
+
+    def test_bulk_update_invalid_item(self) -> None:
+        item = self.item(cast(str, self.faker.uuid4()), cast(str, self.faker.uuid4()))
+        item['action'] = 'invalid'
+
+        resp = self.call_api({'updates': [item]})
+
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn('Invalid value for updates.0.action', json.loads(resp.get_data())['message'])
+        cast(Mock, self.incident_repo.get_views).assert_not_called()
+
+    def test_bulk_update_too_many_items(self) -> None:
+        items = [self.item(cast(str, self.faker.uuid4()), 'agent') for _ in range(101)]
+
+        resp = self.call_api({'updates': items})
+
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn('Invalid value for updates', json.loads(resp.get_data())['message'])
+
+
+class TestBulkIncidentUpdateRisk(TestCase):
+    API_ENDPOINT = '/api/v1/clients/{client_id}/incidents/update-risk'
+
+    def setUp(self) -> None:
+        self.faker = Faker()
+        self.app = create_app()
+        self.client = self.app.test_client()
+        self.client_id = cast(str, self.faker.uuid4())
+        self.incident_repo = Mock(IncidentRepository)
+
+    def call_api(self, body: dict[str, Any]) -> TestResponse:
+        with self.app.container.incident_repo.override(self.incident_repo):
+            return self.client.put(
+                self.API_ENDPOINT.format(client_id=self.client_id), data=json.dumps(body), content_type='application/json'
+            )
+
+    @patch('blueprints.bulk.send_notifications')
+    def test_bulk_update_risk(self, send_notifications: Mock) -> None:
+        ids = [cast(str, self.faker.uuid4()) for _ in range(5)]
+        views: list[IncidentView | None] = [
+            IncidentView(id=ids[0], client_id=self.client_id, risk=Risk.LOW, last_action=Action.CREATED),
+            IncidentView(id=ids[1], client_id=self.client_id, risk=Risk.HIGH, last_action=Action.CREATED),
+            IncidentView(id=ids[2], client_id=self.client_id, risk=Risk.LOW, last_action=Action.CLOSED),
+            None,
+            IncidentView(id=ids[4], client_id=self.client_id, risk=None, last_action=Action.CREATED),
+        ]
+        cast(Mock, self.incident_repo.get_views).return_value = views
+        cast(Mock, self.incident_repo.update_many).return_value = [None, None]
+        send_notifications.return_value = {}
+
+        items = [{'incident_id': incident_id, 'risk': Risk.HIGH} for incident_id in [*ids, 'not-a-uuid']]
+        resp = self.call_api({'incidents': items})
+
+        self.assertEqual(resp.status_code, 200)
+        results = json.loads(resp.get_data())['results']
+        self.assertEqual(
+            [(x['incident_id'], x['code'], x.get('updated')) for x in results],
+            [
+                (ids[0], 200, True),
+                (ids[1], 200, False),
+                (ids[2], 409, None),
+                (ids[3], 404, None),
+                (ids[4], 200, True),
+                ('not-a-uuid', 400, None),
+            ],
+        )
+
+        # Only the changed incidents are written, and only those with a previous risk are notified
+        updates = cast(Mock, self.incident_repo.update_many).call_args.args[0]
+        self.assertEqual([view.id for view in updates], [ids[0], ids[4]])
+        send_notifications.assert_called_once_with(self.client_id, [ids[0]], 'incident-risk-updated', loaded=None)
+
+    @patch('blueprints.bulk.send_notifications')
+    def test_bulk_update_risk_write_failed(self, send_notifications: Mock) -> None:
+        incident_id = cast(str, self.faker.uuid4())
+        cast(Mock, self.incident_repo.get_views).return_value = [
+            IncidentView(id=incident_id, client_id=self.client_id, risk=Risk.LOW, last_action=Action.CREATED)
+        ]
+        cast(Mock, self.incident_repo.update_many).return_value = [InternalServerError('error')]  # type: ignore[no-untyped-call]
+
+        resp = self.call_api({'incidents': [{'incident_id': incident_id, 'risk': Risk.HIGH}]})
+
+        self.assertEqual(json.loads(resp.get_data())['results'], [item_error(incident_id, UPDATE_FAILED_ERROR, 500)])
+        send_notifications.assert_not_called()
+
+    def test_bulk_update_risk_invalid(self) -> None:
+        resp = self.call_api({'incidents': [{'incident_id': cast(str, self.faker.uuid4()), 'risk': 'extreme'}]})
+
+        self.assertEqual(resp.status_code, 400)
+        cast(Mock, self.incident_repo.get_views).assert_not_called()
+
+
+class TestBulkRegistryIncident(TestCase):
+    API_ENDPOINT = '/api/v1/register/incidents'
+
+    def setUp(self) -> None:
+        self.faker = Faker()
+        self.app = create_app()
+        self.client = self.app.test_client()
+        self.incident_repo = Mock(IncidentRepository)
+
+    def item(self, client_id: str, description: str) -> dict[str, Any]:
+        return {
+            'client_id': client_id,
+            'name': self.faker.sentence(3),
+            'channel': 'email',
+            'reported_by': cast(str, self.faker.uuid4()),
+            'created_by': cast(str, self.faker.uuid4()),
+            'description': description,
+            'assigned_to': cast(str, self.faker.uuid4()),
+        }
+
+    def call_api(self, body: dict[str, Any]) -> TestResponse:
+        with self.app.container.incident_repo.override(self.incident_repo):
+            return self.client.post(self.API_ENDPOINT, data=json.dumps(body), content_type='application/json')
+
+    @patch('blueprints.bulk.send_notifications')
+    def test_bulk_register(self, send_notifications: Mock) -> None:
+        client_id = cast(str, self.faker.uuid4())
+        other_client_id = cast(str, self.faker.uuid4())
+        cast(Mock, self.incident_repo.create_many).return_value = [None, InternalServerError('error'), None, None]  # type: ignore[no-untyped-call]
+        cast(Mock, self.incident_repo.append_history_many).return_value = [None, None, InternalServerError('error')]  # type: ignore[no-untyped-call]
+        send_notifications.return_value = {}
+
+        items = [
+            self.item(client_id, 'Incidencia URGENTE'),
+            self.item(client_id, 'Not created'),
+            self.item(other_client_id, 'Created'),
+            self.item(client_id, 'Entry not written'),
+        ]
+        resp = self.call_api({'incidents': items})
+
+        self.assertEqual(resp.status_code, 200)
+        results = json.loads(resp.get_data())['results']
+        self.assertEqual([x['code'] for x in results], [201, 500, 201, 500])
+        self.assertEqual(results[1]['message'], REGISTER_FAILED_ERROR)
+        self.assertEqual([x['incident']['client_id'] for x in results[::2]], [client_id, other_client_id])
+
+        # Incidents and entries in one bulk write each, only the entries of the created incidents are appended
+        cast(Mock, self.incident_repo.create_many).assert_called_once()
+        entries = cast(Mock, self.incident_repo.append_history_many).call_args.args[0]
+        self.assertEqual([entry.description for entry in entries], ['Incidencia URGENTE', 'Created', 'Entry not written'])
+
+        first_id, second_id = results[0]['incident']['id'], results[2]['incident']['id']
+        self.assertEqual(
+            [call.args for call in send_notifications.call_args_list],
+            [
+                (client_id, [first_id], 'incident-update'),
+                (client_id, [first_id], 'incident-alert'),
+                (other_client_id, [second_id], 'incident-update'),
+            ],
+        )
+        self.assertEqual(send_notifications.call_args.kwargs['loaded'][second_id][1], [entries[1]])
+
+    @patch('blueprints.bulk.send_notifications')
+    def test_bulk_register_client_not_found(self, send_notifications: Mock) -> None:
+        cast(Mock, self.incident_repo.create_many).return_value = [None]
+        cast(Mock, self.incident_repo.append_history_many).return_value = [None]
+        send_notifications.side_effect = ValueError('Client not found.')
+
+        with self.assertLogs(self.app.logger, 'ERROR'):
+            resp = self.call_api({'incidents': [self.item(cast(str, self.faker.uuid4()), 'Created')]})
+
+        self.assertEqual([x['code'] for x in json.loads(resp.get_data())['results']], [201])
+
+    def test_bulk_register_invalid(self) -> None:
+        item = self.item(cast(str, self.faker.uuid4()), 'Invalid channel')
+        item['channel'] = 'fax'
+
+        resp = self.call_api({'incidents': [item]})
+
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn('Invalid value for incidents.0.channel', json.loads(resp.get_data())['message'])
+        cast(Mock, self.incident_repo.create_many).assert_not_called()
@@ -0,0 +1,77 @@
+import json
+from datetime import UTC, datetime, timedelta
+from typing import Any, cast
+
+from faker import Faker
+from unittest_parametrize import ParametrizedTestCase, parametrize
+
+from app import create_app
+from repositories.memory import MemoryIncidentRepository
+from tests.util import create_random_history_entry, create_random_incident
+from utils import INVALID_PARAMETER_ERROR
+
+
+class TestIncidentChangeFeed(ParametrizedTestCase):
+    def setUp(self) -> None:
+        self.faker = Faker()
+        self.app = create_app()
+        self.client = self.app.test_client()
+        self.repo = MemoryIncidentRepository()
+        self.client_id = cast(str, self.faker.uuid4())
+
+    def add_incident(self, modified: datetime) -> str:
+        incident = create_random_incident(self.faker, overrides={'client_id': self.client_id})
+        entry = create_random_history_entry(self.faker, seq=None, client_id=self.client_id, incident_id=incident.id)
+        entry.date = modified
+        self.repo.create(incident)
+        self.repo.append_history_entry(entry)
+        return incident.id
+
+    def call_api(self, **params: str) -> tuple[int, dict[str, Any]]:
+        with self.app.container.incident_repo.override(self.repo):
+            resp = self.client.get(f'/api/v1/clients/{self.client_id}/incidents/changes', query_string=params)
+
+        return resp.status_code, json.loads(resp.get_data())
+
+    def test_pages(self) -> None:
+        hour_ago = datetime.now(UTC).replace(microsecond=0) - timedelta(hours=1)
+        ids = [self.add_incident(hour_ago + timedelta(minutes=minutes)) for minutes in [2, 0, 1]]
+
+        status, first = self.call_api(limit='2')
+        _, second = self.call_api(limit='2', cursor=first['cursor'])
+        _, caught_up = self.call_api(limit='2', cursor=second['cursor'])
+
+        self.assertEqual(status, 200)
+        self.assertEqual([x['id'] for x in first['changes']], ids[1:])
+        self.assertEqual(first['changes'][0]['last_modified'], hour_ago.isoformat().replace('+00:00', 'Z'))
+        self.assertTrue(first['has_more'])
+        self.assertEqual(([x['id'] for x in second['changes']], second['has_more']), (ids[:1], False))
+        # Nothing new, the consumer keeps polling from the same position
+        self.assertEqual((caught_up['changes'], caught_up['cursor']), ([], second['cursor']))
+
+    def test_since_and_lag(self) -> None:
+        now = datetime.now(UTC)
+        self.add_incident(now - timedelta(days=1))
+        recent = self.add_incident(now - timedelta(minutes=5))
+        self.add_incident(now)
+
+        _, body = self.call_api(since=(now - timedelta(hours=1)).isoformat())
+
+        # The change stamped now is held back until the lag has passed
+        self.assertEqual([x['id'] for x in body['changes']], [recent])
+
+    @parametrize(
+        ('param', 'value'),
+        [
+            ('cursor', 'not-a-cursor'),
+            ('since', 'yesterday'),
+            ('limit', '0'),
+            ('limit', '501'),
+            ('limit', 'ten'),
+        ],
+    )
+    def test_invalid_parameter(self, param: str, value: str) -> None:
+        status, body = self.call_api(**{param: value})
+
+        self.assertEqual(status, 400)
+        self.assertEqual(body['message'], INVALID_PARAMETER_ERROR.format(param=param))
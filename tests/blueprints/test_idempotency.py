@@ -0,0 +1,158 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, cast
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from dependency_injector import providers
+from faker import Faker
+from werkzeug.test import TestResponse
+
+from app import create_app
+from models import IdempotencyRecord
+from repositories import IdempotencyRepository, IncidentRepository
+from repositories.memory import MemoryIdempotencyRepository, MemorySideEffectTaskRepository
+from utils import IDEMPOTENCY_IN_PROGRESS_ERROR, IDEMPOTENCY_KEY_ERROR, IDEMPOTENCY_MISMATCH_ERROR
+
+
+class TestIdempotency(TestCase):
+    REGISTER_INCIDENT_URL = '/api/v1/register/incident'
+
+    def setUp(self) -> None:
+        self.faker = Faker()
+        self.app = create_app()
+        self.client = self.app.test_client()
+        self.incident_repo = Mock(IncidentRepository)
+        self.idempotency_repo = MemoryIdempotencyRepository(max_size=10)
+
+    def body(self) -> dict[str, Any]:
+        return {
+            'client_id': cast(str, self.faker.uuid4()),
+            'name': 'Test Incident',
+            'channel': 'web',
+            'reported_by': cast(str, self.faker.uuid4()),
+            'created_by': cast(str, self.faker.uuid4()),
+            'description': 'Esto es una incidencia de prueba',
+            'assigned_to': cast(str, self.faker.uuid4()),
+        }
+
+    def call_api(
+        self, body: dict[str, Any], key: str | None, idempotency_repo: IdempotencyRepository | None = None
+    ) -> TestResponse:
+        headers = {} if key is None else {'Idempotency-Key': key}
+
+        with (
+            self.app.container.incident_repo.override(self.incident_repo),
+            self.app.container.idempotency_repo.override(idempotency_repo or self.idempotency_repo),
+        ):
+            return self.client.post(
+                self.REGISTER_INCIDENT_URL, data=json.dumps(body), content_type='application/json', headers=headers
+            )
+
+    @patch('blueprints.incident.send_notification')
+    def test_retry_replayed(self, send_notification: Mock) -> None:
+        body = self.body()
+
+        first = self.call_api(body, 'key')
+        retry = self.call_api(body, 'key')
+        other = self.call_api(body, 'other-key')
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual((retry.status_code, retry.get_data()), (201, first.get_data()))
+        self.assertEqual(retry.headers['Idempotent-Replayed'], 'true')
+        self.assertNotEqual(json.loads(other.get_data())['id'], json.loads(first.get_data())['id'])
+
+        # The retry neither wrote nor published anything
+        self.assertEqual(cast(Mock, self.incident_repo.create).call_count, 2)
+        self.assertEqual(send_notification.call_count, 2)
+
+    @patch('blueprints.incident.send_notification')
+    def test_replay_headers(self, _send_notification: Mock) -> None:
+        body = self.body()
+        executor = ThreadPoolExecutor(max_workers=1)
+
+        with (
+            self.app.container.side_effect_task_repo.override(MemorySideEffectTaskRepository(max_size=10)),
+            self.app.container.side_effect_executor.override(executor),
+            self.app.container.incident_repo.override(self.incident_repo),
+            self.app.container.idempotency_repo.override(self.idempotency_repo),
+        ):
+            first, retry = (
+                self.client.post(
+                    self.REGISTER_INCIDENT_URL,
+                    data=json.dumps(body),
+                    content_type='application/json',
+                    headers={'Idempotency-Key': 'key', 'Prefer': 'respond-async'},
+                )
+                for _ in range(2)
+            )
+        executor.shutdown(wait=True)
+
+        # The retry can follow the same Location as the first request
+        self.assertEqual(retry.status_code, 202)
+        for name in ['Content-Type', 'Location', 'Preference-Applied']:
+            self.assertEqual(retry.headers[name], first.headers[name])
+
+    @patch('blueprints.incident.send_notification')
+    def test_key_reused_with_other_body(self, _send_notification: Mock) -> None:
+        self.call_api(self.body(), 'key')
+
+        resp = self.call_api(self.body(), 'key')
+
+        self.assertEqual(resp.status_code, 422)
+        self.assertEqual(json.loads(resp.get_data())['message'], IDEMPOTENCY_MISMATCH_ERROR)
+
+    def test_in_progress(self) -> None:
+        in_progress = Mock(IdempotencyRepository)
+        cast(Mock, in_progress.create).side_effect = lambda record: IdempotencyRecord(
+            key=record.key, fingerprint=record.fingerprint, expires_at=record.expires_at
+        )
+
+        resp = self.call_api(self.body(), 'key', in_progress)
+
+        self.assertEqual(resp.status_code, 409)
+        self.assertEqual(json.loads(resp.get_data())['message'], IDEMPOTENCY_IN_PROGRESS_ERROR)
+        cast(Mock, self.incident_repo.create).assert_not_called()
+
+    @patch('blueprints.incident.send_notification')
+    def test_server_error_releases_key(self, send_notification: Mock) -> None:
+        body = self.body()
+        send_notification.side_effect = [ValueError('Client not found.'), None]
+
+        first = self.call_api(body, 'key')
+        retry = self.call_api(body, 'key')
+
+        self.assertEqual((first.status_code, retry.status_code), (500, 201))
+        self.assertNotIn('Idempotent-Replayed', retry.headers)
+
+    @patch('blueprints.incident.send_notification')
+    def test_store_unavailable(self, _send_notification: Mock) -> None:
+        unavailable = Mock(IdempotencyRepository)
+        cast(Mock, unavailable.create).side_effect = ConnectionError('unavailable')
+
+        with self.assertLogs(self.app.logger, 'ERROR'):
+            resp = self.call_api(self.body(), 'key', unavailable)
+
+        self.assertEqual(resp.status_code, 201)
+        cast(Mock, unavailable.complete).assert_not_called()
+
+    @patch('blueprints.incident.send_notification')
+    def test_store_built_lazily(self, _send_notification: Mock) -> None:
+        # Building the store fails without credentials, requests without a key must not need it
+        build = Mock(side_effect=RuntimeError('no credentials'))
+
+        with (
+            self.app.container.incident_repo.override(self.incident_repo),
+            self.app.container.idempotency_repo.override(providers.Callable(build)),
+        ):
+            health = self.client.get('/api/v1/health/incidentmodify')
+            write = self.client.post(self.REGISTER_INCIDENT_URL, data=json.dumps(self.body()), content_type='application/json')
+
+        self.assertEqual((health.status_code, write.status_code), (200, 201))
+        build.assert_not_called()
+
+    def test_invalid_key(self) -> None:
+        resp = self.call_api(self.body(), 'x' * 256)
+
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(json.loads(resp.get_data())['message'], IDEMPOTENCY_KEY_ERROR)
@@ -1,4 +1,5 @@
 import base64
+import io
 import json
 from typing import Any, cast
 from unittest.mock import Mock, patch
@@ -8,10 +9,20 @@ from unittest_parametrize import ParametrizedTestCase, parametrize
 from werkzeug.test import TestResponse
 
 from app import create_app
-from models import Action, Channel, Risk
+from models import Action, Channel, Incident, Risk
 from repositories import IncidentRepository
+from repositories.incident import incident_view
+from repositories.memory import MemoryIncidentRepository
+from services.incident import UPDATE_CHECK_FIELDS
 from tests.util import create_random_history_entry, create_random_incident
-from utils import CLOSED_INCIDENT_ERROR, INCIDENT_NOT_FOUND, INVALID_UUID_ERROR, JSON_VALIDATION_ERROR
+from utils import (
+    BODY_TOO_LARGE_ERROR,
+    CLOSED_INCIDENT_ERROR,
+    INCIDENT_NOT_FOUND,
+    INCIDENT_VERSION_ERROR,
+    INVALID_UUID_ERROR,
+    JSON_VALIDATION_ERROR,
+)
 
 
 class TestIncidentUpdate(ParametrizedTestCase):
@@ -229,6 +240,42 @@ class TestIncidentUpdate(ParametrizedTestCase):
                 resp_data, {'code': 400, 'message': f'Invalid value for {field}: Missing data for required field.'}
             )
 
+    def test_update_path_checked_first(self) -> None:
+        token = self.gen_token(client_id=str(self.faker.uuid4()))
+
+        resp = self.call_update_api(token, self.faker.word(), 'not json')
+
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(json.loads(resp.get_data()), {'code': 400, 'message': INVALID_UUID_ERROR.format(field='incident_id')})
+
+    def test_update_body_too_large(self) -> None:
+        token = self.gen_token(client_id=str(self.faker.uuid4()))
+        data = {'action': Action.ESCALATED.value, 'description': 'x' * 20000}
+
+        resp = self.call_update_api(token, str(self.faker.uuid4()), data)
+
+        self.assertEqual(resp.status_code, 413)
+        self.assertEqual(json.loads(resp.get_data()), {'code': 413, 'message': BODY_TOO_LARGE_ERROR})
+
+    def test_update_body_too_large_streamed(self) -> None:
+        token = self.gen_token(client_id=str(self.faker.uuid4()))
+        data = json.dumps({'action': Action.ESCALATED.value, 'description': 'x' * 20000}).encode()
+
+        # Chunked, without a Content-Length to reject it from
+        resp = self.client.post(
+            self.INCIDENT_UPDATE_URL.format(incident_id=str(self.faker.uuid4())),
+            headers={
+                'X-Apigateway-Api-Userinfo': base64.urlsafe_b64encode(json.dumps(token).encode()).decode(),
+                'Transfer-Encoding': 'chunked',
+            },
+            input_stream=io.BytesIO(data),
+            content_type='application/json',
+            environ_overrides={'wsgi.input_terminated': True},
+        )
+
+        self.assertEqual(resp.status_code, 413)
+        self.assertEqual(json.loads(resp.get_data()), {'code': 413, 'message': BODY_TOO_LARGE_ERROR})
+
     def test_update_incident_not_found(self) -> None:
         incident_id = str(self.faker.uuid4())
         data = {
@@ -239,7 +286,7 @@ class TestIncidentUpdate(ParametrizedTestCase):
         token = self.gen_token(client_id=str(self.faker.uuid4()))
 
         incident_repo_mock = Mock(IncidentRepository)
-        cast(Mock, incident_repo_mock.get).return_value = None
+        cast(Mock, incident_repo_mock.get_view).return_value = None
 
         with self.app.container.incident_repo.override(incident_repo_mock):
             resp = self.call_update_api(token, incident_id, data)
@@ -259,7 +306,7 @@ class TestIncidentUpdate(ParametrizedTestCase):
         token = self.gen_token(client_id=str(self.faker.uuid4()))
 
         incident_repo_mock = Mock(IncidentRepository)
-        cast(Mock, incident_repo_mock.get).return_value = incident
+        cast(Mock, incident_repo_mock.get_view).return_value = incident_view(incident, UPDATE_CHECK_FIELDS)
 
         with self.app.container.incident_repo.override(incident_repo_mock):
             resp = self.call_update_api(token, incident.id, data)
@@ -284,8 +331,9 @@ class TestIncidentUpdate(ParametrizedTestCase):
         incident_history[-1].action = Action.CLOSED
 
         incident_repo_mock = Mock(IncidentRepository)
-        cast(Mock, incident_repo_mock.get).return_value = incident
-        cast(Mock, incident_repo_mock.get_history).return_value = incident_history
+        cast(Mock, incident_repo_mock.get_view).return_value = incident_view(
+            incident, UPDATE_CHECK_FIELDS, incident_history[-1]
+        )
 
         with self.app.container.incident_repo.override(incident_repo_mock):
             resp = self.call_update_api(token, incident.id, data)
@@ -310,8 +358,9 @@ class TestIncidentUpdate(ParametrizedTestCase):
         incident_history[0].action = Action.CREATED
 
         incident_repo_mock = Mock(IncidentRepository)
-        cast(Mock, incident_repo_mock.get).return_value = incident
-        cast(Mock, incident_repo_mock.get_history).return_value = incident_history
+        cast(Mock, incident_repo_mock.get_view).return_value = incident_view(
+            incident, UPDATE_CHECK_FIELDS, incident_history[0]
+        )
 
         with self.app.container.incident_repo.override(incident_repo_mock):
             resp = self.call_update_api(token, incident.id, data)
@@ -321,6 +370,15 @@ class TestIncidentUpdate(ParametrizedTestCase):
 
         self.assertEqual(resp_data['action'], data['action'])
         self.assertEqual(resp_data['description'], data['description'])
+        self.assertEqual(resp.headers['X-Repository-Calls'], '2')
+
+        # A masked read for the checks and the append, the history is only read by the notification
+        cast(Mock, incident_repo_mock.get_view).assert_called_once_with(
+            client_id=token['cid'], incident_id=incident.id, fields=UPDATE_CHECK_FIELDS
+        )
+        cast(Mock, incident_repo_mock.append_history_entry).assert_called_once()
+        cast(Mock, incident_repo_mock.get_with_history).assert_not_called()
+        _send_notification.assert_called_once_with(token['cid'], incident.id, 'incident-update')
 
     def test_internal_invalid_json_body(self) -> None:
         token = self.gen_token(client_id=str(self.faker.uuid4()))
@@ -359,7 +417,7 @@ class TestIncidentUpdate(ParametrizedTestCase):
         incident_id = str(self.faker.uuid4())
 
         incident_repo_mock = Mock(IncidentRepository)
-        incident_repo_mock.get.return_value = None
+        incident_repo_mock.get_view.return_value = None
 
         with self.app.container.incident_repo.override(incident_repo_mock):
             response = self.call_internal_update_api(
@@ -375,7 +433,7 @@ class TestIncidentUpdate(ParametrizedTestCase):
         body = {'action': Action.CLOSED.value, 'description': 'Closing incident'}
 
         incident_repo_mock = Mock(IncidentRepository)
-        incident_repo_mock.get.return_value = incident
+        incident_repo_mock.get_view.return_value = incident_view(incident, UPDATE_CHECK_FIELDS)
 
         with self.app.container.incident_repo.override(incident_repo_mock):
             response = self.call_internal_update_api(token, incident.client_id, str(self.faker.uuid4()), incident.id, body)
@@ -390,8 +448,7 @@ class TestIncidentUpdate(ParametrizedTestCase):
         history[0].action = Action.CLOSED
 
         incident_repo_mock = Mock(IncidentRepository)
-        incident_repo_mock.get.return_value = incident
-        incident_repo_mock.get_history.return_value = history
+        incident_repo_mock.get_view.return_value = incident_view(incident, UPDATE_CHECK_FIELDS, history[0])
 
         with self.app.container.incident_repo.override(incident_repo_mock):
             response = self.call_internal_update_api(
@@ -410,8 +467,7 @@ class TestIncidentUpdate(ParametrizedTestCase):
         update_body = {'action': Action.ESCALATED.value, 'description': 'Escalating incident'}
 
         incident_repo_mock = Mock(IncidentRepository)
-        incident_repo_mock.get.return_value = incident
-        incident_repo_mock.get_history.return_value = [history_entry]
+        incident_repo_mock.get_view.return_value = incident_view(incident, UPDATE_CHECK_FIELDS, history_entry)
 
         with self.app.container.incident_repo.override(incident_repo_mock):
             response = self.call_internal_update_api(token, incident.client_id, incident.assigned_to, incident.id, update_body)
@@ -441,7 +497,7 @@ class TestIncidentUpdate(ParametrizedTestCase):
         data = {'risk': Risk.LOW.value}
 
         incident_repo_mock = Mock(IncidentRepository)
-        cast(Mock, incident_repo_mock.get).return_value = None
+        cast(Mock, incident_repo_mock.get_with_history).return_value = (None, [])
 
         with self.app.container.incident_repo.override(incident_repo_mock):
             resp = self.client.put(
@@ -460,10 +516,10 @@ class TestIncidentUpdate(ParametrizedTestCase):
         data = {'risk': Risk.MEDIUM.value}
 
         incident_repo_mock = Mock(IncidentRepository)
-        cast(Mock, incident_repo_mock.get).return_value = incident
-        cast(Mock, incident_repo_mock.get_history).return_value = [
-            create_random_history_entry(self.faker, seq=0, action=Action.CLOSED)
-        ]
+        cast(Mock, incident_repo_mock.get_with_history).return_value = (
+            incident,
+            [create_random_history_entry(self.faker, seq=0, action=Action.CLOSED)],
+        )
 
         with self.app.container.incident_repo.override(incident_repo_mock):
             resp = self.client.put(
@@ -512,9 +568,10 @@ class TestIncidentUpdate(ParametrizedTestCase):
         data = {'risk': updated_risk}
 
         incident_repo_mock = Mock(spec=IncidentRepository)
-        incident_repo_mock.get.return_value = incident
-        incident_repo_mock.get_history.return_value = [create_random_history_entry(self.faker, seq=0, action=Action.CREATED)]
-        incident_repo_mock.update.return_value = None
+        incident_repo_mock.get_with_history.return_value = (
+            incident,
+            [create_random_history_entry(self.faker, seq=0, action=Action.CREATED)],
+        )
 
         with self.app.container.incident_repo.override(incident_repo_mock):
             resp = self.client.put(
@@ -524,12 +581,46 @@ class TestIncidentUpdate(ParametrizedTestCase):
             )
 
         self.assertEqual(resp.status_code, expected_status_code)
+        self.assertEqual(resp.headers['X-Repository-Calls'], '2')
+        cast(Mock, incident_repo_mock.update_with_history).assert_called_once_with(incident, {'risk'}, None, None)
 
         if should_notify:
             _send_notification.assert_called_once_with(client_id, incident.id, 'incident-risk-updated')
         else:
             _send_notification.assert_not_called()
 
+    @patch('blueprints.incident.send_notification')
+    def test_update_risk_if_match(self, _send_notification: Mock) -> None:
+        incident_repo = MemoryIncidentRepository()
+        incident = create_random_incident(self.faker, overrides={'risk': Risk.LOW})
+        incident_repo.create(incident)
+        incident_repo.append_history_entry(
+            create_random_history_entry(
+                self.faker, seq=None, client_id=incident.client_id, incident_id=incident.id, action=Action.CREATED
+            )
+        )
+
+        def put(risk: Risk, if_match: str | None) -> TestResponse:
+            with self.app.container.incident_repo.override(incident_repo):
+                return self.client.put(
+                    f'/api/v1/clients/{incident.client_id}/incidents/{incident.id}/update-risk',
+                    data=json.dumps({'risk': risk}),
+                    content_type='application/json',
+                    headers={} if if_match is None else {'If-Match': if_match},
+                )
+
+        first = put(Risk.MEDIUM, None)
+        second = put(Risk.HIGH, first.headers['ETag'])
+        stale = put(Risk.LOW, first.headers['ETag'])
+
+        self.assertEqual((first.status_code, second.status_code, stale.status_code), (200, 200, 412))
+        self.assertNotEqual(first.headers['ETag'], second.headers['ETag'])
+        self.assertEqual(json.loads(stale.get_data())['message'], INCIDENT_VERSION_ERROR)
+        self.assertEqual(cast(Incident, incident_repo.get(incident.client_id, incident.id)).risk, Risk.HIGH)
+
+        self.assertEqual(put(Risk.LOW, '*').status_code, 200)
+        self.assertEqual(put(Risk.LOW, 'W/"1", "2"').status_code, 400)
+
     def test_update_risk_validation_error(self) -> None:
         client_id = str(self.faker.uuid4())
         incident_id = str(self.faker.uuid4())
@@ -0,0 +1,272 @@
+import base64
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, cast
+from unittest.mock import AsyncMock, Mock, patch
+
+from faker import Faker
+from google.api_core.exceptions import FailedPrecondition
+from unittest_parametrize import ParametrizedTestCase, parametrize
+from werkzeug.test import TestResponse
+
+from app import create_app
+from models import Action, Channel, Incident, Risk
+from repositories import AsyncIncidentRepository
+from repositories.incident import incident_view
+from repositories.memory import MemorySideEffectTaskRepository
+from services.incident import UPDATE_CHECK_FIELDS
+from tests.util import create_random_history_entry, create_random_incident
+from utils import (
+    CLOSED_INCIDENT_ERROR,
+    IF_MATCH_ERROR,
+    INCIDENT_NOT_FOUND,
+    INCIDENT_VERSION_ERROR,
+    UNAUTHORIZED_INCIDENT_ERROR,
+)
+
+
+class TestIncidentAsync(ParametrizedTestCase):
+    INCIDENT_INTERNAL_UPDATE_URL = '/api/v1/clients/{client_id}/employees/{assigned_to}/incidents/{incident_id}/update'
+    REGISTER_INCIDENT_URL = '/api/v1/register/incident'
+    INCIDENT_UPDATE_URL = '/api/v1/incidents/{incident_id}/update'
+    INCIDENT_UPDATE_RISK_URL = '/api/v1/clients/{client_id}/incidents/{incident_id}/update-risk'
+
+    def setUp(self) -> None:
+        self.faker = Faker()
+
+        with patch.dict(os.environ, {'INCIDENT_REPO_BACKEND': 'firestore_async'}):
+            self.app = create_app()
+
+        self.client = self.app.test_client()
+        self.incident_repo_mock = Mock(AsyncIncidentRepository)
+
+    def gen_token(self, *, client_id: str) -> dict[str, Any]:
+        return {
+            'sub': cast(str, self.faker.uuid4()),
+            'cid': client_id,
+            'role': 'agent',
+            'aud': 'agent',
+        }
+
+    def call_update_api(self, token: dict[str, Any], incident_id: str, body: dict[str, Any]) -> TestResponse:
+        token_encoded = base64.urlsafe_b64encode(json.dumps(token).encode()).decode()
+
+        with self.app.container.async_incident_repo.override(self.incident_repo_mock):
+            return self.client.post(
+                self.INCIDENT_UPDATE_URL.format(incident_id=incident_id),
+                headers={'X-Apigateway-Api-Userinfo': token_encoded},
+                data=json.dumps(body),
+                content_type='application/json',
+            )
+
+    def test_blueprint_selected(self) -> None:
+        self.assertIn('Incident (async)', self.app.blueprints)
+        self.assertNotIn('Incident', self.app.blueprints)
+
+    @patch('blueprints.incident_async.send_notification_async', new_callable=AsyncMock)
+    def test_register_incident(self, send_notification_mock: AsyncMock) -> None:
+        payload = {
+            'client_id': str(self.faker.uuid4()),
+            'name': 'Test Incident',
+            'channel': Channel.WEB.value,
+            'reported_by': str(self.faker.uuid4()),
+            'created_by': str(self.faker.uuid4()),
+            'description': 'Esto es una incidencia urgente de prueba',
+            'assigned_to': str(self.faker.uuid4()),
+        }
+
+        with self.app.container.async_incident_repo.override(self.incident_repo_mock):
+            resp = self.client.post(self.REGISTER_INCIDENT_URL, data=json.dumps(payload), content_type='application/json')
+
+        self.assertEqual(resp.status_code, 201)
+        resp_data = json.loads(resp.get_data())
+        self.assertEqual(resp_data['client_id'], payload['client_id'])
+        cast(AsyncMock, self.incident_repo_mock.create).assert_awaited_once()
+        cast(AsyncMock, self.incident_repo_mock.append_history_entry).assert_awaited_once()
+
+        topics = [c.args[2] for c in send_notification_mock.await_args_list]
+        self.assertEqual(sorted(topics), ['incident-alert', 'incident-update'])
+
+    def test_update_no_token(self) -> None:
+        resp = self.client.post(
+            self.INCIDENT_UPDATE_URL.format(incident_id=self.faker.uuid4()), data='{}', content_type='application/json'
+        )
+
+        self.assertEqual(resp.status_code, 401)
+        self.assertEqual(json.loads(resp.get_data()), {'code': 401, 'message': 'Token is missing'})
+
+    @parametrize(
+        'case, expected_status, expected_message',
+        [
+            ('not_found', 404, INCIDENT_NOT_FOUND),
+            ('not_assigned', 403, UNAUTHORIZED_INCIDENT_ERROR),
+            ('closed', 409, CLOSED_INCIDENT_ERROR),
+        ],
+    )
+    def test_update_errors(self, case: str, expected_status: int, expected_message: str) -> None:
+        token = self.gen_token(client_id=str(self.faker.uuid4()))
+        assigned_to = cast(str, self.faker.uuid4()) if case == 'not_assigned' else token['sub']
+        incident = create_random_incident(self.faker, overrides={'client_id': token['cid'], 'assigned_to': assigned_to})
+        last_entry = create_random_history_entry(
+            self.faker, seq=1, action=Action.CLOSED if case == 'closed' else Action.ESCALATED
+        )
+
+        cast(AsyncMock, self.incident_repo_mock.get_view).return_value = (
+            None if case == 'not_found' else incident_view(incident, UPDATE_CHECK_FIELDS, last_entry)
+        )
+
+        resp = self.call_update_api(token, incident.id, {'action': Action.ESCALATED.value, 'description': 'Test'})
+
+        self.assertEqual(resp.status_code, expected_status)
+        self.assertEqual(json.loads(resp.get_data()), {'code': expected_status, 'message': expected_message})
+        cast(AsyncMock, self.incident_repo_mock.append_history_entry).assert_not_awaited()
+
+    @patch('blueprints.incident_async.send_notification_async', new_callable=AsyncMock)
+    def test_update(self, send_notification_mock: AsyncMock) -> None:
+        token = self.gen_token(client_id=str(self.faker.uuid4()))
+        incident = create_random_incident(self.faker, overrides={'client_id': token['cid'], 'assigned_to': token['sub']})
+        last_entry = create_random_history_entry(self.faker, seq=0, action=Action.CREATED)
+        body = {'action': Action.ESCALATED.value, 'description': 'Escalating incident'}
+
+        cast(AsyncMock, self.incident_repo_mock.get_view).return_value = incident_view(
+            incident, UPDATE_CHECK_FIELDS, last_entry
+        )
+
+        resp = self.call_update_api(token, incident.id, body)
+
+        self.assertEqual(resp.status_code, 201)
+        resp_data = json.loads(resp.get_data())
+        self.assertEqual(resp_data['action'], body['action'])
+        self.assertEqual(resp_data['description'], body['description'])
+        self.assertEqual(resp.headers['X-Repository-Calls'], '2')
+        cast(AsyncMock, self.incident_repo_mock.get_view).assert_awaited_once_with(
+            client_id=token['cid'], incident_id=incident.id, fields=UPDATE_CHECK_FIELDS
+        )
+        send_notification_mock.assert_awaited_once_with(incident.client_id, incident.id, 'incident-update')
+
+    @patch('blueprints.incident_async.send_notification_async', new_callable=AsyncMock)
+    def test_update_respond_async(self, send_notification_mock: AsyncMock) -> None:
+        token = self.gen_token(client_id=str(self.faker.uuid4()))
+        incident = create_random_incident(self.faker, overrides={'client_id': token['cid'], 'assigned_to': token['sub']})
+        task_repo = MemorySideEffectTaskRepository(max_size=10)
+        executor = ThreadPoolExecutor(max_workers=1)
+        token_encoded = base64.urlsafe_b64encode(json.dumps(token).encode()).decode()
+
+        cast(AsyncMock, self.incident_repo_mock.get_view).return_value = incident_view(incident, UPDATE_CHECK_FIELDS)
+
+        with (
+            self.app.container.async_incident_repo.override(self.incident_repo_mock),
+            self.app.container.side_effect_task_repo.override(task_repo),
+            self.app.container.side_effect_executor.override(executor),
+        ):
+            resp = self.client.post(
+                self.INCIDENT_UPDATE_URL.format(incident_id=incident.id),
+                headers={'X-Apigateway-Api-Userinfo': token_encoded, 'Prefer': 'respond-async'},
+                data=json.dumps({'action': Action.ESCALATED.value, 'description': 'Test'}),
+                content_type='application/json',
+            )
+            # Waits for the notification sent in the background
+            executor.shutdown(wait=True)
+            status = self.client.get(resp.headers['Location'])
+
+        self.assertEqual(resp.status_code, 202)
+        self.assertEqual(resp.headers['Preference-Applied'], 'respond-async')
+        self.assertEqual(json.loads(status.get_data())['status'], 'succeeded')
+        send_notification_mock.assert_awaited_once_with(incident.client_id, incident.id, 'incident-update')
+
+    @patch('blueprints.incident_async.send_notification_async', new_callable=AsyncMock)
+    def test_internal_update(self, send_notification_mock: AsyncMock) -> None:
+        incident = create_random_incident(self.faker)
+        body = {'action': Action.AI_RESPONSE.value, 'description': 'AI response'}
+
+        cast(AsyncMock, self.incident_repo_mock.get_view).return_value = incident_view(incident, UPDATE_CHECK_FIELDS)
+
+        with self.app.container.async_incident_repo.override(self.incident_repo_mock):
+            resp = self.client.post(
+                self.INCIDENT_INTERNAL_UPDATE_URL.format(
+                    client_id=incident.client_id, assigned_to=incident.assigned_to, incident_id=incident.id
+                ),
+                data=json.dumps(body),
+                content_type='application/json',
+            )
+
+        self.assertEqual(resp.status_code, 201)
+        send_notification_mock.assert_awaited_once_with(incident.client_id, incident.id, 'incident-update')
+
+    @parametrize(
+        'initial_risk, updated_risk, should_notify',
+        [
+            (Risk.LOW.value, Risk.HIGH.value, True),
+            (Risk.HIGH.value, Risk.HIGH.value, False),
+        ],
+    )
+    @patch('blueprints.incident_async.send_notification_async', new_callable=AsyncMock)
+    def test_update_risk(
+        self,
+        send_notification_mock: AsyncMock,
+        initial_risk: str,
+        updated_risk: str,
+        should_notify: bool,  # noqa: FBT001
+    ) -> None:
+        incident = create_random_incident(self.faker, overrides={'risk': initial_risk})
+
+        cast(AsyncMock, self.incident_repo_mock.get_with_history).return_value = (
+            incident,
+            [create_random_history_entry(self.faker, seq=0, action=Action.CREATED)],
+        )
+
+        with self.app.container.async_incident_repo.override(self.incident_repo_mock):
+            resp = self.client.put(
+                self.INCIDENT_UPDATE_RISK_URL.format(client_id=incident.client_id, incident_id=incident.id),
+                data=json.dumps({'risk': updated_risk}),
+                content_type='application/json',
+            )
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(json.loads(resp.get_data())['risk'], updated_risk)
+        self.assertEqual(resp.headers['X-Repository-Calls'], '2')
+        cast(AsyncMock, self.incident_repo_mock.update).assert_awaited_once()
+
+        if should_notify:
+            send_notification_mock.assert_awaited_once_with(incident.client_id, incident.id, 'incident-risk-updated')
+        else:
+            send_notification_mock.assert_not_awaited()
+
+    @parametrize(
+        'if_match, error, expected_status, expected_message',
+        [
+            ('"v1"', None, 200, None),
+            ('"v1"', FailedPrecondition('modified'), 412, INCIDENT_VERSION_ERROR),  # type: ignore[no-untyped-call]
+            ('"v1", "v2"', None, 400, IF_MATCH_ERROR),
+        ],
+    )
+    def test_update_risk_if_match(
+        self, if_match: str, error: Exception | None, expected_status: int, expected_message: str | None
+    ) -> None:
+        incident = create_random_incident(self.faker, overrides={'risk': Risk.LOW})
+        cast(AsyncMock, self.incident_repo_mock.get_with_history).return_value = (
+            incident,
+            [create_random_history_entry(self.faker, seq=0, action=Action.CREATED)],
+        )
+
+        async def update(updated: Incident, expected_version: str | None = None) -> None:  # noqa: ARG001
+            if error is not None:
+                raise error
+            updated.version = 'v2'
+
+        cast(AsyncMock, self.incident_repo_mock.update).side_effect = update
+
+        with self.app.container.async_incident_repo.override(self.incident_repo_mock):
+            resp = self.client.put(
+                self.INCIDENT_UPDATE_RISK_URL.format(client_id=incident.client_id, incident_id=incident.id),
+                data=json.dumps({'risk': Risk.LOW.value}),
+                content_type='application/json',
+                headers={'If-Match': if_match},
+            )
+
+        self.assertEqual(resp.status_code, expected_status)
+        self.assertEqual(json.loads(resp.get_data()).get('message'), expected_message)
+        self.assertEqual(resp.headers.get('ETag'), '"v2"' if expected_message is None else None)
+        if expected_status != 400:  # noqa: PLR2004
+            cast(AsyncMock, self.incident_repo_mock.update).assert_awaited_once_with(incident, expected_version='v1')
@@ -0,0 +1,65 @@
+import json
+import os
+from typing import cast
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from faker import Faker
+
+from app import create_app
+from repositories import IncidentRepository
+from repositories.cached import CachedIncidentRepository
+
+
+class TestMetrics(TestCase):
+    API_ENDPOINT = '/api/v1/metrics/incidentmodify'
+
+    def setUp(self) -> None:
+        self.app = create_app()
+        self.client = self.app.test_client()
+
+    def test_metrics(self) -> None:
+        incident_repo_mock = Mock(IncidentRepository)
+        cast(Mock, incident_repo_mock.metrics).return_value = {'foo': 1}
+
+        with self.app.container.incident_repo.override(incident_repo_mock):
+            resp = self.client.get(self.API_ENDPOINT)
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(json.loads(resp.get_data()), {'incident_repo': {'foo': 1}})
+
+    def test_metrics_cache_enabled(self) -> None:
+        firestore_repo_mock = Mock(IncidentRepository)
+        cast(Mock, firestore_repo_mock.metrics).return_value = {}
+        self.app.container.config.incident_cache.mode.from_value('enabled')
+
+        with self.app.container.firestore_incident_repo.override(firestore_repo_mock):
+            self.assertIsInstance(self.app.container.cached_incident_repo(), CachedIncidentRepository)
+            resp = self.client.get(self.API_ENDPOINT)
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(
+            json.loads(resp.get_data()),
+            {'incident_repo': {'incident_cache': {'hits': 0, 'misses': 0, 'evictions': 0, 'size': 0, 'max_size': 1024}}},
+        )
+
+    def test_metrics_instrumentation_enabled(self) -> None:
+        with patch.dict(os.environ, {'REPO_INSTRUMENTATION': 'enabled'}):
+            app = create_app()
+
+        faker = Faker()
+        client = app.test_client()
+        incident_repo_mock = Mock(IncidentRepository)
+        cast(Mock, incident_repo_mock.metrics).return_value = {}
+        cast(Mock, incident_repo_mock.get_view).return_value = None
+        ids = [cast(str, faker.uuid4()) for _ in range(3)]
+        url = '/api/v1/clients/{}/employees/{}/incidents/{}/update'.format(*ids)
+
+        with app.container.storage_incident_repo.override(incident_repo_mock):
+            client.post(url, data=json.dumps({'action': 'escalated', 'description': 'Test'}), content_type='application/json')
+            resp = client.get(self.API_ENDPOINT)
+
+        self.assertEqual(resp.status_code, 200)
+        repositories = json.loads(resp.get_data())['repositories']
+        self.assertEqual(list(repositories), ['Incident.IncidentUpdate'])
+        self.assertEqual(repositories['Incident.IncidentUpdate']['incident_repo.get_view']['calls'], 1)
@@ -1,13 +1,15 @@
+import asyncio
+import json
 from typing import cast
-from unittest.mock import Mock, patch
+from unittest.mock import AsyncMock, Mock, patch
 
 from faker import Faker
 from google.cloud.pubsub_v1 import PublisherClient  # type: ignore[import-untyped]
 from unittest_parametrize import ParametrizedTestCase, parametrize
 
-from blueprints.notification import send_notification
+from blueprints.notification import send_notification, send_notification_async, send_notifications
 from models import Action, Client, Employee, InvitationStatus, Plan, Role, User
-from repositories import ClientRepository, EmployeeRepository, IncidentRepository, UserRepository
+from repositories import AsyncIncidentRepository, ClientRepository, EmployeeRepository, IncidentRepository, UserRepository
 from tests.util import create_random_history_entry, create_random_incident
 
 
@@ -78,8 +80,9 @@ class TestNotification(ParametrizedTestCase):
         cast(Mock, client_repo_mock.get).return_value = None if error == 'client' else client
 
         incident_repo_mock = Mock(IncidentRepository)
-        cast(Mock, incident_repo_mock.get).return_value = None if error == 'incident' else incident
-        cast(Mock, incident_repo_mock.get_history).return_value = (x for x in incident_history)
+        cast(Mock, incident_repo_mock.get_with_history).return_value = (
+            (None, []) if error == 'incident' else (incident, incident_history)
+        )
 
         user_repo_mock = Mock(UserRepository)
         cast(Mock, user_repo_mock.get).return_value = None if error == 'user' else user
@@ -117,3 +120,150 @@ class TestNotification(ParametrizedTestCase):
             )
 
             cast(Mock, mock_pubsub.publish).assert_called_once()
+
+    @patch('blueprints.notification.build_notification', return_value={})
+    @patch('blueprints.notification.PublisherClient')
+    def test_notifications(self, publisher_client_mock: Mock, _build_notification: Mock) -> None:
+        incident = create_random_incident(self.faker)
+        history = [create_random_history_entry(self.faker, seq=0, action=Action.CREATED)]
+        missing_id = cast(str, self.faker.uuid4())
+
+        client_repo_mock = Mock(ClientRepository)
+        incident_repo_mock = Mock(IncidentRepository)
+        cast(Mock, incident_repo_mock.get_with_history).side_effect = lambda client_id, incident_id: (  # noqa: ARG005
+            (incident, history) if incident_id == incident.id else (None, [])
+        )
+
+        errors = send_notifications(
+            incident.client_id,
+            [incident.id, missing_id, incident.id],
+            'incident-update',
+            client_repo=client_repo_mock,
+            incident_repo=incident_repo_mock,
+            project_id='project',
+            employee_repo=Mock(EmployeeRepository),
+            user_repo=Mock(UserRepository),
+        )
+
+        self.assertEqual(list(errors), [missing_id])
+        # One publisher for the batch, one message per notified incident
+        publisher_client_mock.assert_called_once()
+        self.assertEqual(cast(Mock, publisher_client_mock.return_value.publish).call_count, 1)
+        self.assertEqual(cast(Mock, incident_repo_mock.get_with_history).call_count, 2)
+
+        errors = send_notifications(
+            incident.client_id,
+            [incident.id],
+            'incident-update',
+            loaded={incident.id: (incident, history)},
+            client_repo=client_repo_mock,
+            incident_repo=incident_repo_mock,
+            project_id='project',
+            employee_repo=Mock(EmployeeRepository),
+            user_repo=Mock(UserRepository),
+        )
+
+        self.assertEqual(errors, {})
+        self.assertEqual(cast(Mock, incident_repo_mock.get_with_history).call_count, 2)
+
+    @patch('blueprints.notification.publish')
+    def test_notification_loaded(self, publish_mock: Mock) -> None:
+        incident = create_random_incident(self.faker)
+        history = [create_random_history_entry(self.faker, seq=0, action=Action.CREATED)]
+        incident_repo_mock = Mock(IncidentRepository)
+
+        send_notification(
+            incident.client_id,
+            incident.id,
+            'incident-update',
+            loaded=(incident, history),
+            client_repo=Mock(ClientRepository),
+            incident_repo=incident_repo_mock,
+            project_id='project',
+            employee_repo=Mock(EmployeeRepository),
+            user_repo=Mock(UserRepository),
+        )
+
+        cast(Mock, incident_repo_mock.get_with_history).assert_not_called()
+        self.assertEqual(publish_mock.call_args.args[2]['id'], incident.id)
+
+    @parametrize(
+        ('error',),
+        [
+            (None,),
+            ('employee',),
+            ('client',),
+            ('incident',),
+        ],
+    )
+    @patch('blueprints.notification.PublisherClient')
+    def test_notification_async(self, publisher_client_mock: Mock, error: str) -> None:
+        client_id = cast(str, self.faker.uuid4())
+        user_id = cast(str, self.faker.uuid4())
+        agent_id = cast(str, self.faker.uuid4())
+
+        user = User(id=user_id, client_id=client_id, name=self.faker.name(), email=self.faker.email())
+        employee = Employee(
+            id=agent_id,
+            client_id=client_id,
+            name=self.faker.name(),
+            email=self.faker.email(),
+            role=Role.AGENT,
+            invitation_status=InvitationStatus.ACCEPTED,
+            invitation_date=self.faker.past_datetime(),
+        )
+        client = Client(
+            id=client_id,
+            name=self.faker.company(),
+            plan=cast(Plan, self.faker.random_element(list(Plan))),
+            email_incidents=self.faker.email(),
+        )
+        incident = create_random_incident(
+            self.faker,
+            overrides={'client_id': client_id, 'reported_by': user_id, 'created_by': agent_id, 'assigned_to': agent_id},
+        )
+        incident_history = [
+            create_random_history_entry(self.faker, seq=i, client_id=client_id, incident_id=incident.id) for i in range(3)
+        ]
+
+        client_repo_mock = Mock(ClientRepository)
+        cast(Mock, client_repo_mock.get).return_value = None if error == 'client' else client
+
+        incident_repo_mock = Mock(AsyncIncidentRepository)
+        cast(AsyncMock, incident_repo_mock.get_with_history).return_value = (
+            (None, []) if error == 'incident' else (incident, incident_history)
+        )
+
+        # created_by is an employee, so the user lookup for it misses
+        user_repo_mock = Mock(UserRepository)
+        cast(Mock, user_repo_mock.get).side_effect = lambda user_id, _client_id: user if user_id == user.id else None
+
+        employee_repo_mock = Mock(EmployeeRepository)
+        cast(Mock, employee_repo_mock.get).return_value = None if error == 'employee' else employee
+
+        mock_pubsub = Mock(PublisherClient)
+        publisher_client_mock.side_effect = lambda: mock_pubsub
+
+        coro = send_notification_async(
+            client_id,
+            incident.id,
+            'incident-update',
+            client_repo=client_repo_mock,
+            incident_repo=incident_repo_mock,
+            project_id='project',
+            employee_repo=employee_repo_mock,
+            user_repo=user_repo_mock,
+        )
+
+        if error is not None:
+            with self.assertRaises(ValueError):
+                asyncio.run(coro)
+
+            cast(Mock, mock_pubsub.publish).assert_not_called()
+        else:
+            asyncio.run(coro)
+
+            cast(Mock, mock_pubsub.publish).assert_called_once()
+            data = json.loads(cast(Mock, mock_pubsub.publish).call_args.args[1])
+            self.assertEqual(data['createdBy']['id'], agent_id)
+            self.assertEqual([x['seq'] for x in data['history']], [0, 1, 2])
@@ -1,11 +1,17 @@
+import json
+import os
 from typing import cast
-from unittest.mock import Mock
+from unittest.mock import Mock, patch
 
 from unittest_parametrize import ParametrizedTestCase, parametrize
 
 import demo
 from app import create_app
+from models import HistoryEntry, Incident
 from repositories import IncidentRepository
+from repositories.memory import MemoryIncidentRepository
+
+CLIENT_ID = '6d0b1e2a-4a8e-4d3c-9c51-2f6e0b1c7a42'
 
 
 class TestReset(ParametrizedTestCase):
@@ -31,22 +37,91 @@ class TestReset(ParametrizedTestCase):
         incident_repo_mock = Mock(IncidentRepository)
         call_order = []
 
-        cast(Mock, incident_repo_mock.delete_all).side_effect = lambda: call_order.append('delete_all')
-        cast(Mock, incident_repo_mock.create).side_effect = lambda _x: call_order.append('create')
-        cast(Mock, incident_repo_mock.append_history_entry).side_effect = lambda _x: call_order.append('append_history_entry')
+        def delete_all(client_id: str | None) -> dict[str, int]:
+            call_order.append('delete_all')
+            return {CLIENT_ID: 5} if client_id is None else {}
+
+        def create_many(incidents: list[Incident]) -> list[Exception | None]:
+            call_order.append('create_many')
+            return [None] * len(incidents)
+
+        def append_history_many(entries: list[HistoryEntry]) -> list[Exception | None]:
+            call_order.append('append_history_many')
+            return [None] * len(entries)
+
+        cast(Mock, incident_repo_mock.delete_all).side_effect = delete_all
+        cast(Mock, incident_repo_mock.create_many).side_effect = create_many
+        cast(Mock, incident_repo_mock.append_history_many).side_effect = append_history_many
 
         with self.app.container.incident_repo.override(incident_repo_mock):
             resp = self.client.post(self.API_ENDPOINT + (f'?demo={arg}' if arg is not None else ''))
 
-        cast(Mock, incident_repo_mock.delete_all).assert_called_once()
+        cast(Mock, incident_repo_mock.delete_all).assert_called_once_with(client_id=None)
 
         if expected:
-            expected_call_order = ['delete_all']
+            self.assertEqual(call_order, ['delete_all', 'create_many', 'append_history_many'])
+            cast(Mock, incident_repo_mock.create_many).assert_called_once_with(demo.incidents)
+
+            entries = cast(Mock, incident_repo_mock.append_history_many).call_args.args[0]
+            expected_entries = [entry for incident in demo.incidents for entry in demo.history[incident.id]]
+            self.assertEqual(entries, expected_entries)
+        else:
+            self.assertEqual(call_order, ['delete_all'])
+
+        self.assertEqual(resp.status_code, 200)
+        resp_data = json.loads(resp.get_data())
+        self.assertEqual(resp_data['status'], 'Ok')
+        self.assertEqual(resp_data['deleted'], {CLIENT_ID: 5})
+        self.assertEqual('demo' in resp_data['timing'], expected)
+
+    def test_reset_client(self) -> None:
+        client_id = demo.incidents[-1].client_id
+        incident_repo_mock = Mock(IncidentRepository)
+        cast(Mock, incident_repo_mock.delete_all).return_value = {client_id: 3}
+        cast(Mock, incident_repo_mock.create_many).side_effect = lambda x: [None] * len(x)
+        cast(Mock, incident_repo_mock.append_history_many).side_effect = lambda x: [None] * len(x)
+
+        with self.app.container.incident_repo.override(incident_repo_mock):
+            resp = self.client.post(self.API_ENDPOINT + f'?demo=true&client_id={client_id}')
+
+        cast(Mock, incident_repo_mock.delete_all).assert_called_once_with(client_id=client_id)
 
-            for incident in demo.incidents:
-                expected_call_order.append('create')
-                expected_call_order += ['append_history_entry'] * len(demo.history[incident.id])
+        incidents = cast(Mock, incident_repo_mock.create_many).call_args.args[0]
+        self.assertGreater(len(incidents), 0)
+        self.assertTrue(all(incident.client_id == client_id for incident in incidents))
 
-            self.assertEqual(call_order, expected_call_order)
+        entries = cast(Mock, incident_repo_mock.append_history_many).call_args.args[0]
+        self.assertTrue(all(entry.client_id == client_id for entry in entries))
 
         self.assertEqual(resp.status_code, 200)
+        self.assertEqual(json.loads(resp.get_data())['deleted'], {client_id: 3})
+
+    def test_reset_demo_error(self) -> None:
+        incident_repo_mock = Mock(IncidentRepository)
+        cast(Mock, incident_repo_mock.delete_all).return_value = {}
+        cast(Mock, incident_repo_mock.create_many).side_effect = lambda x: [ValueError('error')] + [None] * (len(x) - 1)
+
+        with self.app.container.incident_repo.override(incident_repo_mock):
+            resp = self.client.post(self.API_ENDPOINT + '?demo=true')
+
+        cast(Mock, incident_repo_mock.append_history_many).assert_not_called()
+        self.assertEqual(resp.status_code, 500)
+        self.assertEqual(json.loads(resp.get_data()), {'status': 'Error'})
+
+    def test_reset_demo_memory(self) -> None:
+        with patch.dict(os.environ, {'INCIDENT_REPO_BACKEND': 'memory'}):
+            app = create_app()
+
+        # The repository under the request memo
+        incident_repo = app.container.cached_incident_repo()
+        self.assertIsInstance(incident_repo, MemoryIncidentRepository)
+
+        resp = app.test_client().post(self.API_ENDPOINT + '?demo=true')
+
+        self.assertEqual(resp.status_code, 200)
+        incident = demo.incidents[0]
+        self.assertEqual(incident_repo.get(client_id=incident.client_id, incident_id=incident.id), incident)
+        history = incident_repo.get_history(client_id=incident.client_id, incident_id=incident.id)
+        self.assertEqual(len(list(history)), len(demo.history[incident.id]))
+
+        app.container.unwire()
@@ -0,0 +1,138 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, cast
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from faker import Faker
+from werkzeug.test import TestResponse
+
+from app import create_app
+from models import Action, Risk
+from repositories import SideEffectTaskRepository
+from repositories.memory import MemoryIncidentRepository, MemorySideEffectTaskRepository
+from tests.util import create_random_history_entry, create_random_incident
+from utils import TASK_NOT_FOUND
+
+
+class TestSideEffects(TestCase):
+    REGISTER_INCIDENT_URL = '/api/v1/register/incident'
+
+    def setUp(self) -> None:
+        self.faker = Faker()
+        self.app = create_app()
+        self.client = self.app.test_client()
+        self.incident_repo = MemoryIncidentRepository()
+        self.task_repo = MemorySideEffectTaskRepository(max_size=10)
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    def body(self, description: str = 'Esto es una incidencia de prueba') -> dict[str, Any]:
+        return {
+            'client_id': cast(str, self.faker.uuid4()),
+            'name': 'Test Incident',
+            'channel': 'web',
+            'reported_by': cast(str, self.faker.uuid4()),
+            'created_by': cast(str, self.faker.uuid4()),
+            'description': description,
+            'assigned_to': cast(str, self.faker.uuid4()),
+        }
+
+    def call(self, method: str, url: str, body: dict[str, Any] | None = None, prefer: str | None = None) -> TestResponse:
+        with (
+            self.app.container.incident_repo.override(self.incident_repo),
+            self.app.container.side_effect_task_repo.override(self.task_repo),
+            self.app.container.side_effect_executor.override(self.executor),
+        ):
+            resp = self.client.open(
+                url,
+                method=method,
+                data=None if body is None else json.dumps(body),
+                content_type='application/json',
+                headers={} if prefer is None else {'Prefer': prefer},
+            )
+            # Waits for the side effects running in the background
+            self.executor.shutdown(wait=True)
+            self.executor = ThreadPoolExecutor(max_workers=1)
+            return resp
+
+    @patch('blueprints.incident.send_notification')
+    def test_register_async(self, send_notification: Mock) -> None:
+        body = self.body('Es urgente')
+
+        resp = self.call('POST', self.REGISTER_INCIDENT_URL, body, prefer='wait=10, respond-async')
+
+        self.assertEqual(resp.status_code, 202)
+        self.assertEqual(resp.headers['Preference-Applied'], 'respond-async')
+        self.assertEqual(json.loads(resp.get_data())['client_id'], body['client_id'])
+        incident_id = json.loads(resp.get_data())['id']
+        self.assertIsNotNone(self.incident_repo.get(client_id=body['client_id'], incident_id=incident_id))
+        self.assertEqual(
+            [x.args for x in send_notification.call_args_list],
+            [(body['client_id'], incident_id, 'incident-update'), (body['client_id'], incident_id, 'incident-alert')],
+        )
+
+        status = self.call('GET', resp.headers['Location'])
+
+        self.assertEqual(status.status_code, 200)
+        self.assertEqual(
+            json.loads(status.get_data()),
+            {'id': resp.headers['Location'].rsplit('/', 1)[1], 'status': 'succeeded', 'errors': []},
+        )
+
+    @patch('blueprints.incident.send_notification')
+    def test_update_risk_async_failed(self, send_notification: Mock) -> None:
+        send_notification.side_effect = ValueError('Client not found.')
+        incident = create_random_incident(self.faker, overrides={'risk': Risk.LOW})
+        self.incident_repo.create(incident)
+        self.incident_repo.append_history_entry(
+            create_random_history_entry(
+                self.faker, seq=None, client_id=incident.client_id, incident_id=incident.id, action=Action.CREATED
+            )
+        )
+        url = f'/api/v1/clients/{incident.client_id}/incidents/{incident.id}/update-risk'
+
+        with self.assertLogs(self.app.logger, 'ERROR'):
+            resp = self.call('PUT', url, {'risk': Risk.HIGH.value}, prefer='respond-async')
+
+        self.assertEqual(resp.status_code, 202)
+        self.assertEqual(json.loads(resp.get_data())['risk'], Risk.HIGH)
+        self.assertIn('ETag', resp.headers)
+
+        status = json.loads(self.call('GET', resp.headers['Location']).get_data())
+
+        self.assertEqual((status['status'], status['errors']), ('failed', ['incident-risk-updated: Client not found.']))
+
+        # Nothing to run in the background, the preference is still applied
+        unchanged = self.call('PUT', url, {'risk': Risk.HIGH.value}, prefer='respond-async')
+
+        self.assertEqual(unchanged.status_code, 202)
+        self.assertEqual(unchanged.headers['Preference-Applied'], 'respond-async')
+        status = json.loads(self.call('GET', unchanged.headers['Location']).get_data())
+        self.assertEqual((status['status'], status['errors']), ('succeeded', []))
+
+    @patch('blueprints.incident.send_notification')
+    def test_sync_without_preference(self, send_notification: Mock) -> None:
+        resp = self.call('POST', self.REGISTER_INCIDENT_URL, self.body(), prefer='return=minimal')
+
+        self.assertEqual(resp.status_code, 201)
+        self.assertNotIn('Location', resp.headers)
+        send_notification.assert_called_once()
+
+    @patch('blueprints.incident.send_notification')
+    def test_task_store_unavailable(self, send_notification: Mock) -> None:
+        self.task_repo = Mock(SideEffectTaskRepository)
+        cast(Mock, self.task_repo.create).side_effect = ConnectionError('unavailable')
+
+        with self.assertLogs(self.app.logger, 'ERROR'):
+            resp = self.call('POST', self.REGISTER_INCIDENT_URL, self.body(), prefer='respond-async')
+
+        self.assertEqual(resp.status_code, 201)
+        send_notification.assert_called_once()
+
+    def test_task_not_found(self) -> None:
+        resp = self.call('GET', f'/api/v1/side-effects/{cast(str, self.faker.uuid4())}')
+        invalid = self.call('GET', '/api/v1/side-effects/not-a-uuid')
+
+        self.assertEqual(resp.status_code, 404)
+        self.assertEqual(json.loads(resp.get_data())['message'], TASK_NOT_FOUND)
+        self.assertEqual(invalid.status_code, 400)
@@ -0,0 +1,64 @@
+from typing import Any
+from unittest.mock import patch
+
+import marshmallow_dataclass
+from marshmallow import ValidationError
+from unittest_parametrize import ParametrizedTestCase, parametrize
+
+from blueprints.incident import REGISTRY_VALIDATOR, RISK_UPDATE_VALIDATOR, UPDATE_VALIDATOR
+from blueprints.validation import RequestValidator
+from models import Risk
+
+REGISTRY_BODY = {
+    'client_id': 'c',
+    'name': 'Test',
+    'channel': 'web',
+    'reported_by': 'r',
+    'created_by': 'c',
+    'description': 'Test',
+    'assigned_to': 'a',
+}
+
+
+def load(load: Any, data: Any) -> Any:  # noqa: ANN401
+    try:
+        return load(data)
+    except ValidationError as err:
+        return err.messages
+
+
+class TestRequestValidator(ParametrizedTestCase):
+    @parametrize(
+        'validator, data',
+        [
+            (REGISTRY_VALIDATOR, REGISTRY_BODY),
+            (REGISTRY_VALIDATOR, {**REGISTRY_BODY, 'channel': 'fax'}),
+            (REGISTRY_VALIDATOR, {**REGISTRY_BODY, 'name': 'x' * 61}),
+            (REGISTRY_VALIDATOR, {**REGISTRY_BODY, 'name': ''}),
+            (REGISTRY_VALIDATOR, {**REGISTRY_BODY, 'extra': 1}),
+            (REGISTRY_VALIDATOR, {'name': 5, 'description': None}),
+            (UPDATE_VALIDATOR, {'action': 'closed', 'description': 'Test'}),
+            (UPDATE_VALIDATOR, {'action': 'created', 'description': 'Test'}),
+            (UPDATE_VALIDATOR, {'action': ['closed'], 'description': 'x' * 1001}),
+            (UPDATE_VALIDATOR, {}),
+            (UPDATE_VALIDATOR, []),
+            (RISK_UPDATE_VALIDATOR, {'risk': 'HIGH'}),
+            (RISK_UPDATE_VALIDATOR, {'risk': 'high'}),
+            (RISK_UPDATE_VALIDATOR, {'risk': None}),
+            (RISK_UPDATE_VALIDATOR, 'HIGH'),
+        ],
+    )
+    def test_same_as_schema(self, validator: RequestValidator[Any], data: Any) -> None:  # noqa: ANN401
+        schema = marshmallow_dataclass.class_schema(validator.cls)()
+
+        self.assertEqual(load(validator.load, data), load(schema.load, data))
+
+    def test_fast_path(self) -> None:
+        expected = RISK_UPDATE_VALIDATOR.schema.load({'risk': 'LOW'})
+
+        with patch.object(RISK_UPDATE_VALIDATOR.schema, 'load') as schema_load:
+            body = RISK_UPDATE_VALIDATOR.load({'risk': 'LOW'})
+
+        schema_load.assert_not_called()
+        self.assertEqual(body, expected)
+        self.assertIs(body.risk, Risk.LOW)
@@ -0,0 +1,48 @@
+from datetime import UTC, datetime, timedelta
+from typing import cast
+from unittest import TestCase
+from unittest.mock import Mock
+
+from models import IdempotencyRecord
+from repositories import IdempotencyRepository
+from repositories.cached import CachedIdempotencyRepository
+
+
+class TestCachedIdempotency(TestCase):
+    def setUp(self) -> None:
+        self.inner = Mock(IdempotencyRepository)
+        self.repo = CachedIdempotencyRepository(self.inner, max_size=2)
+
+    def record(self, key: str, status: int | None = None, expires_in: float = 60) -> IdempotencyRecord:
+        return IdempotencyRecord(
+            key=key, fingerprint='fp', expires_at=datetime.now(UTC) + timedelta(seconds=expires_in), status=status, body='{}'
+        )
+
+    def test_completed_served_locally(self) -> None:
+        completed = self.record('a', 201)
+        cast(Mock, self.inner.create).return_value = None
+        self.repo.create(self.record('a'))
+        self.repo.complete(completed)
+
+        self.assertEqual(self.repo.create(self.record('a')), completed)
+        cast(Mock, self.inner.create).assert_called_once()
+        cast(Mock, self.inner.complete).assert_called_once_with(completed)
+
+    def test_in_progress_not_cached(self) -> None:
+        in_progress = self.record('a')
+        cast(Mock, self.inner.create).return_value = in_progress
+
+        self.assertEqual(self.repo.create(self.record('a')), in_progress)
+        self.assertEqual(self.repo.create(self.record('a')), in_progress)
+        self.assertEqual(cast(Mock, self.inner.create).call_count, 2)
+
+    def test_expired_and_deleted(self) -> None:
+        cast(Mock, self.inner.create).return_value = None
+        self.repo.complete(self.record('a', 201, expires_in=-1))
+        self.repo.complete(self.record('b', 201))
+        self.repo.delete('b')
+
+        self.assertIsNone(self.repo.create(self.record('a')))
+        self.assertIsNone(self.repo.create(self.record('b')))
+        cast(Mock, self.inner.delete).assert_called_once_with('b')
+        self.assertEqual(cast(Mock, self.inner.create).call_count, 2)
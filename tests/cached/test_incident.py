@@ -0,0 +1,256 @@
+from typing import cast
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from faker import Faker
+
+from models import Risk
+from repositories import IncidentRepository
+from repositories.cached import CachedIncidentRepository
+from repositories.incident import incident_view
+from tests.util import create_random_history_entry, create_random_incident
+
+
+class TestCachedIncident(TestCase):
+    def setUp(self) -> None:
+        self.faker = Faker()
+        self.inner = Mock(IncidentRepository)
+        cast(Mock, self.inner.metrics).return_value = {}
+        self.repo = CachedIncidentRepository(self.inner, max_size=2, ttl=60)
+
+    def test_get_read_through(self) -> None:
+        incident = create_random_incident(self.faker)
+        cast(Mock, self.inner.get).return_value = incident
+
+        first = self.repo.get(client_id=incident.client_id, incident_id=incident.id)
+        second = self.repo.get(client_id=incident.client_id, incident_id=incident.id)
+
+        self.assertEqual(first, incident)
+        self.assertEqual(second, incident)
+        cast(Mock, self.inner.get).assert_called_once_with(client_id=incident.client_id, incident_id=incident.id)
+        self.assertEqual((self.repo.hits, self.repo.misses), (1, 1))
+
+    def test_get_not_found_not_cached(self) -> None:
+        cast(Mock, self.inner.get).return_value = None
+        client_id = cast(str, self.faker.uuid4())
+        incident_id = cast(str, self.faker.uuid4())
+
+        self.assertIsNone(self.repo.get(client_id=client_id, incident_id=incident_id))
+        self.assertIsNone(self.repo.get(client_id=client_id, incident_id=incident_id))
+
+        self.assertEqual(cast(Mock, self.inner.get).call_count, 2)
+
+    def test_get_returns_copy(self) -> None:
+        incident = create_random_incident(self.faker, overrides={'risk': Risk.LOW})
+        cast(Mock, self.inner.get).return_value = incident
+
+        self.repo.get(client_id=incident.client_id, incident_id=incident.id)
+        cached = self.repo.get(client_id=incident.client_id, incident_id=incident.id)
+        assert cached is not None  # noqa: S101
+        cached.risk = Risk.HIGH
+
+        result = self.repo.get(client_id=incident.client_id, incident_id=incident.id)
+        assert result is not None  # noqa: S101
+        self.assertEqual(result.risk, Risk.LOW)
+
+    def test_create_write_through(self) -> None:
+        incident = create_random_incident(self.faker)
+
+        self.repo.create(incident)
+        result = self.repo.get(client_id=incident.client_id, incident_id=incident.id)
+
+        cast(Mock, self.inner.create).assert_called_once_with(incident)
+        cast(Mock, self.inner.get).assert_not_called()
+        self.assertEqual(result, incident)
+
+    def test_update_write_through(self) -> None:
+        incident = create_random_incident(self.faker, overrides={'risk': Risk.LOW})
+        cast(Mock, self.inner.get).return_value = incident
+        self.repo.get(client_id=incident.client_id, incident_id=incident.id)
+
+        updated = create_random_incident(
+            self.faker, overrides={'client_id': incident.client_id, 'risk': Risk.HIGH, 'assigned_to': incident.assigned_to}
+        )
+        updated.id = incident.id
+        self.repo.update(updated)
+
+        result = self.repo.get(client_id=incident.client_id, incident_id=incident.id)
+
+        cast(Mock, self.inner.update).assert_called_once_with(updated)
+        cast(Mock, self.inner.get).assert_called_once()
+        self.assertEqual(result, updated)
+
+    def test_update_failure_invalidates(self) -> None:
+        incident = create_random_incident(self.faker)
+        cast(Mock, self.inner.get).return_value = incident
+        cast(Mock, self.inner.update).side_effect = ValueError('not found')
+        self.repo.get(client_id=incident.client_id, incident_id=incident.id)
+
+        with self.assertRaises(ValueError):
+            self.repo.update(incident)
+
+        self.repo.get(client_id=incident.client_id, incident_id=incident.id)
+        self.assertEqual(cast(Mock, self.inner.get).call_count, 2)
+
+    def test_append_history_entry_invalidates(self) -> None:
+        incident = create_random_incident(self.faker)
+        cast(Mock, self.inner.get).return_value = incident
+        entry = create_random_history_entry(self.faker, seq=None, client_id=incident.client_id, incident_id=incident.id)
+
+        self.repo.get(client_id=incident.client_id, incident_id=incident.id)
+        self.repo.append_history_entry(entry)
+        self.repo.get(client_id=incident.client_id, incident_id=incident.id)
+
+        cast(Mock, self.inner.append_history_entry).assert_called_once_with(entry)
+        self.assertEqual(cast(Mock, self.inner.get).call_count, 2)
+
+    def test_ttl_expiry(self) -> None:
+        incident = create_random_incident(self.faker)
+        cast(Mock, self.inner.get).return_value = incident
+
+        with patch('repositories.cached.incident.time.monotonic') as monotonic:
+            monotonic.return_value = 100.0
+            self.repo.get(client_id=incident.client_id, incident_id=incident.id)
+            monotonic.return_value = 159.0
+            self.repo.get(client_id=incident.client_id, incident_id=incident.id)
+            monotonic.return_value = 161.0
+            self.repo.get(client_id=incident.client_id, incident_id=incident.id)
+
+        self.assertEqual(cast(Mock, self.inner.get).call_count, 2)
+
+    def test_lru_eviction(self) -> None:
+        incidents = [create_random_incident(self.faker) for _ in range(3)]
+
+        for incident in incidents:
+            self.repo.create(incident)
+
+        # The oldest entry was evicted, the other two are still cached
+        cast(Mock, self.inner.get).return_value = incidents[0]
+        self.repo.get(client_id=incidents[0].client_id, incident_id=incidents[0].id)
+        self.repo.get(client_id=incidents[2].client_id, incident_id=incidents[2].id)
+
+        cast(Mock, self.inner.get).assert_called_once_with(client_id=incidents[0].client_id, incident_id=incidents[0].id)
+        self.assertEqual(self.repo.evictions, 2)
+
+    def test_delete_all_clears(self) -> None:
+        incident = create_random_incident(self.faker)
+        cast(Mock, self.inner.get).return_value = incident
+        self.repo.create(incident)
+
+        self.repo.delete_all()
+        self.repo.get(client_id=incident.client_id, incident_id=incident.id)
+
+        cast(Mock, self.inner.delete_all).assert_called_once()
+        cast(Mock, self.inner.get).assert_called_once()
+
+    def test_history_passthrough(self) -> None:
+        entries = [create_random_history_entry(self.faker, seq=i) for i in range(3)]
+        cast(Mock, self.inner.get_history).return_value = (x for x in entries)
+        cast(Mock, self.inner.get_last_history_entry).return_value = entries[-1]
+
+        history = list(self.repo.get_history(client_id='c', incident_id='i', limit=3))
+        last = self.repo.get_last_history_entry(client_id='c', incident_id='i')
+
+        self.assertEqual(history, entries)
+        self.assertEqual(last, entries[-1])
+
+    def test_metrics(self) -> None:
+        incident = create_random_incident(self.faker)
+        cast(Mock, self.inner.get).return_value = incident
+        self.repo.get(client_id=incident.client_id, incident_id=incident.id)
+        self.repo.get(client_id=incident.client_id, incident_id=incident.id)
+
+        self.assertEqual(
+            self.repo.metrics(),
+            {'incident_cache': {'hits': 1, 'misses': 1, 'evictions': 0, 'size': 1, 'max_size': 2}},
+        )
+
+    def test_create_many_write_through(self) -> None:
+        incidents = [create_random_incident(self.faker) for _ in range(2)]
+        cast(Mock, self.inner.create_many).return_value = [ValueError('error'), None]
+        cast(Mock, self.inner.get).return_value = None
+
+        results = self.repo.create_many(incidents)
+        self.repo.get(client_id=incidents[0].client_id, incident_id=incidents[0].id)
+        cached = self.repo.get(client_id=incidents[1].client_id, incident_id=incidents[1].id)
+
+        self.assertIsInstance(results[0], ValueError)
+        self.assertEqual(cached, incidents[1])
+        cast(Mock, self.inner.get).assert_called_once_with(client_id=incidents[0].client_id, incident_id=incidents[0].id)
+
+    def test_append_history_many_invalidates(self) -> None:
+        incident = create_random_incident(self.faker)
+        cast(Mock, self.inner.get).return_value = incident
+        entries = [create_random_history_entry(self.faker, seq=None, client_id=incident.client_id, incident_id=incident.id)]
+        cast(Mock, self.inner.append_history_many).return_value = [None]
+
+        self.repo.get(client_id=incident.client_id, incident_id=incident.id)
+        results = self.repo.append_history_many(entries)
+        self.repo.get(client_id=incident.client_id, incident_id=incident.id)
+
+        self.assertEqual(results, [None])
+        self.assertEqual(cast(Mock, self.inner.get).call_count, 2)
+
+    def test_get_with_history_miss_stores_incident(self) -> None:
+        incident = create_random_incident(self.faker)
+        entries = [create_random_history_entry(self.faker, seq=0)]
+        cast(Mock, self.inner.get_with_history).return_value = (incident, entries)
+
+        result = self.repo.get_with_history(client_id=incident.client_id, incident_id=incident.id, history_limit=1)
+        cached = self.repo.get(client_id=incident.client_id, incident_id=incident.id)
+
+        self.assertEqual(result, (incident, entries))
+        self.assertEqual(cached, incident)
+        cast(Mock, self.inner.get).assert_not_called()
+
+    def test_get_with_history_hit_reads_history(self) -> None:
+        incident = create_random_incident(self.faker)
+        entries = [create_random_history_entry(self.faker, seq=i) for i in range(3)]
+        cast(Mock, self.inner.get).return_value = incident
+        cast(Mock, self.inner.get_history).return_value = (x for x in entries[:0:-1])
+
+        self.repo.get(client_id=incident.client_id, incident_id=incident.id)
+        result = self.repo.get_with_history(client_id=incident.client_id, incident_id=incident.id, history_limit=2)
+
+        self.assertEqual(result, (incident, entries[1:]))
+        cast(Mock, self.inner.get_with_history).assert_not_called()
+        cast(Mock, self.inner.get_history).assert_called_once_with(
+            client_id=incident.client_id, incident_id=incident.id, limit=2, descending=True
+        )
+
+    def test_get_view_served_from_cache(self) -> None:
+        incident = create_random_incident(self.faker)
+        cast(Mock, self.inner.get).return_value = incident
+
+        self.repo.get(client_id=incident.client_id, incident_id=incident.id)
+        view = self.repo.get_view(client_id=incident.client_id, incident_id=incident.id, fields=['assigned_to'])
+
+        self.assertEqual(view, incident_view(incident, ['assigned_to']))
+        cast(Mock, self.inner.get_view).assert_not_called()
+
+    def test_get_views_reads_missing_at_once(self) -> None:
+        cached = create_random_incident(self.faker)
+        client_id = cached.client_id
+        other_ids = [cast(str, self.faker.uuid4()) for _ in range(2)]
+        cast(Mock, self.inner.get).return_value = cached
+        cast(Mock, self.inner.get_views).return_value = [None, None]
+
+        self.repo.get(client_id=client_id, incident_id=cached.id)
+        views = self.repo.get_views(client_id, [other_ids[0], cached.id, other_ids[1]], ['risk'])
+
+        self.assertEqual(views, [None, incident_view(cached, ['risk']), None])
+        cast(Mock, self.inner.get_views).assert_called_once_with(client_id, other_ids, ['risk'])
+
+    def test_get_view_last_action_passthrough(self) -> None:
+        incident = create_random_incident(self.faker)
+        cast(Mock, self.inner.get).return_value = incident
+        expected = incident_view(incident, ['assigned_to'])
+        cast(Mock, self.inner.get_view).return_value = expected
+
+        self.repo.get(client_id=incident.client_id, incident_id=incident.id)
+        view = self.repo.get_view(client_id=incident.client_id, incident_id=incident.id, fields=['assigned_to', 'last_action'])
+
+        self.assertIs(view, expected)
+        cast(Mock, self.inner.get_view).assert_called_once_with(
+            incident.client_id, incident.id, ['assigned_to', 'last_action']
+        )
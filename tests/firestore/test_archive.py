@@ -0,0 +1,38 @@
+from datetime import UTC, datetime
+from unittest import TestCase
+
+from faker import Faker
+
+from models import Action
+from repositories.firestore.archive import archived_chunk_docs, archived_incident_doc
+from tests.util import create_random_history_entry
+
+
+class TestArchive(TestCase):
+    def test_archived_docs(self) -> None:
+        faker = Faker()
+        history = [create_random_history_entry(faker, seq=seq) for seq in range(5)]
+        archived_at = datetime.now(UTC)
+        data = {
+            'name': 'Test',
+            'last_action': Action.CLOSED,
+            'history': [],
+            'history_count': 5,
+            'history_chunks': [{'first': 0, 'last': 1}],
+        }
+
+        doc = archived_incident_doc(data, history, archived_at, 2)
+        chunks = archived_chunk_docs(history, 2)
+
+        self.assertEqual(
+            doc,
+            {
+                'name': 'Test',
+                'last_action': Action.CLOSED,
+                'archived_at': archived_at,
+                'history_count': 5,
+                'history_chunks': [{'first': 0, 'last': 1}, {'first': 2, 'last': 3}, {'first': 4, 'last': 4}],
+            },
+        )
+        self.assertEqual([(x['first'], x['last']) for x in chunks], [(0, 1), (2, 3), (4, 4)])
+        self.assertEqual([x['seq'] for x in chunks[1]['entries']], [2, 3])
@@ -0,0 +1,154 @@
+import os
+from typing import cast
+from unittest import IsolatedAsyncioTestCase, skipUnless
+
+import requests
+from faker import Faker
+from google.api_core.exceptions import FailedPrecondition
+
+from models import Action, HistoryEntry, Incident, Risk
+from repositories.firestore import AsyncFirestoreIncidentRepository
+from tests.util import create_random_history_entry, create_random_incident
+
+FIRESTORE_DATABASE = '(default)'
+
+
+@skipUnless('FIRESTORE_EMULATOR_HOST' in os.environ, 'Firestore emulator not available')
+class TestAsyncClient(IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.faker = Faker()
+
+        # Reset Firestore emulator before each test
+        requests.delete(
+            f'http://{os.environ["FIRESTORE_EMULATOR_HOST"]}/emulator/v1/projects/google-cloud-firestore-emulator/databases/{FIRESTORE_DATABASE}/documents',
+            timeout=5,
+        )
+
+        # Created per test, the async client is bound to the test's event loop
+        self.repo = AsyncFirestoreIncidentRepository(FIRESTORE_DATABASE)
+
+    async def test_create_get(self) -> None:
+        incident = create_random_incident(self.faker)
+
+        await self.repo.create(incident)
+        retrieved = await self.repo.get(client_id=incident.client_id, incident_id=incident.id)
+
+        self.assertIsNotNone(incident.version)
+        self.assertEqual(retrieved, incident)
+
+    async def test_get_not_found(self) -> None:
+        retrieved = await self.repo.get(client_id=cast(str, self.faker.uuid4()), incident_id=cast(str, self.faker.uuid4()))
+
+        self.assertIsNone(retrieved)
+
+    async def test_append_get_history(self) -> None:
+        incident = create_random_incident(self.faker)
+        await self.repo.create(incident)
+
+        entries: list[HistoryEntry] = []
+        for _ in range(4):
+            entry = create_random_history_entry(self.faker, seq=None, client_id=incident.client_id, incident_id=incident.id)
+            await self.repo.append_history_entry(entry)
+            entries.append(entry)
+
+        self.assertEqual([x.seq for x in entries], [0, 1, 2, 3])
+
+        history = [x async for x in self.repo.get_history(client_id=incident.client_id, incident_id=incident.id)]
+        self.assertEqual(history, entries)
+
+        history = [
+            x async for x in self.repo.get_history(client_id=incident.client_id, incident_id=incident.id, after_seq=1, limit=1)
+        ]
+        self.assertEqual(history, entries[2:3])
+
+        last_entry = await self.repo.get_last_history_entry(client_id=incident.client_id, incident_id=incident.id)
+        self.assertEqual(last_entry, entries[-1])
+
+    async def test_get_with_history(self) -> None:
+        incident = create_random_incident(self.faker)
+        await self.repo.create(incident)
+
+        entries = [
+            create_random_history_entry(self.faker, seq=None, client_id=incident.client_id, incident_id=incident.id)
+            for _ in range(3)
+        ]
+        for entry in entries:
+            await self.repo.append_history_entry(entry)
+
+        full = await self.repo.get_with_history(client_id=incident.client_id, incident_id=incident.id)
+        last = await self.repo.get_with_history(client_id=incident.client_id, incident_id=incident.id, history_limit=1)
+        missing = await self.repo.get_with_history(client_id=incident.client_id, incident_id=cast(str, self.faker.uuid4()))
+
+        self.assertEqual(full, (incident, entries))
+        self.assertEqual(last, (incident, entries[-1:]))
+        self.assertEqual(missing, (None, []))
+
+    async def test_update(self) -> None:
+        incident = create_random_incident(self.faker)
+        await self.repo.create(incident)
+
+        incident.name = self.faker.sentence()
+        await self.repo.update(incident)
+
+        self.assertEqual(await self.repo.get(client_id=incident.client_id, incident_id=incident.id), incident)
+
+    async def test_update_expected_version(self) -> None:
+        incident = create_random_incident(self.faker)
+        await self.repo.create(incident)
+        stored = cast(Incident, await self.repo.get(client_id=incident.client_id, incident_id=incident.id))
+        version = cast(str, stored.version)
+
+        stored.risk = Risk.HIGH
+        await self.repo.update(stored, expected_version=version)
+
+        self.assertNotEqual(stored.version, version)
+        # The incident changed since version was read
+        with self.assertRaises(FailedPrecondition):
+            await self.repo.update(stored, expected_version=version)
+        with self.assertRaises(FailedPrecondition):
+            await self.repo.update(stored, expected_version='not-a-version')
+
+        self.assertEqual(await self.repo.get(client_id=incident.client_id, incident_id=incident.id), stored)
+
+    async def test_update_not_found(self) -> None:
+        with self.assertRaises(ValueError):
+            await self.repo.update(create_random_incident(self.faker))
+
+    async def test_bulk(self) -> None:
+        incident = create_random_incident(self.faker)
+
+        errors = await self.repo.create_many([incident])
+        self.assertEqual(errors, [None])
+
+        entry = create_random_history_entry(
+            self.faker, seq=None, client_id=incident.client_id, incident_id=incident.id, action=Action.CREATED
+        )
+        errors = await self.repo.append_history_many([entry])
+        self.assertEqual(errors, [None])
+        self.assertEqual(entry.seq, 0)
+
+        deleted = await self.repo.delete_all(client_id=incident.client_id)
+        # Client document, incident and history entry
+        self.assertEqual(deleted, {incident.client_id: 3})
+        self.assertIsNone(await self.repo.get(client_id=incident.client_id, incident_id=incident.id))
+
+    async def test_compacted_history(self) -> None:
+        repo = AsyncFirestoreIncidentRepository(FIRESTORE_DATABASE, embedded_history=2, history_chunk=2, compact_threshold=2)
+        incident = create_random_incident(self.faker)
+        await repo.create(incident)
+
+        entries = [
+            create_random_history_entry(self.faker, seq=None, client_id=incident.client_id, incident_id=incident.id)
+            for _ in range(7)
+        ]
+        for entry in entries:
+            await repo.append_history_entry(entry)
+        repo.sync_repo.compact_executor.shutdown()
+
+        history = [x async for x in repo.get_history(client_id=incident.client_id, incident_id=incident.id)]
+        last = [
+            x async for x in repo.get_history(client_id=incident.client_id, incident_id=incident.id, limit=4, descending=True)
+        ]
+
+        self.assertEqual(history, entries)
+        self.assertEqual(last, entries[:2:-1])
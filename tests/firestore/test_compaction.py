@@ -0,0 +1,64 @@
+from datetime import UTC, datetime
+from typing import Any
+
+from unittest_parametrize import ParametrizedTestCase, parametrize
+
+from models import Action
+from repositories.firestore.compaction import Chunk, chunk_doc, chunked_until, chunks_to_read, read_chunk
+
+CLIENT_ID = '9a652818-342e-4771-84cf-39c20a29264d'
+INCIDENT_ID = '36e3344d-aa5b-4c5a-88ef-a7eb8abe27d8'
+
+# Entries 0 to 2 are embedded, 3 to 8 compacted in chunks of 2
+CHUNKS: list[Chunk] = [(3, 4), (5, 6), (7, 8)]
+
+
+def entry_docs(seqs: range) -> list[dict[str, Any]]:
+    return [{'seq': seq, 'date': datetime.now(UTC), 'action': Action.CREATED, 'description': 'Test'} for seq in seqs]
+
+
+class TestCompaction(ParametrizedTestCase):
+    @parametrize(
+        'data, expected',
+        [
+            ({'history': entry_docs(range(3)), 'history_count': 5}, 3),
+            ({'history': entry_docs(range(3)), 'history_chunks': [{'first': 3, 'last': 4}]}, 5),
+        ],
+    )
+    def test_chunked_until(self, data: dict[str, Any], expected: int) -> None:
+        self.assertEqual(chunked_until(data), expected)
+
+    @parametrize(
+        'after_seq, limit, descending, expected',
+        [
+            (None, None, False, CHUNKS),
+            (None, 3, False, [(3, 4), (5, 6)]),
+            (4, 2, False, [(5, 6)]),
+            (8, None, False, []),
+            (None, None, True, CHUNKS[::-1]),
+            (None, 1, True, [(7, 8)]),
+            (8, 2, True, [(7, 8), (5, 6)]),
+            (4, None, True, [(3, 4)]),
+            (3, None, True, []),
+        ],
+    )
+    def test_chunks_to_read(self, after_seq: int | None, limit: int | None, descending: bool, expected: list[Chunk]) -> None:  # noqa: FBT001
+        self.assertEqual(chunks_to_read(CHUNKS, after_seq, limit, descending=descending), expected)
+
+    @parametrize(
+        'after_seq, descending, expected',
+        [
+            (None, False, [3, 4, 5]),
+            (3, False, [4, 5]),
+            (None, True, [5, 4, 3]),
+            (5, True, [4, 3]),
+        ],
+    )
+    def test_read_chunk(self, after_seq: int | None, descending: bool, expected: list[int]) -> None:  # noqa: FBT001
+        chunk = chunk_doc(entry_docs(range(3, 6)))
+
+        history = read_chunk(chunk, CLIENT_ID, INCIDENT_ID, after_seq, descending=descending)
+
+        self.assertEqual((chunk['first'], chunk['last']), (3, 5))
+        self.assertEqual([x.seq for x in history], expected)
+        self.assertEqual({x.incident_id for x in history}, {INCIDENT_ID})
@@ -0,0 +1,99 @@
+from datetime import UTC, datetime
+from typing import Any
+
+from unittest_parametrize import ParametrizedTestCase, parametrize
+
+from models import Action, HistoryEntry
+from repositories.firestore.embedded import embeds, read_embedded, slice_embedded, spill_cursor, spill_reachable
+
+CLIENT_ID = '9a652818-342e-4771-84cf-39c20a29264d'
+INCIDENT_ID = '36e3344d-aa5b-4c5a-88ef-a7eb8abe27d8'
+
+
+def incident_data(embedded: int, count: int | None) -> dict[str, Any]:
+    data: dict[str, Any] = {
+        'history': [
+            {'seq': seq, 'date': datetime.now(UTC), 'action': Action.CREATED, 'description': 'Test'} for seq in range(embedded)
+        ]
+    }
+
+    if count is not None:
+        data['history_count'] = count
+
+    return data
+
+
+def entries(n: int) -> list[HistoryEntry]:
+    return read_embedded(incident_data(n, n), CLIENT_ID, INCIDENT_ID)[0]
+
+
+class TestEmbedded(ParametrizedTestCase):
+    @parametrize(
+        'embedded, count, spilled',
+        [
+            (0, 0, False),
+            (2, 2, False),
+            (3, 5, True),
+            # Legacy incident, its entries may be in the subcollection
+            (0, None, True),
+        ],
+    )
+    def test_read_embedded(self, embedded: int, count: int | None, spilled: bool) -> None:  # noqa: FBT001
+        history, is_spilled = read_embedded(incident_data(embedded, count), CLIENT_ID, INCIDENT_ID)
+
+        self.assertEqual([x.seq for x in history], list(range(embedded)))
+        self.assertEqual(is_spilled, spilled)
+
+    @parametrize(
+        'embedded, seq, expected',
+        [
+            (0, 0, True),
+            (2, 2, True),
+            (3, 3, False),
+            # Not contiguous, earlier entries are in the subcollection
+            (0, 2, False),
+        ],
+    )
+    def test_embeds(self, embedded: int, seq: int, expected: bool) -> None:  # noqa: FBT001
+        self.assertEqual(embeds(embedded, seq, 3), expected)
+
+    @parametrize(
+        'after_seq, limit, descending, expected',
+        [
+            (None, None, False, [0, 1, 2]),
+            (0, 1, False, [1]),
+            (2, None, False, []),
+            (None, None, True, [2, 1, 0]),
+            (2, 1, True, [1]),
+            (5, None, True, [2, 1, 0]),
+        ],
+    )
+    def test_slice_embedded(self, after_seq: int | None, limit: int | None, descending: bool, expected: list[int]) -> None:  # noqa: FBT001
+        history = slice_embedded(entries(3), after_seq, limit, descending=descending)
+
+        self.assertEqual([x.seq for x in history], expected)
+
+    @parametrize(
+        'embedded, after_seq, descending, cursor, reachable',
+        [
+            (3, None, False, 2, True),
+            (3, 0, False, 2, True),
+            (3, 4, False, 4, True),
+            (0, None, False, None, True),
+            (3, None, True, None, True),
+            (3, 4, True, 4, True),
+            (3, 3, True, 3, False),
+        ],
+    )
+    def test_spill(
+        self,
+        embedded: int,
+        after_seq: int | None,
+        descending: bool,  # noqa: FBT001
+        cursor: int | None,
+        reachable: bool,  # noqa: FBT001
+    ) -> None:
+        history = entries(embedded)
+
+        self.assertEqual(spill_cursor(history, after_seq, descending=descending), cursor)
+        self.assertEqual(spill_reachable(history, after_seq, descending=descending), reachable)
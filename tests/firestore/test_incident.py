@@ -1,28 +1,38 @@
+import base64
 import contextlib
+import json
 import os
 from dataclasses import asdict
-from datetime import UTC
-from typing import cast
+from datetime import UTC, datetime, timedelta
+from typing import Any, cast
 from unittest import skipUnless
+from unittest.mock import patch
 
 import requests
 from faker import Faker
-from google.api_core.exceptions import AlreadyExists
+from google.api_core.exceptions import AlreadyExists, FailedPrecondition, NotFound
 from google.cloud.firestore import Client as FirestoreClient  # type: ignore[import-untyped]
-from google.cloud.firestore_v1 import CollectionReference
-from unittest_parametrize import ParametrizedTestCase
+from google.cloud.firestore_v1 import CollectionReference, DocumentReference
+from unittest_parametrize import ParametrizedTestCase, parametrize
 
-from models import Channel, HistoryEntry, Incident
+from app import create_app
+from models import Action, Channel, HistoryEntry, Incident, IncidentView
 from repositories.firestore import FirestoreIncidentRepository
+from repositories.firestore.converters import doc_to_history_entry
+from tests import incident_contract
 from tests.util import create_random_history_entry, create_random_incident
+from utils import CLOSED_INCIDENT_ERROR
 
 FIRESTORE_DATABASE = '(default)'
+CONVERTER = 'repositories.firestore.incident.doc_to_history_entry'
 
 
 @skipUnless('FIRESTORE_EMULATOR_HOST' in os.environ, 'Firestore emulator not available')
-class TestClient(ParametrizedTestCase):
+class TestClient(incident_contract.IncidentRepositoryContract):
+    repo: FirestoreIncidentRepository
+
     def setUp(self) -> None:
-        self.faker = Faker()
+        super().setUp()
 
         # Reset Firestore emulator before each test
         requests.delete(
@@ -48,6 +58,7 @@ class TestClient(ParametrizedTestCase):
             incident_dict = asdict(incident)
             del incident_dict['id']
             del incident_dict['client_id']
+            del incident_dict['version']
 
             client_ref = self.client.collection('clients').document(incident.client_id)
             with contextlib.suppress(AlreadyExists):
@@ -94,6 +105,7 @@ class TestClient(ParametrizedTestCase):
         incident_dict = asdict(incident)
         del incident_dict['id']
         del incident_dict['client_id']
+        del incident_dict['version']
         self.assertEqual(doc.to_dict(), incident_dict)
 
     def test_append_history_entries(self) -> None:
@@ -127,17 +139,202 @@ class TestClient(ParametrizedTestCase):
         with self.assertRaises(ValueError):
             self.repo.append_history_entry(entry)
 
-    def test_delete_all(self) -> None:
-        incidents = self.add_random_incidents(5)
+    def test_create_many(self) -> None:
+        client_id = cast(str, self.faker.uuid4())
+        incidents = [create_random_incident(self.faker, overrides={'client_id': client_id}) for _ in range(3)]
+        incidents.append(create_random_incident(self.faker))
 
-        self.repo.delete_all()
+        results = self.repo.create_many(incidents)
 
+        self.assertEqual(results, [None] * len(incidents))
         for incident in incidents:
-            client_ref = self.client.collection('clients').document(incident.client_id)
-            incident_ref = cast(CollectionReference, client_ref.collection('incidents')).document(incident.id)
-            doc = incident_ref.get()
+            self.assertEqual(self.repo.get(client_id=incident.client_id, incident_id=incident.id), incident)
+
+    def test_create_many_existing(self) -> None:
+        existing = self.add_random_incidents(1)[0]
+        incident = create_random_incident(self.faker)
+
+        results = self.repo.create_many([existing, incident])
+
+        self.assertIsInstance(results[0], AlreadyExists)
+        self.assertIsNone(results[1])
+        self.assertEqual(self.repo.get(client_id=incident.client_id, incident_id=incident.id), incident)
+
+    def test_append_history_many(self) -> None:
+        incidents = self.add_random_incidents(2)
+        existing = self.add_random_history_entries(2, client_id=incidents[0].client_id, incident_id=incidents[0].id)
+        entries = [
+            create_random_history_entry(
+                self.faker, seq=None, client_id=incidents[i % 2].client_id, incident_id=incidents[i % 2].id
+            )
+            for i in range(6)
+        ]
+
+        results = self.repo.append_history_many(entries)
+
+        self.assertEqual(results, [None] * len(entries))
+        self.assertEqual([entry.seq for entry in entries], [2, 0, 3, 1, 4, 2])
+
+        history = list(self.repo.get_history(client_id=incidents[0].client_id, incident_id=incidents[0].id))
+        self.assertEqual(history, existing + entries[0::2])
+
+        history = list(self.repo.get_history(client_id=incidents[1].client_id, incident_id=incidents[1].id))
+        self.assertEqual(history, entries[1::2])
+
+        client_ref = self.client.collection('clients').document(incidents[1].client_id)
+        doc = cast(CollectionReference, client_ref.collection('incidents')).document(incidents[1].id).get()
+        self.assertEqual(doc.get('last_modified'), entries[5].date)
+
+    def test_append_history_many_errors(self) -> None:
+        incident = self.add_random_incidents(1)[0]
+        entries = [
+            create_random_history_entry(self.faker, seq=None, client_id=incident.client_id, incident_id=incident.id)
+            for _ in range(2)
+        ]
+        entries[0].seq = 5
+        missing = create_random_history_entry(self.faker, seq=None)
+
+        results = self.repo.append_history_many([*entries, missing])
+
+        self.assertIsInstance(results[0], ValueError)
+        self.assertIsNone(results[1])
+        self.assertEqual(entries[1].seq, 0)
+        self.assertIsInstance(results[2], NotFound)
+        self.assertIsNone(missing.seq)
+
+        # No history is written for an incident that does not exist
+        client_ref = self.client.collection('clients').document(missing.client_id)
+        incident_ref = cast(CollectionReference, client_ref.collection('incidents')).document(missing.incident_id)
+        self.assertEqual(list(cast(CollectionReference, incident_ref.collection('history')).list_documents()), [])
+
+    def test_delete_all_client(self) -> None:
+        client_id = cast(str, self.faker.uuid4())
+        incidents = self.add_random_incidents(2, client_id=client_id)
+        self.add_random_history_entries(3, client_id=client_id, incident_id=incidents[0].id)
+        other = self.add_random_incidents(1)[0]
+
+        deleted = self.repo.delete_all(client_id=client_id)
+
+        # Client document, two incidents and three history entries
+        self.assertEqual(deleted, {client_id: 6})
+        for incident in incidents:
+            self.assertIsNone(self.repo.get(client_id=incident.client_id, incident_id=incident.id))
+        self.assertEqual(self.repo.get(client_id=other.client_id, incident_id=other.id), other)
+
+    def add_closed_incident(self, client_id: str, entries: int) -> tuple[Incident, list[HistoryEntry]]:
+        incident = create_random_incident(self.faker, overrides={'client_id': client_id})
+        self.repo.create(incident)
+
+        history = [
+            create_random_history_entry(
+                self.faker,
+                seq=None,
+                client_id=client_id,
+                incident_id=incident.id,
+                action=Action.CLOSED if i == entries - 1 else Action.CREATED,
+            )
+            for i in range(entries)
+        ]
+        for entry in history:
+            self.repo.append_history_entry(entry)
+
+        return incident, history
+
+    def test_archive_closed(self) -> None:
+        client_id = cast(str, self.faker.uuid4())
+        closed, history = self.add_closed_incident(client_id, 3)
+        open_incident = self.add_random_incidents(1, client_id=client_id)[0]
+
+        archived = self.repo.archive_closed(datetime.now(UTC) + timedelta(days=1))
+
+        self.assertEqual(archived, 1)
+        client_ref = self.client.collection('clients').document(client_id)
+        self.assertFalse(cast(CollectionReference, client_ref.collection('incidents')).document(closed.id).get().exists)
+        # The history subcollection is gone, the history is read from the archive
+        self.assertEqual(list(self.repo.get_history(client_id=client_id, incident_id=closed.id)), history)
+        self.assertEqual(
+            list(self.repo.get_history(client_id=client_id, incident_id=closed.id, after_seq=2, descending=True)),
+            history[1::-1],
+        )
+
+        # Reads of the archived incident fall back to the archive
+        self.assertEqual(self.repo.get(client_id=client_id, incident_id=closed.id), closed)
+        view = self.repo.get_view(client_id=client_id, incident_id=closed.id, fields=['last_action'])
+        self.assertEqual(view, IncidentView(id=closed.id, client_id=client_id, last_action=Action.CLOSED))
+        self.assertEqual(self.repo.get(client_id=client_id, incident_id=open_incident.id), open_incident)
+
+        archive_ref = self.client.collection('archive').document(client_id)
+        archived_ref = cast(CollectionReference, archive_ref.collection('archived_incidents')).document(closed.id)
+        chunks_ref = cast(CollectionReference, archived_ref.collection('history_chunks'))
+        entries = [x for doc in chunks_ref.stream() for x in cast(dict[str, Any], doc.to_dict())['entries']]
+        self.assertEqual([x['description'] for x in entries], [x.description for x in history])
+
+        self.assertEqual(self.repo.metrics(), {'incident_archive': {'active': 1, 'archived': 1}})
+
+        self.repo.delete_all()
+        self.assertIsNone(self.repo.get(client_id=client_id, incident_id=closed.id))
+
+    @parametrize('embedded_history', [(0,), (3,)])
+    def test_no_history_not_archived(self, embedded_history: int) -> None:
+        # An active incident without history is not looked up in the archive
+        self.repo = FirestoreIncidentRepository(FIRESTORE_DATABASE, embedded_history=embedded_history)
+        incident = self.add_random_incidents(1)[0]
+
+        with patch.object(self.repo, '_archived_ref', side_effect=AssertionError) as archived_ref_mock:
+            self.assertEqual(list(self.repo.get_history(client_id=incident.client_id, incident_id=incident.id)), [])
+            retrieved, history = self.repo.get_with_history(incident.client_id, incident.id)
+
+        self.assertEqual(cast(Incident, retrieved).id, incident.id)
+        self.assertEqual(history, [])
+        archived_ref_mock.assert_not_called()
+
+    def test_metrics_cached(self) -> None:
+        self.assertEqual(self.repo.metrics(), {'incident_archive': {'active': 0, 'archived': 0}})
+        self.add_random_incidents(1)
+        self.assertEqual(self.repo.metrics(), {'incident_archive': {'active': 0, 'archived': 0}})
+
+        with patch('repositories.firestore.incident.METRICS_TTL', 0):
+            self.assertEqual(self.repo.metrics(), {'incident_archive': {'active': 1, 'archived': 0}})
+
+    @parametrize('embedded_history', [(0,), (3,)])
+    def test_update_archived(self, embedded_history: int) -> None:
+        self.repo = FirestoreIncidentRepository(FIRESTORE_DATABASE, embedded_history=embedded_history)
+        client_id = cast(str, self.faker.uuid4())
+        closed, history = self.add_closed_incident(client_id, 4)
+        self.repo.archive_closed(datetime.now(UTC) + timedelta(days=1))
+
+        self.assertEqual(self.repo.get_with_history(client_id, closed.id), (closed, history))
+        self.assertEqual(self.repo.get_with_history(client_id, closed.id, history_limit=1), (closed, history[-1:]))
+
+        app = create_app()
+        token = {'sub': cast(str, self.faker.uuid4()), 'cid': client_id, 'role': 'agent', 'aud': 'agent'}
+        url = f'/api/v1/clients/{client_id}/employees/{closed.assigned_to}/incidents/{closed.id}/update'
+
+        with app.container.incident_repo.override(self.repo):
+            resp = app.test_client().post(
+                url,
+                headers={'X-Apigateway-Api-Userinfo': base64.urlsafe_b64encode(json.dumps(token).encode()).decode()},
+                data=json.dumps({'action': Action.AI_RESPONSE.value, 'description': 'Test'}),
+                content_type='application/json',
+            )
+        app.container.unwire()
 
-            self.assertFalse(doc.exists)
+        # Rejected as closed, nothing is written to the clients tree
+        self.assertEqual(resp.status_code, 409)
+        self.assertEqual(json.loads(resp.get_data())['message'], CLOSED_INCIDENT_ERROR)
+        client_ref = self.client.collection('clients').document(client_id)
+        self.assertFalse(cast(CollectionReference, client_ref.collection('incidents')).document(closed.id).get().exists)
+
+    def test_archive_closed_before(self) -> None:
+        client_id = cast(str, self.faker.uuid4())
+        incidents = [self.add_closed_incident(client_id, 2)[0] for _ in range(3)]
+
+        self.assertEqual(self.repo.archive_closed(datetime.now(UTC) - timedelta(days=365)), 0)
+        self.assertEqual(self.repo.archive_closed(datetime.now(UTC) + timedelta(days=1), limit=2), 2)
+        self.assertEqual(self.repo.archive_closed(datetime.now(UTC) + timedelta(days=1)), 1)
+
+        for incident in incidents:
+            self.assertEqual(self.repo.get(client_id=client_id, incident_id=incident.id), incident)
 
     def test_get_history(self) -> None:
         client_id = cast(str, self.faker.uuid4())
@@ -150,6 +347,31 @@ class TestClient(ParametrizedTestCase):
 
         self.assertEqual(result, entries)
 
+    def test_get_last_history_entry_empty(self) -> None:
+        incident = self.add_random_incidents(1)[0]
+
+        result = self.repo.get_last_history_entry(client_id=incident.client_id, incident_id=incident.id)
+
+        self.assertIsNone(result)
+
+    def test_get_history_read_count(self) -> None:
+        incident = self.add_random_incidents(1)[0]
+        self.add_random_history_entries(10, client_id=incident.client_id, incident_id=incident.id)
+
+        # Every document returned by a query is converted exactly once, so conversions equal billed reads
+        with patch(CONVERTER, wraps=doc_to_history_entry) as full_reads:
+            list(self.repo.get_history(client_id=incident.client_id, incident_id=incident.id))
+
+        with patch(CONVERTER, wraps=doc_to_history_entry) as ranged_reads:
+            list(self.repo.get_history(client_id=incident.client_id, incident_id=incident.id, after_seq=7))
+
+        with patch(CONVERTER, wraps=doc_to_history_entry) as last_reads:
+            self.repo.get_last_history_entry(client_id=incident.client_id, incident_id=incident.id)
+
+        self.assertEqual(full_reads.call_count, 10)
+        self.assertEqual(ranged_reads.call_count, 2)
+        self.assertEqual(last_reads.call_count, 1)
+
     def test_get_existing(self) -> None:
         client_id = cast(str, self.faker.uuid4())
 
@@ -159,13 +381,33 @@ class TestClient(ParametrizedTestCase):
 
         self.assertEqual(result, incident)
 
-    def test_get_not_found(self) -> None:
-        client_id = cast(str, self.faker.uuid4())
-        incident_id = cast(str, self.faker.uuid4())
+    def test_get_view_reads_incident_only(self) -> None:
+        incident = self.add_random_incidents(1)[0]
+        entry = create_random_history_entry(self.faker, seq=None, client_id=incident.client_id, incident_id=incident.id)
+        self.repo.append_history_entry(entry)
 
-        result = self.repo.get(client_id=client_id, incident_id=incident_id)
+        # last_action is stored on the incident, the history is not queried
+        with patch(CONVERTER, wraps=doc_to_history_entry) as history_reads:
+            view = self.repo.get_view(
+                client_id=incident.client_id, incident_id=incident.id, fields=['assigned_to', 'last_action']
+            )
 
-        self.assertIsNone(result)
+        self.assertEqual(
+            view,
+            IncidentView(
+                id=incident.id, client_id=incident.client_id, assigned_to=incident.assigned_to, last_action=entry.action
+            ),
+        )
+        self.assertEqual(history_reads.call_count, 0)
+
+    def test_get_view_legacy_incident(self) -> None:
+        # History written without last_action on the incident
+        incident = self.add_random_incidents(1)[0]
+        entries = self.add_random_history_entries(3, client_id=incident.client_id, incident_id=incident.id)
+
+        view = self.repo.get_view(client_id=incident.client_id, incident_id=incident.id, fields=['last_action'])
+
+        self.assertEqual(view, IncidentView(id=incident.id, client_id=incident.client_id, last_action=entries[-1].action))
 
     def test_update_existing_incident(self) -> None:
         incident = self.add_random_incidents(1)[0]
@@ -189,3 +431,262 @@ class TestClient(ParametrizedTestCase):
             self.repo.update(incident)
 
         self.assertEqual(str(context.exception), f'Incident with ID {incident.id} not found for client {incident.client_id}.')
+
+    def test_update_with_history_not_found(self) -> None:
+        incident = create_random_incident(self.faker)
+        entry = create_random_history_entry(self.faker, seq=None, client_id=incident.client_id, incident_id=incident.id)
+
+        with self.assertRaises(ValueError):
+            self.repo.update_with_history(incident, {'risk'}, entry)
+
+
+@skipUnless('FIRESTORE_EMULATOR_HOST' in os.environ, 'Firestore emulator not available')
+class TestEmbeddedHistory(ParametrizedTestCase):
+    EMBEDDED = 3
+
+    def setUp(self) -> None:
+        self.faker = Faker()
+
+        requests.delete(
+            f'http://{os.environ["FIRESTORE_EMULATOR_HOST"]}/emulator/v1/projects/google-cloud-firestore-emulator/databases/{FIRESTORE_DATABASE}/documents',
+            timeout=5,
+        )
+
+        self.repo = FirestoreIncidentRepository(FIRESTORE_DATABASE, embedded_history=self.EMBEDDED)
+        self.client = FirestoreClient(database=FIRESTORE_DATABASE)
+
+    def incident_ref(self, incident: Incident) -> DocumentReference:
+        client_ref = self.client.collection('clients').document(incident.client_id)
+        return cast(CollectionReference, client_ref.collection('incidents')).document(incident.id)
+
+    def add_incident_with_history(self, n: int) -> tuple[Incident, list[HistoryEntry]]:
+        incident = create_random_incident(self.faker)
+        self.repo.create(incident)
+
+        entries = [
+            create_random_history_entry(self.faker, seq=None, client_id=incident.client_id, incident_id=incident.id)
+            for _ in range(n)
+        ]
+        for entry in entries:
+            self.repo.append_history_entry(entry)
+
+        return incident, entries
+
+    def test_append_spills(self) -> None:
+        incident, entries = self.add_incident_with_history(5)
+
+        self.assertEqual([x.seq for x in entries], [0, 1, 2, 3, 4])
+
+        data = cast(dict[str, Any], self.incident_ref(incident).get().to_dict())
+        self.assertEqual([x['seq'] for x in data['history']], [0, 1, 2])
+        self.assertEqual(data['history_count'], 5)
+
+        history_ref = cast(CollectionReference, self.incident_ref(incident).collection('history'))
+        self.assertEqual(sorted(doc.id for doc in history_ref.list_documents()), ['3', '4'])
+
+        self.assertEqual(list(self.repo.get_history(client_id=incident.client_id, incident_id=incident.id)), entries)
+
+    def test_append_not_found(self) -> None:
+        with self.assertRaises(NotFound):
+            self.repo.append_history_entry(create_random_history_entry(self.faker, seq=None))
+
+    @parametrize(
+        'count, after_seq, limit, descending',
+        [
+            (2, None, None, False),
+            (2, None, 1, True),
+            (5, None, None, False),
+            (5, None, None, True),
+            (5, 1, 3, False),
+            (5, 2, None, False),
+            (5, None, 2, True),
+            (5, 4, None, True),
+            (5, 4, 3, True),
+            (5, 2, None, True),
+        ],
+    )
+    def test_get_history_range(self, count: int, after_seq: int | None, limit: int | None, descending: bool) -> None:  # noqa: FBT001
+        incident, _ = self.add_incident_with_history(count)
+
+        seqs = list(range(count))
+        if descending:
+            seqs = [x for x in reversed(seqs) if after_seq is None or x < after_seq]
+        else:
+            seqs = [x for x in seqs if after_seq is None or x > after_seq]
+
+        history = self.repo.get_history(
+            client_id=incident.client_id, incident_id=incident.id, after_seq=after_seq, limit=limit, descending=descending
+        )
+
+        self.assertEqual([x.seq for x in history], seqs[:limit])
+
+    def test_legacy_incident(self) -> None:
+        # Written before the layout was enabled: no counter, history in the subcollection
+        incident = create_random_incident(self.faker)
+        FirestoreIncidentRepository(FIRESTORE_DATABASE).create(incident)
+        legacy_repo = FirestoreIncidentRepository(FIRESTORE_DATABASE)
+        for _ in range(2):
+            legacy_repo.append_history_entry(
+                create_random_history_entry(self.faker, seq=None, client_id=incident.client_id, incident_id=incident.id)
+            )
+
+        entry = create_random_history_entry(self.faker, seq=None, client_id=incident.client_id, incident_id=incident.id)
+        self.repo.append_history_entry(entry)
+
+        self.assertEqual(entry.seq, 2)
+        history = self.repo.get_history(client_id=incident.client_id, incident_id=incident.id)
+        self.assertEqual([x.seq for x in history], [0, 1, 2])
+        self.assertNotIn('history', cast(dict[str, Any], self.incident_ref(incident).get().to_dict()))
+
+    def test_append_history_many(self) -> None:
+        incident, _ = self.add_incident_with_history(1)
+        entries = [
+            create_random_history_entry(self.faker, seq=None, client_id=incident.client_id, incident_id=incident.id)
+            for _ in range(4)
+        ]
+        missing = create_random_history_entry(self.faker, seq=None)
+
+        results = self.repo.append_history_many([*entries, missing])
+
+        self.assertEqual(results[:4], [None] * 4)
+        self.assertIsInstance(results[4], NotFound)
+        self.assertEqual([x.seq for x in entries], [1, 2, 3, 4])
+
+        data = cast(dict[str, Any], self.incident_ref(incident).get().to_dict())
+        self.assertEqual(len(data['history']), self.EMBEDDED)
+        self.assertEqual(data['history_count'], 5)
+
+        history = self.repo.get_history(client_id=incident.client_id, incident_id=incident.id, after_seq=0)
+        self.assertEqual(list(history), entries)
+
+    @parametrize('conflicts', [(1,), (3,)])
+    def test_append_history_many_conflict(self, conflicts: int) -> None:
+        incident, history = self.add_incident_with_history(1)
+        entries = [
+            create_random_history_entry(self.faker, seq=None, client_id=incident.client_id, incident_id=incident.id)
+            for _ in range(3)
+        ]
+        next_seqs = self.repo._next_seqs  # noqa: SLF001
+
+        # Another request appends to the incident after each read of its seq counter, up to conflicts times
+        def read_then_append(refs: list[DocumentReference]) -> Any:  # noqa: ANN401
+            seqs = next_seqs(refs)
+            if len(history) <= conflicts:
+                entry = create_random_history_entry(
+                    self.faker, seq=None, client_id=incident.client_id, incident_id=incident.id
+                )
+                self.repo.append_history_entry(entry)
+                history.append(entry)
+            return seqs
+
+        with patch.object(self.repo, '_next_seqs', read_then_append):
+            results = self.repo.append_history_many(entries)
+
+        stored = list(self.repo.get_history(client_id=incident.client_id, incident_id=incident.id))
+        if conflicts < 3:  # noqa: PLR2004
+            self.assertEqual(results, [None] * 3)
+            self.assertEqual(stored, [*history, *entries])
+        else:
+            # Every attempt conflicted, nothing was written
+            self.assertTrue(all(isinstance(x, FailedPrecondition) for x in results))
+            self.assertEqual([x.seq for x in entries], [None] * 3)
+            self.assertEqual(stored, history)
+        self.assertEqual([x.seq for x in stored], list(range(len(stored))))
+
+    @parametrize(
+        'count, history_limit',
+        [
+            (2, None),
+            (2, 1),
+            (5, None),
+            (5, 1),
+            (5, 4),
+        ],
+    )
+    def test_get_with_history(self, count: int, history_limit: int | None) -> None:
+        incident, entries = self.add_incident_with_history(count)
+
+        retrieved, history = self.repo.get_with_history(
+            client_id=incident.client_id, incident_id=incident.id, history_limit=history_limit
+        )
+
+        self.assertEqual(retrieved, incident)
+        self.assertEqual([x.seq for x in history], [x.seq for x in entries][-(history_limit or count) :])
+
+    def compacting_repo(self, compact_threshold: int = 0) -> FirestoreIncidentRepository:
+        return FirestoreIncidentRepository(
+            FIRESTORE_DATABASE, embedded_history=self.EMBEDDED, history_chunk=2, compact_threshold=compact_threshold
+        )
+
+    def history_ids(self, incident: Incident) -> list[str]:
+        history_ref = cast(CollectionReference, self.incident_ref(incident).collection('history'))
+        return sorted((doc.id for doc in history_ref.list_documents()), key=int)
+
+    @parametrize(
+        'after_seq, limit, descending',
+        [
+            (None, None, False),
+            (None, None, True),
+            (1, 4, False),
+            (4, 3, False),
+            (6, None, False),
+            (None, 2, True),
+            (None, 5, True),
+            (7, None, True),
+            (6, 2, True),
+            (3, None, True),
+        ],
+    )
+    def test_compacted_history_range(self, after_seq: int | None, limit: int | None, descending: bool) -> None:  # noqa: FBT001
+        self.repo = self.compacting_repo()
+        incident, _ = self.add_incident_with_history(10)
+
+        def history() -> list[HistoryEntry]:
+            return list(
+                self.repo.get_history(
+                    client_id=incident.client_id,
+                    incident_id=incident.id,
+                    after_seq=after_seq,
+                    limit=limit,
+                    descending=descending,
+                )
+            )
+
+        before = history()
+        # Entries 3 to 8 are compacted, 9 is not a full chunk. Reads see the originals until the next compaction
+        self.assertEqual(self.repo.compact_history(incident.client_id, incident.id), 6)
+        self.assertEqual(history(), before)
+
+        self.assertEqual(self.repo.compact_history(incident.client_id, incident.id), 0)
+        self.assertEqual(self.history_ids(incident), ['9'])
+        self.assertEqual(history(), before)
+
+    def test_compaction_requires_embedded_layout(self) -> None:
+        with self.assertRaises(ValueError):
+            FirestoreIncidentRepository(FIRESTORE_DATABASE).compact_history('c', 'i')
+
+    def test_compaction_scheduled_on_append(self) -> None:
+        self.repo = self.compacting_repo(compact_threshold=4)
+        incident, entries = self.add_incident_with_history(7)
+        self.repo.compact_executor.shutdown()
+
+        data = cast(dict[str, Any], self.incident_ref(incident).get().to_dict())
+        self.assertEqual(data['history_chunks'], [{'first': 3, 'last': 4}, {'first': 5, 'last': 6}])
+        self.assertEqual(list(self.repo.get_history(client_id=incident.client_id, incident_id=incident.id)), entries)
+
+    def test_compaction_scheduled_on_bulk_append(self) -> None:
+        self.repo = self.compacting_repo(compact_threshold=4)
+        incident, _ = self.add_incident_with_history(0)
+        entries = [
+            create_random_history_entry(self.faker, seq=None, client_id=incident.client_id, incident_id=incident.id)
+            for _ in range(7)
+        ]
+
+        with patch.object(self.repo, 'schedule_compaction', wraps=self.repo.schedule_compaction) as schedule:
+            self.assertEqual(self.repo.append_history_many(entries), [None] * 7)
+        self.repo.compact_executor.shutdown()
+
+        schedule.assert_called_once_with(incident.client_id, incident.id)
+        data = cast(dict[str, Any], self.incident_ref(incident).get().to_dict())
+        self.assertEqual(data['history_chunks'], [{'first': 3, 'last': 4}, {'first': 5, 'last': 6}])
+        self.assertEqual(list(self.repo.get_history(client_id=incident.client_id, incident_id=incident.id)), entries)
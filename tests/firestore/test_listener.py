@@ -0,0 +1,188 @@
+from collections.abc import Callable
+from typing import Any, cast
+from unittest import TestCase
+from unittest.mock import Mock
+
+from faker import Faker
+from google.cloud.firestore_v1 import DocumentSnapshot
+from google.cloud.firestore_v1.watch import ChangeType, DocumentChange, Watch
+
+from models import Action, Incident, IncidentView
+from repositories.firestore import FirestoreIncidentRepository, ListenerIncidentRepository
+from repositories.firestore.converters import incident_to_doc
+from tests.util import create_random_history_entry, create_random_incident
+
+FIELDS = ['assigned_to', 'last_action']
+
+
+class TestListener(TestCase):
+    def setUp(self) -> None:
+        self.faker = Faker()
+        self.inner = Mock(FirestoreIncidentRepository)
+        self.inner.db = Mock()
+        cast(Mock, self.inner.metrics).return_value = {}
+        self.repo = ListenerIncidentRepository(self.inner, max_clients=2, idle_ttl=300, active_window=3600)
+
+        # Every started listener, with the callback its snapshots are delivered to
+        self.watches: list[tuple[Mock, Callable[..., None]]] = []
+
+        def on_snapshot(callback: Callable[..., None]) -> Mock:
+            watch = Mock(Watch)
+            self.watches.append((watch, callback))
+            return watch
+
+        query = self.inner.db.collection.return_value.document.return_value.collection.return_value.where.return_value
+        query.on_snapshot.side_effect = on_snapshot
+
+    def deliver(self, incident: Incident, change_type: ChangeType = ChangeType.ADDED, **fields: Any) -> None:  # noqa: ANN401
+        doc = Mock(DocumentSnapshot)
+        doc.id = incident.id
+        cast(Mock, doc.to_dict).return_value = {**incident_to_doc(incident), **fields}
+
+        self.watches[-1][1]([doc], [DocumentChange(change_type, doc, -1, 0)], None)  # type: ignore[no-untyped-call]
+
+    def test_fallback_until_synced(self) -> None:
+        incident = create_random_incident(self.faker)
+        cast(Mock, self.inner.get_view).return_value = None
+
+        view = self.repo.get_view(client_id=incident.client_id, incident_id=incident.id, fields=FIELDS)
+
+        self.assertIsNone(view)
+        cast(Mock, self.inner.get_view).assert_called_once_with(incident.client_id, incident.id, FIELDS)
+        self.assertEqual(len(self.watches), 1)
+
+    def test_served_from_listener(self) -> None:
+        incident = create_random_incident(self.faker)
+        self.repo.get_view(client_id=incident.client_id, incident_id=incident.id, fields=FIELDS)
+        self.deliver(incident, last_action=Action.CLOSED)
+
+        view = self.repo.get_view(client_id=incident.client_id, incident_id=incident.id, fields=FIELDS)
+
+        self.assertEqual(
+            view,
+            IncidentView(
+                id=incident.id, client_id=incident.client_id, assigned_to=incident.assigned_to, last_action=Action.CLOSED
+            ),
+        )
+        self.assertEqual(cast(Mock, self.inner.get_view).call_count, 1)
+        self.assertEqual(len(self.watches), 1)
+
+    def test_legacy_and_removed_fall_back(self) -> None:
+        legacy = create_random_incident(self.faker)
+        removed = create_random_incident(self.faker, overrides={'client_id': legacy.client_id})
+        self.repo.get_view(client_id=legacy.client_id, incident_id=legacy.id, fields=FIELDS)
+        self.deliver(legacy)
+        self.deliver(removed, last_action=Action.CREATED)
+        self.deliver(removed, ChangeType.REMOVED, last_action=Action.CREATED)
+
+        self.repo.get_view(client_id=legacy.client_id, incident_id=legacy.id, fields=FIELDS)
+        self.repo.get_view(client_id=removed.client_id, incident_id=removed.id, fields=FIELDS)
+
+        self.assertEqual(cast(Mock, self.inner.get_view).call_count, 3)
+
+    def test_write_falls_back_until_delivered(self) -> None:
+        incident = create_random_incident(self.faker)
+        self.repo.get_view(client_id=incident.client_id, incident_id=incident.id, fields=FIELDS)
+        self.deliver(incident, last_action=Action.CREATED)
+
+        entry = create_random_history_entry(
+            self.faker, seq=None, client_id=incident.client_id, incident_id=incident.id, action=Action.CLOSED
+        )
+        self.repo.append_history_entry(entry)
+        self.repo.get_view(client_id=incident.client_id, incident_id=incident.id, fields=FIELDS)
+
+        self.deliver(incident, ChangeType.MODIFIED, last_action=Action.CLOSED)
+        view = self.repo.get_view(client_id=incident.client_id, incident_id=incident.id, fields=FIELDS)
+
+        cast(Mock, self.inner.append_history_entry).assert_called_once_with(entry)
+        self.assertEqual(cast(Mock, self.inner.get_view).call_count, 2)
+        assert view is not None  # noqa: S101
+        self.assertEqual(view.last_action, Action.CLOSED)
+
+    def test_dead_listener_restarted(self) -> None:
+        incident = create_random_incident(self.faker)
+        self.repo.get_view(client_id=incident.client_id, incident_id=incident.id, fields=FIELDS)
+        self.deliver(incident, last_action=Action.CREATED)
+        dead = self.watches[0][0]
+        dead.is_active = False
+
+        self.repo.get_view(client_id=incident.client_id, incident_id=incident.id, fields=FIELDS)
+
+        # The stale snapshot is not served, the read goes to the wrapped repository while a new listener syncs
+        self.assertEqual(cast(Mock, self.inner.get_view).call_count, 2)
+        cast(Mock, dead.unsubscribe).assert_called_once()
+        self.assertEqual(len(self.watches), 2)
+
+        self.deliver(incident, last_action=Action.CLOSED)
+        view = self.repo.get_view(client_id=incident.client_id, incident_id=incident.id, fields=FIELDS)
+
+        assert view is not None  # noqa: S101
+        self.assertEqual((view.last_action, cast(Mock, self.inner.get_view).call_count), (Action.CLOSED, 2))
+
+    def test_get_views(self) -> None:
+        incident = create_random_incident(self.faker)
+        missing = create_random_incident(self.faker, overrides={'client_id': incident.client_id})
+        self.repo.get_view(client_id=incident.client_id, incident_id=incident.id, fields=FIELDS)
+        self.deliver(incident, last_action=Action.CREATED)
+        cast(Mock, self.inner.get_views).return_value = [None]
+
+        views = self.repo.get_views(incident.client_id, [missing.id, incident.id], FIELDS)
+
+        self.assertEqual(
+            views,
+            [
+                None,
+                IncidentView(
+                    id=incident.id, client_id=incident.client_id, assigned_to=incident.assigned_to, last_action=Action.CREATED
+                ),
+            ],
+        )
+        cast(Mock, self.inner.get_views).assert_called_once_with(incident.client_id, [missing.id], FIELDS)
+
+    def test_lru_eviction(self) -> None:
+        client_ids = [cast(str, self.faker.uuid4()) for _ in range(3)]
+
+        for client_id in client_ids:
+            self.repo.get_view(client_id=client_id, incident_id=cast(str, self.faker.uuid4()), fields=FIELDS)
+
+        self.assertEqual([cast(Mock, watch.unsubscribe).call_count for watch, _ in self.watches], [1, 0, 0])
+        self.assertEqual(self.repo.metrics()['incident_listener']['listeners'], 2)
+        self.assertEqual(self.repo.evictions, 1)
+
+    def test_idle_eviction(self) -> None:
+        self.repo.idle_ttl = 0
+
+        for _ in range(2):
+            self.repo.get_view(
+                client_id=cast(str, self.faker.uuid4()), incident_id=cast(str, self.faker.uuid4()), fields=FIELDS
+            )
+
+        cast(Mock, self.watches[0][0].unsubscribe).assert_called_once()
+
+    def test_metrics(self) -> None:
+        incident = create_random_incident(self.faker)
+        self.repo.get_view(client_id=incident.client_id, incident_id=incident.id, fields=FIELDS)
+        self.deliver(incident, last_action=Action.CREATED)
+        self.repo.get_view(client_id=incident.client_id, incident_id=incident.id, fields=FIELDS)
+
+        self.assertEqual(
+            self.repo.metrics(),
+            {
+                'incident_listener': {
+                    'listeners': 1,
+                    'max_listeners': 2,
+                    'incidents': 1,
+                    'hits': 1,
+                    'fallbacks': 1,
+                    'evictions': 0,
+                }
+            },
+        )
+
+    def test_close(self) -> None:
+        self.repo.get_view(client_id=cast(str, self.faker.uuid4()), incident_id=cast(str, self.faker.uuid4()), fields=FIELDS)
+
+        self.repo.close()
+
+        cast(Mock, self.watches[0][0].unsubscribe).assert_called_once()
+        self.assertEqual(self.repo.metrics()['incident_listener']['listeners'], 0)
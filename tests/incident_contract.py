@@ -0,0 +1,311 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import UTC, datetime, timedelta
+from typing import cast
+
+from faker import Faker
+from google.api_core.exceptions import AlreadyExists, FailedPrecondition, NotFound
+from unittest_parametrize import ParametrizedTestCase, parametrize
+
+from models import HistoryEntry, Incident, IncidentView, Risk
+from repositories import IncidentRepository
+from tests.util import create_random_history_entry, create_random_incident
+
+
+# Behaviour every IncidentRepository shares, run against the Firestore one by tests/firestore/test_incident.py.
+# Test modules subclass it through the module, so discovery does not collect the base class itself.
+class IncidentRepositoryContract(ParametrizedTestCase):
+    repo: IncidentRepository
+
+    def setUp(self) -> None:
+        self.faker = Faker()
+
+    def add_incident_with_history(self, n: int, client_id: str | None = None) -> tuple[Incident, list[HistoryEntry]]:
+        incident = create_random_incident(self.faker, overrides={'client_id': client_id})
+        self.repo.create(incident)
+
+        entries = [
+            create_random_history_entry(self.faker, seq=None, client_id=incident.client_id, incident_id=incident.id)
+            for _ in range(n)
+        ]
+        for entry in entries:
+            self.repo.append_history_entry(entry)
+
+        return incident, entries
+
+    def test_create_get(self) -> None:
+        incident = create_random_incident(self.faker)
+
+        self.repo.create(incident)
+        retrieved = self.repo.get(client_id=incident.client_id, incident_id=incident.id)
+
+        self.assertEqual(retrieved, incident)
+        self.assertIsNot(retrieved, incident)
+
+    def test_create_duplicate(self) -> None:
+        incident = create_random_incident(self.faker)
+        self.repo.create(incident)
+
+        with self.assertRaises(AlreadyExists):
+            self.repo.create(incident)
+
+    def test_get_not_found(self) -> None:
+        self.assertIsNone(self.repo.get(client_id=cast(str, self.faker.uuid4()), incident_id=cast(str, self.faker.uuid4())))
+
+    def test_append_history_entry(self) -> None:
+        incident, entries = self.add_incident_with_history(3)
+
+        self.assertEqual([x.seq for x in entries], [0, 1, 2])
+        self.assertEqual(list(self.repo.get_history(client_id=incident.client_id, incident_id=incident.id)), entries)
+
+    def test_append_history_entry_seq_set(self) -> None:
+        incident, _ = self.add_incident_with_history(0)
+        entry = create_random_history_entry(self.faker, seq=0, client_id=incident.client_id, incident_id=incident.id)
+
+        with self.assertRaises(ValueError):
+            self.repo.append_history_entry(entry)
+
+    def test_append_history_entry_not_found(self) -> None:
+        with self.assertRaises(NotFound):
+            self.repo.append_history_entry(create_random_history_entry(self.faker, seq=None))
+
+    @parametrize(
+        'after_seq, limit, descending, expected',
+        [
+            (None, None, False, [0, 1, 2, 3, 4]),
+            (1, None, False, [2, 3, 4]),
+            (None, 2, False, [0, 1]),
+            (1, 2, False, [2, 3]),
+            (None, None, True, [4, 3, 2, 1, 0]),
+            (None, 2, True, [4, 3]),
+            (3, None, True, [2, 1, 0]),
+            (3, 2, True, [2, 1]),
+            (4, None, False, []),
+        ],
+    )
+    def test_get_history_range(self, after_seq: int | None, limit: int | None, descending: bool, expected: list[int]) -> None:  # noqa: FBT001
+        incident, _ = self.add_incident_with_history(5)
+
+        history = self.repo.get_history(
+            client_id=incident.client_id, incident_id=incident.id, after_seq=after_seq, limit=limit, descending=descending
+        )
+
+        self.assertEqual([x.seq for x in history], expected)
+
+    @parametrize(
+        'history_limit, expected',
+        [
+            (None, [0, 1, 2]),
+            (1, [2]),
+            (2, [1, 2]),
+            (5, [0, 1, 2]),
+        ],
+    )
+    def test_get_with_history(self, history_limit: int | None, expected: list[int]) -> None:
+        incident, _ = self.add_incident_with_history(3)
+
+        retrieved, history = self.repo.get_with_history(
+            client_id=incident.client_id, incident_id=incident.id, history_limit=history_limit
+        )
+
+        self.assertEqual(retrieved, incident)
+        self.assertEqual([x.seq for x in history], expected)
+
+    def test_get_with_history_not_found(self) -> None:
+        result = self.repo.get_with_history(client_id=cast(str, self.faker.uuid4()), incident_id=cast(str, self.faker.uuid4()))
+
+        self.assertEqual(result, (None, []))
+
+    def test_get_view(self) -> None:
+        incident, entries = self.add_incident_with_history(2)
+
+        view = self.repo.get_view(client_id=incident.client_id, incident_id=incident.id, fields=['assigned_to', 'last_action'])
+
+        self.assertEqual(
+            view,
+            IncidentView(
+                id=incident.id,
+                client_id=incident.client_id,
+                assigned_to=incident.assigned_to,
+                last_action=entries[-1].action,
+            ),
+        )
+
+    def test_get_view_no_history(self) -> None:
+        incident, _ = self.add_incident_with_history(0)
+
+        view = self.repo.get_view(client_id=incident.client_id, incident_id=incident.id, fields=['name', 'last_action'])
+
+        self.assertEqual(view, IncidentView(id=incident.id, client_id=incident.client_id, name=incident.name))
+
+    def test_get_view_not_found(self) -> None:
+        view = self.repo.get_view(
+            client_id=cast(str, self.faker.uuid4()), incident_id=cast(str, self.faker.uuid4()), fields=['assigned_to']
+        )
+
+        self.assertIsNone(view)
+
+    def test_get_view_unknown_field(self) -> None:
+        incident, _ = self.add_incident_with_history(0)
+
+        with self.assertRaises(ValueError):
+            self.repo.get_view(client_id=incident.client_id, incident_id=incident.id, fields=['history'])
+
+    def test_get_views(self) -> None:
+        client_id = cast(str, self.faker.uuid4())
+        incident, entries = self.add_incident_with_history(2, client_id=client_id)
+        other, _ = self.add_incident_with_history(0, client_id=client_id)
+        missing = cast(str, self.faker.uuid4())
+
+        views = self.repo.get_views(client_id, [incident.id, missing, other.id, incident.id], ['risk', 'last_action'])
+
+        self.assertEqual(
+            views,
+            [
+                IncidentView(id=incident.id, client_id=client_id, risk=incident.risk, last_action=entries[-1].action),
+                None,
+                IncidentView(id=other.id, client_id=client_id, risk=other.risk),
+                IncidentView(id=incident.id, client_id=client_id, risk=incident.risk, last_action=entries[-1].action),
+            ],
+        )
+
+    def test_get_last_history_entry(self) -> None:
+        incident, entries = self.add_incident_with_history(3)
+
+        self.assertEqual(self.repo.get_last_history_entry(client_id=incident.client_id, incident_id=incident.id), entries[-1])
+
+    def test_update(self) -> None:
+        incident = create_random_incident(self.faker)
+        self.repo.create(incident)
+
+        incident.risk = Risk.HIGH
+        self.repo.update(incident)
+
+        self.assertEqual(self.repo.get(client_id=incident.client_id, incident_id=incident.id), incident)
+
+    def test_update_not_found(self) -> None:
+        with self.assertRaises(ValueError):
+            self.repo.update(create_random_incident(self.faker))
+
+    def test_update_with_history(self) -> None:
+        incident, entries = self.add_incident_with_history(1)
+        entry = create_random_history_entry(self.faker, seq=None, client_id=incident.client_id, incident_id=incident.id)
+
+        incident.risk = Risk.HIGH
+        incident.name = 'Not written'
+        self.repo.update_with_history(incident, {'risk'}, entry)
+
+        retrieved, history = self.repo.get_with_history(client_id=incident.client_id, incident_id=incident.id)
+        self.assertEqual(cast(Incident, retrieved).risk, Risk.HIGH)
+        self.assertNotEqual(cast(Incident, retrieved).name, 'Not written')
+        self.assertEqual(entry.seq, 1)
+        self.assertEqual(history, [*entries, entry])
+
+    def test_update_with_history_expected_version(self) -> None:
+        incident, _ = self.add_incident_with_history(1)
+        read = cast(Incident, self.repo.get(client_id=incident.client_id, incident_id=incident.id))
+
+        version = read.version
+        read.risk = Risk.HIGH
+        self.repo.update_with_history(read, {'risk'}, None, version)
+
+        # The write sets the new version, backends without versions leave it unset
+        stored = cast(Incident, self.repo.get(client_id=incident.client_id, incident_id=incident.id))
+        self.assertEqual(read.version, stored.version)
+        self.assertTrue(version is None or stored.version != version)
+
+        read.risk = Risk.LOW
+        with self.assertRaises(FailedPrecondition):
+            self.repo.update_with_history(read, {'risk'}, None, 'stale')
+
+        self.assertEqual(cast(Incident, self.repo.get(client_id=incident.client_id, incident_id=incident.id)).risk, Risk.HIGH)
+
+    def test_update_with_history_invalid(self) -> None:
+        incident = create_random_incident(self.faker)
+        entry = create_random_history_entry(self.faker, seq=None, client_id=incident.client_id, incident_id=incident.id)
+
+        with self.assertRaises(ValueError):
+            self.repo.update_with_history(incident, {'risk'}, entry)
+
+        self.repo.create(incident)
+
+        with self.assertRaises(ValueError):
+            self.repo.update_with_history(incident, {'last_action'}, None)
+
+    def test_update_many(self) -> None:
+        incident, _ = self.add_incident_with_history(1)
+        missing = create_random_incident(self.faker, overrides={'client_id': incident.client_id})
+
+        results = self.repo.update_many(
+            [
+                IncidentView(id=incident.id, client_id=incident.client_id, risk=Risk.HIGH, name='Not written'),
+                IncidentView(id=missing.id, client_id=missing.client_id, risk=Risk.HIGH),
+            ],
+            ['risk'],
+        )
+
+        self.assertIsNone(results[0])
+        self.assertIsInstance(results[1], NotFound)
+        retrieved = cast(Incident, self.repo.get(client_id=incident.client_id, incident_id=incident.id))
+        self.assertEqual((retrieved.risk, retrieved.name), (Risk.HIGH, incident.name))
+        self.assertIsNone(self.repo.get(client_id=missing.client_id, incident_id=missing.id))
+
+    def test_get_changes(self) -> None:
+        client_id = cast(str, self.faker.uuid4())
+        start = datetime(2025, 1, 1, tzinfo=UTC)
+        changed: list[tuple[datetime, str]] = []
+
+        # The incidents modified at the same time are ordered by ID
+        for minutes in [0, 1, 1, 2]:
+            incident = create_random_incident(self.faker, overrides={'client_id': client_id})
+            entry = create_random_history_entry(self.faker, seq=None, client_id=client_id, incident_id=incident.id)
+            entry.date = start + timedelta(minutes=minutes)
+            self.repo.create(incident)
+            self.repo.append_history_entry(entry)
+            changed.append((entry.date, incident.id))
+
+        # Never modified, so not in the feed
+        self.add_incident_with_history(0, client_id=client_id)
+        changed.sort()
+
+        first = self.repo.get_changes(client_id, (start, ''), start + timedelta(minutes=2), 2)
+        rest = self.repo.get_changes(client_id, changed[1], start + timedelta(minutes=1), 10)
+
+        self.assertEqual([(x.last_modified, x.incident.id) for x in first], changed[:2])
+        self.assertEqual([(x.last_modified, x.incident.id) for x in rest], changed[2:3])
+
+        # Writing fields without a history entry moves the incident to the end of the feed
+        incident = cast(Incident, self.repo.get(client_id=client_id, incident_id=changed[0][1]))
+        incident.risk = Risk.HIGH
+        self.repo.update_with_history(incident, {'risk'}, None)
+
+        moved = self.repo.get_changes(client_id, changed[-1], datetime.now(UTC) + timedelta(minutes=1), 10)
+
+        self.assertEqual([(x.incident.id, x.incident.risk) for x in moved], [(incident.id, Risk.HIGH)])
+
+    def test_delete_all(self) -> None:
+        client_id = cast(str, self.faker.uuid4())
+        incident, _ = self.add_incident_with_history(3, client_id=client_id)
+        self.add_incident_with_history(0, client_id=client_id)
+        other, _ = self.add_incident_with_history(1)
+
+        # Client document, two incidents and three history entries
+        self.assertEqual(self.repo.delete_all(client_id=client_id), {client_id: 6})
+        self.assertIsNone(self.repo.get(client_id=client_id, incident_id=incident.id))
+        self.assertIsNotNone(self.repo.get(client_id=other.client_id, incident_id=other.id))
+
+        self.assertEqual(self.repo.delete_all(), {other.client_id: 3})
+        self.assertIsNone(self.repo.get(client_id=other.client_id, incident_id=other.id))
+
+    def test_concurrent_appends(self) -> None:
+        incident, _ = self.add_incident_with_history(0)
+        entries = [
+            create_random_history_entry(self.faker, seq=None, client_id=incident.client_id, incident_id=incident.id)
+            for _ in range(200)
+        ]
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(self.repo.append_history_entry, entries))
+
+        self.assertEqual(sorted(cast(int, x.seq) for x in entries), list(range(200)))
+        history = list(self.repo.get_history(client_id=incident.client_id, incident_id=incident.id))
+        self.assertEqual([x.seq for x in history], list(range(200)))
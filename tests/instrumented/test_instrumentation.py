@@ -0,0 +1,124 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, cast
+from unittest import IsolatedAsyncioTestCase, TestCase
+from unittest.mock import AsyncMock, Mock
+
+from faker import Faker
+from google.api_core.exceptions import NotFound
+
+from repositories import AsyncIncidentRepository, IncidentRepository
+from repositories.instrumented import Instrumentation, instrumented, request_context
+from tests.util import create_random_history_entry, create_random_incident
+
+
+def method_stats(instrumentation: Instrumentation, endpoint: str, method: str) -> dict[str, Any]:
+    return cast(dict[str, Any], instrumentation.snapshot()[endpoint][method])
+
+
+class TestInstrumentation(TestCase):
+    def setUp(self) -> None:
+        self.faker = Faker()
+        self.instrumentation = Instrumentation()
+        self.inner = Mock(IncidentRepository)
+        self.repo = instrumented(self.inner, 'incident_repo', self.instrumentation)
+
+    def test_call_counts(self) -> None:
+        incident = create_random_incident(self.faker)
+        cast(Mock, self.inner.get).side_effect = [incident, None]
+
+        self.assertEqual(self.repo.get(client_id=incident.client_id, incident_id=incident.id), incident)
+        self.assertIsNone(self.repo.get(client_id=incident.client_id, incident_id=incident.id))
+
+        stats = method_stats(self.instrumentation, '-', 'incident_repo.get')
+        self.assertEqual(
+            {key: stats[key] for key in ['calls', 'errors', 'documents_read', 'documents_written']},
+            {'calls': 2, 'errors': 0, 'documents_read': 1, 'documents_written': 0},
+        )
+        self.assertEqual(sum(stats['latency_buckets'].values()), 2)
+
+    def test_errors(self) -> None:
+        cast(Mock, self.inner.append_history_entry).side_effect = NotFound('Incident not found')  # type: ignore[no-untyped-call]
+
+        with self.assertRaises(NotFound):
+            self.repo.append_history_entry(create_random_history_entry(self.faker, seq=None))
+
+        stats = method_stats(self.instrumentation, '-', 'incident_repo.append_history_entry')
+        self.assertEqual((stats['calls'], stats['errors'], stats['documents_written']), (1, 1, 0))
+
+    def test_writes(self) -> None:
+        cast(Mock, self.inner.append_history_many).return_value = [None, ValueError('error'), None]
+        cast(Mock, self.inner.delete_all).return_value = {'a': 3, 'b': 4}
+
+        self.repo.append_history_many([create_random_history_entry(self.faker, seq=None) for _ in range(3)])
+        self.repo.delete_all()
+
+        self.assertEqual(method_stats(self.instrumentation, '-', 'incident_repo.append_history_many')['documents_written'], 2)
+        self.assertEqual(method_stats(self.instrumentation, '-', 'incident_repo.delete_all')['documents_written'], 7)
+
+    def test_generator(self) -> None:
+        entries = [create_random_history_entry(self.faker, seq=i) for i in range(3)]
+        cast(Mock, self.inner.get_history).return_value = (x for x in entries)
+
+        history = self.repo.get_history(client_id='c', incident_id='i')
+        self.assertEqual(self.instrumentation.snapshot(), {})
+
+        next(history)
+        history.close()
+
+        stats = method_stats(self.instrumentation, '-', 'incident_repo.get_history')
+        self.assertEqual((stats['calls'], stats['documents_read']), (1, 1))
+
+    def test_request_tagging(self) -> None:
+        cast(Mock, self.inner.get_with_history).return_value = (create_random_incident(self.faker), [])
+        cast(Mock, self.inner.get).return_value = None
+
+        self.instrumentation.start_request('Incident.IncidentDetail')
+        self.repo.get_with_history(client_id='c', incident_id='i', history_limit=1)
+        self.repo.get(client_id='c', incident_id='i')
+
+        with self.assertLogs('Instrumentation', 'INFO') as logs:
+            self.instrumentation.end_request()
+
+        self.repo.get(client_id='c', incident_id='i')
+
+        snapshot = self.instrumentation.snapshot()
+        self.assertEqual(sorted(snapshot), ['-', 'Incident.IncidentDetail'])
+        self.assertEqual(snapshot['Incident.IncidentDetail']['incident_repo.get_with_history']['documents_read'], 1)
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('Endpoint Incident.IncidentDetail made 2 repository calls', logs.output[0])
+        self.assertIn('incident_repo.get=1, incident_repo.get_with_history=1', logs.output[0])
+
+    def test_worker_threads(self) -> None:
+        cast(Mock, self.inner.get).return_value = None
+        self.instrumentation.start_request('Incident.IncidentDetail')
+        self.addCleanup(self.instrumentation.end_request)
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            # The executor does not copy contextvars, only the call run in request_context() is tagged
+            executor.submit(self.repo.get, client_id='c', incident_id='i').result()
+            executor.submit(request_context().run, self.repo.get, client_id='c', incident_id='i').result()
+
+        snapshot = self.instrumentation.snapshot()
+        self.assertEqual(snapshot['-']['incident_repo.get']['calls'], 1)
+        self.assertEqual(snapshot['Incident.IncidentDetail']['incident_repo.get']['calls'], 1)
+
+    def test_uninstrumented(self) -> None:
+        cast(Mock, self.inner.metrics).return_value = {'foo': 1}
+
+        self.assertEqual(self.repo.metrics(), {'foo': 1})
+        self.assertEqual(self.instrumentation.snapshot(), {})
+
+
+class TestAsyncInstrumentation(IsolatedAsyncioTestCase):
+    async def test_async_calls(self) -> None:
+        faker = Faker()
+        instrumentation = Instrumentation()
+        inner = Mock(AsyncIncidentRepository)
+        incident = create_random_incident(faker)
+        cast(AsyncMock, inner.get).return_value = incident
+        repo = instrumented(inner, 'async_incident_repo', instrumentation)
+
+        self.assertEqual(await repo.get(client_id=incident.client_id, incident_id=incident.id), incident)
+
+        stats = method_stats(instrumentation, '-', 'async_incident_repo.get')
+        self.assertEqual((stats['calls'], stats['documents_read']), (1, 1))
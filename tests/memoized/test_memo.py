@@ -0,0 +1,128 @@
+from typing import cast
+from unittest import TestCase
+
+from faker import Faker
+from flask import Flask
+
+from models import Action, Incident, IncidentView, Risk, User
+from repositories import UserRepository
+from repositories.instrumented import Instrumentation, instrumented
+from repositories.memoized import memoized
+from repositories.memory import MemoryIncidentRepository
+from tests.util import create_random_history_entry, create_random_incident
+
+
+class MissingUserRepository(UserRepository):
+    def get(self, user_id: str, client_id: str) -> User | None:  # noqa: ARG002
+        return None
+
+
+class TestMemoized(TestCase):
+    def setUp(self) -> None:
+        self.faker = Faker()
+        self.app = Flask(__name__)
+        self.inner = MemoryIncidentRepository()
+        # Wrapped as in the container, the instrumentation counts the calls that reach the repository
+        self.instrumentation = Instrumentation()
+        self.repo = memoized(instrumented(self.inner, 'incident_repo', self.instrumentation), 'incident_repo')
+
+        self.incident = create_random_incident(self.faker)
+        self.inner.create(self.incident)
+        self.inner.append_history_entry(
+            create_random_history_entry(
+                self.faker, seq=None, client_id=self.incident.client_id, incident_id=self.incident.id, action=Action.CREATED
+            )
+        )
+
+    def calls(self, method: str) -> int:
+        return cast(int, self.instrumentation.snapshot()['-'][method]['calls'])
+
+    def get_with_history(self) -> None:
+        self.repo.get_with_history(client_id=self.incident.client_id, incident_id=self.incident.id)
+
+    def test_repeated_reads(self) -> None:
+        with self.app.app_context():
+            self.get_with_history()
+            self.repo.get_with_history(self.incident.client_id, self.incident.id, None)
+            self.repo.get_with_history(client_id=self.incident.client_id, incident_id=self.incident.id, history_limit=1)
+
+        self.assertEqual(self.calls('incident_repo.get_with_history'), 2)
+
+    def test_results_copied(self) -> None:
+        with self.app.app_context():
+            incident, history = self.repo.get_with_history(client_id=self.incident.client_id, incident_id=self.incident.id)
+            cast(Incident, incident).risk = Risk.HIGH
+            history.clear()
+
+            self.assertEqual(
+                self.repo.get_with_history(client_id=self.incident.client_id, incident_id=self.incident.id),
+                self.inner.get_with_history(client_id=self.incident.client_id, incident_id=self.incident.id),
+            )
+
+    def test_write_invalidates(self) -> None:
+        other = create_random_incident(self.faker, overrides={'client_id': self.incident.client_id})
+        self.inner.create(other)
+        entry = create_random_history_entry(
+            self.faker, seq=None, client_id=self.incident.client_id, incident_id=self.incident.id
+        )
+
+        with self.app.app_context():
+            self.get_with_history()
+            self.repo.get(client_id=other.client_id, incident_id=other.id)
+
+            self.repo.append_history_entry(entry)
+
+            _, history = self.repo.get_with_history(client_id=self.incident.client_id, incident_id=self.incident.id)
+            self.repo.get(client_id=other.client_id, incident_id=other.id)
+
+        self.assertEqual(history[-1], entry)
+        self.assertEqual(self.calls('incident_repo.get_with_history'), 2)
+        self.assertEqual(self.calls('incident_repo.get'), 1)
+
+    def test_write_invalidates_client_reads(self) -> None:
+        other = create_random_incident(self.faker)
+        self.inner.create(other)
+        entry = create_random_history_entry(
+            self.faker, seq=None, client_id=self.incident.client_id, incident_id=self.incident.id, action=Action.CLOSED
+        )
+
+        with self.app.app_context():
+            self.repo.get_views(self.incident.client_id, [self.incident.id], ['last_action'])
+            self.repo.get_views(other.client_id, [other.id], ['last_action'])
+
+            self.repo.append_history_entry(entry)
+
+            views = self.repo.get_views(self.incident.client_id, [self.incident.id], ['last_action'])
+            self.repo.get_views(other.client_id, [other.id], ['last_action'])
+
+        # The read spanning the written incident's client is dropped, the one of the other client is kept
+        self.assertEqual(cast(IncidentView, views[0]).last_action, Action.CLOSED)
+        self.assertEqual(self.calls('incident_repo.get_views'), 3)
+
+    def test_unscoped_write_invalidates_all(self) -> None:
+        with self.app.app_context():
+            self.get_with_history()
+            self.repo.delete_all(client_id=self.incident.client_id)
+            self.get_with_history()
+
+        self.assertEqual(self.calls('incident_repo.get_with_history'), 2)
+
+    def test_per_request(self) -> None:
+        for _ in range(2):
+            with self.app.app_context():
+                self.get_with_history()
+
+        self.get_with_history()
+
+        self.assertEqual(self.calls('incident_repo.get_with_history'), 3)
+
+    def test_misses_and_generators(self) -> None:
+        repo = memoized(instrumented(MissingUserRepository(), 'user_repo', self.instrumentation), 'user_repo')
+
+        with self.app.app_context():
+            for _ in range(2):
+                self.assertIsNone(repo.get('user', 'client'))
+                list(self.repo.get_history(client_id=self.incident.client_id, incident_id=self.incident.id))
+
+        self.assertEqual(self.calls('user_repo.get'), 1)
+        self.assertEqual(self.calls('incident_repo.get_history'), 2)
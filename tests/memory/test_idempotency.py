@@ -0,0 +1,42 @@
+from datetime import UTC, datetime, timedelta
+from unittest import TestCase
+
+from models import IdempotencyRecord
+from repositories.memory import MemoryIdempotencyRepository
+
+
+class TestMemoryIdempotency(TestCase):
+    def setUp(self) -> None:
+        self.repo = MemoryIdempotencyRepository(max_size=2)
+
+    def record(self, key: str, expires_in: float = 60) -> IdempotencyRecord:
+        return IdempotencyRecord(key=key, fingerprint='fp', expires_at=datetime.now(UTC) + timedelta(seconds=expires_in))
+
+    def test_create(self) -> None:
+        first = self.record('a')
+        self.assertIsNone(self.repo.create(first))
+        # A record in progress is returned, and not replaced
+        self.assertEqual(self.repo.create(self.record('a', 120)), first)
+
+        completed = self.record('a')
+        completed.status, completed.body = 201, '{}'
+        self.repo.complete(completed)
+
+        self.assertEqual(self.repo.create(self.record('a')), completed)
+
+    def test_expired_replaced(self) -> None:
+        self.repo.create(self.record('a', -1))
+
+        self.assertIsNone(self.repo.create(self.record('a')))
+
+    def test_delete_and_evict(self) -> None:
+        self.repo.create(self.record('a'))
+        self.repo.delete('a')
+        self.assertIsNone(self.repo.create(self.record('a')))
+
+        self.repo.create(self.record('b'))
+        self.repo.create(self.record('c'))
+
+        # a was the least recently used
+        self.assertIsNone(self.repo.create(self.record('a')))
+        self.assertIsNotNone(self.repo.create(self.record('c')))
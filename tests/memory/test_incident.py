@@ -0,0 +1,8 @@
+from repositories.memory import MemoryIncidentRepository
+from tests import incident_contract
+
+
+class TestMemoryIncident(incident_contract.IncidentRepositoryContract):
+    def setUp(self) -> None:
+        super().setUp()
+        self.repo = MemoryIncidentRepository()
@@ -0,0 +1,37 @@
+from datetime import UTC, datetime, timedelta
+from typing import cast
+from unittest import TestCase
+
+from models import SideEffectTask, TaskStatus
+from repositories.memory import MemorySideEffectTaskRepository
+
+
+class TestMemorySideEffectTask(TestCase):
+    def setUp(self) -> None:
+        self.repo = MemorySideEffectTaskRepository(max_size=2)
+
+    def task(self, task_id: str, expires_in: float = 60) -> SideEffectTask:
+        return SideEffectTask(id=task_id, expires_at=datetime.now(UTC) + timedelta(seconds=expires_in))
+
+    def test_create_and_update(self) -> None:
+        task = self.task('a')
+        self.repo.create(task)
+        self.assertEqual(self.repo.get('a'), task)
+
+        task.status, task.errors = TaskStatus.FAILED, ['incident-update: error']
+        # Stored copies are not changed through the task
+        self.assertEqual(cast(SideEffectTask, self.repo.get('a')).status, TaskStatus.PENDING)
+        self.repo.update(task)
+
+        self.assertEqual(self.repo.get('a'), task)
+
+    def test_expired_and_evicted(self) -> None:
+        self.repo.create(self.task('a', -1))
+        self.assertIsNone(self.repo.get('a'))
+
+        self.repo.create(self.task('b'))
+        self.repo.create(self.task('c'))
+        self.repo.update(self.task('a'))
+
+        self.assertIsNone(self.repo.get('a'))
+        self.assertIsNotNone(self.repo.get('b'))
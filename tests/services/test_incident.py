@@ -0,0 +1,138 @@
+from typing import cast
+from unittest import TestCase
+
+from faker import Faker
+
+from models import Action, HistoryEntry, Incident, IncidentView, Risk
+from repositories.memory import MemoryIncidentRepository
+from services import IncidentService, UpdateItem, UpdateRejectedError
+from tests.util import create_random_history_entry, create_random_incident
+from utils import CLOSED_INCIDENT_ERROR, INCIDENT_NOT_FOUND, UNAUTHORIZED_INCIDENT_ERROR
+
+
+class TestIncidentService(TestCase):
+    def setUp(self) -> None:
+        self.faker = Faker()
+        self.repo = MemoryIncidentRepository()
+        self.service = IncidentService(self.repo)
+
+        self.incident = create_random_incident(self.faker, overrides={'risk': Risk.LOW})
+        self.repo.create(self.incident)
+        self.append(Action.CREATED)
+
+    def append(self, action: Action) -> None:
+        self.repo.append_history_entry(
+            create_random_history_entry(
+                self.faker, seq=None, client_id=self.incident.client_id, incident_id=self.incident.id, action=action
+            )
+        )
+
+    def test_append_update(self) -> None:
+        uow, entry = self.service.append_update(
+            self.incident.client_id, self.incident.id, self.incident.assigned_to, Action.ESCALATED, 'Escalated'
+        )
+
+        self.assertEqual(entry.seq, 1)
+        self.assertEqual(uow.calls, 2)
+        # Only the view the checks need was read
+        self.assertIsNone(uow.incident)
+        self.assertEqual(cast(IncidentView, uow.view).assigned_to, self.incident.assigned_to)
+        self.assertEqual([*self.repo.get_history(self.incident.client_id, self.incident.id)][-1], entry)
+
+    def test_append_update_rejected(self) -> None:
+        cases = [
+            (cast(str, self.faker.uuid4()), self.incident.assigned_to, INCIDENT_NOT_FOUND, 404),
+            (self.incident.id, cast(str, self.faker.uuid4()), UNAUTHORIZED_INCIDENT_ERROR, 403),
+        ]
+
+        for incident_id, assigned_to, message, status in cases:
+            with self.subTest(status=status), self.assertRaises(UpdateRejectedError) as ctx:
+                self.service.append_update(self.incident.client_id, incident_id, assigned_to, Action.CLOSED, 'x')
+
+            self.assertEqual((ctx.exception.message, ctx.exception.status), (message, status))
+
+        self.append(Action.CLOSED)
+
+        with self.assertRaises(UpdateRejectedError) as ctx:
+            self.service.append_update(
+                self.incident.client_id, self.incident.id, self.incident.assigned_to, Action.ESCALATED, 'x'
+            )
+
+        self.assertEqual((ctx.exception.message, ctx.exception.status), (CLOSED_INCIDENT_ERROR, 409))
+
+    def test_update_risk(self) -> None:
+        uow, prev_risk = self.service.update_risk(self.incident.client_id, self.incident.id, Risk.HIGH)
+
+        self.assertEqual(prev_risk, Risk.LOW)
+        self.assertEqual(uow.calls, 2)
+        self.assertEqual(uow.loaded[0].risk, Risk.HIGH)
+        self.assertEqual(self.repo.get(client_id=self.incident.client_id, incident_id=self.incident.id), uow.loaded[0])
+
+    def test_update_risk_closed(self) -> None:
+        self.append(Action.CLOSED)
+
+        with self.assertRaises(UpdateRejectedError) as ctx:
+            self.service.update_risk(self.incident.client_id, self.incident.id, Risk.HIGH)
+
+        self.assertEqual(ctx.exception.status, 409)
+
+    def test_append_updates(self) -> None:
+        assigned_to = self.incident.assigned_to
+        items = [
+            UpdateItem(self.incident.id, assigned_to, Action.ESCALATED, 'Escalated'),
+            UpdateItem(cast(str, self.faker.uuid4()), assigned_to, Action.ESCALATED, 'Missing'),
+            UpdateItem(self.incident.id, assigned_to, Action.CLOSED, 'Closed'),
+            UpdateItem(self.incident.id, assigned_to, Action.AI_RESPONSE, 'After closing'),
+        ]
+
+        results = self.service.append_updates(self.incident.client_id, items)
+
+        self.assertEqual([x.seq if isinstance(x, HistoryEntry) else x.status for x in results], [1, 404, 2, 409])
+        history = self.repo.get_history(client_id=self.incident.client_id, incident_id=self.incident.id)
+        self.assertEqual([x.description for x in history][1:], ['Escalated', 'Closed'])
+
+    def test_commit_nothing(self) -> None:
+        uow = self.service.unit_of_work(self.incident.client_id, self.incident.id)
+        uow.load()
+        uow.commit()
+
+        self.assertEqual(uow.calls, 1)
+
+    def test_not_loaded(self) -> None:
+        uow = self.service.unit_of_work(self.incident.client_id, self.incident.id)
+
+        with self.assertRaises(ValueError):
+            uow.set_risk(Risk.HIGH)
+
+    def test_update_risks(self) -> None:
+        closed = create_random_incident(self.faker, overrides={'client_id': self.incident.client_id})
+        self.repo.create(closed)
+        self.repo.append_history_entry(
+            create_random_history_entry(
+                self.faker, seq=None, client_id=closed.client_id, incident_id=closed.id, action=Action.CLOSED
+            )
+        )
+        items = [
+            (self.incident.id, Risk.LOW),
+            (cast(str, self.faker.uuid4()), Risk.HIGH),
+            (closed.id, Risk.HIGH),
+            (self.incident.id, Risk.HIGH),
+        ]
+
+        results = self.service.update_risks(self.incident.client_id, items)
+
+        self.assertEqual(results[0], (Risk.LOW, Risk.LOW))
+        self.assertEqual([cast(UpdateRejectedError, x).status for x in results[1:3]], [404, 409])
+        self.assertEqual(results[3], (Risk.LOW, Risk.HIGH))
+        incident = self.repo.get(client_id=self.incident.client_id, incident_id=self.incident.id)
+        self.assertEqual(cast(Incident, incident).risk, Risk.HIGH)
+
+    def test_register_incidents(self) -> None:
+        incident = create_random_incident(self.faker)
+
+        results = self.service.register_incidents([(incident, 'Created'), (self.incident, 'Already exists')])
+
+        self.assertEqual(cast(HistoryEntry, results[0]).seq, 0)
+        self.assertEqual(cast(UpdateRejectedError, results[1]).status, 500)
+        history = self.repo.get_history(client_id=incident.client_id, incident_id=incident.id)
+        self.assertEqual([(x.action, x.description) for x in history], [(Action.CREATED, 'Created')])
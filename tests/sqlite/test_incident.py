@@ -0,0 +1,63 @@
+import sqlite3
+import tempfile
+from pathlib import Path
+from typing import cast
+
+from google.api_core.exceptions import FailedPrecondition
+
+from models import Incident, Risk
+from repositories.sqlite import SqliteIncidentRepository, migrate
+from tests import incident_contract
+from tests.util import create_random_history_entry
+
+
+class TestSqliteIncident(incident_contract.IncidentRepositoryContract):
+    repo: SqliteIncidentRepository
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = str(Path(self.tmp_dir.name) / 'incidents.db')
+        self.repo = SqliteIncidentRepository(self.path)
+
+    def tearDown(self) -> None:
+        self.repo.close()
+        self.tmp_dir.cleanup()
+
+    def test_wal_mode(self) -> None:
+        conn = sqlite3.connect(self.path)
+        self.assertEqual(conn.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+        conn.close()
+
+    def test_migrate_idempotent(self) -> None:
+        conn = sqlite3.connect(self.path, isolation_level=None)
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+
+        self.assertGreater(version, 0)
+        self.assertEqual(migrate(conn), version)
+        conn.close()
+
+    def test_persisted(self) -> None:
+        incident, entries = self.add_incident_with_history(2)
+        self.repo.close()
+
+        repo = SqliteIncidentRepository(self.path)
+        self.assertEqual(repo.get(client_id=incident.client_id, incident_id=incident.id), incident)
+        self.assertEqual(list(repo.get_history(client_id=incident.client_id, incident_id=incident.id)), entries)
+        repo.close()
+
+    def test_version_bumped_by_append(self) -> None:
+        incident, _ = self.add_incident_with_history(1)
+        read, _ = self.repo.get_with_history(client_id=incident.client_id, incident_id=incident.id)
+        read = cast(Incident, read)
+
+        entry = create_random_history_entry(self.faker, seq=None, client_id=incident.client_id, incident_id=incident.id)
+        self.repo.append_history_entry(entry)
+
+        read.risk = Risk.HIGH
+        with self.assertRaises(FailedPrecondition):
+            self.repo.update_with_history(read, {'risk'}, None, read.version)
+
+        current = cast(Incident, self.repo.get(client_id=incident.client_id, incident_id=incident.id))
+        self.repo.update_with_history(read, {'risk'}, None, current.version)
+        self.assertEqual(cast(Incident, self.repo.get(client_id=incident.client_id, incident_id=incident.id)).risk, Risk.HIGH)
@@ -0,0 +1,54 @@
+import asyncio
+import contextvars
+import threading
+from unittest import TestCase
+
+from utils import EventLoopThread
+
+request_id: contextvars.ContextVar[str] = contextvars.ContextVar('request_id')
+
+
+class TestEventLoopThread(TestCase):
+    def setUp(self) -> None:
+        self.event_loop = EventLoopThread()
+
+    def test_run(self) -> None:
+        async def coro() -> tuple[int, threading.Thread]:
+            await asyncio.sleep(0)
+            return 42, threading.current_thread()
+
+        result, thread = self.event_loop.run(coro())
+
+        self.assertEqual(result, 42)
+        self.assertIs(thread, self.event_loop.thread)
+
+    def test_run_exception(self) -> None:
+        async def coro() -> None:
+            raise ValueError('error')
+
+        with self.assertRaises(ValueError):
+            self.event_loop.run(coro())
+
+    def test_run_context(self) -> None:
+        async def coro() -> str:
+            return request_id.get()
+
+        request_id.set('abc')
+
+        self.assertEqual(self.event_loop.run(coro()), 'abc')
+
+    def test_run_concurrent(self) -> None:
+        async def coro(i: int) -> int:
+            await asyncio.sleep(0.01)
+            return i
+
+        results: list[int] = []
+        threads = [threading.Thread(target=lambda i=i: results.append(self.event_loop.run(coro(i)))) for i in range(8)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(results), list(range(8)))
@@ -1,15 +1,37 @@
 from .error_msg import (
+    BODY_TOO_LARGE_ERROR,
     CLOSED_INCIDENT_ERROR,
+    IDEMPOTENCY_IN_PROGRESS_ERROR,
+    IDEMPOTENCY_KEY_ERROR,
+    IDEMPOTENCY_MISMATCH_ERROR,
+    IF_MATCH_ERROR,
     INCIDENT_NOT_FOUND,
+    INCIDENT_VERSION_ERROR,
+    INVALID_PARAMETER_ERROR,
     INVALID_UUID_ERROR,
     JSON_VALIDATION_ERROR,
+    REGISTER_FAILED_ERROR,
+    TASK_NOT_FOUND,
     UNAUTHORIZED_INCIDENT_ERROR,
+    UPDATE_FAILED_ERROR,
 )
+from .event_loop import EventLoopThread
 
 __all__ = [
+    'BODY_TOO_LARGE_ERROR',
     'CLOSED_INCIDENT_ERROR',
+    'IDEMPOTENCY_IN_PROGRESS_ERROR',
+    'IDEMPOTENCY_KEY_ERROR',
+    'IDEMPOTENCY_MISMATCH_ERROR',
+    'IF_MATCH_ERROR',
     'INCIDENT_NOT_FOUND',
+    'INCIDENT_VERSION_ERROR',
+    'INVALID_PARAMETER_ERROR',
     'INVALID_UUID_ERROR',
     'JSON_VALIDATION_ERROR',
+    'REGISTER_FAILED_ERROR',
+    'TASK_NOT_FOUND',
     'UNAUTHORIZED_INCIDENT_ERROR',
+    'UPDATE_FAILED_ERROR',
+    'EventLoopThread',
 ]
@@ -1,5 +1,15 @@
 JSON_VALIDATION_ERROR = 'Request body must be a JSON object.'
+BODY_TOO_LARGE_ERROR = 'Request body is too large.'
 INVALID_UUID_ERROR = 'Invalid UUID format for {field}.'
+INVALID_PARAMETER_ERROR = 'Invalid value for the {param} query parameter.'
 INCIDENT_NOT_FOUND = 'Incident not found.'
 UNAUTHORIZED_INCIDENT_ERROR = 'You are not allowed to access this incident.'
 CLOSED_INCIDENT_ERROR = 'Incident is already closed.'
+UPDATE_FAILED_ERROR = 'Incident could not be updated.'
+INCIDENT_VERSION_ERROR = 'Incident was modified, it does not match If-Match.'
+IF_MATCH_ERROR = 'If-Match must be a single ETag or *.'
+REGISTER_FAILED_ERROR = 'Incident could not be registered.'
+IDEMPOTENCY_KEY_ERROR = 'Idempotency-Key must have between 1 and 255 characters.'
+IDEMPOTENCY_MISMATCH_ERROR = 'Idempotency-Key was already used with a different request.'
+IDEMPOTENCY_IN_PROGRESS_ERROR = 'A request with this Idempotency-Key is still in progress.'
+TASK_NOT_FOUND = 'Side effect task not found.'
@@ -0,0 +1,38 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import threading
+from collections.abc import Coroutine
+from typing import Any, TypeVar
+
+T = TypeVar('T')
+
+
+class EventLoopThread:
+    # Event loop on a daemon thread shared by every request thread. Async clients (gRPC channels) are bound to the
+    # loop they were first used on, so they are created once per process instead of once per request
+    def __init__(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name='event-loop', daemon=True)
+        self.thread.start()
+
+    def run(self, coro: Coroutine[Any, Any, T]) -> T:
+        # The coroutine runs with a copy of the caller's context, so Flask's request context stays available
+        context = contextvars.copy_context()
+        future: concurrent.futures.Future[T] = concurrent.futures.Future()
+
+        def on_done(task: asyncio.Task[T]) -> None:
+            if task.cancelled():
+                future.cancel()
+            elif (exc := task.exception()) is not None:
+                future.set_exception(exc)
+            else:
+                future.set_result(task.result())
+
+        def start() -> None:
+            task = self.loop.create_task(coro, context=context)
+            task.add_done_callback(on_done)
+
+        self.loop.call_soon_threadsafe(start)
+
+        return future.result()